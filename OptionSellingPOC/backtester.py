@@ -1,45 +1,65 @@
 # backtester.py
 import os
-import pickle
 import datetime
+import sys
 import logging
 import trade_zero as algo  # Import your production algo module
+import service_path  # noqa: F401
+import checkpoint
+import fees
+import metrics
+import risk_rules
+from profiler import start_profiler, profile_cycle
+from tick_store import spot_candles
+from candle_series import CandleSeries
+from result_cache import MISS, ResultCache, code_version, fingerprint
+from checkpoint import CheckpointStore
+
+# Service modules whose code runs in the replay (exit rules, checkpoints, latency metrics, charges),
+# fingerprinted with the algo so editing any of them invalidates cached runs
+SIMULATED_MODULES = (risk_rules, checkpoint, metrics, fees)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class Backtester:
-    def __init__(self, data_file, start_date, end_date):
+    def __init__(self, data_file, start_date, end_date, cache=None):
         """
         Initialize the backtester.
-        - data_file: The path to the locally stored historical data file.
+        - data_file: The path to the locally stored historical data file: a CandleSeries .npy file from
+          data_store.py / data_store_yahoo.py (or an older candle pickle), or a tick recording (a .ticks
+          file or directory from tick_store.py) resampled to 1-minute candles.
         - start_date, end_date: The time range to filter the stored data for backtesting.
+        - cache: ResultCache for finished runs (defaults to the service's RESULT_CACHE_DIR).
         """
         self.data_file = data_file
         self.start_date = start_date
         self.end_date = end_date
-        self.historical_data = []
+        self.historical_data = CandleSeries()
         self.trade_log = []         # Records simulated order details
         self.simulated_positions = {}  # Tracks simulated positions
         self.strategy_context = None
         self.current_candle = None  # The "live" candle during simulation
+        self.final_pnl = None
+        self.cache = cache if cache is not None else ResultCache()
 
     def load_historical_data(self):
         if not os.path.exists(self.data_file):
             logging.error(f"Data file {self.data_file} does not exist!")
             return
-        with open(self.data_file, "rb") as f:
-            all_data = pickle.load(f)
-        # Filter candles by date. Each candle is expected to have a "date" key (a datetime object).
-        self.historical_data = [candle for candle in all_data
-                                if self.start_date <= candle["date"] <= self.end_date]
+        if self.data_file.endswith(".ticks") or os.path.isdir(self.data_file):
+            all_data = spot_candles(self.data_file)
+        else:
+            all_data = CandleSeries.load(self.data_file)
+        # A view of the candles in the period, found by binary search on the dates
+        self.historical_data = all_data.between(self.start_date, self.end_date)
         logging.info(f"Loaded {len(self.historical_data)} candles from {self.data_file} "
                      f"for the period {self.start_date} to {self.end_date}.")
 
     # -------------- Simulation Functions -------------- #
     def sim_get_live_price(self, exchange_instrument):
         """Simulated live price: returns the 'close' price of the current candle."""
-        if self.current_candle:
-            return self.current_candle["close"]
+        if self.current_candle is not None:
+            return float(self.current_candle["close"])
         return None
 
     def sim_place_order(self, tradingsymbol, transaction_type, quantity, price=None, retries=3):
@@ -54,13 +74,13 @@ class Backtester:
             return None
 
         # Assume fill price equals the candle's open price.
-        fill_price = self.current_candle["open"]
+        fill_price = float(self.current_candle["open"])
         order_details = {
             "tradingsymbol": tradingsymbol,
             "transaction_type": transaction_type,
             "quantity": quantity,
             "fill_price": fill_price,
-            "timestamp": self.current_candle["date"],
+            "timestamp": self.current_candle["date"].item(),
             "status": "filled"
         }
         self.trade_log.append(order_details)
@@ -92,29 +112,70 @@ class Backtester:
                 self.sim_place_order(symbol, txn_type, abs(qty))
         self.simulated_positions = {}
         logging.info("Simulated closing of all positions.")
+        return True
+
+    def sim_current_time(self):
+        """Simulated clock: the timestamp of the current candle."""
+        if self.current_candle is not None:
+            return self.current_candle["date"].item()
+        return self.start_date
 
     def sim_calculate_pnl(self):
-        """A simplified P&L calculation. Extend as needed."""
+        """
+        A simplified P&L calculation. Extend as needed.
+
+        Charges (fees.py) are deliberately not netted here: simulated orders fill at the index
+        candle's open, not at an option premium, so fees on that turnover would be meaningless.
+        """
         return 0
 
+    def cache_key(self):
+        """
+        Hash of what decides the run: the candles, the algo's settings (its upper-case
+        module constants) and the source of the algo, this backtester and the
+        SIMULATED_MODULES the replay runs.
+        """
+        settings = {name: value for name, value in vars(algo).items() if name.isupper()}
+        candles = [self.historical_data[field] for field in ("date", "open", "high", "low", "close")]
+        return fingerprint(code_version(algo, __file__, *SIMULATED_MODULES), settings, *candles)
+
     # -------------- Running the Backtest -------------- #
-    def run_backtest(self):
+    def run_backtest(self, profile=None):
+        """
+        Replay the candles through the strategy.
+        - profile: run the sampling profiler (defaults to the ADKITE_PROFILE environment variable).
+        """
+        start_profiler("backtester", enabled=profile)
         self.load_historical_data()
         if not self.historical_data:
             logging.error("No historical data available for backtesting.")
             return
 
+        # An unchanged run is read back instead of replayed
+        key = self.cache_key()
+        cached = self.cache.get(key)
+        if cached is not MISS:
+            self.trade_log, self.final_pnl = cached["trade_log"], cached["final_pnl"]
+            logging.info("Loaded the backtest result from the cache.")
+            self.print_summary()
+            return
+
         # Monkey-patch production functions with simulation functions.
         algo.get_live_price = self.sim_get_live_price
         algo.place_order = self.sim_place_order
         algo.get_positions = self.sim_get_positions
         algo.close_all_positions = self.sim_close_all_positions
+        algo.wait_for_fills = lambda order_ids, timeout=None: True  # Simulated orders fill immediately
         algo.calculate_pnl = self.sim_calculate_pnl
+        algo.current_time = self.sim_current_time
         # Override market open check to always return True in simulation.
         algo.is_market_open = lambda: True
+        algo.checkpoints = CheckpointStore(None)  # Keep simulated state off the live checkpoint
 
-        # Initiate the strategy (it now uses simulated functions).
-        self.strategy_context = algo.execute_iron_condor()
+        # Initiate the strategy (it now uses simulated functions) on the first candle.
+        self.current_candle = self.historical_data[0]
+        with profile_cycle("entry"):
+            self.strategy_context = algo.execute_iron_condor()
         if self.strategy_context is None:
             logging.error("Strategy failed to execute in backtest mode.")
             return
@@ -122,12 +183,15 @@ class Backtester:
         # Step through each historical candle and simulate the monitoring.
         for candle in self.historical_data:
             self.current_candle = candle
-            logging.info(f"Simulated time: {candle['date']}, Price: {candle['close']}")
-            cont = algo.monitor_and_adjust(self.strategy_context)
+            logging.info(f"Simulated time: {candle['date'].item()}, Price: {candle['close']}")
+            with profile_cycle("monitor"):
+                cont = algo.monitor_and_adjust(self.strategy_context)
             if not cont:
                 logging.info("Strategy signaled an exit condition at simulated time.")
                 break
 
+        self.final_pnl = algo.calculate_pnl()
+        self.cache.put(key, {"trade_log": self.trade_log, "final_pnl": self.final_pnl})
         self.print_summary()
 
     def print_summary(self):
@@ -135,14 +199,13 @@ class Backtester:
         print("\nTrade Log:")
         for trade in self.trade_log:
             print(trade)
-        final_pnl = algo.calculate_pnl()
-        print(f"\nFinal simulated PNL: {final_pnl}")
+        print(f"\nFinal simulated PNL: {self.final_pnl}")
 
 if __name__ == "__main__":
     # Specify the data file created by data_store.py (adjust the filename as needed).
-    data_file = "historical_data_20230101_20230131_day.pkl"
+    data_file = "historical_data_20230101_20230131_day.npy"
     # Set the time range for the backtest.
     start_date = datetime.datetime(2023, 1, 10)
     end_date = datetime.datetime(2023, 1, 20)
     backtester = Backtester(data_file, start_date, end_date)
-    backtester.run_backtest()
+    backtester.run_backtest(profile="--profile" in sys.argv or None)
@@ -1,11 +1,13 @@
 # data_store.py
 import os
-import pickle
 import datetime
 import logging
 from kiteconnect import KiteConnect
 from kiteconnect.exceptions import KiteException
 
+import service_path  # noqa: F401
+from candle_series import CandleSeries
+
 # ==================== CONFIGURATION ====================
 API_KEY = "your_api_key"
 API_SECRET = "your_api_secret"
@@ -19,7 +21,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 def get_cache_filename(start_date, end_date, interval):
     start_str = start_date.strftime('%Y%m%d')
     end_str = end_date.strftime('%Y%m%d')
-    return f"historical_data_{start_str}_{end_str}_{interval}.pkl"
+    return f"historical_data_{start_str}_{end_str}_{interval}.npy"
 
 def pull_and_store_data(start_date, end_date, interval=INTERVAL, force_refresh=False):
     # Initialize KiteConnect
@@ -39,8 +41,7 @@ def pull_and_store_data(start_date, end_date, interval=INTERVAL, force_refresh=F
 
     try:
         data = kite.historical_data(INSTRUMENT_TOKEN, start_date, end_date, interval)
-        with open(filename, "wb") as f:
-            pickle.dump(data, f)
+        CandleSeries.from_records(data).save(filename)
         logging.info(f"Historical data retrieved and stored in {filename}.")
     except KiteException as e:
         logging.error(f"Error fetching historical data: {e}")
@@ -1,11 +1,13 @@
 # data_store.py
 import os
-import pickle
 import datetime
 import logging
 import yfinance as yf
 import pandas as pd
 
+import service_path  # noqa: F401
+from candle_series import CandleSeries
+
 # ==================== CONFIGURATION ====================
 # For NIFTY 50, Yahoo Finance uses '^NSEI'. Change this if needed.
 TICKER = '^NSEI'
@@ -22,7 +24,7 @@ def get_cache_filename(start_date, end_date, interval):
     """
     start_str = start_date.strftime('%Y%m%d')
     end_str = end_date.strftime('%Y%m%d')
-    return f"historical_data_{TICKER}_{start_str}_{end_str}_{interval}.pkl"
+    return f"historical_data_{TICKER}_{start_str}_{end_str}_{interval}.npy"
 
 
 def get_csv_filename(start_date, end_date, interval):
@@ -38,8 +40,8 @@ def get_csv_filename(start_date, end_date, interval):
 
 def pull_and_store_data(start_date, end_date, interval=INTERVAL, force_refresh=False):
     """
-    Download historical data for the specified ticker and store it locally in both
-    Pickle and CSV formats.
+    Download historical data for the specified ticker and store it locally as a
+    CandleSeries (.npy, memory-mapped when loaded) and as CSV.
 
     Args:
         start_date (datetime.datetime): Start date for the data.
@@ -47,12 +49,12 @@ def pull_and_store_data(start_date, end_date, interval=INTERVAL, force_refresh=F
         interval (str): Data interval (e.g., '1d' for daily data).
         force_refresh (bool): If True, force re-download even if a cache file exists.
     """
-    pkl_filename = get_cache_filename(start_date, end_date, interval)
+    npy_filename = get_cache_filename(start_date, end_date, interval)
     csv_filename = get_csv_filename(start_date, end_date, interval)
 
-    if os.path.exists(pkl_filename) and os.path.exists(csv_filename) and not force_refresh:
+    if os.path.exists(npy_filename) and os.path.exists(csv_filename) and not force_refresh:
         logging.info(
-            f"Data files {pkl_filename} and {csv_filename} already exist. Use force_refresh=True to refresh data.")
+            f"Data files {npy_filename} and {csv_filename} already exist. Use force_refresh=True to refresh data.")
         return
 
     logging.info(f"Downloading historical data for {TICKER} from {start_date} to {end_date} at interval '{interval}'.")
@@ -68,24 +70,10 @@ def pull_and_store_data(start_date, end_date, interval=INTERVAL, force_refresh=F
     data.to_csv(csv_filename)
     logging.info(f"Historical data saved in CSV format to {csv_filename}.")
 
-    # Convert the DataFrame to a list of dictionaries (each representing a candle)
-    candles = []
-    for dt, row in data.iterrows():
-        candle = {
-            "date": dt.to_pydatetime(),  # Convert Timestamp to datetime
-            "open": row["Open"],
-            "high": row["High"],
-            "low": row["Low"],
-            "close": row["Close"],
-            "volume": row["Volume"]
-        }
-        candles.append(candle)
-
-    # Save the candles list to a Pickle file
-    with open(pkl_filename, "wb") as f:
-        pickle.dump(candles, f)
-
-    logging.info(f"Historical data downloaded and stored in {pkl_filename}.")
+    # Convert the DataFrame column by column into one structured array of candles
+    CandleSeries.from_frame(data).save(npy_filename)
+
+    logging.info(f"Historical data downloaded and stored in {npy_filename}.")
 
 
 if __name__ == "__main__":
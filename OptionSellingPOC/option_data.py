@@ -1,104 +1,176 @@
 # option_chain_store.py
 import os
-import pickle
+import hashlib
 import datetime
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import yfinance as yf
-import pandas as pd
+
+import service_path  # noqa: F401
+from tick_store import SnapshotWriter, snapshot_at
 
 # -------------------- Configuration --------------------
-# Change the TICKER below as needed. For example:
-# For a U.S. stock: TICKER = "AAPL"
-# For the NIFTY 50 index: TICKER = "^NSEI" (note: option chain data for indices may be limited)
-TICKER = "^NSEI"
-# Set the desired expiration date (as a datetime object)
-# Ensure that the expiration date is one of the dates returned by yf.Ticker(TICKER).options
-EXPIRATION_DATE = datetime.datetime(2025, 2, 6)  # Example date; change as needed
+# Change the TICKERS below as needed. For example:
+# For a U.S. stock: "AAPL"
+# For the NIFTY 50 index: "^NSEI" (note: option chain data for indices may be limited)
+TICKERS = ["^NSEI"]
+# Expirations to pull (datetime objects); None pulls every expiration returned by yf.Ticker(ticker).options
+EXPIRATIONS = None
+CHAIN_DIR = "data/chains"  # Daily snapshot files in the tick_store format
+MAX_WORKERS = 8  # Concurrent requests to Yahoo Finance
+MAX_AGE = 300  # Seconds a stored snapshot is served before pull_and_store_option_chain fetches again
 
 # Set up logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+writer = None  # SnapshotWriter, created on first use so it remembers the last snapshot written
+pulled_at = {}  # (ticker, "YYYY-MM-DD") -> time of the last successful fetch; unchanged quotes aren't rewritten
+
 
 # -------------------- Utility Functions --------------------
-def get_cache_filename(ticker, expiration_date):
+def contract_token(symbol):
     """
-    Generate a cache filename (Pickle file) for the option chain data.
+    A stable 63-bit instrument token for a contract symbol (Yahoo contracts have no numeric token).
     """
-    exp_str = expiration_date.strftime('%Y-%m-%d')
-    # Remove characters that might be problematic in filenames
-    ticker_clean = ticker.replace('^', '')
-    return f"option_chain_{ticker_clean}_{exp_str}.pkl"
+    return int.from_bytes(hashlib.blake2b(symbol.encode(), digest_size=8).digest(), "big") >> 1
 
 
-def get_csv_filenames(ticker, expiration_date):
+def fetch_expirations(ticker):
     """
-    Generate CSV filenames for the calls and puts data.
+    Expiration dates (YYYY-MM-DD strings) listed for a ticker.
     """
-    exp_str = expiration_date.strftime('%Y-%m-%d')
-    ticker_clean = ticker.replace('^', '')
-    calls_filename = f"calls_{ticker_clean}_{exp_str}.csv"
-    puts_filename = f"puts_{ticker_clean}_{exp_str}.csv"
-    return calls_filename, puts_filename
+    return list(yf.Ticker(ticker).options)
 
 
-def pull_and_store_option_chain(ticker, expiration_date, force_refresh=False):
+def fetch_chain(ticker, expiration):
     """
-    Download option chain data for the specified ticker and expiration date from Yahoo Finance,
-    then store the data as both a Pickle file and as CSV files.
+    Download one expiration's calls and puts as tick_store quotes and instrument records.
 
     Args:
         ticker (str): The ticker symbol (e.g., "AAPL" or "^NSEI").
-        expiration_date (datetime.datetime): The expiration date for which to download data.
-        force_refresh (bool): If True, re-download even if local files exist.
+        expiration (str): Expiration date as YYYY-MM-DD.
 
     Returns:
-        dict: A dictionary with two keys, "calls" and "puts", each containing a Pandas DataFrame.
+        tuple: (quotes, instruments) lists, one entry per contract.
+    """
+    chain = yf.Ticker(ticker).option_chain(expiration)
+    quotes, instruments = [], []
+    for option_type, frame in (("CE", chain.calls), ("PE", chain.puts)):
+        frame = frame.fillna({"lastPrice": float("nan"), "volume": 0, "openInterest": 0, "bid": 0, "ask": 0})
+        for contract in frame.to_dict("records"):
+            token = contract_token(contract["contractSymbol"])
+            quotes.append({
+                "instrument_token": token,
+                "last_price": contract["lastPrice"],
+                "volume_traded": int(contract["volume"]),
+                "oi": int(contract["openInterest"]),
+                "depth": {"buy": [{"price": contract["bid"], "quantity": 0}],
+                          "sell": [{"price": contract["ask"], "quantity": 0}]},
+            })
+            instruments.append({"instrument_token": token, "tradingsymbol": contract["contractSymbol"],
+                                "name": ticker, "exchange": "YF", "instrument_type": option_type,
+                                "expiry": expiration, "strike": float(contract["strike"])})
+    return quotes, instruments
+
+
+def pull_option_chains(tickers=TICKERS, expirations=EXPIRATIONS, max_workers=MAX_WORKERS, directory=CHAIN_DIR):
     """
-    pkl_filename = get_cache_filename(ticker, expiration_date)
-    calls_csv, puts_csv = get_csv_filenames(ticker, expiration_date)
+    Fetch the option chains of many tickers and expirations concurrently and append them to the
+    snapshot store as one timestamped snapshot.
 
-    if (os.path.exists(pkl_filename) and os.path.exists(calls_csv) and os.path.exists(puts_csv)
-            and not force_refresh):
-        logging.info(f"Using cached data from {pkl_filename} and CSV files.")
-        with open(pkl_filename, 'rb') as f:
-            option_chain = pickle.load(f)
-        return option_chain
+    Requests run on a pool of at most max_workers threads: first every ticker's expiration list, then
+    every (ticker, expiration) chain. Contracts whose quote is unchanged since the previous snapshot
+    are not written again, so polling builds up intraday chain history cheaply.
 
-    logging.info(f"Downloading option chain data for {ticker} for expiration {expiration_date.strftime('%Y-%m-%d')}.")
-    yf_ticker = yf.Ticker(ticker)
+    Args:
+        tickers (list): Ticker symbols.
+        expirations (list): Expiration dates (datetime objects) to pull; None for all listed ones.
+        max_workers (int): Concurrent requests.
+        directory (str): Snapshot store directory.
+
+    Returns:
+        int: Number of contracts written.
+    """
+    global writer
+    if writer is None or writer.directory != directory:
+        writer = SnapshotWriter(directory)
+    taken_at = datetime.datetime.now()
+    wanted = None if expirations is None else {expiration.strftime('%Y-%m-%d') for expiration in expirations}
+    quotes, instruments = [], []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        listed = dict(zip(tickers, pool.map(fetch_expirations, tickers)))
+        jobs = {}
+        for ticker in tickers:
+            missing = (wanted or set()) - set(listed[ticker])
+            if missing:
+                logging.error(f"Expirations {sorted(missing)} are not available for ticker {ticker}. "
+                              f"Available expirations: {listed[ticker]}")
+            for expiration in listed[ticker]:
+                if wanted is None or expiration in wanted:
+                    jobs[pool.submit(fetch_chain, ticker, expiration)] = (ticker, expiration)
+        for future in as_completed(jobs):
+            ticker, expiration = jobs[future]
+            try:
+                chain_quotes, chain_instruments = future.result()
+            except Exception as e:
+                logging.error(f"Failed to fetch the {ticker} {expiration} option chain: {e}")
+                continue
+            quotes.extend(chain_quotes)
+            instruments.extend(chain_instruments)
+            pulled_at[(ticker, expiration)] = taken_at
+    written = writer.write(quotes, instruments, taken_at)
+    logging.info(f"Fetched {len(quotes)} contracts in {len(jobs)} chains; {written} changed since the last snapshot.")
+    return written
+
+
+def load_option_chain(ticker, expiration_date, moment=None, directory=CHAIN_DIR):
+    """
+    The stored chain of one expiration as of moment (default: the latest snapshot).
 
-    # Yahoo Finance returns a list of available expiration dates as strings (YYYY-MM-DD).
-    available_expirations = yf_ticker.options
+    Returns:
+        dict: "calls" and "puts" DataFrames (tradingsymbol, strike, last_price, bid, ask, volume_traded, oi,
+        exchange_timestamp), or None if nothing is stored.
+    """
+    if not os.path.isdir(directory):
+        return None
+    book = snapshot_at(directory, moment)
     exp_str = expiration_date.strftime('%Y-%m-%d')
-    if exp_str not in available_expirations:
-        logging.error(
-            f"Expiration date {exp_str} is not available for ticker {ticker}. Available expirations: {available_expirations}")
+    chain = book[(book["name"] == ticker) & (book["expiry"].astype(str) == exp_str)]
+    if chain.empty:
         return None
+    columns = ["tradingsymbol", "strike", "last_price", "bid", "ask", "volume_traded", "oi", "exchange_timestamp"]
+    return {"calls": chain[chain["instrument_type"] == "CE"][columns].sort_values("strike", ignore_index=True),
+            "puts": chain[chain["instrument_type"] == "PE"][columns].sort_values("strike", ignore_index=True)}
 
-    # Retrieve option chain data for the given expiration.
-    chain = yf_ticker.option_chain(exp_str)
-    # chain.calls and chain.puts are Pandas DataFrames.
-    option_chain = {"calls": chain.calls, "puts": chain.puts}
 
-    # Save as CSV files for verification.
-    chain.calls.to_csv(calls_csv, index=False)
-    chain.puts.to_csv(puts_csv, index=False)
-    logging.info(f"Option chain CSV files saved: {calls_csv}, {puts_csv}")
+def pull_and_store_option_chain(ticker, expiration_date, force_refresh=False, max_age=MAX_AGE):
+    """
+    The option chain of one expiration: read from the snapshot store if its latest snapshot is
+    younger than max_age seconds, otherwise fetched and stored first.
+
+    Args:
+        ticker (str): The ticker symbol (e.g., "AAPL" or "^NSEI").
+        expiration_date (datetime.datetime): The expiration date for which to download data.
+        force_refresh (bool): If True, fetch even if a recent snapshot is stored.
+        max_age (float): Seconds a stored snapshot stays current.
 
-    # Save the dictionary to a Pickle file.
-    with open(pkl_filename, "wb") as f:
-        pickle.dump(option_chain, f)
-    logging.info(f"Option chain data cached in Pickle file: {pkl_filename}")
+    Returns:
+        dict: A dictionary with two keys, "calls" and "puts", each containing a Pandas DataFrame.
+    """
+    option_chain = None if force_refresh else load_option_chain(ticker, expiration_date)
+    if option_chain is not None:
+        taken_at = max(option_chain["calls"]["exchange_timestamp"].max(), option_chain["puts"]["exchange_timestamp"].max(),
+                       pulled_at.get((ticker, expiration_date.strftime('%Y-%m-%d')), datetime.datetime.min))
+        if datetime.datetime.now() - taken_at <= datetime.timedelta(seconds=max_age):
+            logging.info(f"Using the option chain snapshot stored at {taken_at}.")
+            return option_chain
 
-    return option_chain
+    logging.info(f"Downloading option chain data for {ticker} for expiration {expiration_date.strftime('%Y-%m-%d')}.")
+    pull_option_chains([ticker], [expiration_date])
+    return load_option_chain(ticker, expiration_date)
 
 
 if __name__ == "__main__":
-    # Example usage:
-    option_data = pull_and_store_option_chain(TICKER, EXPIRATION_DATE, force_refresh=False)
-    if option_data:
-        print("=== Calls Data ===")
-        print(option_data["calls"].head())
-        print("\n=== Puts Data ===")
-        print(option_data["puts"].head())
+    # Example usage: one snapshot of every listed expiration of every ticker
+    pull_option_chains(TICKERS, EXPIRATIONS)
@@ -0,0 +1,8 @@
+# service_path.py
+"""Make the shared modules in OptionSellingService importable from the POC scripts."""
+import os
+import sys
+
+SERVICE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "OptionSellingService"))
+if SERVICE_DIR not in sys.path:
+    sys.path.append(SERVICE_DIR)
@@ -1,16 +1,41 @@
+import os
+import sys
 import time
 import logging
 import datetime
+import threading
 import pytz
-from kiteconnect import KiteConnect
+from kiteconnect import KiteConnect, KiteTicker
 from kiteconnect.exceptions import KiteException
 
+import service_path  # noqa: F401
+from metrics import InstrumentedKite, TICK_TO_DECISION, DECISION_TO_ACK, start_metrics_server
+from profiler import start_profiler, profile_cycle
+from rate_limiter import RateLimiter
+from order_tracker import OrderTracker, OrderNotFilled
+from execution import LimitChaser
+from order_gateway import OrderGateway
+from risk_rules import RiskEngine
+from candles import CandleAggregator
+from checkpoint import CheckpointStore, reconcile
+from fees import charges
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from Zerodha.Connection.session_manager import SessionManager, SessionError
+
 # ==================== CONFIGURATION ====================
 API_KEY = "your_api_key"
 API_SECRET = "your_api_secret"
 REQUEST_TOKEN = "your_request_token"
+PAPER_TRADING = os.environ.get("KITE_PAPER") == "1"  # Trade against the in-process paper exchange
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9109))  # Local /metrics endpoint; 0 disables it
+ORDER_RATE_LIMIT = 10  # Orders per second allowed by the Kite API
+ORDER_FILL_TIMEOUT = 30  # Seconds to wait for order updates confirming a fill
+CHECKPOINT_FILE = "data/trade_zero_checkpoint.json"  # Strategy state, resumed after a crash or restart
 
 UNDERLYING = "NIFTY"  # or "BANKNIFTY"
+INDEX_TOKENS = {"NIFTY": 256265, "BANKNIFTY": 260105}
+INDEX_SYMBOLS = {"NIFTY": "NSE:NIFTY 50", "BANKNIFTY": "NSE:NIFTY BANK"}
 LOTS = 5
 QUANTITY_PER_LOT = 50
 TOTAL_QUANTITY = LOTS * QUANTITY_PER_LOT
@@ -27,31 +52,90 @@ MARKET_START = datetime.time(9, 15)
 MARKET_END = datetime.time(15, 20)
 IST = pytz.timezone("Asia/Kolkata")
 
+# Exit rules, compiled by risk_rules.RiskEngine
+RISK_RULES = {
+    "iron_condor": [
+        {"type": "take_profit", "pnl": TARGET_PROFIT},
+        {"type": "max_loss", "pnl": MAX_LOSS},
+        {"type": "trailing_stop", "trigger": TRAIL_PROFIT_TRIGGER, "trail": TRAIL_AMOUNT},
+        {"type": "exit_time", "time": MARKET_END.strftime("%H:%M")},
+    ],
+}
+EXIT_REASONS = {
+    "take_profit": "Target profit reached. Exiting all positions.",
+    "max_loss": "Max loss limit reached. Exiting all positions.",
+    "trailing_stop": "Trailing stop triggered. Exiting positions.",
+    "exit_time": "Market closing soon. Exiting all positions.",
+}
+
 # Logging configuration
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 # ==================== INITIAL SETUP ====================
-kite = KiteConnect(api_key=API_KEY)
+if PAPER_TRADING:
+    from paper_exchange import paper_session
+    kite, ticker, paper_exchange = paper_session(ticks_file=os.environ.get("KITE_PAPER_TICKS"))
+else:
+    kite = KiteConnect(api_key=API_KEY)
+kite = InstrumentedKite(kite)  # Per-endpoint latency histograms
+order_limiter = RateLimiter(ORDER_RATE_LIMIT)
 
 try:
-    session_data = kite.generate_session(REQUEST_TOKEN, api_secret=API_SECRET)
+    if PAPER_TRADING:
+        session_data = kite.generate_session(REQUEST_TOKEN, api_secret=API_SECRET)
+    else:
+        # Reuse today's token from the shared session store; log in only if no process has yet
+        session_data = SessionManager(
+            API_KEY, login=lambda kite: kite.generate_session(REQUEST_TOKEN, api_secret=API_SECRET)
+        ).session(kite)
     kite.set_access_token(session_data["access_token"])
     logging.info("Session generated successfully!")
-except KiteException as e:
+except (KiteException, SessionError) as e:
     logging.error(f"Error generating session: {e}")
     exit()
 
+# Order updates arrive over the ticker websocket and drive the order tracker
+if not PAPER_TRADING:
+    ticker = KiteTicker(API_KEY, session_data["access_token"])
+order_tracker = OrderTracker().attach(ticker)
+order_gateway = OrderGateway(kite, order_tracker, limiter=order_limiter, lot_size=QUANTITY_PER_LOT)
+execution_engine = LimitChaser(kite, order_tracker, gateway=order_gateway)
+checkpoints = CheckpointStore(CHECKPOINT_FILE)
+
+# Live index candles from the same websocket; each 1-minute close triggers a monitoring cycle
+index_token = INDEX_TOKENS[UNDERLYING]
+candles = CandleAggregator().attach(ticker)
+minute_closed = threading.Event()
+candles.on_bar(lambda bar: minute_closed.set(), timeframe="1m", token=index_token)
+
+def subscribe_index(ws, response):
+    ws.subscribe([index_token])
+    ws.set_mode(ws.MODE_FULL, [index_token])  # Full mode carries the exchange timestamp
+
+ticker.on_connect = subscribe_index  # Re-subscribes after reconnects
+
 # ==================== UTILITY FUNCTIONS ====================
+def current_time():
+    """
+    Current time in IST. The backtester replaces this with the simulated candle time.
+    """
+    return datetime.datetime.now(IST)
+
 def is_market_open():
-    now = datetime.datetime.now(IST).time()
+    now = current_time().time()
     return MARKET_START <= now <= MARKET_END
 
 def get_live_price(exchange_instrument):
     """
     Fetch the last traded price for a given instrument.
     exchange_instrument e.g. "NSE:NIFTY 50"
+    The underlying index is read from the live candles when they are streaming.
     """
+    if exchange_instrument == INDEX_SYMBOLS[UNDERLYING] and ticker.is_connected():
+        bar = candles.forming(index_token, "1s") or candles.forming(index_token, "1m")
+        if bar is not None:
+            return bar["close"]
     try:
         quote = kite.ltp([exchange_instrument])
         price = quote[exchange_instrument]["last_price"]
@@ -105,21 +189,29 @@ def calculate_strikes(atm_price):
 def place_order(tradingsymbol, transaction_type, quantity, price=None, retries=3):
     """
     Place an order with retry logic.
-    price = None implies a MARKET order; otherwise, a LIMIT order is placed.
+    price = None works a LIMIT order from the mid towards the touch, finishing at MARKET if
+    it is still open after the last step; otherwise, a LIMIT order is placed at price.
     """
-    order_type = "MARKET" if price is None else "LIMIT"
     for attempt in range(1, retries + 1):
         try:
-            order_id = kite.place_order(
-                variety=kite.VARIETY_REGULAR,
-                exchange="NFO",
-                tradingsymbol=tradingsymbol,
-                transaction_type=transaction_type,
-                quantity=quantity,
-                product="MIS",
-                order_type=order_type,
-                price=price
-            )
+            if price is None:
+                result, = execution_engine.execute([{
+                    "exchange": "NFO", "tradingsymbol": tradingsymbol, "transaction_type": transaction_type,
+                    "quantity": quantity, "product": "MIS"}], fallback="market")
+                if result["order_id"] is None:
+                    raise KiteException(result.get("status_message") or "Order placement failed")
+                order_id = result["order_id"]
+            else:
+                # Above the freeze quantity this is sliced; order_id then covers every slice
+                order_id = order_gateway.place_order(
+                    exchange="NFO",
+                    tradingsymbol=tradingsymbol,
+                    transaction_type=transaction_type,
+                    quantity=quantity,
+                    product="MIS",
+                    order_type="LIMIT",
+                    price=price
+                )
             logging.info(f"Order placed: {tradingsymbol} {transaction_type} QTY:{quantity} Price:{price} ID:{order_id}")
             return order_id
         except KiteException as e:
@@ -139,32 +231,53 @@ def get_positions():
         logging.error(f"Failed to fetch positions: {e}")
         return {"day": [], "net": []}
 
+def wait_for_fills(order_ids, timeout=ORDER_FILL_TIMEOUT):
+    """
+    Wait for order updates confirming that every order filled.
+    Returns False (and logs why) if any order is rejected, cancelled or still open at the timeout.
+    """
+    try:
+        order_tracker.wait_all_filled_sync([order_id for order_id in order_ids if order_id], timeout, kite=kite)
+    except OrderNotFilled as e:
+        logging.error(f"Orders not filled: {e}. Statuses: {order_tracker.statuses(order_ids)}")
+        return False
+    return None not in order_ids
+
 def close_all_positions():
     """
-    Close all open day positions by placing reverse orders.
+    Close all open day positions by placing reverse orders, then wait for the fills.
+    Returns True once every closing order filled (or there was nothing to close).
     """
     positions = get_positions()
     if "day" in positions:
+        order_ids = []
         for pos in positions["day"]:
             if pos["quantity"] != 0:
                 # Determine reverse transaction type based on current quantity.
                 txn_type = "BUY" if pos["quantity"] < 0 else "SELL"
                 qty = abs(pos["quantity"])
-                place_order(pos["tradingsymbol"], txn_type, qty)
+                order_ids.append(place_order(pos["tradingsymbol"], txn_type, qty))
                 logging.info(f"Closed position: {pos['tradingsymbol']} Quantity: {pos['quantity']}")
-    else:
-        logging.info("No day positions found to close.")
+        filled = not order_ids or wait_for_fills(order_ids)
+        if order_ids and filled:
+            logging.info("All closing orders filled.")
+        return filled
+    logging.info("No day positions found to close.")
+    return True
 
 def calculate_pnl():
     """
-    Calculate and return the total PNL for day positions.
+    Calculate and return the total PNL for day positions, net of brokerage, taxes and exchange
+    charges on the day's buys and sells (fees.py; each side of a position counted as one order).
     """
-    positions = get_positions()
-    pnl = 0
-    for pos in positions.get("day", []):
-        pnl += pos.get("pnl", 0)
-    logging.info(f"Calculated PNL: {pnl}")
-    return pnl
+    positions = get_positions().get("day", [])
+    pnl = sum(pos.get("pnl", 0) for pos in positions)
+    prices = [pos.get("day_buy_price", 0) for pos in positions] + [pos.get("day_sell_price", 0) for pos in positions]
+    quantities = ([pos.get("day_buy_quantity", 0) for pos in positions] +
+                  [-pos.get("day_sell_quantity", 0) for pos in positions])
+    fees = float(charges(prices, quantities, current_time().date()).sum())
+    logging.info(f"Calculated PNL: {pnl - fees} (charges {round(fees, 2)})")
+    return pnl - fees
 
 # ==================== STRATEGY EXECUTION ====================
 def execute_iron_condor():
@@ -179,7 +292,7 @@ def execute_iron_condor():
         logging.error("Market not open. Cannot execute strategy.")
         return None
 
-    underlying_symbol = "NSE:NIFTY 50" if UNDERLYING == "NIFTY" else "NSE:BANKNIFTY"
+    underlying_symbol = INDEX_SYMBOLS[UNDERLYING]
     atm_price = get_live_price(underlying_symbol)
     if atm_price is None:
         logging.error("Could not fetch ATM price. Aborting strategy.")
@@ -193,22 +306,86 @@ def execute_iron_condor():
     long_put_symbol = construct_option_symbol(UNDERLYING, expiry, strikes["long_put"], "PE")
     short_call_symbol = construct_option_symbol(UNDERLYING, expiry, strikes["short_call"], "CE")
     long_call_symbol = construct_option_symbol(UNDERLYING, expiry, strikes["long_call"], "CE")
-
-    # Place orders (here, MARKET orders are used for simplicity).
-    place_order(short_put_symbol, "SELL", TOTAL_QUANTITY)
-    place_order(long_put_symbol, "BUY", TOTAL_QUANTITY)
-    place_order(short_call_symbol, "SELL", TOTAL_QUANTITY)
-    place_order(long_call_symbol, "BUY", TOTAL_QUANTITY)
-
-    logging.info("Iron Condor strategy initiated.")
-    return {
+    context = {
         "short_put_symbol": short_put_symbol,
         "long_put_symbol": long_put_symbol,
         "short_call_symbol": short_call_symbol,
         "long_call_symbol": long_call_symbol,
-        "entry_time": datetime.datetime.now(IST),
-        "trail_base": 0
+        "legs": {short_put_symbol: -TOTAL_QUANTITY, long_put_symbol: TOTAL_QUANTITY,
+                 short_call_symbol: -TOTAL_QUANTITY, long_call_symbol: TOTAL_QUANTITY},
+        "entry_time": current_time(),
+        "risk": None,
+        "trail_stop": None
     }
+    # Written ahead of the orders, so a crash mid-entry resumes with whatever the broker filled
+    save_checkpoint(context, "entering")
+
+    # Place orders (limit orders chased from the mid, finishing at market).
+    order_ids = [
+        place_order(short_put_symbol, "SELL", TOTAL_QUANTITY),
+        place_order(long_put_symbol, "BUY", TOTAL_QUANTITY),
+        place_order(short_call_symbol, "SELL", TOTAL_QUANTITY),
+        place_order(long_call_symbol, "BUY", TOTAL_QUANTITY),
+    ]
+    if not wait_for_fills(order_ids):
+        logging.error("Iron Condor entry not fully filled; monitoring whatever is open.")
+
+    logging.info("Iron Condor strategy initiated.")
+    risk = RiskEngine(RISK_RULES)
+    risk.open("iron_condor", "iron_condor")  # Marked with the broker's P&L each cycle
+    context["risk"] = risk
+    save_checkpoint(context, "open")
+    return context
+
+def save_checkpoint(context, phase):
+    """
+    Record the strategy state so a restart can resume it: the legs, entry time,
+    trailing stop and phase ("entering", "open" or "exiting").
+    """
+    context["phase"] = phase
+    state = {key: value for key, value in context.items() if key != "risk"}
+    if context["risk"] is not None:
+        state["trail_peak"], state["trail_armed"] = context["risk"].trail_state("iron_condor")
+    checkpoints.save("iron_condor", state)
+
+def resume_iron_condor():
+    """
+    Rebuild the strategy context from the last checkpoint, reconciled with the
+    broker's positions in one call. Returns None when there is nothing to resume.
+    """
+    state = checkpoints.get("iron_condor")
+    if state is None:
+        return None
+    held, differing = reconcile(state["legs"], get_positions())
+    if not any(held.values()):
+        logging.info("The checkpointed Iron Condor is flat at the broker; starting afresh.")
+        checkpoints.delete("iron_condor")
+        return None
+    if differing:
+        logging.warning(f"Broker quantities differ from the checkpoint for {differing}; monitoring what is held.")
+    context = dict(state, legs=held)
+    peak, armed = context.pop("trail_peak", None), context.pop("trail_armed", False)
+    risk = RiskEngine(RISK_RULES)
+    risk.open("iron_condor", "iron_condor")
+    risk.restore_trail("iron_condor", peak, armed)
+    context["risk"] = risk
+    logging.info(f"Resumed the Iron Condor entered at {context['entry_time']} ({context['phase']}), "
+                 f"trailing stop {context['trail_stop']}.")
+    save_checkpoint(context, "exiting" if context["phase"] == "exiting" else "open")
+    return context
+
+def exit_all(reason, data_received, context):
+    """
+    Close all positions, recording the time from the market data behind the
+    decision to the decision, and from the decision to the exit orders being accepted.
+    """
+    decided = time.perf_counter()
+    TICK_TO_DECISION.labels("trade_zero").observe(decided - data_received)
+    logging.info(reason)
+    save_checkpoint(context, "exiting")  # A crash mid-exit finishes the exit on restart
+    if close_all_positions():
+        checkpoints.delete("iron_condor")
+    DECISION_TO_ACK.labels("trade_zero").observe(time.perf_counter() - decided)
 
 def monitor_and_adjust(context):
     """
@@ -219,38 +396,25 @@ def monitor_and_adjust(context):
     """
     if context is None:
         return False
+    if context.get("phase") == "exiting":
+        exit_all("Finishing the exit interrupted before the restart.", time.perf_counter(), context)
+        return False
 
     pnl = calculate_pnl()
+    received = time.perf_counter()
     logging.info(f"Current PNL: {pnl}")
 
-    # Exit conditions based on profit or loss limits.
-    if pnl >= TARGET_PROFIT:
-        logging.info("Target profit reached. Exiting all positions.")
-        close_all_positions()
-        return False
-    if pnl <= MAX_LOSS:
-        logging.info("Max loss limit reached. Exiting all positions.")
-        close_all_positions()
-        return False
-
-    # Trailing stop logic.
-    if pnl > TRAIL_PROFIT_TRIGGER and context["trail_base"] == 0:
-        context["trail_base"] = TRAIL_PROFIT_TRIGGER
-        logging.info("Trailing profit trigger reached. Locking in profits.")
-
-    if context["trail_base"] > 0 and pnl < context["trail_base"]:
-        logging.info("Trailing stop triggered. Exiting positions.")
-        close_all_positions()
-        return False
-
-    if context["trail_base"] > 0 and pnl > (context["trail_base"] + TRAIL_AMOUNT):
-        context["trail_base"] = pnl - TRAIL_AMOUNT
-        logging.info(f"Trailing base updated to: {context['trail_base']}")
-
-    # Exit if the market is about to close.
-    if datetime.datetime.now(IST).time() > MARKET_END:
-        logging.info("Market closing soon. Exiting all positions.")
-        close_all_positions()
+    # Target profit, max loss, trailing stop and market close, per RISK_RULES.
+    risk = context["risk"]
+    risk.set_pnl("iron_condor", pnl)
+    exits = risk.evaluate(current_time())
+    trail_stop = risk.trailing_stop("iron_condor")
+    if trail_stop != context["trail_stop"]:
+        logging.info(f"Trailing stop at: {trail_stop}")
+        context["trail_stop"] = trail_stop
+        save_checkpoint(context, "open")
+    if exits:
+        exit_all(EXIT_REASONS[exits[0][1]], received, context)
         return False
 
     return True
@@ -258,7 +422,14 @@ def monitor_and_adjust(context):
 # ==================== MAIN EXECUTION ====================
 if __name__ == "__main__":
     logging.info("Starting Iron Condor Strategy")
-    strategy_context = execute_iron_condor()
+    start_profiler("trade_zero", enabled="--profile" in sys.argv or None)  # Or ADKITE_PROFILE=1
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    ticker.connect(threaded=True)  # Stream order updates and index ticks
+    strategy_context = resume_iron_condor()  # Pick up a position left open by a crashed run
+    if strategy_context is None:
+        with profile_cycle("entry"):
+            strategy_context = execute_iron_condor()
 
     try:
         while True:
@@ -268,17 +439,23 @@ if __name__ == "__main__":
 
             if not is_market_open():
                 logging.info("Market closed. Closing positions if any.")
-                close_all_positions()
+                if close_all_positions():
+                    checkpoints.delete("iron_condor")
                 break
 
-            if not monitor_and_adjust(strategy_context):
+            with profile_cycle("monitor"):
+                keep_running = monitor_and_adjust(strategy_context)
+            if not keep_running:
                 # Either stop conditions met or positions closed.
                 break
 
-            time.sleep(60)  # Wait 1 minute before next check
+            # Next check when the next 1-minute index candle closes (or after a minute without ticks)
+            minute_closed.wait(60)
+            minute_closed.clear()
     except KeyboardInterrupt:
         logging.info("Keyboard Interrupt detected. Closing positions and exiting.")
-        close_all_positions()
+        if close_all_positions():
+            checkpoints.delete("iron_condor")
     except Exception as e:
-        logging.error(f"Unexpected error: {e}")
-        close_all_positions()
+        # Leave the book as it is: a restart reconciles it with the checkpoint and resumes monitoring
+        logging.exception(f"Unexpected error: {e}. Positions left open; restart to resume them.")
@@ -0,0 +1,202 @@
+# allocator.py
+"""Margin-aware capital allocation across open option positions.
+
+CapitalAllocator keeps a local, SPAN-style margin estimate of every open
+position, so entries and adjustments are sized without a margin API call.
+Legs are netted per underlying and expiry ("bucket"), which gives hedged
+structures (spreads, condors, offsetting strategies) their hedge benefit.
+A bucket's margin is its worst expiry loss over a +/-``scan_range`` move of
+the underlying, plus an exposure margin on its larger short side. Opening,
+adjusting or closing a position only recomputes the bucket it touches and
+applies the difference to the running total.
+
+Entries may use ``INITIAL_ALLOCATION`` of capital; adjustments may also
+draw on ``RESERVE_ALLOCATION``.
+"""
+
+import numpy as np
+
+from config import CAPITAL, INITIAL_ALLOCATION, RESERVE_ALLOCATION, MARGIN_SCAN_RANGE, EXPOSURE_MARGIN
+
+MAX_LOTS = 1000  # Ceiling for baskets that add no margin (e.g. only long options)
+
+
+def _payoff(grid, strikes, quantities, calls):
+    """Expiry value of the legs at each grid price."""
+    moneyness = grid[:, None] - strikes
+    intrinsic = np.maximum(np.where(calls, moneyness, -moneyness), 0.0)
+    return intrinsic @ quantities
+
+
+def _short_sides(quantities, calls):
+    """Short call and short put quantities."""
+    shorts = np.minimum(quantities, 0.0)
+    return -shorts[calls].sum(), -shorts[~calls].sum()
+
+
+class CapitalAllocator:
+    """Track margin used by open positions and size new ones from their marginal margin.
+
+    Legs are given as (strike, option_type, signed quantity) tuples, negative
+    for sold options.
+    """
+
+    def __init__(self, capital=CAPITAL, initial_allocation=INITIAL_ALLOCATION,
+                 reserve_allocation=RESERVE_ALLOCATION, scan_range=MARGIN_SCAN_RANGE, exposure=EXPOSURE_MARGIN):
+        """
+        Args:
+            capital (float): Capital in INR.
+            initial_allocation (float): Share of capital entries may use.
+            reserve_allocation (float): Further share only adjustments may use.
+            scan_range (float): Relative move of the underlying the margin must cover.
+            exposure (float): Exposure margin as a share of the notional of the larger short side.
+        """
+        self.capital = capital
+        self.limits = {"entry": capital * initial_allocation,
+                       "adjustment": capital * (initial_allocation + reserve_allocation)}
+        self.scan_range = scan_range
+        self.exposure = exposure
+        self.spots = {}  # Underlying -> last spot
+        self.used = 0.0
+        self._positions = {}  # Position id -> (bucket, {(strike, option_type): quantity})
+        self._net = {}  # Bucket -> {(strike, option_type): net quantity}
+        self._arrays = {}  # Bucket -> (strikes, quantities, calls) of the net legs
+        self._margin = {}  # Bucket -> margin
+
+    # -------------- Margin model -------------- #
+    def _grid(self, spot, *strike_arrays):
+        low, high = spot * (1 - self.scan_range), spot * (1 + self.scan_range)
+        strikes = np.concatenate(strike_arrays)
+        return np.concatenate([[low, high], strikes[(strikes > low) & (strikes < high)]])
+
+    def _bucket_margin(self, bucket):
+        strikes, quantities, calls = self._arrays[bucket]
+        if not len(strikes):
+            return 0.0
+        spot = self.spots[bucket[0]]
+        loss = max(-_payoff(self._grid(spot, strikes), strikes, quantities, calls).min(), 0.0)
+        return loss + self.exposure * spot * max(_short_sides(quantities, calls))
+
+    def _refresh(self, bucket):
+        net = self._net[bucket]
+        keys = [key for key, quantity in net.items() if quantity]
+        self._arrays[bucket] = (np.array([strike for strike, _ in keys], dtype=float),
+                                np.array([net[key] for key in keys], dtype=float),
+                                np.array([option_type == "CE" for _, option_type in keys], dtype=bool))
+        margin = self._bucket_margin(bucket)
+        self.used += margin - self._margin.get(bucket, 0.0)
+        self._margin[bucket] = margin
+
+    @staticmethod
+    def _legs(legs):
+        return [(float(strike), option_type, float(quantity)) for strike, option_type, quantity in legs]
+
+    # -------------- Positions -------------- #
+    def set_spot(self, underlying, spot):
+        """Move the scan range of an underlying's buckets to a new spot."""
+        self.spots[underlying] = spot
+        for bucket in self._net:
+            if bucket[0] == underlying:
+                self._refresh(bucket)
+
+    def open(self, position_id, legs, underlying="NIFTY", expiry=None, spot=None):
+        """Add a position (or more legs to an open one) and update the margin used."""
+        if spot is not None:
+            self.spots[underlying] = spot
+        bucket = (underlying, expiry)
+        if position_id in self._positions and self._positions[position_id][0] != bucket:
+            raise ValueError(f"Position {position_id} is on {self._positions[position_id][0]}, not {bucket}")
+        held = self._positions.setdefault(position_id, (bucket, {}))[1]
+        net = self._net.setdefault(bucket, {})
+        for strike, option_type, quantity in self._legs(legs):
+            held[(strike, option_type)] = held.get((strike, option_type), 0.0) + quantity
+            net[(strike, option_type)] = net.get((strike, option_type), 0.0) + quantity
+        self._refresh(bucket)
+
+    def apply(self, position_id, legs):
+        """Apply fills to an open position, e.g. the closing legs of an adjustment."""
+        bucket = self._positions[position_id][0]
+        self.open(position_id, legs, *bucket)
+
+    def close(self, position_id):
+        """Remove a position's remaining legs."""
+        bucket, held = self._positions.pop(position_id)
+        net = self._net[bucket]
+        for key, quantity in held.items():
+            net[key] -= quantity
+        self._refresh(bucket)
+
+    def margin(self, position_id=None):
+        """Margin of a position's bucket, or the total used."""
+        if position_id is None:
+            return self.used
+        return self._margin[self._positions[position_id][0]]
+
+    def available(self, purpose="entry"):
+        """Margin still free for an entry or an adjustment."""
+        return self.limits[purpose] - self.used
+
+    # -------------- Sizing -------------- #
+    def _book(self, bucket):
+        return self._arrays.get(bucket, (np.zeros(0), np.zeros(0), np.zeros(0, dtype=bool)))
+
+    def _margin_at(self, bucket, spot):
+        """A bucket's margin at another spot, without moving the book."""
+        if spot == self.spots.get(bucket[0]) or bucket not in self._arrays:
+            return self._margin.get(bucket, 0.0)
+        previous = self.spots[bucket[0]]
+        self.spots[bucket[0]] = spot
+        try:
+            return self._bucket_margin(bucket)
+        finally:
+            self.spots[bucket[0]] = previous
+
+    def marginal_margin(self, legs, underlying="NIFTY", expiry=None, spot=None):
+        """Margin the legs would add to the book (negative when they reduce risk)."""
+        bucket = (underlying, expiry)
+        spot = spot if spot is not None else self.spots[underlying]
+        strikes, quantities, calls = self._book(bucket)
+        legs = self._legs(legs)
+        strikes = np.concatenate([strikes, [strike for strike, _, _ in legs]])
+        quantities = np.concatenate([quantities, [quantity for _, _, quantity in legs]])
+        calls = np.concatenate([calls, np.array([option_type == "CE" for _, option_type, _ in legs], dtype=bool)])
+        loss = max(-_payoff(self._grid(spot, strikes), strikes, quantities, calls).min(), 0.0)
+        after = loss + self.exposure * spot * max(_short_sides(quantities, calls))
+        return after - self._margin_at(bucket, spot)
+
+    def max_lots(self, legs_per_lot, underlying="NIFTY", expiry=None, spot=None, purpose="entry", cap=MAX_LOTS):
+        """Largest number of lots of a basket that fits in the free margin.
+
+        Solved in one vectorized pass rather than by trying lot counts: the
+        bucket's margin after ``n`` more lots is bounded by linear functions
+        of ``n`` (one per scan price and short side, taking short quantities
+        gross), so the answer is the tightest of their break-even points.
+
+        Args:
+            legs_per_lot: (strike, option_type, signed quantity) legs of one lot.
+            purpose (str): "entry" (INITIAL_ALLOCATION) or "adjustment" (also RESERVE_ALLOCATION).
+            cap (int): Ceiling when the basket adds no margin.
+        """
+        bucket = (underlying, expiry)
+        spot = spot if spot is not None else self.spots[underlying]
+        strikes, quantities, calls = self._book(bucket)
+        legs = self._legs(legs_per_lot)
+        lot_strikes = np.array([strike for strike, _, _ in legs])
+        lot_quantities = np.array([quantity for _, _, quantity in legs])
+        lot_calls = np.array([option_type == "CE" for _, option_type, _ in legs], dtype=bool)
+
+        budget = self.limits[purpose] - self.used + self._margin.get(bucket, 0.0)  # Room for this bucket
+        grid = self._grid(spot, strikes, lot_strikes)
+        rate = self.exposure * spot
+        # Rows: loss at each scan price and the zero floor; columns: short call and short put exposure
+        base = np.append(-_payoff(grid, strikes, quantities, calls), 0.0)[:, None] + \
+            rate * np.array(_short_sides(quantities, calls))
+        slope = np.append(-_payoff(grid, lot_strikes, lot_quantities, lot_calls), 0.0)[:, None] + \
+            rate * np.array(_short_sides(lot_quantities, lot_calls))
+        room = budget - base
+        if (room < 0).any():
+            return 0
+        binding = slope > 0
+        if not binding.any():
+            return cap
+        return int(min(np.floor((room[binding] / slope[binding]).min() + 1e-9), cap))
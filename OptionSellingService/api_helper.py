@@ -1,12 +1,35 @@
 # api_helper.py
 """Helper functions for Zerodha Kite API interactions."""
 
-from kiteconnect import KiteConnect
-from config import API_KEY, API_SECRET, ACCESS_TOKEN
-
-# Initialize KiteConnect
-kite = KiteConnect(api_key=API_KEY)
-kite.set_access_token(ACCESS_TOKEN)
+import os
+import sys
+import time
+from kiteconnect import KiteConnect, KiteTicker
+from config import API_KEY, API_SECRET, ACCESS_TOKEN, LOT_SIZE, PAPER_TRADING, PAPER_TICKS_FILE, ORDER_RATE_LIMIT, \
+    ORDER_FILL_TIMEOUT
+from metrics import InstrumentedKite
+from order_tracker import OrderTracker, OrderNotFilled
+from execution import LimitChaser
+from order_gateway import OrderGateway
+from rate_limiter import RateLimiter
+
+# Initialize KiteConnect (or the in-process paper exchange)
+if PAPER_TRADING:
+    from paper_exchange import paper_session
+    kite, ticker, paper_exchange = paper_session(ticks_file=PAPER_TICKS_FILE)
+else:
+    # Today's token from the shared session store, if a login already happened today
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from Zerodha.Connection.session_manager import load_access_token
+    access_token = load_access_token(API_KEY) or ACCESS_TOKEN
+    kite = KiteConnect(api_key=API_KEY)
+    kite.set_access_token(access_token)
+    ticker = KiteTicker(API_KEY, access_token)  # Connected by the caller (ticker.connect(threaded=True))
+kite = InstrumentedKite(kite)  # Per-endpoint latency histograms
+order_limiter = RateLimiter(ORDER_RATE_LIMIT)
+order_tracker = OrderTracker().attach(ticker)  # Order states pushed over the ticker websocket
+order_gateway = OrderGateway(kite, order_tracker, limiter=order_limiter)  # Slices orders above the freeze limit
+execution_engine = LimitChaser(kite, order_tracker, gateway=order_gateway)
 
 
 def generate_access_token():
@@ -40,36 +63,57 @@ def get_options_chain(expiry_date=None):
     return options
 
 
-def place_order(order_details):
-    """Place an Iron Condor order (four legs)."""
+def option_symbol(strike, option_type):
+    """Build the NFO trading symbol for a NIFTY option."""
+    return f"NIFTY{strike}{option_type}"  # Simplified; fetch actual symbol
+
+
+def get_option_premiums(symbols):
+    """Fetch last traded prices for NFO option symbols in one quote call.
+
+    Returns:
+        dict: Trading symbol -> last price, for the symbols the API returned.
+    """
+    quotes = kite.quote([f"NFO:{symbol}" for symbol in symbols])
+    return {key.split(":", 1)[1]: quote["last_price"] for key, quote in quotes.items()}
+
+
+def place_order(order_details, surface=None, expiry=None):
+    """Place an Iron Condor order (four legs), tagged so the legs can be tracked together.
+
+    With a VolSurface (and the legs' expiry), each leg carries the surface's
+    fair value, so the chaser stops short of paying through it.
+    """
     strikes = order_details["strikes"]
     lots = order_details["lots"]
-    lot_size = 50  # Nifty lot size
+    tag = order_details.setdefault("tag", f"IC{int(time.time())}")
     orders = [
         {"transaction_type": "SELL", "strike": strikes["sold_call"], "option_type": "CE"},
         {"transaction_type": "BUY", "strike": strikes["bought_call"], "option_type": "CE"},
         {"transaction_type": "SELL", "strike": strikes["sold_put"], "option_type": "PE"},
         {"transaction_type": "BUY", "strike": strikes["bought_put"], "option_type": "PE"}
     ]
-    order_ids = []
-    for order in orders:
-        try:
-            trading_symbol = f"NIFTY{order['strike']}{order['option_type']}"  # Simplified; fetch actual symbol
-            order_id = kite.place_order(
-                variety="regular",
-                exchange="NFO",
-                tradingsymbol=trading_symbol,
-                transaction_type=order["transaction_type"],
-                quantity=lots * lot_size,
-                product="NRML",
-                order_type="LIMIT",
-                price=order.get("price")  # Need to fetch last price or set limit price
-            )
-            order_ids.append(order_id)
-        except Exception as e:
-            print(f"Order placement failed: {e}")
-            return None
-    return order_ids
+    if surface is not None:
+        for order in orders:
+            order["fair_price"] = round(surface.price(order["strike"], expiry, order["option_type"]), 2)
+    # Limit orders pegged at the mid and chased towards the touch; entries are cancelled, not crossed,
+    # if they can't fill within the slippage budget.
+    results = execution_engine.execute([
+        {"exchange": "NFO", "tradingsymbol": option_symbol(order["strike"], order["option_type"]),
+         "transaction_type": order["transaction_type"], "quantity": lots * LOT_SIZE, "product": "NRML",
+         "tag": tag, **({"fair_price": order["fair_price"]} if "fair_price" in order else {})}
+        for order in orders
+    ], fallback="cancel")
+    for result in results:
+        if result["order_id"] is None:
+            print(f"Order placement failed for {result['tradingsymbol']}: {result.get('status_message')}")
+    order_ids = [result["order_id"] for result in results if result["order_id"] is not None]
+    return order_ids or None
+
+
+def get_positions():
+    """Day and net positions of the account, in one request."""
+    return kite.positions()
 
 
 def get_margin_required(strikes, lots):
@@ -78,27 +122,40 @@ def get_margin_required(strikes, lots):
     return 100000 * lots  # Placeholder; replace with actual API call
 
 
-def place_option_order(strike, option_type, transaction_type, lots):
-    """Place a market order for a specific option.
+def place_option_order(strike, option_type, transaction_type, lots, tag=None):
+    """Place an order for a specific option, chased from the mid and finished at market.
 
     Args:
         strike (int): Strike price of the option.
         option_type (str): 'CE' for call, 'PE' for put.
         transaction_type (str): 'BUY' or 'SELL'.
         lots (int): Number of lots to trade.
+        tag (str): Optional order tag (alphanumeric, max 20 characters).
+    """
+    result, = execution_engine.execute([{
+        "exchange": "NFO",
+        "tradingsymbol": option_symbol(strike, option_type),
+        "transaction_type": transaction_type,
+        "quantity": lots * LOT_SIZE,
+        "product": "NRML",  # Normal product type for options
+        "tag": tag,
+    }], fallback="market")  # Used for exits, which must complete
+    return result["order_id"]
+
+
+def confirm_fills(order_ids, timeout=ORDER_FILL_TIMEOUT):
+    """Wait for order updates confirming every order filled.
+
+    Returns:
+        bool: True if all filled; False (after printing why) if any was rejected,
+        cancelled or still open at the timeout.
     """
-    trading_symbol = f"NIFTY{strike}{option_type}"  # Simplified; adjust based on actual symbol format
-    lot_size = 50  # Example lot size for NIFTY options
-    order_id = kite.place_order(
-        variety="regular",
-        exchange="NFO",
-        tradingsymbol=trading_symbol,
-        transaction_type=transaction_type,
-        quantity=lots * lot_size,
-        product="NRML",  # Normal product type for options
-        order_type="MARKET"  # Using market orders for simplicity
-    )
-    return order_id
+    try:
+        order_tracker.wait_all_filled_sync(order_ids, timeout, kite=kite)
+    except OrderNotFilled as e:
+        print(f"Orders not filled: {e}. Statuses: {order_tracker.statuses(order_ids)}")
+        return False
+    return True
 
 
 if __name__ == "__main__":
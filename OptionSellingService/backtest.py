@@ -1,35 +1,249 @@
 # backtest.py
 """Module to backtest the Iron Condor strategy."""
 
+import datetime
+import glob
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-from config import CAPITAL, BACKTEST_PERIOD_MONTHS
-from strategy import check_entry_conditions, select_strikes, calculate_lots
+import config
+import fees
+import pricing
+import strategy
+import vol_surface
+from config import BACKTEST_PERIOD_MONTHS, BACKTEST_WORKERS, SPOT_CANDLES_FILE, TICK_DIR, ENTRY_DAYS, ENTRY_TIME, \
+    STOP_LOSS_MULTIPLIER
+from strategy import MarketSnapshot, check_entry_conditions, calculate_lots, calculate_fees, condor_legs, select_strikes
 from utils import log_trade
+from synthetic_chain import SyntheticChain
+from tick_store import chain_frame
+from result_cache import MISS, ResultCache, code_version, fingerprint
+
+# Settings a cycle's result depends on besides its data and lots; part of the result cache key
+STRATEGY_PARAMETERS = ("ENTRY_DAYS", "ENTRY_TIME", "IV_MIN", "IV_MAX", "MIN_CREDIT", "STRIKE_DISTANCE",
+                       "SOLD_STRIKE_DELTA", "PROTECTION_DISTANCE", "LOT_SIZE", "STOP_LOSS_MULTIPLIER",
+                       "RISK_FREE_RATE")
+
+
+def load_historical_data(file_path="data/nifty_options_data.csv", spot_candles_file=SPOT_CANDLES_FILE,
+                         ticks_dir=TICK_DIR, surface=None):
+    """Load historical options data (assumes CSV format).
+
+    Without the CSV, chains are built from our own tick recordings in
+    ``ticks_dir`` (see tick_store.py). Failing that, it falls back to a
+    synthetic chain priced off spot candles, since real NIFTY options
+    history is rarely available. A fitted VolSurface, if given, supplies the
+    synthetic chain's smile and term structure instead of a flat vol.
+    """
+    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+        data = pd.read_csv(file_path)
+        data["date"] = pd.to_datetime(data["date"])
+        return data
+    if ticks_dir and glob.glob(os.path.join(ticks_dir, "*.ticks")):
+        print(f"No options history in {file_path}; using the tick recordings in {ticks_dir}")
+        return chain_frame(ticks_dir)
+    print(f"No options history in {file_path}; generating a synthetic chain from {spot_candles_file}")
+    return SyntheticChain(spot_candles_file, iv_model=surface).to_frame()
+
+
+def partition_cycles(data):
+    """Split options data into weekly expiry cycles.
+
+    Each timestamp trades its nearest expiry, so a cycle is every row of one
+    expiry at the timestamps where it was the nearest. Cycles never share a
+    position and can be simulated independently.
+
+    Returns:
+        tuple: (rows sorted by cycle, date, option type and strike; list of
+        (expiry, start row, stop row) per cycle in expiry order).
+    """
+    nearest = data.groupby("date")["expiry"].transform("min")
+    rows = data[data["expiry"] == nearest].sort_values(["expiry", "date", "option_type", "strike"],
+                                                       kind="stable").reset_index(drop=True)
+    expiries = rows["expiry"].to_numpy()
+    boundaries = np.flatnonzero(expiries[1:] != expiries[:-1]) + 1
+    starts = np.concatenate([[0], boundaries]) if len(rows) else np.array([], dtype=int)
+    stops = np.concatenate([boundaries, [len(rows)]]) if len(rows) else np.array([], dtype=int)
+    return rows, [(expiries[start], int(start), int(stop)) for start, stop in zip(starts, stops)]
+
+
+def write_columns(rows, directory):
+    """Save the columns a cycle simulation reads as .npy files for memory-mapping by the workers.
+
+    Returns:
+        dict: The saved column arrays.
+    """
+    os.makedirs(directory, exist_ok=True)
+    columns = {  # Keys as in _COLUMNS
+        "date": rows["date"].to_numpy("datetime64[ns]"),
+        "spot_price": rows["spot_price"].to_numpy(float),
+        "strike": rows["strike"].to_numpy(float),
+        "option_type": rows["option_type"].to_numpy().astype("U2"),
+        "premium": rows["premium"].to_numpy(float),
+        "iv": rows["iv"].to_numpy(float),
+    }
+    for name, values in columns.items():
+        np.save(os.path.join(directory, f"{name}.npy"), values)
+    return columns
+
+
+_COLUMNS = ("date", "spot_price", "strike", "option_type", "premium", "iv")
+
 
+def _load_columns(directory, start, stop):
+    return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")[start:stop]
+            for name in _COLUMNS}
 
-def load_historical_data(file_path="data/nifty_options_data.csv"):
-    """Load historical options data (assumes CSV format)."""
-    return pd.read_csv(file_path)
 
+def simulate_cycle(directory, expiry, start, stop, lots):
+    """Trade one expiry cycle: enter the first Iron Condor the entry checks allow, hold it to expiry.
 
-def run_backtest():
-    """Run backtest on historical data."""
+    The position exits at the last timestamp of the cycle or when its loss
+    reaches STOP_LOSS_MULTIPLIER times the entry credit.
+
+    Args:
+        directory (str): Columns written by write_columns.
+        expiry: Expiry of the cycle.
+        start, stop (int): Row range of the cycle.
+        lots (int): Lots traded.
+
+    Returns:
+        dict: The trade, or None if no entry was taken (always None when no lot fits the margin).
+    """
+    if not lots:
+        return None
+    columns = _load_columns(directory, start, stop)
+    dates = columns["date"]
+    times, firsts = np.unique(dates, return_index=True)
+    bounds = np.append(firsts, len(dates))
+    entry_time = datetime.datetime.strptime(ENTRY_TIME, "%H:%M").time()
+    for index, moment in enumerate(pd.DatetimeIndex(times)):
+        if moment.strftime("%A") not in ENTRY_DAYS or moment.time() < entry_time:
+            continue
+        rows = slice(bounds[index], bounds[index + 1])
+        chain = tuple({"strike": strike, "option_type": option_type, "premium": premium, "iv": iv}
+                      for strike, option_type, premium, iv in zip(
+                          columns["strike"][rows].tolist(), columns["option_type"][rows].tolist(),
+                          columns["premium"][rows].tolist(), columns["iv"][rows].tolist()))
+        snapshot = MarketSnapshot(spot=float(columns["spot_price"][rows.start]), chain=chain,
+                                  timestamp=moment, expiry=expiry)
+        if check_entry_conditions(snapshot):
+            return _hold_to_expiry(columns, moment.to_datetime64(), snapshot, lots)
+    return None
+
+
+def _hold_to_expiry(columns, entry, snapshot, lots):
+    """Mark the condor entered at ``entry`` at every later timestamp where all four legs are quoted.
+
+    The profit is net of charges on the entry fills and on the exit: closing
+    fills when stopped out (or exited before expiry day). Held to expiry, the
+    short legs expire without charges and the long legs that finish in the
+    money pay STT on exercise of their intrinsic value at the final spot.
+    """
+    strikes = snapshot.strikes
+    legs = condor_legs(strikes, lots)
+    later = columns["date"] >= entry
+    series = []
+    for strike, option_type, _ in legs:
+        rows = np.flatnonzero(later & (columns["strike"] == strike) & (columns["option_type"] == option_type))
+        series.append((columns["date"][rows], columns["premium"][rows]))
+    common = series[0][0]
+    for dates, _ in series[1:]:
+        common = np.intersect1d(common, dates)
+    # Premium of each leg at each common timestamp, and the value of the position (INR, negative while short)
+    marks = np.array([premiums[np.searchsorted(dates, common)] for dates, premiums in series])
+    quantities = np.array([quantity for _, _, quantity in legs], dtype=float)
+    value = quantities @ marks
+    credit = snapshot.net_credit * lots
+    pnl = credit + value
+    stopped = np.flatnonzero(pnl <= -STOP_LOSS_MULTIPLIER * credit)
+    exit_index = stopped[0] if len(stopped) else len(common) - 1
+    exit_time = pd.Timestamp(common[exit_index])
+    entry_fees = calculate_fees(marks[:, 0], quantities, snapshot.timestamp)
+    if len(stopped) or exit_time.normalize() != pd.Timestamp(snapshot.expiry):
+        exit_fees = calculate_fees(marks[:, exit_index], -quantities, exit_time)
+    else:
+        spot = float(columns["spot_price"][np.searchsorted(columns["date"], common[exit_index])])
+        intrinsic = np.array([max(spot - strike, 0.0) if option_type == "CE" else max(strike - spot, 0.0)
+                              for strike, option_type, _ in legs])
+        exercised = (quantities > 0) & (intrinsic > 0)
+        exit_fees = calculate_fees(intrinsic[exercised], quantities[exercised], exit_time, exercised=True)
+    charges = entry_fees + exit_fees
+    profit = float(pnl[exit_index]) - charges
+    return {"date": pd.Timestamp(entry).to_pydatetime(), "exit": exit_time.to_pydatetime(),
+            "expiry": snapshot.expiry, "strikes": strikes, "lots": lots, "credit": round(credit, 2),
+            "stopped": bool(len(stopped)), "fees": round(charges, 2), "profit": round(profit, 2)}
+
+
+def cycle_key(columns, expiry, start, stop, lots):
+    """Result cache key of one cycle: its rows, the lots, the strategy settings and the code version.
+
+    The version covers the fee schedule and the option pricing behind strike
+    selection and the synthetic chain's vols, so a change to either reprices
+    every cycle.
+    """
+    parameters = {name: getattr(config, name) for name in STRATEGY_PARAMETERS}
+    version = code_version(__file__, strategy.__file__, fees.__file__, pricing.__file__, vol_surface.__file__)
+    return fingerprint(version, parameters, lots, str(expiry),
+                       *(columns[name][start:stop] for name in _COLUMNS))
+
+
+def run_backtest(workers=BACKTEST_WORKERS, cache=None, surface=None):
+    """Run backtest on historical data.
+
+    Expiry cycles are simulated in a process pool. The workers memory-map the
+    cycle's columns from a scratch directory rather than receiving pickled
+    frames, and results are merged in expiry order, so the output doesn't
+    depend on the number of workers.
+
+    Each cycle's result is cached under a hash of its inputs (see
+    result_cache.py), so a rerun only simulates the cycles whose data or
+    settings changed.
+
+    Args:
+        workers (int): Worker processes; None for one per core, 1 to run in-process.
+        cache (ResultCache): Cycle result cache; defaults to RESULT_CACHE_DIR.
+        surface (VolSurface): Vols for the synthetic chain when there is no options history.
+    """
     print(f"Running backtest for {BACKTEST_PERIOD_MONTHS} months...")
-    data = load_historical_data()
+    data = load_historical_data(surface=surface)
     end_date = pd.to_datetime("today")
     start_date = end_date - pd.DateOffset(months=BACKTEST_PERIOD_MONTHS)
     data = data[(data["date"] >= start_date) & (data["date"] <= end_date)]
 
+    rows, cycles = partition_cycles(data)
+    cache = cache if cache is not None else ResultCache()
+    with tempfile.TemporaryDirectory(prefix="backtest_") as directory:
+        columns = write_columns(rows, directory)
+        # One position at a time, so each cycle is sized on an empty book at the cycle's first spot
+        lots = [calculate_lots(select_strikes(columns["spot_price"][start]), float(columns["spot_price"][start]),
+                               expiry) for expiry, start, stop in cycles]
+        keys = [cycle_key(columns, *cycle, cycle_lots) for cycle, cycle_lots in zip(cycles, lots)]
+        trades = [cache.get(key) for key in keys]
+        missing = [i for i, trade in enumerate(trades) if trade is MISS]
+        jobs = [(directory, *cycles[i], lots[i]) for i in missing]
+        workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+        if workers <= 1:
+            results = [simulate_cycle(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(simulate_cycle, *zip(*jobs)))
+        for i, trade in zip(missing, results):
+            trades[i] = trade
+            cache.put(keys[i], trade)
+    if cycles:
+        print(f"Simulated {len(missing)} of {len(cycles)} expiry cycles ({len(cycles) - len(missing)} cached)")
+
     total_profit = 0
-    for date, day_data in data.groupby("date"):
-        if check_entry_conditions(day_data):  # Adjust to use historical data
-            current_price = day_data["spot_price"].iloc[0]
-            strikes = select_strikes(current_price)
-            lots = calculate_lots()
-            profit = lots * 100  # Simplified; replace with P&L calculation
-            total_profit += profit
-            log_trade({"date": date, "strikes": strikes, "profit": profit})
-    print(f"Backtest completed. Total profit: {total_profit} INR")
+    for trade in trades:
+        if trade is None:
+            continue
+        total_profit += trade["profit"]
+        log_trade(trade)
+    print(f"Backtest completed. Total profit: {round(total_profit, 2)} INR")
     return total_profit
 
 
@@ -0,0 +1,258 @@
+# benchmarks/bench_hot_paths.py
+"""Benchmarks for the strategy, chain and backtest hot paths.
+
+Every benchmark runs on fixed, seeded synthetic fixtures at several chain or
+history sizes, so no credentials or network access are needed. Run from
+OptionSellingService:
+
+    python benchmarks/bench_hot_paths.py                  # run and print timings
+    python benchmarks/bench_hot_paths.py --save           # run and store the JSON baseline
+    python benchmarks/bench_hot_paths.py --compare        # run and flag regressions against the baseline
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import logging
+import os
+import pickle
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(HERE)
+ROOT_DIR = os.path.dirname(SERVICE_DIR)
+sys.path[:0] = [SERVICE_DIR, os.path.join(ROOT_DIR, "OptionSellingPOC"), ROOT_DIR]
+os.environ.setdefault("KITE_PAPER", "1")  # Paper sessions instead of logging in at import time
+
+import api_helper  # noqa: E402
+import backtest  # noqa: E402
+import strategy  # noqa: E402
+from paper_exchange import PaperExchange, PaperKite, index_instruments, option_instruments  # noqa: E402
+from pricing import bs_price  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+from synthetic_chain import SyntheticChain  # noqa: E402
+
+with contextlib.redirect_stdout(io.StringIO()):  # The module prints an example on import
+    from calculate_margin_required import calculate_iron_condor_margin_approx  # noqa: E402
+
+BASELINE_DIR = os.path.join(HERE, "baselines")
+SPOT = 23500.0
+SEED = 7
+BENCHMARKS = {}
+
+
+def benchmark(name, sizes):
+    """Register ``setup(size) -> callable`` as a benchmark run at each size."""
+    def register(setup):
+        BENCHMARKS[name] = (sizes, setup)
+        return setup
+    return register
+
+
+# -------------- Fixtures -------------- #
+def make_chain(n_strikes, spot=SPOT, expiry=datetime.date(2025, 1, 9)):
+    """Option chain rows (CE and PE per strike) priced at a flat 14% vol around spot."""
+    strikes = np.round(spot / 50) * 50 + 50 * (np.arange(n_strikes) - n_strikes // 2)
+    chain = []
+    for option_type in ("CE", "PE"):
+        premiums = bs_price(spot, strikes, 3 / 365, 0.14, option_type)
+        for strike, premium in zip(strikes, premiums):
+            chain.append({"strike": int(strike), "option_type": option_type, "instrument_type": option_type,
+                          "premium": round(float(premium), 2), "iv": 14.0, "expiry": expiry,
+                          "tradingsymbol": f"NIFTY{int(strike)}{option_type}"})
+    return chain
+
+
+def make_snapshot(chain, spot=SPOT):
+    """A fresh MarketSnapshot (nothing memoized yet) over the chain rows."""
+    return strategy.MarketSnapshot(spot, tuple(chain), datetime.datetime(2025, 1, 6, 10, 45), chain[0]["expiry"])
+
+
+def make_instruments(n_expiries):
+    """An NFO instrument dump with NIFTY and BANKNIFTY weeklies over n_expiries weeks."""
+    first = datetime.date(2025, 1, 9)
+    expiries = [first + datetime.timedelta(days=7 * week) for week in range(n_expiries)]
+    return (index_instruments() + option_instruments(SPOT, expiries, strike_range=2500) +
+            option_instruments(50000, expiries, name="BANKNIFTY", strike_range=5000, step=100,
+                               first_token=50_000_000))
+
+
+def make_candles(n, start=datetime.datetime(2023, 1, 2, 9, 15)):
+    """Seeded random-walk minute candles in the data_store.py pickle format."""
+    rng = np.random.default_rng(SEED)
+    close = SPOT * np.exp(np.cumsum(rng.normal(0, 0.0004, n)))
+    return [{"date": start + datetime.timedelta(minutes=i), "open": float(c), "high": float(c) + 5,
+             "low": float(c) - 5, "close": float(c), "volume": 0} for i, c in enumerate(close)]
+
+
+def make_options_history(n_days):
+    """Synthetic options history ending today, in the backtest CSV layout."""
+    end = pd.Timestamp.today().normalize() + pd.Timedelta(hours=15)
+    dates = pd.bdate_range(end=end, periods=n_days)
+    rng = np.random.default_rng(SEED)
+    candles = pd.DataFrame({"date": dates, "close": SPOT * np.exp(np.cumsum(rng.normal(0, 0.008, n_days)))})
+    return SyntheticChain(candles, iv_model=0.14, strike_range=500, cache_dir=None).to_frame()
+
+
+# -------------- Benchmarks -------------- #
+@benchmark("get_options_chain", sizes=[1, 8, 32])
+def bench_get_options_chain(n_expiries):
+    api_helper.kite = PaperKite(PaperExchange(make_instruments(n_expiries)))
+    return api_helper.get_options_chain
+
+
+@benchmark("get_premium", sizes=[50, 200, 400])
+def bench_get_premium(n_strikes):
+    chain = make_chain(n_strikes)
+    strike = chain[-1]["strike"]  # Worst case: last row of the chain
+    return lambda: strategy.get_premium(make_snapshot(chain), strike, "PE")
+
+
+@benchmark("calculate_net_credit", sizes=[50, 200, 400])
+def bench_calculate_net_credit(n_strikes):
+    chain = make_chain(n_strikes)
+    return lambda: strategy.calculate_net_credit(make_snapshot(chain))
+
+
+@benchmark("calculate_average_iv", sizes=[50, 200, 400])
+def bench_calculate_average_iv(n_strikes):
+    chain = make_chain(n_strikes)
+    return lambda: strategy.calculate_average_iv(make_snapshot(chain))
+
+
+@benchmark("margin_approx", sizes=[1, 1000])
+def bench_margin_approx(n_condors):
+    rng = np.random.default_rng(SEED)
+    legs = [(22000, 21800, 23000, 23200, *rng.uniform(1, 20, 4), 75, SPOT) for _ in range(n_condors)]
+    return lambda: [calculate_iron_condor_margin_approx(*leg) for leg in legs]
+
+
+@benchmark("Backtester.run_backtest", sizes=[1_000, 10_000, 50_000])
+def bench_poc_backtester(n_candles):
+    import backtester
+    candles = make_candles(n_candles)
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_"), f"candles_{n_candles}.pkl")
+    with open(path, "wb") as f:
+        pickle.dump(candles, f)
+    start, end = candles[0]["date"], candles[-1]["date"]
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            backtester.Backtester(path, start, end, cache=ResultCache(None)).run_backtest()
+    return run
+
+
+@benchmark("backtest.run_backtest", sizes=[20, 120, 250])
+def bench_service_backtest(n_days):
+    data = make_options_history(n_days)
+    backtest.load_historical_data = lambda *args, **kwargs: data.copy()
+    backtest.log_trade = lambda trade_details: None
+    strategy.check_economic_calendar = lambda expiry_date: False
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            backtest.run_backtest(cache=ResultCache(None))  # Time the simulation, not cache hits
+    return run
+
+
+# -------------- Runner -------------- #
+def time_callable(fn, min_time=0.2, max_repeats=1000):
+    """Time fn repeatedly for at least min_time seconds; returns per-call seconds."""
+    fn()  # Warm-up (imports, caches)
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_repeats and (len(timings) < 3 or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def run_benchmarks(selected=None, min_time=0.2):
+    logging.disable(logging.CRITICAL)  # The backtesters log every candle
+    results = {}
+    for name, (sizes, setup) in BENCHMARKS.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        for size in sizes:
+            key = f"{name}[{size}]"
+            try:
+                timings = time_callable(setup(size), min_time)
+                results[key] = {"median_s": statistics.median(timings), "min_s": min(timings),
+                                "runs": len(timings)}
+            except Exception as e:
+                results[key] = {"error": f"{type(e).__name__}: {e}"}
+            print(format_result(key, results[key]))
+    logging.disable(logging.NOTSET)
+    return {
+        "meta": {"created": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "machine": platform.machine(),
+                 "numpy": np.__version__, "pandas": pd.__version__},
+        "results": results,
+    }
+
+
+def format_result(key, result):
+    if "error" in result:
+        return f"{key:<40} ERROR {result['error']}"
+    return f"{key:<40} median {result['median_s'] * 1e3:12.4f} ms   min {result['min_s'] * 1e3:12.4f} ms   " \
+           f"runs {result['runs']}"
+
+
+def compare(current, baseline, threshold):
+    """Return (key, baseline_s, current_s, ratio) for benchmarks slower than baseline by more than threshold."""
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if not base or "error" in base or "error" in result:
+            continue
+        ratio = result["median_s"] / base["median_s"]
+        if ratio > 1 + threshold:
+            regressions.append((key, base["median_s"], result["median_s"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare results against the baseline")
+    parser.add_argument("--baseline", default="baseline", help="baseline name under benchmarks/baselines")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds spent timing each case")
+    parser.add_argument("-k", dest="selected", action="append", help="only run benchmarks whose name contains this")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.selected, args.min_time)
+    path = os.path.join(BASELINE_DIR, f"{args.baseline}.json")
+    status = 0
+    if args.compare:
+        if not os.path.exists(path):
+            print(f"No baseline at {path}; run with --save first.")
+            return 1
+        with open(path) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for key, base, current, ratio in regressions:
+            print(f"REGRESSION {key}: {base * 1e3:.4f} ms -> {current * 1e3:.4f} ms ({ratio:.2f}x)")
+        if not regressions:
+            print(f"No regressions beyond {args.threshold:.0%} against {path}.")
+        status = 1 if regressions else 0
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {path}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# candle_series.py
+"""OHLCV candles in one NumPy structured array.
+
+A list of per-candle dicts costs several hundred bytes a candle and a dict
+lookup per field; CandleSeries keeps the same data in 48 bytes a candle.
+Conversions from DataFrames (yfinance, resampled ticks) and Kite
+``historical_data`` payloads are vectorized, series saved as ``.npy`` load
+memory-mapped (so multi-year minute data opens instantly), time ranges are
+found by binary search, and slicing and iteration return views, not copies.
+
+Iterating yields NumPy records: ``candle["close"]`` is a float and
+``candle["date"].item()`` a datetime. Test a record against None rather
+than by truthiness (``if candle:``), which says nothing about its contents.
+"""
+
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ("open", "high", "low", "close", "volume")
+DTYPE = np.dtype([("date", "M8[us]")] + [(field, "f8") for field in FIELDS])
+
+
+def _as_float(value):
+    """Unwrap single-element Series left behind by multi-ticker yfinance downloads."""
+    return float(np.asarray(value, dtype=float).ravel()[0])
+
+
+def _as_datetime64(moment):
+    moment = pd.Timestamp(moment)
+    if moment.tzinfo is not None:
+        moment = moment.tz_localize(None)  # Keep the exchange's wall-clock time
+    return moment.to_datetime64().astype("M8[us]")
+
+
+class CandleSeries:
+    """Time-sorted OHLCV candles backed by a structured array (or a memory-mapped ``.npy`` file)."""
+
+    def __init__(self, data=None):
+        """
+        Args:
+            data (numpy.ndarray): Candles of dtype DTYPE sorted by date; empty if not given.
+        """
+        self.data = np.zeros(0, dtype=DTYPE) if data is None else data
+
+    # -------------- Conversion -------------- #
+    @classmethod
+    def from_frame(cls, frame):
+        """Candles from a DataFrame with OHLCV columns (any case) and a date column or index.
+
+        Single-ticker yfinance frames (two-level columns) are accepted; missing
+        fields are NaN.
+        """
+        if isinstance(frame.columns, pd.MultiIndex):
+            frame = frame.droplevel(list(range(1, frame.columns.nlevels)), axis=1)
+        columns = {str(name).lower(): name for name in frame.columns}
+        dates = pd.DatetimeIndex(frame[columns["date"]] if "date" in columns else frame.index)
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)  # Keep the exchange's wall-clock time
+        data = np.empty(len(frame), dtype=DTYPE)
+        data["date"] = dates.values.astype("M8[us]")
+        for field in FIELDS:
+            data[field] = frame[columns[field]].to_numpy(dtype=float) if field in columns else np.nan
+        return cls._sorted(data)
+
+    @classmethod
+    def from_records(cls, records):
+        """Candles from a list of dicts, e.g. ``kite.historical_data`` or the older candle pickles."""
+        data = np.empty(len(records), dtype=DTYPE)
+        data["date"] = [_as_datetime64(record["date"]) for record in records]
+        for field in FIELDS:
+            values = [record.get(field, np.nan) for record in records]
+            try:
+                data[field] = np.asarray(values, dtype=float)
+            except (TypeError, ValueError):
+                data[field] = [_as_float(value) for value in values]
+        return cls._sorted(data)
+
+    @classmethod
+    def _sorted(cls, data):
+        if len(data) > 1 and (np.diff(data["date"]) < np.timedelta64(0)).any():
+            data = data[np.argsort(data["date"], kind="stable")]
+        return cls(data)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a ``.npy`` series (memory-mapped unless ``mmap`` is False) or a pickled list/DataFrame of candles."""
+        if str(path).endswith(".npy"):
+            return cls(np.load(path, mmap_mode="r" if mmap else None))
+        with open(path, "rb") as f:
+            candles = pickle.load(f)
+        return cls.from_frame(candles) if isinstance(candles, pd.DataFrame) else cls.from_records(candles)
+
+    def save(self, path):
+        """Write the candles as a ``.npy`` file."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.save(path, np.asarray(self.data))
+
+    def to_frame(self):
+        """A DataFrame of the candles indexed by date."""
+        return pd.DataFrame({field: self.data[field] for field in FIELDS},
+                            index=pd.DatetimeIndex(self.data["date"], name="date"))
+
+    # -------------- Access -------------- #
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __getitem__(self, key):
+        """A column (by name), a candle record (by position) or a CandleSeries view (by slice)."""
+        if isinstance(key, str):
+            return self.data[key]
+        if isinstance(key, (int, np.integer)):
+            return self.data[key]
+        return CandleSeries(self.data[key])
+
+    @property
+    def dates(self):
+        return self.data["date"]
+
+    def index_of(self, moment, side="left"):
+        """Position of ``moment`` in the series by binary search (as ``numpy.searchsorted``)."""
+        return int(np.searchsorted(self.data["date"], _as_datetime64(moment), side=side))
+
+    def between(self, start=None, end=None):
+        """View of the candles with start <= date <= end."""
+        low = self.index_of(start) if start is not None else 0
+        high = self.index_of(end, side="right") if end is not None else len(self)
+        return self[low:high]
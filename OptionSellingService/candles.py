@@ -0,0 +1,207 @@
+# candles.py
+"""Live multi-timeframe OHLCV candles built incrementally from ticks.
+
+CandleAggregator keeps the forming bar of every token and timeframe and
+updates it in O(1) per tick. When a tick falls into a later period, the
+finished bar is written into that token's fixed-size NumPy ring of closed
+bars and bar-close listeners are called, so strategies can react to 1 m or
+5 m closes as they happen instead of polling ``historical_data``.
+
+Bars are aligned to the exchange-local clock of the ticks' timestamps
+(15 m bars close at 9:30, 9:45, ...). Periods without ticks produce no bar,
+like Kite's historical candles.
+"""
+
+import datetime
+
+import numpy as np
+
+from config import CANDLE_TIMEFRAMES, CANDLE_HISTORY
+
+TIMEFRAME_SECONDS = {"1s": 1, "5s": 5, "1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600}
+PRICE_FIELDS = ("open", "high", "low", "close")
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def epoch_seconds(moment):
+    """Seconds since the epoch of a naive (exchange-local) or aware datetime, keeping its wall-clock time."""
+    if moment.tzinfo is not None:
+        moment = moment.replace(tzinfo=None)
+    return (moment - _EPOCH).total_seconds()
+
+
+class CandleAggregator:
+    """Aggregate ticks into OHLCV bars for several timeframes at once.
+
+    Args:
+        timeframes: Timeframe names from TIMEFRAME_SECONDS, e.g. ("1s", "1m", "5m", "15m").
+        history (int): Closed bars kept per token and timeframe.
+        capacity (int): Initial number of token slots (grows as needed).
+    """
+
+    def __init__(self, timeframes=CANDLE_TIMEFRAMES, history=CANDLE_HISTORY, capacity=64):
+        unknown = [name for name in timeframes if name not in TIMEFRAME_SECONDS]
+        if unknown:
+            raise ValueError(f"Unknown timeframes: {', '.join(unknown)}")
+        self.timeframes = tuple(timeframes)
+        self.seconds = tuple(TIMEFRAME_SECONDS[name] for name in self.timeframes)
+        self.history = history
+        self._index = {}  # Token -> slot
+        self._tokens = []
+        self._forming = []  # Slot -> per timeframe [period start, open, high, low, close, volume] or None
+        self._last_volume = []  # Slot -> cumulative volume_traded of the previous tick
+        self._starts = {name: np.zeros((0, history), dtype="int64") for name in self.timeframes}
+        self._prices = {name: np.zeros((0, len(PRICE_FIELDS), history)) for name in self.timeframes}
+        self._volumes = {name: np.zeros((0, history), dtype="int64") for name in self.timeframes}
+        self._closed = {name: np.zeros(0, dtype="int64") for name in self.timeframes}  # Bars ever closed
+        self._listeners = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        extra = capacity - len(self._tokens)
+        for name in self.timeframes:
+            self._starts[name] = np.concatenate([self._starts[name], np.zeros((extra, self.history), "int64")])
+            self._prices[name] = np.concatenate(
+                [self._prices[name], np.zeros((extra, len(PRICE_FIELDS), self.history))])
+            self._volumes[name] = np.concatenate([self._volumes[name], np.zeros((extra, self.history), "int64")])
+            self._closed[name] = np.concatenate([self._closed[name], np.zeros(extra, "int64")])
+        self._capacity = capacity
+
+    def _slot(self, token):
+        slot = self._index.get(token)
+        if slot is None:
+            slot = len(self._tokens)
+            if slot == self._capacity:
+                self._allocate(2 * self._capacity)
+            self._index[token] = slot
+            self._tokens.append(token)
+            self._forming.append([None] * len(self.timeframes))
+            self._last_volume.append(None)
+        return slot
+
+    # -------------- Events -------------- #
+    def on_bar(self, callback, timeframe=None, token=None):
+        """Call ``callback(bar)`` for each closed bar (optionally of one timeframe and/or token).
+
+        ``bar`` is a dict with token, timeframe, date, open, high, low, close and volume.
+        Callbacks run on the thread feeding the ticks and should return quickly.
+        """
+        self._listeners.append((callback, timeframe, token))
+
+    def _emit(self, slot, index):
+        name = self.timeframes[index]
+        start, open_, high, low, close, volume = self._forming[slot][index]
+        position = self._closed[name][slot] % self.history
+        self._starts[name][slot, position] = start
+        self._prices[name][slot, :, position] = (open_, high, low, close)
+        self._volumes[name][slot, position] = volume
+        self._closed[name][slot] += 1
+        if self._listeners:
+            token = self._tokens[slot]
+            bar = {"token": token, "timeframe": name,
+                   "date": _EPOCH + datetime.timedelta(seconds=start),
+                   "open": open_, "high": high, "low": low, "close": close, "volume": volume}
+            for callback, timeframe, wanted in self._listeners:
+                if (timeframe is None or timeframe == name) and (wanted is None or wanted == token):
+                    callback(bar)
+
+    # -------------- Feeding ticks -------------- #
+    def attach(self, ticker):
+        """Aggregate a KiteTicker's ticks, keeping any existing on_ticks handler."""
+        previous = ticker.on_ticks
+
+        def on_ticks(ws, ticks):
+            self.on_ticks(ws, ticks)
+            if previous:
+                previous(ws, ticks)
+
+        ticker.on_ticks = on_ticks
+        return self
+
+    def on_ticks(self, ws, ticks):
+        """KiteTicker.on_ticks-compatible callback."""
+        for tick in ticks:
+            stamp = tick.get("exchange_timestamp") or tick.get("last_trade_time")
+            self.add_tick(tick["instrument_token"], tick["last_price"],
+                          epoch_seconds(stamp) if stamp else epoch_seconds(datetime.datetime.now()),
+                          tick.get("volume_traded"), tick.get("last_traded_quantity", 0))
+
+    def add_tick(self, token, price, timestamp, volume_traded=None, quantity=0):
+        """Fold one trade into every timeframe.
+
+        Args:
+            token: Instrument token.
+            price (float): Last traded price.
+            timestamp (float): Epoch seconds of the exchange-local time (see epoch_seconds).
+            volume_traded (int): Cumulative day volume; bar volume is its increase. Without it
+                ``quantity`` is added instead.
+        """
+        slot = self._slot(token)
+        if volume_traded is not None:
+            previous = self._last_volume[slot]
+            self._last_volume[slot] = volume_traded
+            quantity = max(volume_traded - previous, 0) if previous is not None else 0
+        forming = self._forming[slot]
+        second = int(timestamp)
+        for index, seconds in enumerate(self.seconds):
+            start = second - second % seconds
+            bar = forming[index]
+            if bar is None or start > bar[0]:
+                if bar is not None:
+                    self._emit(slot, index)
+                forming[index] = [start, price, price, price, price, quantity]
+            elif start == bar[0]:
+                if price > bar[2]:
+                    bar[2] = price
+                elif price < bar[3]:
+                    bar[3] = price
+                bar[4] = price
+                bar[5] += quantity
+            # A tick older than the forming bar is dropped
+
+    def advance(self, now):
+        """Close forming bars whose period has ended by ``now`` (a datetime), e.g. from a timer.
+
+        Without this, a bar closes only when its token's next tick arrives.
+        """
+        second = int(epoch_seconds(now))
+        for slot, forming in enumerate(self._forming):
+            for index, seconds in enumerate(self.seconds):
+                bar = forming[index]
+                if bar is not None and bar[0] + seconds <= second:
+                    self._emit(slot, index)
+                    forming[index] = None
+
+    # -------------- Queries -------------- #
+    def bars(self, token, timeframe, count=None):
+        """Closed bars, oldest first, as a dict of arrays (date as datetime64[s])."""
+        slot = self._index.get(token)
+        if slot is None:
+            return {"date": np.zeros(0, "datetime64[s]"), **{field: np.zeros(0) for field in PRICE_FIELDS},
+                    "volume": np.zeros(0, "int64")}
+        closed = int(self._closed[timeframe][slot])
+        available = min(closed, self.history)
+        count = available if count is None else min(count, available)
+        positions = np.arange(closed - count, closed) % self.history
+        prices = self._prices[timeframe][slot][:, positions]
+        bars = {"date": self._starts[timeframe][slot, positions].astype("datetime64[s]")}
+        bars.update({field: prices[column] for column, field in enumerate(PRICE_FIELDS)})
+        bars["volume"] = self._volumes[timeframe][slot, positions]
+        return bars
+
+    def candles(self, token, timeframe, count=None):
+        """Closed bars as a list of dicts shaped like ``kite.historical_data`` candles."""
+        bars = self.bars(token, timeframe, count)
+        dates = bars["date"].tolist()
+        columns = [(field, bars[field].tolist()) for field in (*PRICE_FIELDS, "volume")]
+        return [{"date": date, **{field: values[i] for field, values in columns}} for i, date in enumerate(dates)]
+
+    def forming(self, token, timeframe):
+        """The bar still forming, as a candle dict, or None."""
+        slot = self._index.get(token)
+        bar = self._forming[slot][self.timeframes.index(timeframe)] if slot is not None else None
+        if bar is None:
+            return None
+        start, open_, high, low, close, volume = bar
+        return {"date": _EPOCH + datetime.timedelta(seconds=start), "open": open_, "high": high, "low": low,
+                "close": close, "volume": volume}
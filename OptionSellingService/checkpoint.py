@@ -0,0 +1,150 @@
+# checkpoint.py
+"""Crash-safe checkpoints of strategy state, reconciled with the broker on restart.
+
+Strategies record each state transition (orders sent, position open, trail
+moved, exit started) with ``CheckpointStore.save``, which appends one JSON
+line to a write-ahead log and flushes it to disk before returning. Loading
+reads the last compacted snapshot and replays the log; a line torn by a crash
+mid-write is ignored. Every ``compact_every`` records the state is rewritten
+atomically and the log truncated, so startup reads stay small.
+
+On restart ``reconcile`` compares the checkpointed legs with one
+``kite.positions()`` response, so monitoring can resume instead of the book
+being flattened.
+"""
+
+import datetime
+import json
+import os
+import tempfile
+
+from config import CHECKPOINT_FILE
+
+
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$date": value.isoformat()}
+    if hasattr(value, "item"):  # NumPy scalars
+        return value.item()
+    raise TypeError(f"Cannot checkpoint {type(value).__name__}")
+
+
+def _decode(obj):
+    if "$datetime" in obj:
+        return datetime.datetime.fromisoformat(obj["$datetime"])
+    if "$date" in obj:
+        return datetime.date.fromisoformat(obj["$date"])
+    return obj
+
+
+class CheckpointStore:
+    """Key -> JSON-serializable state (datetimes and dates allowed), persisted on every change."""
+
+    def __init__(self, path=CHECKPOINT_FILE, fsync=True, compact_every=256):
+        """
+        Args:
+            path (str): Snapshot file; the log is ``path + ".log"``. None keeps state in memory only.
+            fsync (bool): Also fsync each record, so it survives a power loss and not just a process crash.
+            compact_every (int): Log records before the snapshot is rewritten.
+        """
+        self.path = path
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self.state = {}
+        self._log = None
+        self._records = 0
+        if path is not None:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                self.state = json.load(f, object_hook=_decode)
+        except FileNotFoundError:
+            pass
+        try:
+            with open(self.path + ".log") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line, object_hook=_decode)
+                    except json.JSONDecodeError:
+                        break  # Torn by a crash mid-write; nothing after it was acknowledged
+                    if record.get("deleted"):
+                        self.state.pop(record["key"], None)
+                    else:
+                        self.state[record["key"]] = record["value"]
+                    self._records += 1
+        except FileNotFoundError:
+            pass
+
+    def _append(self, record):
+        if self.path is None:
+            return
+        if self._records >= self.compact_every:
+            self.compact()
+        if self._log is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._log = open(self.path + ".log", "a")
+        self._log.write(json.dumps(record, default=_encode) + "\n")
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self._records += 1
+
+    def get(self, key, default=None):
+        """The last state saved under ``key``."""
+        return self.state.get(key, default)
+
+    def save(self, key, value):
+        """Record a new state for ``key``; durable when this returns."""
+        self._append({"key": key, "value": value})
+        self.state[key] = value
+
+    def delete(self, key):
+        """Forget ``key`` (e.g. once its position is flat)."""
+        if key in self.state:
+            self._append({"key": key, "deleted": True})
+            del self.state[key]
+
+    def compact(self):
+        """Atomically rewrite the snapshot from the current state and truncate the log."""
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w") as f:
+            json.dump(self.state, f, default=_encode)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.path + ".log", "w")
+        self._records = 0
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def reconcile(legs, positions):
+    """Compare checkpointed legs with the broker's positions.
+
+    Args:
+        legs (dict): Trading symbol (optionally "NFO:"-prefixed) -> expected signed quantity.
+        positions (dict): A ``kite.positions()`` response; its "net" positions are compared.
+
+    Returns:
+        tuple: (symbol -> broker quantity for every leg, list of the symbols whose quantity differs).
+    """
+    net = {}
+    for position in positions.get("net", []):
+        net[position["tradingsymbol"]] = net.get(position["tradingsymbol"], 0) + position["quantity"]
+    held = {symbol: net.get(symbol.split(":")[-1], 0) for symbol in legs}
+    return held, [symbol for symbol, quantity in legs.items() if held[symbol] != quantity]
@@ -1,6 +1,8 @@
 # config.py
 """Configuration variables for the Iron Condor trading strategy."""
 
+import os
+
 # Trading schedule
 ENTRY_DAYS = ["Tuesday", "Wednesday"]  # Days to enter trades
 ENTRY_TIME = "10:45"  # Time to enter trades (24-hour format)
@@ -9,6 +11,13 @@ ENTRY_TIME = "10:45"  # Time to enter trades (24-hour format)
 CAPITAL = 1000000  # Total capital in INR (₹10,00,000)
 INITIAL_ALLOCATION = 0.7  # 70% of capital for initial position (₹7,00,000)
 RESERVE_ALLOCATION = 0.3  # 30% reserved for adjustments (₹3,00,000)
+MARGIN_SCAN_RANGE = 0.10  # Margin covers the worst expiry loss over a ±10% move of the underlying
+EXPOSURE_MARGIN = 0.02  # Plus 2% of the notional of the larger short side
+
+# Contract details
+LOT_SIZE = 75  # NIFTY options lot size
+NIFTY_INDEX_TOKEN = 256265  # Instrument token of NSE:NIFTY 50 for tick subscriptions
+FREEZE_QUANTITY = 1800  # Exchange freeze limit for a single NIFTY options order
 
 # Entry conditions
 IV_MIN = 20  # Minimum implied volatility (%)
@@ -17,15 +26,69 @@ MIN_CREDIT = 100  # Minimum net credit per lot (INR)
 
 # Strike selection
 STRIKE_DISTANCE = 150  # Minimum distance from current price for sold strikes
+SOLD_STRIKE_DELTA = None  # Sell the quoted strikes nearest this |delta| on the snapshot's vol surface when they are
+                          # further out than STRIKE_DISTANCE (e.g. 0.16); None uses STRIKE_DISTANCE alone
 PROTECTION_DISTANCE = 200  # Distance from sold strikes for bought strikes
 ADJUSTMENT_DISTANCE = 200  # Distance for adjustment strikes
+SNAPSHOT_STRIKE_WINDOW = 1000  # Strikes within this distance of spot are quoted for each market snapshot
 
 # Risk management
 STOP_LOSS_MULTIPLIER = 3  # Stop-loss at 3x initial credit
 ADJUSTMENT_MIN_CREDIT = 30  # Minimum credit for adjustment spreads (INR)
+MAX_NET_DELTA = 40  # Adjust when |net delta| (in units of NIFTY) exceeds this
+# Exit rules per strategy, compiled by risk_rules.RiskEngine and checked on every leg tick.
+# Types: take_profit (pnl), max_loss (pnl), credit_stop (multiple), trailing_stop (trigger, trail), exit_time (time)
+RISK_RULES = {
+    "iron_condor": [
+        {"type": "credit_stop", "multiple": STOP_LOSS_MULTIPLIER},  # Loss reaching 3x the entry credit
+    ],
+}
+
+# Order throttling and monitoring
+ORDER_RATE_LIMIT = 10  # Orders per second allowed by the Kite API
+ORDER_FILL_TIMEOUT = 30  # Seconds to wait for order updates confirming a fill
+ICEBERG_ORDERS = True  # Slice oversized LIMIT orders with Kite's iceberg variety (else parallel child orders)
+SLICE_WORKERS = 4  # Threads submitting child slices of an oversized order in parallel
+
+# Limit-order execution (start at the mid, step towards the touch)
+EXECUTION_STEPS = 5  # Price steps from the start price to the touch
+EXECUTION_STEP_SECONDS = 2  # Seconds an order rests at each price
+EXECUTION_MAX_SLIPPAGE = 2.0  # Furthest the limit may move past the arrival mid (points)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9108))  # Local /metrics endpoint; 0 disables it
 
 # Backtesting parameters
 BACKTEST_PERIOD_MONTHS = 12  # Duration for backtesting
+BACKTEST_WORKERS = None  # Processes simulating expiry cycles in parallel (None = one per core, 1 = in-process)
+RESULT_CACHE_DIR = "data/results"  # Backtest results keyed by a hash of their inputs; None disables the cache
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Least recently used results are evicted beyond this size
+
+# Strategy state checkpoints (checkpoint.py), reconciled with the broker's positions on restart
+CHECKPOINT_FILE = "data/checkpoint.json"
+
+# Option pricing
+RISK_FREE_RATE = 0.065  # Annualized risk-free rate used for Black-Scholes pricing
+
+# Synthetic option chain (used when no options history is available)
+SPOT_CANDLES_FILE = "../OptionSellingPOC/historical_data_^NSEI_20250101_20250131_30m.pkl"  # From data_store_yahoo.py
+SYNTHETIC_CACHE_DIR = "data/synthetic"  # Cache for generated per-expiry chains
+SYNTHETIC_STRIKE_RANGE = 1000  # Points either side of the spot range to generate strikes for
+SYNTHETIC_VOL_WINDOW = 20  # Candles used for the realized-volatility model
+EXPIRY_WEEKDAY = 3  # Weekly expiry weekday (Monday=0, Thursday=3)
+
+# Paper trading (set KITE_PAPER=1 to run against the in-process paper exchange)
+PAPER_TRADING = os.environ.get("KITE_PAPER") == "1"
+PAPER_TICKS_FILE = os.environ.get("KITE_PAPER_TICKS")  # Optional ticks to replay (JSON lines or a .ticks file)
+PAPER_SPOT = 23500  # Opening NIFTY price when no ticks are replayed
+PAPER_VOL = 0.14  # Volatility used to quote options without ticks
+
+# Tick recording (python tick_store.py records full NIFTY/BANKNIFTY chains)
+TICK_DIR = "data/ticks"  # Daily compressed tick files (<date>.ticks)
+TICK_BUFFER_CAPACITY = 1 << 20  # Ticks buffered between flushes before new ones are dropped
+TICK_FLUSH_SECONDS = 1.0  # Time between appends to the daily file
+
+# Live candles built from ticks (candles.CandleAggregator)
+CANDLE_TIMEFRAMES = ("1s", "1m", "5m", "15m")
+CANDLE_HISTORY = 200  # Closed bars kept per token and timeframe (~0.1 MB per token for the four timeframes)
 
 # Zerodha Kite API credentials
 API_KEY = "your_api_key"  # Replace with your API key
@@ -0,0 +1,208 @@
+# execution.py
+"""Limit-order execution that pegs to the mid (or fair value) and chases the touch.
+
+Market orders on thin far-OTM strikes pay the whole spread and then some.
+LimitChaser instead places a LIMIT order at the mid of the live depth (or at
+a fair value clamped inside the spread), then on a fixed schedule modifies the
+same order a step closer to the touch, never further from the arrival mid than
+a slippage budget, nor past the fair value when one is given. Orders still open after the last step are either converted
+to MARKET or cancelled. Fills are read from an OrderTracker, so waiting
+between steps costs no API calls. Orders go through an OrderGateway, so one
+above the freeze quantity is worked as a single order across its slices.
+"""
+
+import math
+import time
+
+from kiteconnect.exceptions import KiteException
+
+from config import EXECUTION_STEPS, EXECUTION_STEP_SECONDS, EXECUTION_MAX_SLIPPAGE
+from metrics import EXECUTION_OUTCOMES, EXECUTION_SLIPPAGE_SAVED, EXECUTION_TIME_TO_FILL
+from order_gateway import OrderGateway
+
+TICK_SIZE = 0.05
+
+
+def floor_to_tick(price):
+    return round(math.floor(round(price / TICK_SIZE, 6)) * TICK_SIZE, 2)
+
+
+def ceil_to_tick(price):
+    return round(math.ceil(round(price / TICK_SIZE, 6)) * TICK_SIZE, 2)
+
+
+def best_bid_ask(quote):
+    """Best bid and ask from a Kite quote's depth; None for an empty side."""
+    depth = quote.get("depth") or {}
+    bids = [level["price"] for level in depth.get("buy", []) if level.get("price")]
+    asks = [level["price"] for level in depth.get("sell", []) if level.get("price")]
+    return (max(bids) if bids else None), (min(asks) if asks else None)
+
+
+class LimitChaser:
+    """Work LIMIT orders from the mid towards the touch.
+
+    Args:
+        kite: KiteConnect-compatible client.
+        tracker (OrderTracker): Receives the client's order updates.
+        steps (int): Number of price steps from the start price to the touch.
+        step_seconds (float): Time an order rests at each price.
+        max_slippage (float): Furthest the limit may move past the arrival mid, in price points.
+        limiter (RateLimiter): Optional order rate limiter; placements and modifications each take a token.
+        gateway (OrderGateway): Places, modifies and cancels the orders; by default one over
+            ``kite``, ``tracker`` and ``limiter``.
+    """
+
+    def __init__(self, kite, tracker, steps=EXECUTION_STEPS, step_seconds=EXECUTION_STEP_SECONDS,
+                 max_slippage=EXECUTION_MAX_SLIPPAGE, limiter=None, gateway=None):
+        self.kite = kite
+        self.tracker = tracker
+        self.steps = steps
+        self.step_seconds = step_seconds
+        self.max_slippage = max_slippage
+        self.gateway = gateway or OrderGateway(kite, tracker, limiter=limiter)
+
+    def _quotes(self, orders):
+        return self.kite.quote([f"{order['exchange']}:{order['tradingsymbol']}" for order in orders])
+
+    def _plan(self, order, quote):
+        """Arrival prices and the price schedule for one order."""
+        buying = order["transaction_type"] == "BUY"
+        bid, ask = best_bid_ask(quote)
+        last = quote.get("last_price")
+        if bid is None or ask is None:
+            # One-sided or empty book: peg around the fair value (or last price) instead
+            reference = order.get("fair_price") or last
+            bid = bid if bid is not None else reference
+            ask = ask if ask is not None else reference
+        mid = (bid + ask) / 2
+        start = order.get("fair_price") or mid
+        start = min(max(start, bid), ask)  # A fair value outside the spread would cross or never fill
+        start = floor_to_tick(start) if buying else ceil_to_tick(start)
+        budget = self.max_slippage if order.get("max_slippage") is None else order["max_slippage"]
+        cap = floor_to_tick(mid + budget) if buying else max(ceil_to_tick(mid - budget), TICK_SIZE)
+        fair = order.get("fair_price")
+        if fair:  # Never pay through the fair value, even within the budget
+            cap = min(cap, floor_to_tick(fair)) if buying else max(cap, ceil_to_tick(fair))
+            start = min(start, cap) if buying else max(start, cap)
+        return {"bid": bid, "ask": ask, "mid": mid, "start": start, "cap": cap, "buying": buying}
+
+    def _target(self, plan, step, bid, ask):
+        """Limit price for ``step`` (1..steps): a fraction of the way to the current touch, capped."""
+        buying = plan["buying"]
+        touch = ask if buying else bid
+        if touch is None:
+            touch = plan["ask"] if buying else plan["bid"]
+        price = plan["start"] + (touch - plan["start"]) * step / self.steps
+        if buying:
+            return min(ceil_to_tick(price), plan["cap"])
+        return max(floor_to_tick(price), plan["cap"])
+
+    def _place(self, order, price):
+        return self.gateway.place_order(
+            exchange=order["exchange"], tradingsymbol=order["tradingsymbol"],
+            transaction_type=order["transaction_type"], quantity=order["quantity"],
+            product=order.get("product", "NRML"), order_type="LIMIT", price=price, tag=order.get("tag"))
+
+    def _state(self, order_id):
+        # Without a websocket update yet (e.g. the ticker isn't connected) this asks the API once per step
+        return self.gateway.refresh(order_id)
+
+    def execute(self, orders, fallback="market"):
+        """Work a batch of orders together and block until each is filled or given up.
+
+        Args:
+            orders (list): Dicts with exchange, tradingsymbol, transaction_type, quantity and
+                optionally product, tag, fair_price (start price, and the furthest the limit is chased)
+                and max_slippage.
+            fallback (str): After the last step, "market" converts unfilled orders to MARKET
+                (use for exits that must complete); "cancel" cancels them.
+
+        Returns:
+            list: One result dict per order (order_id, status, filled_quantity, average_price,
+            arrival bid/ask/mid, last limit price, time_to_fill and slippage_saved in rupees).
+        """
+        started = time.perf_counter()
+        quotes = self._quotes(orders)
+        working = []
+        results = []
+        for order in orders:
+            quote = quotes.get(f"{order['exchange']}:{order['tradingsymbol']}", {})
+            plan = self._plan(order, quote)
+            result = {"order_id": None, "tradingsymbol": order["tradingsymbol"], "status": "REJECTED",
+                      "filled_quantity": 0, "average_price": 0.0, "arrival_bid": plan["bid"],
+                      "arrival_ask": plan["ask"], "arrival_mid": plan["mid"], "limit_price": plan["start"],
+                      "time_to_fill": None, "slippage_saved": 0.0}
+            results.append(result)
+            try:
+                result["order_id"] = self._place(order, plan["start"])
+            except KiteException as e:
+                result["status_message"] = str(e)
+                EXECUTION_OUTCOMES.labels("rejected").inc()
+                continue
+            working.append((order, plan, result))
+
+        step = 0
+        while working:
+            deadline = time.monotonic() + self.step_seconds
+            for order, plan, result in working:
+                self.tracker.wait_terminal_sync(result["order_id"], max(deadline - time.monotonic(), 0))
+            still_open = []
+            for item in working:
+                state = self._state(item[2]["order_id"])
+                if state is not None and state.is_terminal:
+                    self._finish(*item, state, started)
+                else:
+                    still_open.append(item)
+            working = still_open
+            if not working:
+                break
+            step += 1
+            if step > self.steps:
+                for item in working:
+                    self._give_up(*item, fallback, started)
+                break
+            quotes = self._quotes([order for order, _, _ in working])
+            for order, plan, result in working:
+                bid, ask = best_bid_ask(quotes.get(f"{order['exchange']}:{order['tradingsymbol']}", {}))
+                price = self._target(plan, step, bid, ask)
+                if price != result["limit_price"]:
+                    self._modify(result, price=price)
+        return results
+
+    def _modify(self, result, **changes):
+        # A failed modification usually means a fill or cancel in the meantime; the next state read shows which
+        modified = self.gateway.modify_order(result["order_id"], **changes)
+        if modified and "price" in changes:
+            result["limit_price"] = changes["price"]
+        return modified
+
+    def _give_up(self, order, plan, result, fallback, started):
+        order_id = result["order_id"]
+        if fallback == "market":
+            self._modify(result, order_type="MARKET")
+            EXECUTION_OUTCOMES.labels("market_fallback").inc()
+        else:
+            self.gateway.cancel_order(order_id)
+            EXECUTION_OUTCOMES.labels("cancelled").inc()
+        state = self.tracker.wait_terminal_sync(order_id, self.step_seconds) or self._state(order_id)
+        self._finish(order, plan, result, state, started, count=False)
+
+    def _finish(self, order, plan, result, state, started, count=True):
+        if state is None:
+            return
+        result["status"] = state.status
+        result["filled_quantity"] = state.filled_quantity
+        result["average_price"] = state.average_price
+        if state.filled_quantity:
+            result["time_to_fill"] = time.perf_counter() - started
+            EXECUTION_TIME_TO_FILL.observe(result["time_to_fill"])
+            # Versus a market order crossing the arrival touch
+            if plan["buying"]:
+                saved = (plan["ask"] - state.average_price) * state.filled_quantity
+            else:
+                saved = (state.average_price - plan["bid"]) * state.filled_quantity
+            result["slippage_saved"] = round(saved, 2)
+            EXECUTION_SLIPPAGE_SAVED.inc(saved)
+        if count:
+            EXECUTION_OUTCOMES.labels("filled" if state.is_filled else state.status.lower()).inc()
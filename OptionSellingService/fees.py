@@ -0,0 +1,89 @@
+# fees.py
+"""Brokerage, taxes and exchange charges on NSE index option fills.
+
+``charges`` prices whole arrays of fills in one vectorized call, so
+backtests can net every simulated trade of costs without a per-trade loop,
+and live P&L uses the same numbers. The rates live in FEE_SCHEDULE, one
+entry per date they changed; each fill is charged at the rates in force on
+the day it traded.
+
+Per fill (turnover = premium x quantity):
+    brokerage     flat per executed order
+    STT           on sell turnover; on exercise, on the intrinsic value of exercised long options
+    exchange      transaction charges on turnover
+    SEBI fees     on turnover
+    stamp duty    on buy turnover
+    GST           on brokerage + exchange charges + SEBI fees
+
+Exercised rows (cash-settled at expiry) pay only STT on exercise.
+"""
+
+import datetime
+
+import numpy as np
+
+# (effective from, rates); rates are fractions of turnover except brokerage (INR per order).
+# Append an entry when a rate changes; older fills keep the rates of their day.
+FEE_SCHEDULE = (
+    (datetime.date(2020, 7, 1), {"brokerage": 20.0, "stt_sell": 0.0005, "stt_exercise": 0.00125,
+                                 "exchange": 0.00053, "sebi": 1e-6, "stamp_duty": 0.00003, "gst": 0.18}),
+    (datetime.date(2023, 4, 1), {"brokerage": 20.0, "stt_sell": 0.000625, "stt_exercise": 0.00125,
+                                 "exchange": 0.0005, "sebi": 1e-6, "stamp_duty": 0.00003, "gst": 0.18}),
+    (datetime.date(2024, 10, 1), {"brokerage": 20.0, "stt_sell": 0.001, "stt_exercise": 0.00125,
+                                  "exchange": 0.0003503, "sebi": 1e-6, "stamp_duty": 0.00003, "gst": 0.18}),
+)
+CHARGES = ("brokerage", "stt", "exchange", "sebi", "stamp_duty", "gst")
+
+_EFFECTIVE = np.array([effective for effective, _ in FEE_SCHEDULE], dtype="datetime64[D]")
+_RATES = {name: np.array([rates[name] for _, rates in FEE_SCHEDULE]) for name in FEE_SCHEDULE[0][1]}
+
+
+def rates_on(traded_on=None):
+    """The schedule's rates in force on a date (default today), or per element of an array of dates.
+
+    Dates before the first entry use its rates.
+
+    Returns:
+        dict: Rate name -> float, or -> array aligned with ``traded_on``.
+    """
+    days = np.asarray(datetime.date.today() if traded_on is None else traded_on, dtype="datetime64[D]")
+    index = np.maximum(np.searchsorted(_EFFECTIVE, days, side="right") - 1, 0)
+    if index.ndim == 0:
+        return {name: float(values[index]) for name, values in _RATES.items()}
+    return {name: values[index] for name, values in _RATES.items()}
+
+
+def charges(price, quantity, traded_on=None, exercised=False, orders=1, breakdown=False):
+    """Charges (INR) on each fill.
+
+    Args:
+        price: Premium per unit, or the intrinsic value per unit for exercised rows.
+        quantity: Signed units, negative for sells.
+        traded_on: Trade date(s) selecting the schedule entry; defaults to today.
+        exercised: True for long options exercised at expiry.
+        orders: Executed orders behind each fill, for the flat brokerage.
+        breakdown (bool): Return every charge, not just the total.
+
+    Returns:
+        numpy.ndarray: Total charges per fill, or with ``breakdown`` a dict of arrays keyed by
+        CHARGES plus "total". Arguments broadcast, so scalars may be mixed with arrays.
+    """
+    price = np.asarray(price, dtype=float)
+    quantity = np.asarray(quantity, dtype=float)
+    exercised = np.asarray(exercised, dtype=bool)
+    rates = rates_on(traded_on)
+    turnover = price * np.abs(quantity)
+    sell = quantity < 0
+    traded = turnover * ~exercised  # Exercised rows only pay STT
+    charged = {
+        "brokerage": rates["brokerage"] * np.asarray(orders, dtype=float) * ((quantity != 0) & ~exercised),
+        "stt": turnover * np.where(exercised, rates["stt_exercise"], rates["stt_sell"] * sell),
+        "exchange": traded * rates["exchange"],
+        "sebi": traded * rates["sebi"],
+        "stamp_duty": traded * ~sell * rates["stamp_duty"],
+    }
+    charged["gst"] = (charged["brokerage"] + charged["exchange"] + charged["sebi"]) * rates["gst"]
+    total = sum(charged.values())
+    if breakdown:
+        return {**charged, "total": total}
+    return total
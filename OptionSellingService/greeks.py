@@ -0,0 +1,168 @@
+# greeks.py
+"""Incrementally maintained portfolio Greeks with threshold callbacks."""
+
+import datetime
+
+import numpy as np
+
+from config import RISK_FREE_RATE
+from pricing import bs_greeks, implied_vol
+from vol_surface import year_fraction
+
+GREEKS = ("delta", "gamma", "vega", "theta")
+DEFAULT_VOL = 0.15
+
+
+class GreeksAggregator:
+    """Net delta, gamma, vega and theta of all open legs, updated per tick.
+
+    Legs live in flat NumPy columns. A tick only marks the legs whose inputs
+    changed as dirty (every leg on an underlying for a spot tick, one leg for
+    a premium/IV tick); ``refresh`` reprices just those legs in one vectorized
+    call and applies the difference to the running totals. Totals are
+    position-weighted: delta is in units of the underlying, vega per vol point
+    and theta per day, all in INR for the quantities given.
+
+    Threshold callbacks are edge-triggered: they fire once when a Greek
+    leaves its band and re-arm when it comes back inside.
+    """
+
+    def __init__(self, surface=None, rate=RISK_FREE_RATE, capacity=16):
+        """
+        Args:
+            surface: Optional VolSurface used for legs that have no vol of their own.
+            rate: Risk-free rate used for pricing.
+            capacity: Initial number of leg slots (grows as needed).
+        """
+        self.surface = surface
+        self.rate = rate
+        self.spots = {}
+        self.totals = dict.fromkeys(GREEKS, 0.0)
+        self._index = {}
+        self._free = []
+        self._by_underlying = {}
+        self._dirty = set()
+        self._thresholds = []
+        self.now = None
+        self._strike = np.zeros(0)
+        self._quantity = np.zeros(0)
+        self._vol = np.zeros(0)
+        self._call = np.zeros(0, dtype=bool)
+        self._expiry = []
+        self._underlying = []
+        self._contribution = {greek: np.zeros(0) for greek in GREEKS}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        size = len(self._strike)
+        extra = capacity - size
+        self._strike = np.concatenate([self._strike, np.zeros(extra)])
+        self._quantity = np.concatenate([self._quantity, np.zeros(extra)])
+        self._vol = np.concatenate([self._vol, np.full(extra, np.nan)])
+        self._call = np.concatenate([self._call, np.zeros(extra, dtype=bool)])
+        self._expiry.extend([None] * extra)
+        self._underlying.extend([None] * extra)
+        for greek in GREEKS:
+            self._contribution[greek] = np.concatenate([self._contribution[greek], np.zeros(extra)])
+        self._free.extend(range(capacity - 1, size - 1, -1))
+
+    def add_leg(self, leg_id, strike, expiry, option_type, quantity, underlying="NIFTY", vol=None):
+        """Add an open leg; quantity is signed (negative for short legs)."""
+        if leg_id in self._index:
+            self.remove_leg(leg_id)
+        if not self._free:
+            self._allocate(2 * len(self._strike))
+        slot = self._free.pop()
+        self._index[leg_id] = slot
+        self._strike[slot] = strike
+        self._quantity[slot] = quantity
+        self._vol[slot] = np.nan if vol is None else vol
+        self._call[slot] = option_type == "CE"
+        self._expiry[slot] = expiry
+        self._underlying[slot] = underlying
+        self._by_underlying.setdefault(underlying, set()).add(slot)
+        self._dirty.add(slot)
+
+    def remove_leg(self, leg_id):
+        """Remove a closed leg and take its contribution out of the totals."""
+        slot = self._index.pop(leg_id, None)
+        if slot is None:
+            return
+        for greek in GREEKS:
+            self.totals[greek] -= float(self._contribution[greek][slot])
+            self._contribution[greek][slot] = 0.0
+        self._by_underlying[self._underlying[slot]].discard(slot)
+        self._dirty.discard(slot)
+        self._quantity[slot] = 0.0
+        self._free.append(slot)
+
+    def update_quantity(self, leg_id, quantity):
+        """Change a leg's net quantity after a partial exit or add."""
+        slot = self._index[leg_id]
+        self._quantity[slot] = quantity
+        self._dirty.add(slot)
+
+    def on_underlying_tick(self, underlying, price, now=None):
+        """Record a spot move; every leg on that underlying is repriced."""
+        self.spots[underlying] = price
+        self._dirty.update(self._by_underlying.get(underlying, ()))
+        return self.refresh(now)
+
+    def on_leg_tick(self, leg_id, premium=None, vol=None, now=None):
+        """Record a leg's new premium (implied to a vol) or vol; only that leg is repriced."""
+        slot = self._index.get(leg_id)
+        if slot is None:
+            return self.totals
+        if vol is None and premium is not None:
+            spot = self.spots.get(self._underlying[slot])
+            if spot is None:
+                return self.totals
+            t = year_fraction(self._expiry[slot], now or datetime.datetime.now())
+            vol = float(implied_vol(premium, spot, self._strike[slot], t,
+                                    "CE" if self._call[slot] else "PE", self.rate))
+        if vol is not None and not np.isnan(vol):
+            self._vol[slot] = vol
+            self._dirty.add(slot)
+        return self.refresh(now)
+
+    def add_threshold(self, greek, callback, upper=None, lower=None):
+        """Call ``callback(greek, value, totals)`` when a net Greek leaves [lower, upper]."""
+        if greek not in GREEKS:
+            raise ValueError(f"Unknown greek: {greek}")
+        self._thresholds.append({"greek": greek, "upper": upper, "lower": lower,
+                                 "callback": callback, "breached": False})
+
+    def refresh(self, now=None):
+        """Reprice dirty legs, update the totals and fire any threshold callbacks."""
+        now = now or datetime.datetime.now()
+        self.now = now
+        slots = [slot for slot in self._dirty if self._underlying[slot] in self.spots]
+        if slots:
+            self._dirty.difference_update(slots)
+            index = np.fromiter(slots, dtype=int, count=len(slots))
+            spot = np.array([self.spots[self._underlying[slot]] for slot in slots])
+            t = np.array([year_fraction(self._expiry[slot], now) for slot in slots])
+            vol = self._vol[index].copy()
+            missing = np.isnan(vol)
+            for position in np.flatnonzero(missing):
+                slot = slots[position]
+                vol[position] = (self.surface.iv(self._strike[slot], self._expiry[slot], now)
+                                 if self.surface is not None and self.surface.smiles else DEFAULT_VOL)
+            greeks = bs_greeks(spot, self._strike[index], t, vol, np.where(self._call[index], "CE", "PE"), self.rate)
+            for greek in GREEKS:
+                new = greeks[greek] * self._quantity[index]
+                self.totals[greek] += float(np.sum(new - self._contribution[greek][index]))
+                self._contribution[greek][index] = new
+            self._check_thresholds()
+        return self.totals
+
+    def _check_thresholds(self):
+        for threshold in self._thresholds:
+            value = self.totals[threshold["greek"]]
+            outside = ((threshold["upper"] is not None and value > threshold["upper"]) or
+                       (threshold["lower"] is not None and value < threshold["lower"]))
+            if outside and not threshold["breached"]:
+                threshold["breached"] = True
+                threshold["callback"](threshold["greek"], value, dict(self.totals))
+            elif not outside:
+                threshold["breached"] = False
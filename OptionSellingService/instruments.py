@@ -0,0 +1,110 @@
+# instruments.py
+"""Indexed lookups over Kite's instrument dump.
+
+``kite.instruments()`` returns tens of thousands of records, and scanning
+them for every leg is both slow and easy to get wrong (wrong exchange,
+hand-built trading symbols). InstrumentIndex builds the lookups once, so an
+instrument by token or symbol, an underlying's expiries or the option at a
+given expiry, strike and type are dictionary lookups, and strikes near a
+price are a binary search.
+"""
+
+import bisect
+import datetime
+
+# Underlying name -> (NSE index tradingsymbol, instrument token) of the indices options are listed on
+INDICES = {"NIFTY": ("NIFTY 50", 256265), "BANKNIFTY": ("NIFTY BANK", 260105)}
+_OPTION_TYPES = ("CE", "PE")
+
+
+def _as_date(expiry):
+    if isinstance(expiry, datetime.datetime):
+        return expiry.date()
+    if isinstance(expiry, str):
+        return datetime.date.fromisoformat(expiry) if expiry else None
+    return expiry
+
+
+class InstrumentIndex:
+    """Kite instrument records indexed by token, symbol and (underlying, expiry, strike, type)."""
+
+    def __init__(self, instruments):
+        """
+        Args:
+            instruments (list): Records as returned by ``kite.instruments()``, from any exchanges.
+        """
+        self.by_token = {}
+        self.by_symbol = {}  # (exchange, tradingsymbol) -> record
+        self._options = {}  # (name, expiry) -> {(strike, option_type): record}
+        self._strikes = {}  # (name, expiry) -> sorted strikes
+        for instrument in instruments:
+            self.by_token[instrument["instrument_token"]] = instrument
+            self.by_symbol[(instrument["exchange"], instrument["tradingsymbol"])] = instrument
+            if instrument.get("instrument_type") in _OPTION_TYPES:
+                key = (instrument["name"], _as_date(instrument["expiry"]))
+                self._options.setdefault(key, {})[(float(instrument["strike"]), instrument["instrument_type"])] = \
+                    instrument
+        self._expiries = {}  # name -> sorted expiries
+        for name, expiry in self._options:
+            self._expiries.setdefault(name, []).append(expiry)
+        for name in self._expiries:
+            self._expiries[name].sort()
+        for key, chain in self._options.items():
+            self._strikes[key] = sorted({strike for strike, _ in chain})
+
+    @classmethod
+    def load(cls, kite, exchanges=("NSE", "NFO")):
+        """Fetch and index the instrument dumps of the given exchanges."""
+        instruments = []
+        for exchange in exchanges:
+            instruments.extend(kite.instruments(exchange))
+        return cls(instruments)
+
+    def instrument(self, exchange, tradingsymbol):
+        """The record of an exchange symbol, or None."""
+        return self.by_symbol.get((exchange, tradingsymbol))
+
+    def expiries(self, name, on_or_after=None):
+        """Option expiries of an underlying, nearest first (optionally from a date on)."""
+        expiries = self._expiries.get(name, [])
+        if on_or_after is None:
+            return list(expiries)
+        return expiries[bisect.bisect_left(expiries, _as_date(on_or_after)):]
+
+    def nearest_expiry(self, name, today=None):
+        """First expiry on or after ``today`` (default today), or None."""
+        expiries = self.expiries(name, today or datetime.date.today())
+        return expiries[0] if expiries else None
+
+    def strikes(self, name, expiry):
+        """Sorted strikes listed for an expiry."""
+        return self._strikes.get((name, _as_date(expiry)), [])
+
+    def option(self, name, expiry, strike, option_type):
+        """The option record at an exact strike, or None."""
+        return self._options.get((name, _as_date(expiry)), {}).get((float(strike), option_type))
+
+    def chain(self, name, expiry):
+        """Every option record of one expiry, by (strike, option type)."""
+        return self._options.get((name, _as_date(expiry)), {})
+
+    def nearest_strike(self, name, expiry, price):
+        """The listed strike closest to ``price``, or None."""
+        strikes = self.strikes(name, expiry)
+        if not strikes:
+            return None
+        i = bisect.bisect_left(strikes, price)
+        candidates = strikes[max(i - 1, 0):i + 1]
+        return min(candidates, key=lambda strike: abs(strike - price))
+
+    def strikes_around(self, name, expiry, price, count):
+        """The ``count`` listed strikes closest to ``price``, in ascending order."""
+        strikes = self.strikes(name, expiry)
+        i = bisect.bisect_left(strikes, price)
+        low, high = i, i  # strikes[low:high] is the window
+        while high - low < min(count, len(strikes)):
+            if low > 0 and (high == len(strikes) or price - strikes[low - 1] <= strikes[high] - price):
+                low -= 1
+            else:
+                high += 1
+        return strikes[low:high]
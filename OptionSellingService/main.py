@@ -1,54 +1,318 @@
 # main.py
 """Main script to run the Iron Condor trading strategy live."""
 
+import argparse
+import threading
 import time
 from datetime import datetime
-from config import ENTRY_DAYS, ENTRY_TIME, PROTECTION_DISTANCE
-from api_helper import get_options_chain, place_option_order
-from strategy import check_entry_conditions, select_strikes, calculate_lots, calculate_net_credit, \
-    round_to_nearest_strike
+from config import ENTRY_DAYS, ENTRY_TIME, PROTECTION_DISTANCE, LOT_SIZE, MAX_NET_DELTA, NIFTY_INDEX_TOKEN, \
+    METRICS_PORT
+from api_helper import get_options_chain, place_option_order, get_option_premiums, option_symbol
+from strategy import MarketSnapshot, check_entry_conditions, check_economic_calendar, calculate_lots, calculate_fees, \
+    condor_legs, entry_fees, held_lots, round_to_nearest_strike, select_strikes
 from utils import is_market_open, log_trade
-from config import STOP_LOSS_MULTIPLIER, ADJUSTMENT_DISTANCE, ADJUSTMENT_MIN_CREDIT
-from api_helper import place_order, get_current_nifty_price
+from config import RISK_RULES, ADJUSTMENT_DISTANCE, ADJUSTMENT_MIN_CREDIT
+from api_helper import place_order, get_current_nifty_price, confirm_fills, get_positions, ticker
+from greeks import GreeksAggregator
+from risk_rules import RiskEngine
+from metrics import TICK_TO_DECISION, DECISION_TO_ACK, start_metrics_server
+from profiler import start_profiler, profile_cycle
+from allocator import CapitalAllocator
+from checkpoint import CheckpointStore, reconcile
+from option_chain import OptionChain
+
+allocator = CapitalAllocator()  # Margin of the open positions, for sizing entries and adjustments
+checkpoints = CheckpointStore()  # Position state, resumed after a crash or restart
 
 def run_trading_service():
-    """Execute the Iron Condor strategy in live trading."""
+    """Execute the Iron Condor strategy in live trading.
+
+    On entry days the chain is seeded once the market is open and then kept
+    current from the ticker (watch_entry_chain), so the entry decision reads
+    the average IV and condor credit of the latest ticks without fetching
+    and re-solving the chain.
+    """
     print("Starting Iron Condor trading service...")
+    ticker.connect(threaded=True)  # Order updates (and later leg ticks) arrive over the websocket
+    resume_position()
+    chain = chain_lock = chain_day = None
     while True:
         now = datetime.now()
+        if now.strftime("%A") in ENTRY_DAYS and is_market_open() and chain_day != now.date():
+            chain, chain_lock = watch_entry_chain(ticker)
+            chain_day = now.date()
         if (now.strftime("%A") in ENTRY_DAYS and is_market_open() and
             now.strftime("%H:%M") == ENTRY_TIME):
             print(f"Checking entry at {now}...")
-            options_chain = get_options_chain()
-            if check_entry_conditions(options_chain):
-                current_price = get_current_nifty_price()
-                strikes = select_strikes(current_price)
-                lots = calculate_lots()
-                order_details = {"strikes": strikes, "lots": lots}
-                order_ids = place_order(order_details)
-                if order_ids:
-                    log_trade({"entry_time": str(now), "strikes": strikes, "lots": lots, "order_ids": order_ids})
-                    print("Position entered. Monitoring...")
-                    monitor_position(order_details)  # Implement this
+            with profile_cycle("entry"):
+                with chain_lock:
+                    snapshot = MarketSnapshot.from_chain(chain) if check_entry_conditions(chain) else None
+                order_details = order_ids = None
+                # The frozen snapshot confirms the trade at the strikes it places (see SOLD_STRIKE_DELTA)
+                if snapshot is not None and check_entry_conditions(snapshot):
+                    strikes = snapshot.strikes
+                    lots = calculate_lots(strikes, snapshot.spot, snapshot.expiry, allocator)
+                    order_details = {"strikes": strikes, "lots": lots}
+                    if lots:
+                        # Written ahead of the orders, so a crash mid-entry resumes with whatever filled
+                        checkpoint_position("entering", order_details, position_legs(order_details), snapshot)
+                        order_ids = place_order(order_details, snapshot.surface, snapshot.expiry)
+                        if order_ids:
+                            checkpoint_position("open", order_details, position_legs(order_details), snapshot)
+                        else:
+                            checkpoints.delete("iron_condor")
+                    else:
+                        print("Not enough free margin for one lot; skipping the entry.")
+            if order_ids:
+                allocator.open(order_details.get("tag") or "iron_condor", condor_legs(strikes, lots), "NIFTY",
+                               snapshot.expiry, snapshot.spot)
+                filled = confirm_fills(order_ids)
+                log_trade({"entry_time": str(now), "strikes": strikes, "lots": lots, "order_ids": order_ids,
+                           "filled": filled, "fees": round(entry_fees(snapshot, lots), 2)})
+                print("Position entered. Monitoring..." if filled else "Entry not fully filled. Monitoring...")
+                monitor_position(order_details, ticker=ticker, entry_snapshot=snapshot)
             time.sleep(24 * 60 * 60)  # Wait until next day
         time.sleep(60)  # Check every minute
 
-def monitor_position(order_details):
-    """Monitor the position for stop-loss and adjustments."""
-    initial_credit = calculate_net_credit(get_options_chain())  # Fetch at entry
+def watch_entry_chain(ticker):
+    """Seed an OptionChain of the nearest expiry and keep it current from the ticker's ticks.
+
+    The chain covers the strikes quoted by MarketSnapshot.capture. The
+    economic calendar is fetched here, once per day, so entry checks made
+    under the lock never wait on it.
+
+    Returns:
+        tuple: (OptionChain, lock to hold while reading it).
+    """
+    options_chain = get_options_chain()
+    snapshot = MarketSnapshot.capture(options_chain)
+    quoted = {opt["tradingsymbol"] for opt in snapshot.chain}
+    instruments = [opt for opt in options_chain if opt["tradingsymbol"] in quoted]
+    chain = OptionChain.from_snapshot(snapshot, strike_selector=select_strikes, instruments=instruments)
+    check_economic_calendar(str(snapshot.expiry))
+    lock = threading.Lock()
+    tokens = [NIFTY_INDEX_TOKEN] + [opt["instrument_token"] for opt in instruments]
+
+    def on_ticks(ws, ticks):
+        with lock:
+            chain.timestamp = datetime.now()  # LTP ticks carry no exchange timestamp
+            chain.on_ticks(ticks)
+
+    def on_connect(ws, response):
+        ws.subscribe(tokens)
+        ws.set_mode(ws.MODE_LTP, tokens)
+
+    ticker.on_ticks = on_ticks
+    ticker.on_connect = on_connect  # Re-subscribes after reconnects
+    if ticker.is_connected():
+        on_connect(ticker, None)
+    return chain, lock
+
+
+def checkpoint_position(phase, order_details, legs, snapshot=None, **state):
+    """Record the position for resume_position: its phase, order details and legs, and the entry market."""
+    if snapshot is not None:
+        state.update(cash=snapshot.net_credit * order_details["lots"] - entry_fees(snapshot, order_details["lots"]),
+                     expiry=snapshot.expiry, spot=snapshot.spot)
+    checkpoints.save("iron_condor", {**checkpoints.get("iron_condor", {}), **state, "phase": phase,
+                                     "order_details": order_details, "legs": legs})
+
+
+def resume_position():
+    """Resume monitoring a checkpointed position, reconciled with the broker's positions in one request.
+
+    Every checkpointed leg, including those of an earlier condor kept through
+    an adjustment, is monitored and exited at the broker's quantity, and
+    adjustments are sized at most to the largest leg held; a position that is
+    flat everywhere is forgotten.
+
+    Returns:
+        bool: True if a position was resumed.
+    """
+    state = checkpoints.get("iron_condor")
+    if state is None:
+        return False
+    held, differing = reconcile({leg[0]: leg[3] for leg in state["legs"]}, get_positions())
+    if not any(held.values()):
+        print("The checkpointed position is flat at the broker; nothing to resume.")
+        checkpoints.delete("iron_condor")
+        return False
+    if differing:
+        print(f"Broker quantities differ from the checkpoint for {differing}; monitoring what is held.")
+    legs = [(symbol, strike, option_type, held[symbol]) for symbol, strike, option_type, _ in state["legs"]
+            if held[symbol]]
+    lots = max((abs(held) for held in held_lots([leg[1:] for leg in legs]).values()), default=0)
+    order_details = {**state["order_details"], "lots": lots}
+    allocator.open(order_details.get("tag") or "iron_condor", [leg[1:] for leg in legs], "NIFTY",
+                   state.get("expiry"), state.get("spot"))
+    print(f"Resuming the {state['phase']} position from the checkpoint. Monitoring...")
+    monitor_position(order_details, ticker=ticker, legs=legs, cash=state.get("cash"))
+    return True
+
+
+def position_legs(order_details):
+    """List the Iron Condor legs as (symbol, strike, option_type, signed quantity)."""
+    strikes = order_details["strikes"]
+    quantity = order_details["lots"] * LOT_SIZE
+    return [
+        (option_symbol(strikes["sold_call"], "CE"), strikes["sold_call"], "CE", -quantity),
+        (option_symbol(strikes["bought_call"], "CE"), strikes["bought_call"], "CE", quantity),
+        (option_symbol(strikes["sold_put"], "PE"), strikes["sold_put"], "PE", -quantity),
+        (option_symbol(strikes["bought_put"], "PE"), strikes["bought_put"], "PE", quantity),
+    ]
+
+
+def merge_legs(legs):
+    """Sum legs on the same symbol, dropping the ones that net to zero."""
+    merged = {}
+    for symbol, strike, option_type, quantity in legs:
+        held = merged.get(symbol, (symbol, strike, option_type, 0))
+        merged[symbol] = held[:3] + (held[3] + quantity,)
+    return [leg for leg in merged.values() if leg[3]]
+
+
+def stream_greeks(ticker, aggregator, options_chain, legs, lock, risk=None, on_exit=None):
+    """Feed KiteTicker ticks for the underlying and the legs into the Greeks aggregator.
+
+    With a RiskEngine as ``risk``, leg ticks also mark its positions and the
+    rules are evaluated after every batch; ``on_exit(exits)`` is called when
+    any position must exit.
+    """
+    symbols = {leg[0] for leg in legs}
+    leg_tokens = {opt["instrument_token"]: opt["tradingsymbol"] for opt in options_chain
+                  if opt["tradingsymbol"] in symbols}
+
+    def on_ticks(ws, ticks):
+        with lock:
+            for tick in ticks:
+                token = tick["instrument_token"]
+                if token == NIFTY_INDEX_TOKEN:
+                    aggregator.on_underlying_tick("NIFTY", tick["last_price"])
+                elif token in leg_tokens:
+                    aggregator.on_leg_tick(leg_tokens[token], premium=tick["last_price"])
+                    if risk is not None:
+                        risk.on_tick(leg_tokens[token], tick["last_price"])
+            exits = risk.evaluate() if risk is not None else None
+        if exits and on_exit is not None:
+            on_exit(exits)
+
+    def on_connect(ws, response):
+        tokens = [NIFTY_INDEX_TOKEN] + list(leg_tokens)
+        ws.subscribe(tokens)
+        ws.set_mode(ws.MODE_LTP, tokens)
+
+    ticker.on_ticks = on_ticks
+    ticker.on_connect = on_connect  # Re-subscribes after reconnects
+    if ticker.is_connected():
+        on_connect(ticker, None)
+    else:
+        ticker.connect(threaded=True)
+
+
+def monitor_position(order_details, ticker=None, entry_snapshot=None, legs=None, cash=None):
+    """Monitor the position for stop-loss and adjustments.
+
+    Net Greeks of the open legs are kept current by a GreeksAggregator. With a
+    KiteTicker passed as ``ticker``, ticks update them as they arrive and a net
+    delta breach wakes this loop immediately; otherwise quotes are polled
+    every 60 seconds. Exit rules (RISK_RULES["iron_condor"]) are checked by a
+    RiskEngine on every leg price. The time from market data to the exit decision, and from
+    the decision to the broker accepting the exit orders, are recorded in the
+    tick_to_decision_seconds and decision_to_ack_seconds histograms. The
+    initial credit comes from ``entry_snapshot`` when given, so it matches the
+    market the entry decision was made on. A resumed position passes its
+    ``legs`` and ``cash`` (net credit in INR) from the checkpoint instead.
+    P&L is net of the entry charges (fees.py).
+
+    After an adjustment the kept legs and the new condor are monitored on as
+    one position, its P&L counted from the adjustment (every leg marked at its
+    quote then) net of the adjustment's charges.
+
+    Every transition (exit started, spread closed, adjustment placed) is
+    checkpointed before the next one.
+    """
+    options_chain = get_options_chain()
+    expiry = options_chain[0]["expiry"] if options_chain else None
+    if cash is None:
+        entry_snapshot = entry_snapshot or MarketSnapshot.capture(options_chain)
+        cash = entry_snapshot.net_credit * order_details["lots"] - entry_fees(entry_snapshot, order_details["lots"])
+    legs = legs or position_legs(order_details)
+
+    aggregator = GreeksAggregator(surface=entry_snapshot.surface if entry_snapshot is not None else None)
+    for symbol, strike, option_type, quantity in legs:
+        aggregator.add_leg(symbol, strike, expiry, option_type, quantity)
+    breach = threading.Event()
+    breached_at = []  # perf_counter() of the tick that breached the delta limit
+
+    def on_breach(*args):
+        breached_at.append(time.perf_counter())
+        breach.set()
+
+    aggregator.add_threshold("delta", on_breach, upper=MAX_NET_DELTA, lower=-MAX_NET_DELTA)
+    risk = RiskEngine(RISK_RULES)
+    position_id = order_details.get("tag") or "iron_condor"
+    risk.open(position_id, "iron_condor", legs={symbol: quantity for symbol, _, _, quantity in legs}, credit=cash)
+    lock = threading.Lock()
+    if ticker is not None:
+        stream_greeks(ticker, aggregator, options_chain, legs, lock, risk=risk, on_exit=on_breach)
+
     while True:
-        current_price = get_current_nifty_price()
-        # Placeholder: Fetch current premiums and calculate loss
-        loss = 0  # Implement premium difference calculation
-        if loss >= initial_credit * STOP_LOSS_MULTIPLIER:
-            exit_spread(order_details)  # Implement exit logic
-            new_strikes = select_adjustment_strikes(current_price)
-            new_order = {"strikes": new_strikes, "lots": order_details["lots"]}
-            if calculate_net_credit(get_options_chain()) >= ADJUSTMENT_MIN_CREDIT:
-                place_order(new_order)
-                log_trade({"adjustment_time": str(datetime.now()), "strikes": new_strikes})
-            break
-        time.sleep(60)
+        with profile_cycle("monitor"):
+            current_price = get_current_nifty_price()
+            premiums = get_option_premiums([leg[0] for leg in legs])
+            received = time.perf_counter()
+            with lock:
+                aggregator.on_underlying_tick("NIFTY", current_price)
+                for symbol, premium in premiums.items():
+                    aggregator.on_leg_tick(symbol, premium=premium)
+                    risk.on_tick(symbol, premium)
+                net_delta = aggregator.totals["delta"]
+                exits = risk.evaluate()
+                pnl = risk.pnl(position_id)
+            if exits or breach.is_set():
+                decided = time.perf_counter()
+                TICK_TO_DECISION.labels("iron_condor").observe(decided - min(breached_at + [received]))
+                # Positive net delta means the market fell towards the sold put, negative towards the sold call
+                side = "put" if net_delta > 0 else "call"
+                closing = [leg for leg in legs if leg[2] == ("PE" if side == "put" else "CE")]
+                if not closing:
+                    print(f"The {side} spread is already closed; nothing to exit.")
+                    break
+                checkpoint_position("exiting", order_details, legs, side=side)
+                exit_ids = exit_spread(legs, side, order_details.get("tag"))
+                DECISION_TO_ACK.labels("iron_condor").observe(time.perf_counter() - decided)
+                if not confirm_fills(exit_ids):
+                    log_trade({"exit_not_filled": exit_ids, "net_delta": net_delta, "pnl": pnl})
+                    break  # Don't stack an adjustment on a spread that is still open
+                allocator.apply(position_id, [(strike, option_type, -quantity)
+                                              for _, strike, option_type, quantity in closing])
+                legs = [leg for leg in legs if leg not in closing]
+                checkpoint_position("open", order_details, legs)
+                allocator.set_spot("NIFTY", current_price)
+                new_strikes = select_adjustment_strikes(current_price)
+                # Adjustments may draw on the reserve, but never grow the position
+                lots = min(order_details["lots"],
+                           calculate_lots(new_strikes, current_price, expiry, allocator, purpose="adjustment"))
+                new_order = {"strikes": new_strikes, "lots": lots, "tag": position_id}
+                adjustment = MarketSnapshot.capture(options_chain)
+                adjusted = False
+                if lots and adjustment.net_credit >= ADJUSTMENT_MIN_CREDIT:
+                    adjusted = bool(place_order(new_order, adjustment.surface, adjustment.expiry))
+                    log_trade({"adjustment_time": str(datetime.now()), "strikes": new_strikes, "net_delta": net_delta,
+                               "pnl": pnl, "rule": exits[0][1] if exits else "net_delta"})
+                if adjusted:
+                    allocator.open(position_id, condor_legs(new_strikes, lots))
+                    new_legs = position_legs(new_order)
+                    legs = merge_legs(legs + new_legs)
+                    marks = get_option_premiums([leg[0] for leg in legs])
+                    charges = calculate_fees([marks.get(leg[0], 0.0) for leg in new_legs],
+                                             [leg[3] for leg in new_legs])
+                    cash = -sum(quantity * marks.get(symbol, 0.0) for symbol, _, _, quantity in legs) - charges
+                    checkpoint_position("open", new_order, legs, cash=cash)
+                    # Keep monitoring the adjusted position: the kept legs and the new condor
+                    return monitor_position(new_order, ticker=ticker, legs=legs, cash=cash)
+                break
+        breach.wait(timeout=60)
 
 def select_adjustment_strikes(current_price):
     """Select new strikes for adjustment."""
@@ -59,28 +323,32 @@ def select_adjustment_strikes(current_price):
     return {"sold_call": sold_call, "bought_call": bought_call, "sold_put": sold_put, "bought_put": bought_put}
 
 
-def exit_spread(order_details, side):
-    """Exit the specified spread (call or put) in an Iron Condor strategy.
+def exit_spread(legs, side, tag=None):
+    """Exit every held leg on one side (call or put) of the position.
 
     Args:
-        order_details (dict): Contains 'strikes' (dict of strike prices) and 'lots' (int).
-        side (str): 'call' to exit the call spread, 'put' to exit the put spread.
+        legs (list): Held legs as (symbol, strike, option_type, signed quantity), possibly from
+            several condors after adjustments.
+        side (str): 'call' to exit the call spreads, 'put' to exit the put spreads.
+        tag (str): Order tag of the position.
+
+    Returns:
+        list: Order ids of the closing orders, one per contract held.
     """
-    lots = order_details["lots"]
-    if side == "call":
-        # Close the call spread
-        # Buy back the sold call to close the short position
-        place_option_order(order_details["strikes"]["sold_call"], "CE", "BUY", lots)
-        # Sell the bought call to close the long position
-        place_option_order(order_details["strikes"]["bought_call"], "CE", "SELL", lots)
-    elif side == "put":
-        # Close the put spread
-        # Buy back the sold put to close the short position
-        place_option_order(order_details["strikes"]["sold_put"], "PE", "BUY", lots)
-        # Sell the bought put to close the long position
-        place_option_order(order_details["strikes"]["bought_put"], "PE", "SELL", lots)
-    else:
+    if side not in ("call", "put"):
         raise ValueError("Invalid side: must be 'call' or 'put'")
+    option_type = "CE" if side == "call" else "PE"
+    held = held_lots([leg[1:] for leg in legs])
+    # Buy back the sold options to close the short positions first, then sell the bought ones
+    closing = sorted((lots, strike) for (strike, kind), lots in held.items() if kind == option_type)
+    return [place_option_order(strike, option_type, "BUY" if lots < 0 else "SELL", abs(lots), tag)
+            for lots, strike in closing]
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Iron Condor trading service.")
+    parser.add_argument("--profile", action="store_true", help="run the sampling profiler (or set ADKITE_PROFILE=1)")
+    args = parser.parse_args()
+    start_profiler("trading_service", enabled=args.profile or None)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
     run_trading_service()
\ No newline at end of file
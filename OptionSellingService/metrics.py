@@ -0,0 +1,287 @@
+# metrics.py
+"""Low-overhead latency histograms, counters and gauges with a Prometheus-style endpoint.
+
+Samples are written to per-thread shards, so recording never takes a lock
+or contends with other threads; a scrape sums the shards. Recording a
+histogram sample is a bisect plus two list updates.
+"""
+
+import bisect
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, 50 µs to 10 s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Order working times in seconds, 100 ms to 2 minutes
+FILL_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+class _Sharded:
+    """Base for metrics whose samples live in per-thread shards."""
+
+    def __init__(self, name, help_text, labels=None):
+        self.name = name
+        self.help = help_text
+        self.labels = labels or {}
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()  # Taken once per thread, when its shard is created
+
+    def _new_shard(self):
+        raise NotImplementedError
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = self._new_shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _label_text(self, extra=None):
+        labels = dict(self.labels, **(extra or {}))
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Counter(_Sharded):
+    """Monotonic counter."""
+
+    kind = "counter"
+
+    def _new_shard(self):
+        return [0.0]
+
+    def inc(self, amount=1):
+        try:
+            self._local.shard[0] += amount
+        except AttributeError:
+            self._shard()[0] += amount
+
+    @property
+    def value(self):
+        return sum(shard[0] for shard in list(self._shards))
+
+    def samples(self):
+        yield f"{self.name}_total{self._label_text()}", self.value
+
+
+class Gauge(Counter):
+    """Value that goes up and down (e.g. a queue depth); inc/dec from any thread."""
+
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def samples(self):
+        yield f"{self.name}{self._label_text()}", self.value
+
+
+class Histogram(_Sharded):
+    """Cumulative-bucket histogram of observed values (seconds for latencies)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=None, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def _new_shard(self):
+        return [0] * (len(self.buckets) + 1) + [0.0]  # bucket counts (+Inf last), then the sum
+
+    def observe(self, value):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def time(self):
+        """Context manager that observes the elapsed time of its block."""
+        return _Timer(self)
+
+    def snapshot(self):
+        """Return (per-bucket counts including +Inf, sum, count) summed over all shards."""
+        size = len(self.buckets) + 1
+        counts = [0] * size
+        total = 0.0
+        for shard in list(self._shards):
+            for i in range(size):
+                counts[i] += shard[i]
+            total += shard[-1]
+        return counts, total, sum(counts)
+
+    def quantile(self, q):
+        """Approximate quantile: the upper bound of the bucket containing it."""
+        counts, _, count = self.snapshot()
+        if not count:
+            return 0.0
+        target, running = q * count, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        counts, total, count = self.snapshot()
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{self.name}_bucket{self._label_text({'le': le})}", running
+        yield f"{self.name}_sum{self._label_text()}", total
+        yield f"{self.name}_count{self._label_text()}", count
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Family:
+    """A metric name with one child per label value (e.g. one histogram per Kite endpoint)."""
+
+    def __init__(self, metric_class, name, help_text, label_name, **kwargs):
+        self.metric_class = metric_class
+        self.name = name
+        self.help = help_text
+        self.kind = metric_class.kind
+        self.label_name = label_name
+        self.kwargs = kwargs
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, value):
+        child = self._children.get(value)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(
+                    value, self.metric_class(self.name, self.help, {self.label_name: value}, **self.kwargs))
+        return child
+
+    def samples(self):
+        for child in list(self._children.values()):
+            yield from child.samples()
+
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, label=None):
+        return self.register(Family(Counter, name, help_text, label) if label else Counter(name, help_text))
+
+    def gauge(self, name, help_text, label=None):
+        return self.register(Family(Gauge, name, help_text, label) if label else Gauge(name, help_text))
+
+    def histogram(self, name, help_text, label=None, buckets=LATENCY_BUCKETS):
+        if label:
+            return self.register(Family(Histogram, name, help_text, label, buckets=buckets))
+        return self.register(Histogram(name, help_text, buckets=buckets))
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name} {value}" for name, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+KITE_LATENCY = REGISTRY.histogram("kite_request_seconds", "Kite API call latency by endpoint", label="endpoint")
+KITE_ERRORS = REGISTRY.counter("kite_request_errors", "Kite API calls that raised, by endpoint", label="endpoint")
+TICK_TO_DECISION = REGISTRY.histogram("tick_to_decision_seconds",
+                                      "Time from receiving market data to deciding to act", label="strategy")
+DECISION_TO_ACK = REGISTRY.histogram("decision_to_ack_seconds",
+                                     "Time from deciding to act to the broker acknowledging the orders",
+                                     label="strategy")
+RATE_LIMIT_QUEUE = REGISTRY.gauge("order_rate_limiter_queue_depth", "Orders waiting on the order rate limiter")
+RATE_LIMIT_WAIT = REGISTRY.histogram("order_rate_limiter_wait_seconds", "Time orders spent waiting on the rate limiter")
+EXECUTION_TIME_TO_FILL = REGISTRY.histogram("execution_time_to_fill_seconds",
+                                            "Time from starting a limit chase to its fill", buckets=FILL_BUCKETS)
+EXECUTION_SLIPPAGE_SAVED = REGISTRY.gauge("execution_slippage_saved_rupees",
+                                          "Rupees saved by limit chasing versus market orders at the arrival touch")
+EXECUTION_OUTCOMES = REGISTRY.counter("execution_orders", "Limit-chased orders by outcome", label="outcome")
+
+INSTRUMENTED_ENDPOINTS = {"quote", "ltp", "positions", "place_order", "modify_order", "cancel_order",
+                          "instruments", "orders", "margins", "order_margins", "basket_order_margins",
+                          "historical_data"}
+
+
+class InstrumentedKite:
+    """Proxy around a KiteConnect-like client recording per-endpoint latency and errors."""
+
+    def __init__(self, kite, endpoints=INSTRUMENTED_ENDPOINTS):
+        self._kite = kite
+        self._endpoints = endpoints
+
+    def __getattr__(self, name):
+        attribute = getattr(self._kite, name)
+        if name not in self._endpoints or not callable(attribute):
+            return attribute
+        histogram = KITE_LATENCY.labels(name)
+        errors = KITE_ERRORS.labels(name)
+
+        @functools.wraps(attribute)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        setattr(self, name, timed)  # Cache the wrapper; later lookups skip __getattr__
+        return timed
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the trading logs
+
+
+def start_metrics_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve /metrics on a daemon thread; returns the server (call shutdown() to stop)."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,247 @@
+# option_chain.py
+"""Live option chain with incrementally maintained entry aggregates."""
+
+import bisect
+import datetime
+
+import numpy as np
+
+from config import LOT_SIZE, NIFTY_INDEX_TOKEN, RISK_FREE_RATE
+from pricing import implied_vol
+from vol_surface import year_fraction
+
+
+class OptionChain:
+    """Premiums and IVs of one expiry, with the average ATM IV and condor credit kept current per tick.
+
+    Quotes live in flat NumPy columns, one slot per (strike, option type). A
+    tick only writes its premium and marks the slot dirty; reading
+    ``average_iv`` or ``net_credit`` folds the dirty slots in: their IVs are
+    solved in one vectorized call and the difference is applied to the
+    running IV sum and count of the ATM window. A spot move only touches the
+    strikes that enter or leave the window, and the condor credit is four
+    lookups, redone when the condor strikes move or one of its legs ticks.
+    So a read costs O(changed strikes), not O(chain).
+
+    Reads the same attributes as MarketSnapshot (spot, expiry, strikes,
+    premiums, average_iv, net_credit), so the strategy checks accept either.
+    A strike's IV is re-solved when its premium ticks, not on every spot tick.
+    """
+
+    def __init__(self, expiry=None, strike_selector=None, iv_window=200, rate=RISK_FREE_RATE, capacity=64):
+        """
+        Args:
+            expiry: Expiry of the chain, for solving IVs.
+            strike_selector: Function of the spot returning the condor strikes (strategy.select_strikes);
+                without one, net_credit is 0.
+            iv_window (float): Strikes within this distance of spot are averaged by ``average_iv``.
+            rate (float): Risk-free rate used for solving IVs.
+            capacity (int): Initial number of quote slots (grows as needed).
+        """
+        self.expiry = expiry
+        self.strike_selector = strike_selector
+        self.iv_window = iv_window
+        self.rate = rate
+        self.spot = None
+        self.timestamp = None
+        self.dirty = set()  # Slots written since the last fold
+        self._index = {}  # (strike, option_type) -> slot
+        self._tokens = {}  # instrument_token -> slot
+        self._by_strike = {}  # strike -> slots
+        self._sorted = []  # Distinct strikes, ascending
+        self._keys = []
+        self._strike = np.zeros(0)
+        self._call = np.zeros(0, dtype=bool)
+        self._premium = np.zeros(0)
+        self._iv = np.zeros(0)  # Percent; NaN until solved
+        self._solve = np.zeros(0, dtype=bool)  # IV is solved from the premium rather than given
+        self._counted = np.zeros(0)  # IV currently included in the window sum, NaN if none
+        self._window = (0, 0)  # Index range of self._sorted currently counted
+        self._iv_sum = 0.0
+        self._iv_count = 0
+        self._strikes = None  # Condor strikes at the last fold
+        self._credit = 0.0
+        self._credit_stale = True
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        extra = capacity - len(self._strike)
+        self._strike = np.concatenate([self._strike, np.zeros(extra)])
+        self._call = np.concatenate([self._call, np.zeros(extra, dtype=bool)])
+        self._premium = np.concatenate([self._premium, np.full(extra, np.nan)])
+        self._iv = np.concatenate([self._iv, np.full(extra, np.nan)])
+        self._solve = np.concatenate([self._solve, np.zeros(extra, dtype=bool)])
+        self._counted = np.concatenate([self._counted, np.full(extra, np.nan)])
+
+    @classmethod
+    def from_snapshot(cls, snapshot, strike_selector=None, instruments=(), **kwargs):
+        """Seed a chain from a MarketSnapshot (and map the tokens of NFO ``instruments`` for ticks)."""
+        chain = cls(expiry=snapshot.expiry, strike_selector=strike_selector, **kwargs)
+        chain.set_spot(snapshot.spot, snapshot.timestamp)
+        for opt in snapshot.chain:
+            chain.update(opt["strike"], opt["option_type"], opt["premium"], opt.get("iv"))
+        for instrument in instruments:
+            chain.add_instrument(instrument)
+        return chain
+
+    # -------------- Updates -------------- #
+    def _slot(self, strike, option_type):
+        key = (float(strike), option_type)
+        slot = self._index.get(key)
+        if slot is None:
+            slot = len(self._keys)
+            if slot == len(self._strike):
+                self._allocate(2 * slot)
+            self._index[key] = slot
+            self._keys.append(key)
+            self._strike[slot] = key[0]
+            self._call[slot] = option_type == "CE"
+            if key[0] not in self._by_strike:
+                position = bisect.bisect_left(self._sorted, key[0])
+                self._sorted.insert(position, key[0])
+                low, high = self._window
+                # Keep the counted range pointing at the same strikes
+                self._window = (low + (position < low), high + (position < high))
+                self._by_strike[key[0]] = []
+            self._by_strike[key[0]].append(slot)
+        return slot
+
+    def add_instrument(self, instrument):
+        """Map an NFO instrument record's token to its quote slot, for on_ticks."""
+        self._tokens[instrument["instrument_token"]] = self._slot(instrument["strike"], instrument["instrument_type"])
+
+    def update(self, strike, option_type, premium, iv=None):
+        """Record a quote; ``iv`` (percent) is solved from the premium when not given."""
+        slot = self._slot(strike, option_type)
+        self._premium[slot] = premium
+        self._solve[slot] = iv is None
+        if iv is not None:
+            self._iv[slot] = iv
+        self.dirty.add(slot)
+
+    def set_spot(self, spot, timestamp=None):
+        """Record an index move; only strikes entering or leaving the ATM window are refolded."""
+        self.spot = spot
+        if timestamp is not None:
+            self.timestamp = timestamp
+
+    def on_ticks(self, ticks):
+        """Fold a batch of KiteTicker ticks for the index and mapped options."""
+        for tick in ticks:
+            token = tick["instrument_token"]
+            if token == NIFTY_INDEX_TOKEN:
+                self.set_spot(tick["last_price"], tick.get("exchange_timestamp"))
+            elif token in self._tokens:
+                slot = self._tokens[token]
+                self._premium[slot] = tick["last_price"]
+                self._solve[slot] = True
+                self.dirty.add(slot)
+
+    def attach(self, ticker):
+        """Feed the ticker's ticks into the chain, keeping any existing on_ticks handler."""
+        previous = ticker.on_ticks
+
+        def on_ticks(ws, ticks):
+            self.on_ticks(ticks)
+            if previous:
+                previous(ws, ticks)
+
+        ticker.on_ticks = on_ticks
+        return self
+
+    # -------------- Aggregates -------------- #
+    def _recount(self, slots, low, high):
+        """Re-apply the window contribution of ``slots`` given the counted strike range [low, high)."""
+        for slot in slots:
+            position = bisect.bisect_left(self._sorted, self._strike[slot])
+            iv = self._iv[slot] if low <= position < high else np.nan
+            counted = self._counted[slot]
+            if counted == counted:  # Not NaN
+                self._iv_sum -= counted
+                self._iv_count -= 1
+            if iv == iv:
+                self._iv_sum += iv
+                self._iv_count += 1
+            self._counted[slot] = iv
+
+    def refresh(self):
+        """Fold dirty quotes and spot moves into the aggregates."""
+        if self.spot is None:
+            return
+        dirty = np.fromiter(self.dirty, dtype=int, count=len(self.dirty))
+        self.dirty = set()
+        solve = dirty[self._solve[dirty] & np.isfinite(self._premium[dirty])] if len(dirty) else dirty
+        if len(solve):
+            t = max(year_fraction(self.expiry, self.timestamp or datetime.datetime.now()), 1e-6)
+            option_types = np.where(self._call[solve], "CE", "PE")
+            self._iv[solve] = implied_vol(self._premium[solve], self.spot, self._strike[solve], t, option_types,
+                                          self.rate) * 100
+        low = bisect.bisect_left(self._sorted, self.spot - self.iv_window)
+        high = bisect.bisect_right(self._sorted, self.spot + self.iv_window)
+        old_low, old_high = self._window
+        moved = [slot for position in range(min(low, old_low), max(high, old_high))
+                 if (low <= position < high) != (old_low <= position < old_high)
+                 for slot in self._by_strike[self._sorted[position]]]
+        self._window = (low, high)
+        self._recount(set(moved).union(dirty.tolist()), low, high)
+
+        strikes = self.strike_selector(self.spot) if self.strike_selector else None
+        if strikes != self._strikes:
+            self._strikes = strikes
+            self._credit_stale = True
+        elif strikes and not self._credit_stale:
+            legs = {(float(strikes[name]), option_type) for name, option_type in
+                    (("sold_call", "CE"), ("bought_call", "CE"), ("sold_put", "PE"), ("bought_put", "PE"))}
+            self._credit_stale = any(self._keys[slot] in legs for slot in dirty.tolist())
+        if self._credit_stale:
+            self._credit = self._condor_credit()
+            self._credit_stale = False
+
+    def _condor_credit(self):
+        if not self._strikes:
+            return 0.0
+        premiums = [self.premium(self._strikes[name], option_type) for name, option_type in
+                    (("sold_call", "CE"), ("bought_call", "CE"), ("sold_put", "PE"), ("bought_put", "PE"))]
+        if None in premiums:
+            return 0  # Same as calculate_net_credit when a leg is unquoted
+        sold_call, bought_call, sold_put, bought_put = premiums
+        return (sold_call - bought_call + sold_put - bought_put) * LOT_SIZE
+
+    def premium(self, strike, option_type):
+        """Last premium of an option, or None if it hasn't been quoted."""
+        slot = self._index.get((float(strike), option_type))
+        if slot is None or not np.isfinite(self._premium[slot]):
+            return None
+        return float(self._premium[slot])
+
+    def quotes(self):
+        """Every quoted option with a solved IV, as MarketSnapshot chain rows (strike, option_type, premium, iv)."""
+        self.refresh()
+        return tuple({"strike": strike, "option_type": option_type, "premium": float(self._premium[slot]),
+                      "iv": float(self._iv[slot])}
+                     for (strike, option_type), slot in self._index.items()
+                     if np.isfinite(self._premium[slot]) and np.isfinite(self._iv[slot]))
+
+    @property
+    def premiums(self):
+        """(strike, option_type) -> premium of every quoted option."""
+        return {key: float(self._premium[slot]) for key, slot in self._index.items()
+                if np.isfinite(self._premium[slot])}
+
+    @property
+    def strikes(self):
+        """Condor strikes at the current spot."""
+        self.refresh()
+        return self._strikes
+
+    @property
+    def average_iv(self):
+        """Average IV (percent) of the options within ``iv_window`` of spot; 0 if none."""
+        self.refresh()
+        return self._iv_sum / self._iv_count if self._iv_count else 0
+
+    @property
+    def net_credit(self):
+        """Net credit per lot (INR) of the condor at the current spot."""
+        self.refresh()
+        return self._credit
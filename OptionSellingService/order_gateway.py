@@ -0,0 +1,188 @@
+# order_gateway.py
+"""Order placement that slices quantities above the exchange freeze limit.
+
+NSE rejects any single F&O order above the freeze quantity, so a position
+sized off real margin can't be placed as one order. OrderGateway splits an
+oversized order into lot-aligned slices: a LIMIT order goes out as one Kite
+iceberg order when iceberg orders are enabled and the slices fit in its 10
+legs; otherwise the slices are submitted as parallel child orders, each
+taking a token from the shared rate limiter. Child orders are grouped in the
+OrderTracker under a parent id whose state aggregates their fills, and
+modifications and cancellations of the parent fan out to the open children.
+"""
+
+import itertools
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from kiteconnect.exceptions import KiteException
+
+from config import FREEZE_QUANTITY, LOT_SIZE, ICEBERG_ORDERS, SLICE_WORKERS
+
+MAX_ICEBERG_LEGS = 10  # Kite allows 2 to 10 legs per iceberg order
+
+
+def split_quantity(quantity, freeze_quantity=FREEZE_QUANTITY, lot_size=LOT_SIZE):
+    """Split ``quantity`` into as few near-equal, lot-aligned slices as the freeze limit allows.
+
+    Example: 4500 with a freeze limit of 1800 and lots of 75 gives [1500, 1500, 1500].
+    """
+    max_slice = max(freeze_quantity // lot_size, 1) * lot_size
+    if quantity <= max_slice:
+        return [quantity]
+    count = math.ceil(quantity / max_slice)
+    lots, odd = divmod(quantity, lot_size)
+    base, extra = divmod(lots, count)
+    slices = [(base + 1) * lot_size] * extra + [base * lot_size] * (count - extra)
+    slices[-1] += odd  # A quantity that isn't a lot multiple is rejected by the exchange either way
+    return slices
+
+
+class OrderGateway:
+    """Place, modify and cancel orders of any size as single logical orders.
+
+    Args:
+        kite: KiteConnect-compatible client.
+        tracker (OrderTracker): Receives the client's order updates; holds the parent/child groups.
+        limiter (RateLimiter): Optional order rate limiter; every API request takes a token.
+        freeze_quantity (int): Largest quantity the exchange accepts in one order.
+        lot_size (int): Slices are whole lots.
+        iceberg (bool): Use Kite's iceberg variety for oversized LIMIT orders.
+        workers (int): Threads submitting child slices in parallel.
+    """
+
+    def __init__(self, kite, tracker, limiter=None, freeze_quantity=FREEZE_QUANTITY, lot_size=LOT_SIZE,
+                 iceberg=ICEBERG_ORDERS, workers=SLICE_WORKERS):
+        self.kite = kite
+        self.tracker = tracker
+        self.limiter = limiter
+        self.freeze_quantity = freeze_quantity
+        self.lot_size = lot_size
+        self.iceberg = iceberg
+        self.varieties = {}  # Order id -> variety, for ids that weren't placed as "regular"
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="order-slice")
+        self._rejected_ids = itertools.count(1)
+
+    def _throttle(self):
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+    def _submit(self, params):
+        self._throttle()
+        order_id = self.kite.place_order(**params)
+        self.tracker.track(order_id, params.get("tag"))
+        if params["variety"] != "regular":
+            self.varieties[str(order_id)] = params["variety"]
+        return order_id
+
+    def _submit_or_error(self, params):
+        try:
+            return self._submit(params)
+        except KiteException as e:
+            return e
+
+    def _fan_out(self, function, items):
+        """Run ``function`` over ``items`` on the slice pool (inline for a single item)."""
+        if len(items) == 1:
+            return [function(items[0])]
+        return list(self._pool.map(function, items))
+
+    def split(self, quantity):
+        return split_quantity(quantity, self.freeze_quantity, self.lot_size)
+
+    def place_order(self, exchange, tradingsymbol, transaction_type, quantity, product, order_type,
+                    variety="regular", price=None, tag=None, **params):
+        """Place an order of any quantity; returns one order id for the whole quantity.
+
+        For an order sliced into child orders, the id is the parent's id in the
+        tracker. Slices the API refused are recorded as rejected children, so
+        the parent never reports COMPLETE for less than the full quantity.
+
+        Raises:
+            KiteException: If the order (or every one of its slices) was refused.
+        """
+        base = dict(variety=variety, exchange=exchange, tradingsymbol=tradingsymbol,
+                    transaction_type=transaction_type, product=product, order_type=order_type,
+                    price=price, tag=tag, **params)
+        slices = self.split(quantity)
+        if len(slices) == 1:
+            return self._submit(dict(base, quantity=quantity))
+        if self.iceberg and variety == "regular" and order_type == "LIMIT" and len(slices) <= MAX_ICEBERG_LEGS:
+            return self._submit(dict(base, variety="iceberg", quantity=quantity, iceberg_legs=len(slices),
+                                     iceberg_quantity=max(slices)))
+        placed = self._fan_out(self._submit_or_error, [dict(base, quantity=size) for size in slices])
+        errors = [result for result in placed if isinstance(result, Exception)]
+        if len(errors) == len(placed):
+            raise errors[0]
+        child_ids = []
+        for size, result in zip(slices, placed):
+            if isinstance(result, Exception):
+                error, result = result, f"X{next(self._rejected_ids)}"
+                self.tracker.update({"order_id": result, "status": "REJECTED", "status_message": str(error),
+                                     "tradingsymbol": tradingsymbol, "transaction_type": transaction_type,
+                                     "quantity": size, "filled_quantity": 0, "tag": tag})
+            child_ids.append(result)
+        return self.tracker.track_parent(child_ids, tag).order_id
+
+    def _place_or_error(self, order):
+        try:
+            return self.place_order(**order)
+        except KiteException as e:
+            return e
+
+    def place_basket(self, orders):
+        """Place several orders at once; returns their ids in order, or the KiteException of a refused one.
+
+        Each order is a dict of place_order arguments. Orders that fit in one
+        slice are submitted in parallel on the slice pool (each still taking a
+        rate-limiter token); oversized ones follow, each fanning out its own
+        slices.
+        """
+        whole = [i for i, order in enumerate(orders) if len(self.split(order["quantity"])) == 1]
+        results = dict(zip(whole, self._fan_out(self._place_or_error, [orders[i] for i in whole]) if whole else []))
+        for i, order in enumerate(orders):
+            if i not in results:
+                results[i] = self._place_or_error(order)
+        return [results[i] for i in range(len(orders))]
+
+    def children(self, order_id):
+        """Child order ids of a sliced order, or [order_id] for an order placed whole."""
+        return self.tracker.children.get(str(order_id), [str(order_id)])
+
+    def _open_children(self, order_id):
+        return [child_id for child_id in self.children(order_id)
+                if not getattr(self.tracker.get(child_id), "is_terminal", False)]
+
+    def modify_order(self, order_id, **changes):
+        """Modify an order (every still-open slice of a sliced one); returns False if any request failed."""
+        def modify(child_id):
+            self._throttle()
+            try:
+                self.kite.modify_order(variety=self.varieties.get(child_id, "regular"), order_id=child_id,
+                                       **changes)
+                return True
+            except KiteException:
+                return False  # Usually filled or cancelled in the meantime
+        return all(self._fan_out(modify, self._open_children(order_id)) or [True])
+
+    def cancel_order(self, order_id):
+        """Cancel an order (every still-open slice of a sliced one); returns False if any request failed."""
+        def cancel(child_id):
+            self._throttle()
+            try:
+                self.kite.cancel_order(variety=self.varieties.get(child_id, "regular"), order_id=child_id)
+                return True
+            except KiteException:
+                return False
+        return all(self._fan_out(cancel, self._open_children(order_id)) or [True])
+
+    def refresh(self, order_id):
+        """Read the order's state from the API, for when no websocket update has arrived; returns the state."""
+        for child_id in self.children(order_id):
+            state = self.tracker.get(child_id)
+            if state is not None and state.updates:
+                continue
+            history = self.kite.order_history(child_id)
+            if history:
+                self.tracker.update(history[-1])
+        return self.tracker.get(order_id)
@@ -0,0 +1,322 @@
+# order_tracker.py
+"""Push-based order state tracking from KiteTicker order updates or postbacks.
+
+Kite pushes every order state change over the ticker websocket (and to a
+postback URL if one is configured). OrderTracker folds those updates into an
+in-memory state per order, indexed by order id and tag, so callers can wait
+for a fill or query many orders at once without polling ``kite.orders()``.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+# Kite order statuses after which an order never changes again
+TERMINAL_STATUSES = {"COMPLETE", "REJECTED", "CANCELLED"}
+
+
+class OrderNotFilled(Exception):
+    """Raised by the wait helpers when an order ends rejected or cancelled, or the wait times out."""
+
+    def __init__(self, order_id, state=None, message=None):
+        self.order_id = order_id
+        self.state = state
+        status = state.status if state else "UNKNOWN"
+        super().__init__(message or f"Order {order_id} ended {status}: {state.status_message if state else ''}")
+
+
+class OrderState:
+    """Latest known state of one order."""
+
+    __slots__ = ("order_id", "tag", "status", "status_message", "tradingsymbol", "transaction_type",
+                 "quantity", "filled_quantity", "pending_quantity", "average_price", "updated_at", "updates")
+
+    def __init__(self, order_id, tag=None):
+        self.order_id = order_id
+        self.tag = tag
+        self.status = None
+        self.status_message = None
+        self.tradingsymbol = None
+        self.transaction_type = None
+        self.quantity = 0
+        self.filled_quantity = 0
+        self.pending_quantity = 0
+        self.average_price = 0.0
+        self.updated_at = None  # time.monotonic() of the last applied update
+        self.updates = 0
+
+    @property
+    def is_terminal(self):
+        return self.status in TERMINAL_STATUSES
+
+    @property
+    def is_filled(self):
+        return self.status == "COMPLETE"
+
+    def apply(self, order):
+        """Apply a Kite order dict; returns False for stale or out-of-order updates."""
+        status = order.get("status")
+        filled = order.get("filled_quantity") or 0
+        if self.is_terminal or filled < self.filled_quantity:
+            return False  # The websocket may deliver an older state after a newer one
+        self.status = status
+        self.status_message = order.get("status_message")
+        self.tradingsymbol = order.get("tradingsymbol", self.tradingsymbol)
+        self.transaction_type = order.get("transaction_type", self.transaction_type)
+        self.quantity = order.get("quantity") or self.quantity
+        self.filled_quantity = filled
+        self.pending_quantity = order.get("pending_quantity") or 0
+        self.average_price = order.get("average_price") or self.average_price
+        self.tag = order.get("tag") or self.tag
+        self.updated_at = time.monotonic()
+        self.updates += 1
+        return True
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class OrderTracker:
+    """Order-state machine fed by ``on_order_update`` / ``on_postback``.
+
+    Updates may arrive on the ticker's thread before ``place_order`` even
+    returns the order id, so every update is recorded whether or not the
+    order was registered with ``track``. Waiters are woken as soon as the
+    order reaches a terminal status: asyncio callers through their event
+    loop, synchronous callers through a threading.Event.
+    """
+
+    def __init__(self):
+        self.orders = {}  # Order id -> OrderState
+        self.tags = defaultdict(set)  # Tag -> order ids
+        self.children = {}  # Parent order id -> child order ids (orders sliced under the freeze limit)
+        self.parent_of = {}  # Child order id -> parent order id
+        self._lock = threading.Lock()
+        self._events = {}  # Order id -> threading.Event set on a terminal status
+        self._futures = defaultdict(list)  # Order id -> [(loop, future)]
+        self._listeners = []
+
+    # -------------- Feeding updates -------------- #
+    def attach(self, ticker):
+        """Receive a KiteTicker's (or PaperTicker's) order updates, keeping any existing handler."""
+        previous = ticker.on_order_update
+
+        def on_order_update(ws, order):
+            self.update(order)
+            if previous:
+                previous(ws, order)
+
+        ticker.on_order_update = on_order_update
+        return self
+
+    def on_order_update(self, ws, order):
+        """KiteTicker.on_order_update-compatible callback."""
+        self.update(order)
+
+    def on_postback(self, payload, api_secret=None):
+        """Apply a postback payload; with ``api_secret`` its checksum is verified first."""
+        if api_secret is not None:
+            expected = hashlib.sha256(
+                f"{payload['order_id']}{payload['order_timestamp']}{api_secret}".encode()).hexdigest()
+            if payload.get("checksum") != expected:
+                raise ValueError(f"Postback checksum mismatch for order {payload.get('order_id')}")
+        return self.update(payload)
+
+    def update(self, order):
+        """Fold one Kite order dict into the tracked state; returns the OrderState."""
+        order_id = str(order["order_id"])
+        with self._lock:
+            state = self.orders.get(order_id)
+            if state is None:
+                state = self.orders[order_id] = OrderState(order_id)
+            if not state.apply(order):
+                return state
+            if state.tag:
+                self.tags[state.tag].add(order_id)
+            changed = [state]
+            parent_id = self.parent_of.get(order_id)
+            if parent_id is not None:
+                changed.append(self._aggregate(parent_id))
+            wake = [(changed_state, self._events.pop(changed_state.order_id, None),
+                     self._futures.pop(changed_state.order_id, []))
+                    for changed_state in changed if changed_state.is_terminal]
+            listeners = list(self._listeners)
+        for terminal_state, event, futures in wake:
+            if event is not None:
+                event.set()
+            for loop, future in futures:
+                loop.call_soon_threadsafe(_resolve, future, terminal_state)
+        for listener in listeners:
+            for changed_state in changed:
+                listener(changed_state)
+        return state
+
+    def track_parent(self, child_ids, tag=None):
+        """Group child slices into one logical order; returns the parent's OrderState.
+
+        The parent's filled quantity and average price aggregate its children.
+        It is OPEN while any child is, then COMPLETE if everything filled,
+        REJECTED if every child was rejected, and CANCELLED otherwise (with any
+        partial fill in filled_quantity). Every query and wait helper accepts
+        the parent's order id.
+        """
+        child_ids = [str(child_id) for child_id in child_ids]
+        parent_id = f"P{child_ids[0]}"
+        with self._lock:
+            self.children[parent_id] = child_ids
+            for child_id in child_ids:
+                self.parent_of[child_id] = parent_id
+                self.orders.setdefault(child_id, OrderState(child_id, tag))
+            state = self.orders[parent_id] = OrderState(parent_id, tag)
+            if tag:
+                self.tags[tag].add(parent_id)
+            self._aggregate(parent_id)
+        return state
+
+    def _aggregate(self, parent_id):
+        """Recompute a parent's state from its children (lock held)."""
+        parent = self.orders[parent_id]
+        children = [self.orders[child_id] for child_id in self.children[parent_id]]
+        parent.tradingsymbol = next((child.tradingsymbol for child in children if child.tradingsymbol), None)
+        parent.transaction_type = next((child.transaction_type for child in children if child.transaction_type),
+                                       None)
+        parent.quantity = sum(child.quantity for child in children)
+        parent.filled_quantity = sum(child.filled_quantity for child in children)
+        parent.pending_quantity = sum(child.pending_quantity for child in children)
+        value = sum(child.average_price * child.filled_quantity for child in children)
+        parent.average_price = round(value / parent.filled_quantity, 2) if parent.filled_quantity else 0.0
+        if any(child.status is None or not child.is_terminal for child in children):
+            parent.status = "OPEN" if any(child.status for child in children) else None
+        elif all(child.is_filled for child in children):
+            parent.status = "COMPLETE"
+        elif all(child.status == "REJECTED" for child in children):
+            parent.status = "REJECTED"
+        else:
+            parent.status = "CANCELLED"
+        parent.status_message = next((child.status_message for child in children
+                                      if child.status_message and not child.is_filled), None)
+        parent.updated_at = time.monotonic()
+        parent.updates += 1
+        return parent
+
+    def reconcile(self, kite):
+        """Catch up from one ``kite.orders()`` call, e.g. after the websocket reconnects."""
+        for order in kite.orders():
+            self.update(order)
+
+    def add_listener(self, callback):
+        """Call ``callback(state)`` after every applied update (on the updating thread)."""
+        self._listeners.append(callback)
+
+    # -------------- Queries -------------- #
+    def track(self, order_id, tag=None):
+        """Register a placed order (and its tag) before or after its first update arrives."""
+        order_id = str(order_id)
+        with self._lock:
+            state = self.orders.get(order_id)
+            if state is None:
+                state = self.orders[order_id] = OrderState(order_id, tag)
+            elif tag and not state.tag:
+                state.tag = tag
+            if state.tag:
+                self.tags[state.tag].add(order_id)
+            return state
+
+    def get(self, order_id):
+        return self.orders.get(str(order_id))
+
+    def by_tag(self, tag):
+        """States of all orders placed with ``tag``."""
+        with self._lock:
+            return [self.orders[order_id] for order_id in self.tags.get(tag, ())]
+
+    def statuses(self, order_ids=None):
+        """Order id -> status for the given orders (all tracked orders by default)."""
+        with self._lock:
+            if order_ids is None:
+                return {order_id: state.status for order_id, state in self.orders.items()}
+            return {str(order_id): getattr(self.orders.get(str(order_id)), "status", None)
+                    for order_id in order_ids}
+
+    def open_orders(self):
+        with self._lock:
+            return [state for state in self.orders.values() if not state.is_terminal]
+
+    # -------------- Waiting -------------- #
+    def wait_terminal_sync(self, order_id, timeout=None):
+        """Block until the order is COMPLETE, REJECTED or CANCELLED; returns its state (or None on timeout)."""
+        order_id = str(order_id)
+        with self._lock:
+            state = self.orders.get(order_id)
+            if state is not None and state.is_terminal:
+                return state
+            event = self._events.setdefault(order_id, threading.Event())
+        if not event.wait(timeout):
+            return None
+        return self.orders[order_id]
+
+    def wait_all_filled_sync(self, order_ids, timeout=None, kite=None):
+        """Block until every order has filled.
+
+        Args:
+            order_ids (list): Orders to wait for.
+            timeout (float): Overall limit in seconds.
+            kite: If given, one ``kite.orders()`` reconciliation is done before giving up on a timeout.
+
+        Returns:
+            list: The filled OrderStates, in ``order_ids`` order.
+
+        Raises:
+            OrderNotFilled: For the first order that was rejected, cancelled or not done in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        states = []
+        for order_id in order_ids:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            state = self.wait_terminal_sync(order_id, remaining)
+            if state is None and kite is not None:
+                self.reconcile(kite)
+                kite = None
+                state = self.get(order_id)
+                state = state if state is not None and state.is_terminal else None
+            if state is None:
+                raise OrderNotFilled(order_id, self.get(order_id), f"Order {order_id} not done within {timeout}s")
+            if not state.is_filled:
+                raise OrderNotFilled(order_id, state)
+            states.append(state)
+        return states
+
+    async def wait_terminal(self, order_id, timeout=None):
+        """Await the order's terminal state (None on timeout)."""
+        order_id = str(order_id)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self.orders.get(order_id)
+            if state is not None and state.is_terminal:
+                return state
+            future = loop.create_future()
+            self._futures[order_id].append((loop, future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def wait_filled(self, order_id, timeout=None):
+        """Await a fill; returns the OrderState or raises OrderNotFilled."""
+        state = await self.wait_terminal(order_id, timeout)
+        if state is None:
+            raise OrderNotFilled(order_id, self.get(order_id), f"Order {order_id} not done within {timeout}s")
+        if not state.is_filled:
+            raise OrderNotFilled(order_id, state)
+        return state
+
+    async def wait_all_filled(self, order_ids, timeout=None):
+        """Await fills of several orders concurrently; raises OrderNotFilled for the first failure."""
+        return await asyncio.gather(*(self.wait_filled(order_id, timeout) for order_id in order_ids))
+
+
+def _resolve(future, state):
+    if not future.done():
+        future.set_result(state)
@@ -0,0 +1,867 @@
+# paper_exchange.py
+"""In-process paper-trading exchange that stands in for KiteConnect and KiteTicker.
+
+PaperExchange holds the instruments, a price-time priority order book per
+instrument, orders, positions and margins. PaperKite exposes the subset of
+the KiteConnect API this project uses on top of it, and PaperTicker the
+subset of KiteTicker. Prices come from published or replayed ticks; options
+without ticks of their own are quoted at Black-Scholes value off the latest
+underlying tick.
+"""
+
+import datetime
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from kiteconnect import KiteConnect
+from kiteconnect.exceptions import InputException
+
+from config import CAPITAL, LOT_SIZE, EXPIRY_WEEKDAY, PAPER_SPOT, PAPER_VOL, FREEZE_QUANTITY
+from instruments import INDICES
+from pricing import bs_price_scalar
+from vol_surface import year_fraction
+
+TICK_SIZE = 0.05
+OPTION_SYMBOL = re.compile(r"^(NIFTY|BANKNIFTY)(.*?)(\d{4,5})(CE|PE)$")
+MONTH_CODES = "123456789OND"
+
+
+def round_to_tick(price):
+    """Round a price to the exchange tick size."""
+    return round(round(price / TICK_SIZE) * TICK_SIZE, 2)
+
+
+def next_expiry(today=None, weekday=EXPIRY_WEEKDAY):
+    """Nearest weekly expiry on or after today."""
+    today = today or datetime.date.today()
+    return today + datetime.timedelta(days=(weekday - today.weekday()) % 7)
+
+
+def option_instruments(spot, expiries, name="NIFTY", strike_range=1000, step=50, lot_size=LOT_SIZE,
+                       first_token=10_000_000):
+    """Build Kite-style NFO option instrument records around a spot price.
+
+    Trading symbols follow the weekly format, e.g. NIFTY2510923500CE.
+    """
+    tokens = itertools.count(first_token)
+    atm = round(spot / step) * step
+    instruments = []
+    for expiry in expiries:
+        prefix = f"{name}{expiry:%y}{MONTH_CODES[expiry.month - 1]}{expiry:%d}"
+        for strike in range(int(atm - strike_range), int(atm + strike_range) + step, step):
+            for option_type in ("CE", "PE"):
+                token = next(tokens)
+                instruments.append({
+                    "instrument_token": token, "exchange_token": str(token // 256),
+                    "tradingsymbol": f"{prefix}{strike}{option_type}", "name": name, "last_price": 0.0,
+                    "expiry": expiry, "strike": float(strike), "tick_size": TICK_SIZE, "lot_size": lot_size,
+                    "instrument_type": option_type, "segment": "NFO-OPT", "exchange": "NFO",
+                })
+    return instruments
+
+
+def index_instruments():
+    """Kite-style NSE index instrument records for the supported underlyings."""
+    return [{
+        "instrument_token": token, "exchange_token": str(token // 256), "tradingsymbol": symbol, "name": name,
+        "last_price": 0.0, "expiry": "", "strike": 0.0, "tick_size": 0.0, "lot_size": 0,
+        "instrument_type": "EQ", "segment": "INDICES", "exchange": "NSE",
+    } for name, (symbol, token) in INDICES.items()]
+
+
+def is_tick_recording(path):
+    """True for a tick_store recording: a daily .ticks file or a directory of them."""
+    return path.endswith(".ticks") or os.path.isdir(path)
+
+
+def load_ticks(path):
+    """Load recorded ticks from a tick_store recording or a JSON-lines file (one Kite tick dict per line)."""
+    if is_tick_recording(path):
+        from tick_store import iter_ticks  # tick_store imports this module
+        yield from iter_ticks(path)
+        return
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                tick = json.loads(line)
+                if isinstance(tick.get("exchange_timestamp"), str):
+                    tick["exchange_timestamp"] = datetime.datetime.fromisoformat(tick["exchange_timestamp"])
+                yield tick
+
+
+class _Order:
+    __slots__ = ("order_id", "instrument", "transaction_type", "quantity", "filled_quantity", "price",
+                 "trigger_price", "order_type", "product", "variety", "validity", "tag", "status",
+                 "status_message", "fill_value", "order_timestamp", "exchange_timestamp", "sequence", "book_key")
+
+    @property
+    def pending_quantity(self):
+        return self.quantity - self.filled_quantity
+
+    @property
+    def average_price(self):
+        return round(self.fill_value / self.filled_quantity, 2) if self.filled_quantity else 0.0
+
+    def as_dict(self):
+        instrument = self.instrument
+        return {
+            "order_id": self.order_id, "exchange_order_id": self.order_id, "parent_order_id": None,
+            "status": self.status, "status_message": self.status_message,
+            "order_timestamp": self.order_timestamp, "exchange_timestamp": self.exchange_timestamp,
+            "variety": self.variety, "exchange": instrument["exchange"],
+            "tradingsymbol": instrument["tradingsymbol"], "instrument_token": instrument["instrument_token"],
+            "order_type": self.order_type, "transaction_type": self.transaction_type,
+            "validity": self.validity, "product": self.product, "quantity": self.quantity,
+            "disclosed_quantity": 0, "price": self.price or 0.0, "trigger_price": self.trigger_price or 0.0,
+            "average_price": self.average_price, "filled_quantity": self.filled_quantity,
+            "pending_quantity": self.pending_quantity if self.status == "OPEN" else 0,
+            "cancelled_quantity": self.pending_quantity if self.status == "CANCELLED" else 0,
+            "tag": self.tag, "tags": [self.tag] if self.tag else [],
+        }
+
+
+class OrderBook:
+    """Price-time priority limit order book for one instrument.
+
+    Bids and asks are heaps keyed on (price, arrival sequence). Each order
+    carries the key of its live entry, so entries of cancelled, filled or
+    repriced orders are recognised as stale and dropped lazily when they
+    reach the top.
+    """
+
+    def __init__(self):
+        self.bids = []  # (-price, sequence, order)
+        self.asks = []  # (price, sequence, order)
+
+    def add(self, order):
+        if order.transaction_type == "BUY":
+            heap, order.book_key = self.bids, (-order.price, order.sequence)
+        else:
+            heap, order.book_key = self.asks, (order.price, order.sequence)
+        heapq.heappush(heap, (*order.book_key, order))
+
+    @staticmethod
+    def _live(entry):
+        order = entry[2]
+        return order.status == "OPEN" and order.pending_quantity > 0 and order.book_key == entry[:2]
+
+    @classmethod
+    def _top(cls, heap):
+        while heap and not cls._live(heap[0]):
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def best_bid(self):
+        return self._top(self.bids)
+
+    def best_ask(self):
+        return self._top(self.asks)
+
+    def levels(self, side, depth=5):
+        """Aggregate the top price levels of one side as Kite depth entries."""
+        heap = self.bids if side == "BUY" else self.asks
+        levels = {}
+        for entry in heapq.nsmallest(len(heap), heap):
+            order = entry[2]
+            if self._live(entry):
+                level = levels.setdefault(order.price, {"price": order.price, "quantity": 0, "orders": 0})
+                level["quantity"] += order.pending_quantity
+                level["orders"] += 1
+                if len(levels) > depth:
+                    del levels[order.price]
+                    break
+        return list(levels.values())
+
+    def __bool__(self):
+        return bool(self.bids or self.asks)
+
+
+class PaperExchange:
+    """Matching engine, account state and market data for paper trading.
+
+    Args:
+        instruments: Kite-style instrument records to list; defaults to the NSE indices.
+        latency: Seconds (or a (min, max) range) each API call sleeps, to mimic round trips.
+        reject_rate: Probability that an otherwise valid order is rejected by simulated RMS.
+        vol: Volatility used to quote options that have no ticks of their own.
+        cash: Opening cash balance for margins().
+        margin_rate: Fraction of short-option notional blocked as margin.
+        freeze_quantity: Orders above this quantity are rejected, as on the exchange.
+        touch_quantity: Quantity quoted at the synthetic best bid/offer around the last price. Fills
+            against the external touch (synthetic or from tick depth) never exceed its quantity
+            until the touch moves.
+        seed: Seed for latency and rejection randomness.
+    """
+
+    def __init__(self, instruments=None, latency=0.0, reject_rate=0.0, vol=PAPER_VOL, cash=CAPITAL,
+                 margin_rate=0.12, freeze_quantity=FREEZE_QUANTITY, touch_quantity=FREEZE_QUANTITY, seed=None):
+        self.latency = latency
+        self.reject_rate = reject_rate
+        self.vol = vol
+        self.cash = cash
+        self.margin_rate = margin_rate
+        self.freeze_quantity = freeze_quantity
+        self.touch_quantity = touch_quantity
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.instruments = []
+        self._by_key = {}
+        self._by_token = {}
+        self._books = {}
+        self._ticks = {}
+        self._taken = {}  # Token -> {"BUY": quantity, "SELL": quantity} taken from the external touch since it moved
+        self.orders = {}
+        self._positions = {}
+        self._order_ids = itertools.count(1)
+        self._sequence = itertools.count()
+        self._order_listeners = []
+        self._tick_listeners = []
+        self.now = None
+        for instrument in instruments if instruments is not None else index_instruments():
+            self.list_instrument(instrument)
+
+    # -------------- Reference data -------------- #
+    def list_instrument(self, instrument):
+        """Add an instrument record; it becomes quotable and tradable."""
+        self.instruments.append(instrument)
+        self._by_key[f"{instrument['exchange']}:{instrument['tradingsymbol']}"] = instrument
+        self._by_token[instrument["instrument_token"]] = instrument
+
+    def resolve(self, exchange, tradingsymbol):
+        """Find an instrument by exchange and symbol.
+
+        Unknown NFO symbols that still parse as NIFTY/BANKNIFTY options (the
+        project's simplified symbol builders produce those) are listed on the
+        fly against the nearest weekly expiry.
+        """
+        if ":" in tradingsymbol:
+            exchange, tradingsymbol = tradingsymbol.split(":", 1)
+        instrument = self._by_key.get(f"{exchange}:{tradingsymbol}")
+        if instrument is None and exchange == "NFO":
+            match = OPTION_SYMBOL.match(tradingsymbol)
+            if match:
+                name, _, strike, option_type = match.groups()
+                token = 20_000_000 + len(self.instruments)
+                instrument = {
+                    "instrument_token": token, "exchange_token": str(token // 256), "tradingsymbol": tradingsymbol,
+                    "name": name, "last_price": 0.0, "expiry": next_expiry(self._today()), "strike": float(strike),
+                    "tick_size": TICK_SIZE, "lot_size": LOT_SIZE, "instrument_type": option_type,
+                    "segment": "NFO-OPT", "exchange": "NFO",
+                }
+                self.list_instrument(instrument)
+        if instrument is None:
+            raise InputException(f"Invalid `tradingsymbol`: {exchange}:{tradingsymbol}")
+        return instrument
+
+    def _today(self):
+        return (self.now or datetime.datetime.now()).date()
+
+    # -------------- Market data -------------- #
+    def price(self, instrument):
+        """Last traded price, or the Black-Scholes value off the underlying for unticked options."""
+        tick = self._ticks.get(instrument["instrument_token"])
+        if tick is not None:
+            return tick["last_price"]
+        if instrument["segment"] == "NFO-OPT" and instrument["name"] in INDICES:
+            underlying = self._ticks.get(INDICES[instrument["name"]][1])
+            if underlying is not None:
+                t = year_fraction(instrument["expiry"], self.now or datetime.datetime.now())
+                value = bs_price_scalar(underlying["last_price"], instrument["strike"], t, self.vol,
+                                        instrument["instrument_type"])
+                return max(round_to_tick(value), TICK_SIZE)
+        return None
+
+    def last_tick(self, token):
+        """Most recent tick published for an instrument token, if any."""
+        return self._ticks.get(token)
+
+    def touch(self, instrument):
+        """External best bid and offer: tick depth when available, else last price +/- one tick."""
+        tick = self._ticks.get(instrument["instrument_token"])
+        depth = tick.get("depth") if tick else None
+        if depth and depth.get("buy") and depth.get("sell"):
+            return depth["buy"][0]["price"], depth["sell"][0]["price"]
+        last = self.price(instrument)
+        if last is None:
+            return None, None
+        return max(round_to_tick(last - TICK_SIZE), 0.0), round_to_tick(last + TICK_SIZE)
+
+    def touch_available(self, instrument, side):
+        """Quantity left at the external touch: ``side`` "BUY" for the bid, "SELL" for the offer."""
+        tick = self._ticks.get(instrument["instrument_token"])
+        depth = tick.get("depth") if tick else None
+        if depth and depth.get("buy") and depth.get("sell"):
+            size = depth["buy" if side == "BUY" else "sell"][0]["quantity"]
+        else:
+            size = self.touch_quantity
+        return max(size - self._taken.get(instrument["instrument_token"], {}).get(side, 0), 0)
+
+    def _take_touch(self, order, price):
+        """Fill as much of ``order`` as the opposite external touch has left; returns the quantity filled."""
+        side = "SELL" if order.transaction_type == "BUY" else "BUY"
+        quantity = min(order.pending_quantity, self.touch_available(order.instrument, side))
+        if quantity:
+            taken = self._taken.setdefault(order.instrument["instrument_token"], {"BUY": 0, "SELL": 0})
+            taken[side] += quantity
+            self._fill(order, quantity, price)
+        return quantity
+
+    def publish_ticks(self, ticks):
+        """Apply ticks to market state, fill resting orders they cross and notify tick listeners."""
+        with self.lock:
+            for tick in ticks:
+                token = tick["instrument_token"]
+                self._ticks[token] = tick
+                self._taken.pop(token, None)
+                self.now = tick.get("exchange_timestamp") or self.now
+                instrument = self._by_token.get(token)
+                if instrument is None:
+                    continue
+                if instrument["segment"] == "INDICES":
+                    # Unticked options are priced off the underlying: their touch moved and their books may now cross.
+                    for taken_token in [t for t in self._taken if t not in self._ticks]:
+                        del self._taken[taken_token]
+                    for book_token, book in list(self._books.items()):
+                        if book and book_token not in self._ticks:
+                            self._sweep(self._by_token[book_token])
+                else:
+                    self._sweep(instrument)
+        for listener in list(self._tick_listeners):
+            listener(ticks)
+
+    def publish_price(self, token, price, **fields):
+        """Convenience wrapper to publish a single last-price tick."""
+        self.publish_ticks([dict(instrument_token=token, last_price=price, **fields)])
+
+    def replay(self, ticks, speed=None):
+        """Publish recorded ticks in order.
+
+        Args:
+            ticks: Iterable of Kite tick dicts (e.g. from load_ticks).
+            speed: None to replay as fast as possible, otherwise a multiple of real time
+                based on the ticks' exchange_timestamp.
+        """
+        previous = None
+        for tick in ticks:
+            stamp = tick.get("exchange_timestamp")
+            if speed and previous is not None and stamp is not None:
+                gap = (stamp - previous).total_seconds() / speed
+                if gap > 0:
+                    time.sleep(gap)
+            previous = stamp or previous
+            self.publish_ticks([tick])
+
+    def replay_in_background(self, ticks, speed=None):
+        """Replay ticks on a daemon thread and return the thread."""
+        thread = threading.Thread(target=self.replay, args=(ticks, speed), daemon=True)
+        thread.start()
+        return thread
+
+    def depth(self, instrument, levels=5):
+        """Five-level Kite depth: resting paper orders merged with the external touch."""
+        book = self._books.get(instrument["instrument_token"])
+        bid, ask = self.touch(instrument)
+        buy = book.levels("BUY", levels) if book else []
+        sell = book.levels("SELL", levels) if book else []
+        if bid is not None:
+            buy.append({"price": bid, "quantity": self.touch_available(instrument, "BUY"), "orders": 1})
+            sell.append({"price": ask, "quantity": self.touch_available(instrument, "SELL"), "orders": 1})
+        buy = sorted(buy, key=lambda level: -level["price"])[:levels]
+        sell = sorted(sell, key=lambda level: level["price"])[:levels]
+        return {"buy": buy, "sell": sell}
+
+    # -------------- Orders -------------- #
+    def add_order_listener(self, listener):
+        """Register ``listener(order_dict)``, called on every order state change."""
+        self._order_listeners.append(listener)
+
+    def remove_order_listener(self, listener):
+        if listener in self._order_listeners:
+            self._order_listeners.remove(listener)
+
+    def add_tick_listener(self, listener):
+        """Register ``listener(ticks)``, called for every published batch of ticks."""
+        self._tick_listeners.append(listener)
+
+    def remove_tick_listener(self, listener):
+        if listener in self._tick_listeners:
+            self._tick_listeners.remove(listener)
+
+    def simulate_latency(self):
+        delay = self.latency
+        if isinstance(delay, tuple):
+            delay = self.random.uniform(*delay)
+        if delay:
+            time.sleep(delay)
+
+    def _notify(self, order):
+        if self._order_listeners:
+            update = order.as_dict()
+            for listener in list(self._order_listeners):
+                listener(update)
+
+    def submit(self, variety, exchange, tradingsymbol, transaction_type, quantity, product, order_type,
+               price=None, trigger_price=None, validity=None, tag=None, iceberg_legs=None, iceberg_quantity=None):
+        """Validate, accept and match a new order; returns its order id.
+
+        An iceberg order (variety "iceberg") is matched as one order; only its
+        leg size has to be within the freeze limit.
+        """
+        instrument = self.resolve(exchange, tradingsymbol)
+        if transaction_type not in ("BUY", "SELL"):
+            raise InputException(f"Invalid `transaction_type`: {transaction_type}")
+        if order_type not in ("MARKET", "LIMIT"):
+            raise InputException(f"Unsupported `order_type` in paper trading: {order_type}")
+        if not quantity or int(quantity) <= 0:
+            raise InputException("Invalid `quantity`.")
+        if order_type == "LIMIT" and not price:
+            raise InputException("Invalid `price` for a LIMIT order.")
+        if variety == "iceberg":
+            if not iceberg_legs or not 2 <= int(iceberg_legs) <= 10:
+                raise InputException("Iceberg legs should be between 2 and 10.")
+            if not iceberg_quantity or int(iceberg_quantity) * int(iceberg_legs) < int(quantity):
+                raise InputException("Invalid `iceberg_quantity`.")
+        slice_quantity = int(iceberg_quantity) if variety == "iceberg" else int(quantity)
+        lot_size = instrument["lot_size"] or 1
+        now = self.now or datetime.datetime.now()
+        with self.lock:
+            order = _Order()
+            order.order_id = str(next(self._order_ids))
+            order.instrument = instrument
+            order.transaction_type = transaction_type
+            order.quantity = int(quantity)
+            order.filled_quantity = 0
+            order.fill_value = 0.0
+            order.price = round_to_tick(float(price)) if order_type == "LIMIT" else None
+            order.trigger_price = trigger_price
+            order.order_type = order_type
+            order.product = product
+            order.variety = variety
+            order.validity = validity or "DAY"
+            order.tag = tag
+            order.order_timestamp = order.exchange_timestamp = now
+            order.sequence = next(self._sequence)
+            order.book_key = None
+            order.status = "OPEN"
+            order.status_message = None
+            self.orders[order.order_id] = order
+
+            if order.quantity % lot_size:
+                self._reject(order, f"Quantity should be a multiple of lot size {lot_size}.")
+            elif self.freeze_quantity and slice_quantity > self.freeze_quantity:
+                self._reject(order, f"Quantity exceeds the freeze limit of {self.freeze_quantity}.")
+            elif self.reject_rate and self.random.random() < self.reject_rate:
+                self._reject(order, "Simulated RMS rejection.")
+            else:
+                self._notify(order)
+                self._match(order)
+            return order.order_id
+
+    def _reject(self, order, message):
+        order.status = "REJECTED"
+        order.status_message = message
+        self._notify(order)
+
+    def _fill(self, order, quantity, price):
+        order.filled_quantity += quantity
+        order.fill_value += quantity * price
+        order.exchange_timestamp = self.now or datetime.datetime.now()
+        if order.pending_quantity == 0:
+            order.status = "COMPLETE"
+        instrument = order.instrument
+        key = (instrument["exchange"], instrument["tradingsymbol"], order.product)
+        position = self._positions.get(key)
+        if position is None:
+            position = self._positions[key] = {"instrument": instrument, "product": order.product,
+                                               "buy_quantity": 0, "buy_value": 0.0,
+                                               "sell_quantity": 0, "sell_value": 0.0}
+        side = "buy" if order.transaction_type == "BUY" else "sell"
+        position[f"{side}_quantity"] += quantity
+        position[f"{side}_value"] += quantity * price
+        self._notify(order)
+
+    def _match(self, order):
+        """Match against resting orders by price-time priority, then against the external touch."""
+        instrument = order.instrument
+        book = self._books.setdefault(instrument["instrument_token"], OrderBook())
+        buying = order.transaction_type == "BUY"
+        while order.pending_quantity > 0:
+            resting = book.best_ask() if buying else book.best_bid()
+            if resting is None or resting is order:
+                break
+            if order.order_type == "LIMIT" and (order.price < resting.price if buying else order.price > resting.price):
+                break
+            quantity = min(order.pending_quantity, resting.pending_quantity)
+            self._fill(resting, quantity, resting.price)
+            self._fill(order, quantity, resting.price)
+
+        if order.pending_quantity > 0:
+            bid, ask = self.touch(instrument)
+            external = ask if buying else bid
+            crosses = external is not None and external > 0 and (
+                order.order_type == "MARKET" or (order.price >= external if buying else order.price <= external))
+            if crosses:
+                self._take_touch(order, external)
+        if order.pending_quantity > 0:
+            if order.order_type == "MARKET":
+                if order.filled_quantity:
+                    order.status = "CANCELLED"
+                    order.status_message = "Unfilled market quantity cancelled: no liquidity."
+                    self._notify(order)
+                else:
+                    self._reject(order, "No liquidity for market order.")
+            else:
+                book.add(order)
+
+    def _sweep(self, instrument):
+        """Fill resting orders that the latest external touch now crosses, best price first."""
+        book = self._books.get(instrument["instrument_token"])
+        if not book:
+            return
+        bid, ask = self.touch(instrument)
+        while ask is not None and (order := book.best_bid()) is not None and order.price >= ask:
+            if not self._take_touch(order, order.price):
+                break
+        while bid is not None and bid > 0 and (order := book.best_ask()) is not None and order.price <= bid:
+            if not self._take_touch(order, order.price):
+                break
+
+    def modify(self, order_id, quantity=None, price=None, order_type=None, trigger_price=None):
+        """Modify an open order. A price change loses time priority and may match immediately."""
+        with self.lock:
+            order = self.orders.get(str(order_id))
+            if order is None or order.status != "OPEN":
+                raise InputException(f"Order {order_id} cannot be modified.")
+            if quantity is not None:
+                if int(quantity) < order.filled_quantity:
+                    raise InputException("Modified quantity is less than the filled quantity.")
+                order.quantity = int(quantity)
+            if trigger_price is not None:
+                order.trigger_price = trigger_price
+            repriced = False
+            if order_type is not None and order_type != order.order_type:
+                order.order_type = order_type
+                repriced = True
+            if price is not None and order.order_type == "LIMIT" and round_to_tick(float(price)) != order.price:
+                order.price = round_to_tick(float(price))
+                repriced = True
+            if order.order_type == "MARKET":
+                order.price = None
+            if order.pending_quantity == 0:
+                order.status = "COMPLETE"
+                self._notify(order)
+            elif repriced:
+                order.sequence = next(self._sequence)  # Its old book entry is now stale
+                order.book_key = None
+                self._notify(order)
+                self._match(order)
+            else:
+                self._notify(order)
+            return order.order_id
+
+    def cancel(self, order_id):
+        """Cancel an open order's pending quantity."""
+        with self.lock:
+            order = self.orders.get(str(order_id))
+            if order is None or order.status != "OPEN":
+                raise InputException(f"Order {order_id} cannot be cancelled.")
+            order.status = "CANCELLED"
+            self._notify(order)
+            return order.order_id
+
+    # -------------- Account -------------- #
+    def positions(self):
+        """Kite-style positions with mark-to-market P&L at the current price."""
+        with self.lock:
+            rows = []
+            for (exchange, tradingsymbol, product), position in self._positions.items():
+                instrument = position["instrument"]
+                quantity = position["buy_quantity"] - position["sell_quantity"]
+                last = self.price(instrument) or 0.0
+                pnl = position["sell_value"] - position["buy_value"] + quantity * last
+                buy_price = position["buy_value"] / position["buy_quantity"] if position["buy_quantity"] else 0.0
+                sell_price = position["sell_value"] / position["sell_quantity"] if position["sell_quantity"] else 0.0
+                rows.append({
+                    "tradingsymbol": tradingsymbol, "exchange": exchange,
+                    "instrument_token": instrument["instrument_token"], "product": product,
+                    "quantity": quantity, "overnight_quantity": 0, "multiplier": 1,
+                    "average_price": (position["buy_value"] - position["sell_value"]) / quantity if quantity else 0.0,
+                    "close_price": 0.0, "last_price": last, "value": position["sell_value"] - position["buy_value"],
+                    "pnl": pnl, "m2m": pnl, "unrealised": pnl, "realised": 0.0,
+                    "buy_quantity": position["buy_quantity"], "buy_price": buy_price,
+                    "buy_value": position["buy_value"], "buy_m2m": position["buy_value"],
+                    "sell_quantity": position["sell_quantity"], "sell_price": sell_price,
+                    "sell_value": position["sell_value"], "sell_m2m": position["sell_value"],
+                    # Paper positions all open today
+                    "day_buy_quantity": position["buy_quantity"], "day_buy_price": buy_price,
+                    "day_buy_value": position["buy_value"],
+                    "day_sell_quantity": position["sell_quantity"], "day_sell_price": sell_price,
+                    "day_sell_value": position["sell_value"],
+                })
+            return {"net": rows, "day": [dict(row) for row in rows]}
+
+    def order_margin(self, instrument, transaction_type, quantity, price=None):
+        """Margin blocked by one order: premium for buys, a share of notional for short options."""
+        price = price or self.price(instrument) or 0.0
+        if transaction_type == "BUY":
+            return price * quantity
+        if instrument["segment"] == "NFO-OPT":
+            return instrument["strike"] * quantity * self.margin_rate
+        return price * quantity
+
+    def used_margin(self):
+        """Margin currently blocked by open positions."""
+        used = 0.0
+        for row in self.positions()["net"]:
+            if row["quantity"]:
+                instrument = self._by_token[row["instrument_token"]]
+                side = "BUY" if row["quantity"] > 0 else "SELL"
+                used += self.order_margin(instrument, side, abs(row["quantity"]))
+        return used
+
+
+class PaperKite:
+    """Drop-in stand-in for KiteConnect backed by a PaperExchange."""
+
+    def __init__(self, exchange=None, api_key="paper", access_token=None):
+        self.exchange = exchange or PaperExchange()
+        self.api_key = api_key
+        self.access_token = access_token
+
+    def login_url(self):
+        return "https://kite.zerodha.com/connect/login?v=3&api_key=paper"
+
+    def generate_session(self, request_token, api_secret=None):
+        self.exchange.simulate_latency()
+        return {"access_token": "paper-access-token", "user_id": "PAPER", "user_name": "Paper Trader"}
+
+    def set_access_token(self, access_token):
+        self.access_token = access_token
+
+    def profile(self):
+        return {"user_id": "PAPER", "user_name": "Paper Trader", "broker": "PAPER"}
+
+    def instruments(self, exchange=None):
+        self.exchange.simulate_latency()
+        return [dict(inst) for inst in self.exchange.instruments if exchange is None or inst["exchange"] == exchange]
+
+    def _keys(self, instruments):
+        return [instruments] if isinstance(instruments, str) else list(instruments)
+
+    def ltp(self, *instruments):
+        self.exchange.simulate_latency()
+        keys = self._keys(instruments[0]) if len(instruments) == 1 else list(instruments)
+        result = {}
+        with self.exchange.lock:
+            for key in keys:
+                instrument = self.exchange.resolve(*key.split(":", 1))
+                price = self.exchange.price(instrument)
+                if price is not None:
+                    result[key] = {"instrument_token": instrument["instrument_token"], "last_price": price}
+        return result
+
+    def quote(self, *instruments):
+        self.exchange.simulate_latency()
+        keys = self._keys(instruments[0]) if len(instruments) == 1 else list(instruments)
+        result = {}
+        with self.exchange.lock:
+            for key in keys:
+                instrument = self.exchange.resolve(*key.split(":", 1))
+                price = self.exchange.price(instrument)
+                if price is None:
+                    continue
+                tick = self.exchange.last_tick(instrument["instrument_token"]) or {}
+                result[key] = {
+                    "instrument_token": instrument["instrument_token"],
+                    "timestamp": tick.get("exchange_timestamp") or self.exchange.now,
+                    "last_price": price, "volume": tick.get("volume_traded", 0), "oi": tick.get("oi", 0),
+                    "ohlc": tick.get("ohlc", {"open": price, "high": price, "low": price, "close": price}),
+                    "depth": self.exchange.depth(instrument),
+                }
+        return result
+
+    def place_order(self, variety, exchange, tradingsymbol, transaction_type, quantity, product, order_type,
+                    price=None, validity=None, validity_ttl=None, disclosed_quantity=None, trigger_price=None,
+                    iceberg_legs=None, iceberg_quantity=None, auction_number=None, algo_id=None, tag=None,
+                    market_protection=None):
+        self.exchange.simulate_latency()
+        return self.exchange.submit(variety, exchange, tradingsymbol, transaction_type, quantity, product,
+                                    order_type, price=price, trigger_price=trigger_price, validity=validity,
+                                    tag=tag, iceberg_legs=iceberg_legs, iceberg_quantity=iceberg_quantity)
+
+    def modify_order(self, variety, order_id, parent_order_id=None, quantity=None, price=None, order_type=None,
+                     trigger_price=None, validity=None, disclosed_quantity=None, market_protection=None):
+        self.exchange.simulate_latency()
+        return self.exchange.modify(order_id, quantity=quantity, price=price, order_type=order_type,
+                                    trigger_price=trigger_price)
+
+    def cancel_order(self, variety, order_id, parent_order_id=None):
+        self.exchange.simulate_latency()
+        return self.exchange.cancel(order_id)
+
+    def orders(self):
+        self.exchange.simulate_latency()
+        with self.exchange.lock:
+            return [order.as_dict() for order in self.exchange.orders.values()]
+
+    def order_history(self, order_id):
+        self.exchange.simulate_latency()
+        with self.exchange.lock:
+            return [self.exchange.orders[str(order_id)].as_dict()]
+
+    def positions(self):
+        self.exchange.simulate_latency()
+        return self.exchange.positions()
+
+    def holdings(self):
+        return []
+
+    def margins(self, segment=None):
+        self.exchange.simulate_latency()
+        with self.exchange.lock:
+            used = self.exchange.used_margin()
+        equity = {
+            "enabled": True, "net": self.exchange.cash - used,
+            "available": {"cash": self.exchange.cash, "opening_balance": self.exchange.cash,
+                          "live_balance": self.exchange.cash - used, "collateral": 0, "intraday_payin": 0},
+            "utilised": {"debits": used, "span": used, "exposure": 0, "option_premium": 0},
+        }
+        return equity if segment == "equity" else {"equity": equity, "commodity": {"enabled": False, "net": 0}}
+
+    def order_margins(self, params):
+        self.exchange.simulate_latency()
+        margins = []
+        with self.exchange.lock:
+            for order in params:
+                instrument = self.exchange.resolve(order["exchange"], order["tradingsymbol"])
+                total = self.exchange.order_margin(instrument, order["transaction_type"], order["quantity"],
+                                                   order.get("price"))
+                margins.append({"tradingsymbol": instrument["tradingsymbol"], "exchange": instrument["exchange"],
+                                "type": "equity", "total": total, "span": total, "exposure": 0})
+        return margins
+
+    def basket_order_margins(self, params, consider_positions=True, mode=None):
+        orders = self.order_margins(params)
+        total = sum(order["total"] for order in orders)
+        return {"initial": {"total": total}, "final": {"total": total}, "orders": orders}
+
+
+for _name in dir(KiteConnect):
+    if _name.isupper():
+        setattr(PaperKite, _name, getattr(KiteConnect, _name))
+
+
+class PaperTicker:
+    """Drop-in stand-in for KiteTicker fed by a PaperExchange's published ticks and order updates."""
+
+    MODE_LTP = "ltp"
+    MODE_QUOTE = "quote"
+    MODE_FULL = "full"
+
+    def __init__(self, exchange, api_key="paper", access_token=None):
+        self.exchange = exchange
+        self.on_ticks = None
+        self.on_connect = None
+        self.on_close = None
+        self.on_error = None
+        self.on_message = None
+        self.on_reconnect = None
+        self.on_noreconnect = None
+        self.on_order_update = None
+        self.subscribed_tokens = {}
+        self._connected = False
+        self._closed = threading.Event()
+
+    def connect(self, threaded=False, disable_ssl_verification=False, proxy=None):
+        self._connected = True
+        self._closed.clear()
+        self.exchange.add_tick_listener(self._dispatch)
+        self.exchange.add_order_listener(self._order_update)
+        if self.on_connect:
+            self.on_connect(self, {})
+        if not threaded:
+            self._closed.wait()
+
+    def is_connected(self):
+        return self._connected
+
+    def subscribe(self, instrument_tokens):
+        for token in instrument_tokens:
+            self.subscribed_tokens.setdefault(token, self.MODE_QUOTE)
+        return True
+
+    def unsubscribe(self, instrument_tokens):
+        for token in instrument_tokens:
+            self.subscribed_tokens.pop(token, None)
+        return True
+
+    def set_mode(self, mode, instrument_tokens):
+        for token in instrument_tokens:
+            self.subscribed_tokens[token] = mode
+        return True
+
+    def close(self, code=None, reason=None):
+        self._connected = False
+        self.exchange.remove_tick_listener(self._dispatch)
+        self.exchange.remove_order_listener(self._order_update)
+        self._closed.set()
+        if self.on_close:
+            self.on_close(self, code, reason)
+
+    stop = close
+
+    def _dispatch(self, ticks):
+        if not self.on_ticks:
+            return
+        out = []
+        for tick in ticks:
+            mode = self.subscribed_tokens.get(tick["instrument_token"])
+            if mode is None:
+                continue
+            payload = {"tradable": True, "mode": mode, "instrument_token": tick["instrument_token"],
+                       "last_price": tick["last_price"]}
+            if mode != self.MODE_LTP:
+                payload.update({key: value for key, value in tick.items() if key not in payload})
+            out.append(payload)
+        if out:
+            self.on_ticks(self, out)
+
+    def _order_update(self, order):
+        if self.on_order_update:
+            self.on_order_update(self, order)
+
+
+def paper_session(spot=PAPER_SPOT, ticks_file=None, speed=None, expiries=2, **exchange_options):
+    """Build a ready-to-use paper account: NIFTY weekly options around ``spot``.
+
+    Args:
+        spot: Opening NIFTY price published as the first index tick.
+        ticks_file: Optional tick recording (JSON lines, or a tick_store file or directory whose
+            recorded instruments replace the generated chain) replayed on a background thread.
+        speed: Replay speed (None = as fast as possible, 1.0 = real time).
+        expiries: Number of weekly expiries to list.
+        **exchange_options: Passed through to PaperExchange (latency, reject_rate, ...).
+
+    Returns:
+        tuple: (PaperKite, PaperTicker, PaperExchange)
+    """
+    first = next_expiry()
+    weeks = [first + datetime.timedelta(days=7 * week) for week in range(expiries)]
+    instruments = index_instruments() + option_instruments(spot, weeks)
+    if ticks_file and is_tick_recording(ticks_file):
+        from tick_store import read_instruments
+        recorded = [record for record in read_instruments(ticks_file).values()
+                    if record.get("instrument_type") in ("CE", "PE")]
+        if recorded:
+            instruments = index_instruments() + recorded
+    exchange = PaperExchange(instruments, **exchange_options)
+    exchange.publish_price(INDICES["NIFTY"][1], spot)
+    if ticks_file:
+        exchange.replay_in_background(load_ticks(ticks_file), speed)
+    return PaperKite(exchange), PaperTicker(exchange), exchange
@@ -0,0 +1,139 @@
+# pricing.py
+"""Vectorized Black-Scholes pricing, Greeks and implied volatility for index options."""
+
+import math
+
+import numpy as np
+from config import RISK_FREE_RATE
+
+SQRT_2PI = np.sqrt(2 * np.pi)
+
+
+def norm_cdf(x):
+    """Standard normal CDF (Abramowitz-Stegun 7.1.26, |error| < 1.5e-7), vectorized."""
+    x = np.asarray(x, dtype=float)
+    z = np.abs(x) / np.sqrt(2)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-z * z)
+    return 0.5 * (1.0 + np.sign(x) * erf)
+
+
+def norm_pdf(x):
+    """Standard normal density, vectorized."""
+    x = np.asarray(x, dtype=float)
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+
+def is_call(option_type):
+    """Return a boolean array that is True where option_type is 'CE'."""
+    return np.asarray(option_type) == "CE"
+
+
+def _d1_d2(spot, strike, t, vol, rate):
+    sqrt_t = np.sqrt(t)
+    vol_sqrt_t = vol * sqrt_t
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * t) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def bs_price(spot, strike, t, vol, option_type, rate=RISK_FREE_RATE):
+    """Black-Scholes premium for European options.
+
+    All arguments broadcast against each other, so a column of spots against a
+    row of strikes prices the whole strikes x timestamps grid in one call.
+
+    Args:
+        spot: Underlying price(s).
+        strike: Strike price(s).
+        t: Time to expiry in years; non-positive values price at intrinsic.
+        vol: Annualized volatility as a decimal (0.15 for 15%).
+        option_type: 'CE'/'PE' or an array of them.
+        rate: Continuously compounded risk-free rate.
+
+    Returns:
+        numpy.ndarray: Premiums.
+    """
+    spot, strike, t, vol = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (spot, strike, t, vol)))
+    call = np.broadcast_to(is_call(option_type), spot.shape)
+    intrinsic = np.where(call, np.maximum(spot - strike, 0.0), np.maximum(strike - spot, 0.0))
+    live = (t > 0) & (vol > 0)
+    t_safe = np.where(live, t, 1.0)
+    vol_safe = np.where(live, vol, 1.0)
+    d1, d2 = _d1_d2(spot, strike, t_safe, vol_safe, rate)
+    discount = np.exp(-rate * t_safe)
+    call_price = spot * norm_cdf(d1) - strike * discount * norm_cdf(d2)
+    put_price = strike * discount * norm_cdf(-d2) - spot * norm_cdf(-d1)
+    return np.where(live, np.where(call, call_price, put_price), intrinsic)
+
+
+def bs_greeks(spot, strike, t, vol, option_type, rate=RISK_FREE_RATE):
+    """Black-Scholes Greeks per unit of underlying.
+
+    Returns:
+        dict: 'delta', 'gamma', 'vega' (per 1 vol point) and 'theta' (per calendar day) arrays.
+    """
+    spot, strike, t, vol = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (spot, strike, t, vol)))
+    call = np.broadcast_to(is_call(option_type), spot.shape)
+    live = (t > 0) & (vol > 0)
+    t_safe = np.where(live, t, 1.0)
+    vol_safe = np.where(live, vol, 1.0)
+    d1, d2 = _d1_d2(spot, strike, t_safe, vol_safe, rate)
+    pdf_d1 = norm_pdf(d1)
+    sqrt_t = np.sqrt(t_safe)
+    discount = np.exp(-rate * t_safe)
+
+    expired_delta = np.where(call, (spot > strike).astype(float), -(spot < strike).astype(float))
+    delta = np.where(live, np.where(call, norm_cdf(d1), norm_cdf(d1) - 1.0), expired_delta)
+    gamma = np.where(live, pdf_d1 / (spot * vol_safe * sqrt_t), 0.0)
+    vega = np.where(live, spot * pdf_d1 * sqrt_t / 100.0, 0.0)
+    decay = -spot * pdf_d1 * vol_safe / (2 * sqrt_t)
+    call_theta = decay - rate * strike * discount * norm_cdf(d2)
+    put_theta = decay + rate * strike * discount * norm_cdf(-d2)
+    theta = np.where(live, np.where(call, call_theta, put_theta) / 365.0, 0.0)
+    return {"delta": delta, "gamma": gamma, "vega": vega, "theta": theta}
+
+
+def bs_price_scalar(spot, strike, t, vol, option_type, rate=RISK_FREE_RATE):
+    """Scalar Black-Scholes premium using math only, for per-tick queries where numpy overhead dominates."""
+    if t <= 0 or vol <= 0:
+        return max(spot - strike, 0.0) if option_type == "CE" else max(strike - spot, 0.0)
+    vol_sqrt_t = vol * math.sqrt(t)
+    d1 = (math.log(spot / strike) + (rate + 0.5 * vol * vol) * t) / vol_sqrt_t
+    d2 = d1 - vol_sqrt_t
+    discount = math.exp(-rate * t)
+    if option_type == "CE":
+        return spot * 0.5 * math.erfc(-d1 / math.sqrt(2)) - strike * discount * 0.5 * math.erfc(-d2 / math.sqrt(2))
+    return strike * discount * 0.5 * math.erfc(d2 / math.sqrt(2)) - spot * 0.5 * math.erfc(d1 / math.sqrt(2))
+
+
+def implied_vol(price, spot, strike, t, option_type, rate=RISK_FREE_RATE, tol=1e-6, max_iter=50):
+    """Solve for implied volatility with safeguarded Newton steps, vectorized.
+
+    Prices outside the no-arbitrage bounds return NaN.
+
+    Returns:
+        numpy.ndarray: Implied volatilities as decimals.
+    """
+    price, spot, strike, t = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (price, spot, strike, t)))
+    call = np.broadcast_to(is_call(option_type), price.shape)
+    discount = np.exp(-rate * np.maximum(t, 0.0))
+    lower = np.where(call, np.maximum(spot - strike * discount, 0.0), np.maximum(strike * discount - spot, 0.0))
+    upper = np.where(call, spot, strike * discount)
+    valid = (t > 0) & (price > lower) & (price < upper)
+
+    low = np.full(price.shape, 1e-4)
+    high = np.full(price.shape, 5.0)
+    vol = np.full(price.shape, 0.2)
+    for _ in range(max_iter):
+        model = bs_price(spot, strike, t, vol, np.where(call, "CE", "PE"), rate)
+        diff = model - price
+        if np.all(np.abs(diff[valid]) < tol):
+            break
+        high = np.where(diff > 0, vol, high)
+        low = np.where(diff <= 0, vol, low)
+        vega = bs_greeks(spot, strike, t, vol, np.where(call, "CE", "PE"), rate)["vega"] * 100.0
+        step = np.divide(diff, vega, out=np.zeros_like(diff), where=vega > 1e-8)
+        newton = vol - step
+        vol = np.where((newton > low) & (newton < high) & (vega > 1e-8), newton, 0.5 * (low + high))
+    return np.where(valid, vol, np.nan)
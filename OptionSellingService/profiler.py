@@ -0,0 +1,211 @@
+# profiler.py
+"""Opt-in sampling profiler for the live loops and the backtesters.
+
+A daemon thread snapshots every thread's stack with sys._current_frames() at
+a fixed interval. Samples are written as folded stacks (one
+``frame;frame;frame count`` line per unique stack), ready for flamegraph.pl or
+speedscope, and samples taken inside a ``profile_cycle(name)`` block are also
+summed into per-function cumulative and self times for that cycle. Nothing is
+traced, so the cost is bounded by the sample rate and the stack depth, and the
+default 20 ms interval is cheap enough to leave on during market hours.
+
+Enable with ADKITE_PROFILE=1 (or a --profile flag where the entry point has
+one). ADKITE_PROFILE_INTERVAL sets the interval in milliseconds and
+ADKITE_PROFILE_DIR the output directory (default "profiles").
+"""
+
+import atexit
+import collections
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+DEFAULT_INTERVAL = 0.02  # Seconds between samples
+FLUSH_INTERVAL = 60  # Seconds between writes while running
+
+_active = None
+
+
+class SamplingProfiler:
+    """Samples thread stacks on a background thread.
+
+    Args:
+        name (str): Prefix of the output files.
+        interval (float): Seconds between samples.
+        output_dir (str): Directory the folded stacks and cycle summary are written to.
+    """
+
+    def __init__(self, name, interval=DEFAULT_INTERVAL, output_dir="profiles"):
+        self.name = name
+        self.interval = interval
+        self.output_dir = output_dir
+        self.stacks = collections.Counter()  # Folded stack -> samples
+        self.cycle_functions = collections.defaultdict(collections.Counter)  # Cycle -> function -> samples
+        self.cycle_leaves = collections.defaultdict(collections.Counter)  # Cycle -> function -> self samples
+        self.cycle_wall = collections.defaultdict(lambda: [0, 0.0])  # Cycle -> [count, seconds]
+        self.samples = 0
+        self._current_cycle = {}  # Thread id -> cycle name
+        self._labels = {}  # Code object -> frame label
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.path_prefix = os.path.join(output_dir, f"{name}_{stamp}_{os.getpid()}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and write the output files."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.dump()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _run(self):
+        own_id = threading.get_ident()
+        next_flush = time.monotonic() + FLUSH_INTERVAL
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id != own_id:
+                        self._sample(thread_id, frame)
+                self.samples += 1
+            del frames
+            if time.monotonic() >= next_flush:
+                self.dump()
+                next_flush = time.monotonic() + FLUSH_INTERVAL
+
+    def _sample(self, thread_id, frame):
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        self.stacks[";".join(labels)] += 1
+        cycle = self._current_cycle.get(thread_id)
+        if cycle is not None:
+            self.cycle_functions[cycle].update(set(labels))  # Cumulative: once per sample, even if recursive
+            self.cycle_leaves[cycle][labels[-1]] += 1
+
+    def cycle(self, name):
+        """Context manager attributing the calling thread's samples to cycle ``name``."""
+        return _Cycle(self, name)
+
+    def cycle_report(self, top=20):
+        """Per-cycle wall time and the top functions by cumulative time, in seconds."""
+        with self._lock:
+            report = {}
+            for cycle, (count, wall) in self.cycle_wall.items():
+                functions = self.cycle_functions[cycle]
+                leaves = self.cycle_leaves[cycle]
+                report[cycle] = {
+                    "cycles": count,
+                    "wall_s": round(wall, 6),
+                    "functions": [{"function": function, "cumulative_s": round(samples * self.interval, 6),
+                                   "self_s": round(leaves[function] * self.interval, 6)}
+                                  for function, samples in functions.most_common(top)],
+                }
+            return report
+
+    def dump(self):
+        """Write ``<prefix>.folded`` and ``<prefix>.cycles.json``; returns the prefix."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            folded = "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+        with open(self.path_prefix + ".folded", "w") as f:
+            f.write(folded)
+        with open(self.path_prefix + ".cycles.json", "w") as f:
+            json.dump({"interval_s": self.interval, "samples": self.samples, "cycles": self.cycle_report()},
+                      f, indent=2)
+        return self.path_prefix
+
+
+class _Cycle:
+    __slots__ = ("profiler", "name", "thread_id", "start", "outer")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        self.outer = self.profiler._current_cycle.get(self.thread_id)
+        self.profiler._current_cycle[self.thread_id] = self.name
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.outer is None:
+            self.profiler._current_cycle.pop(self.thread_id, None)
+        else:
+            self.profiler._current_cycle[self.thread_id] = self.outer
+        with self.profiler._lock:
+            wall = self.profiler.cycle_wall[self.name]
+            wall[0] += 1
+            wall[1] += elapsed
+        return False
+
+
+class _NullCycle:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_CYCLE = _NullCycle()
+
+
+def start_profiler(name, enabled=None):
+    """Start the process-wide profiler if enabled (by argument or ADKITE_PROFILE).
+
+    Calling it again while a profiler is running returns the running one. The
+    output is written every minute and when the process exits.
+
+    Returns:
+        SamplingProfiler or None: The running profiler, or None when profiling is off.
+    """
+    global _active
+    if _active is not None:
+        return _active
+    if enabled is None:
+        enabled = os.environ.get("ADKITE_PROFILE", "") not in ("", "0")
+    if not enabled:
+        return None
+    interval = float(os.environ.get("ADKITE_PROFILE_INTERVAL", DEFAULT_INTERVAL * 1000)) / 1000
+    _active = SamplingProfiler(name, interval, os.environ.get("ADKITE_PROFILE_DIR", "profiles")).start()
+    atexit.register(stop_profiler)
+    print(f"Sampling profiler on every {interval * 1000:g} ms, writing {_active.path_prefix}.*")
+    return _active
+
+
+def stop_profiler():
+    """Stop the process-wide profiler, if running, and write its output."""
+    global _active
+    if _active is not None:
+        profiler, _active = _active, None
+        profiler.stop()
+
+
+def profile_cycle(name):
+    """Scope a strategy cycle for the running profiler; a no-op when profiling is off."""
+    if _active is None:
+        return _NULL_CYCLE
+    return _active.cycle(name)
@@ -0,0 +1,67 @@
+# rate_limiter.py
+"""Token-bucket rate limiter for Kite order requests."""
+
+import threading
+import time
+
+from metrics import RATE_LIMIT_QUEUE, RATE_LIMIT_WAIT
+
+
+class RateLimiter:
+    """Blocking token bucket shared by every thread that places orders.
+
+    Callers waiting for a token are counted in the order_rate_limiter_queue_depth
+    gauge, and the time they waited is recorded in order_rate_limiter_wait_seconds.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int): Bucket capacity; defaults to one second's worth of tokens.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, rate))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens without waiting; returns True if they were available."""
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available; returns the seconds spent waiting."""
+        start = time.perf_counter()
+        RATE_LIMIT_QUEUE.inc()
+        try:
+            while True:
+                with self.lock:
+                    self._refill()
+                    if self.tokens >= tokens:
+                        self.tokens -= tokens
+                        break
+                    wait = (tokens - self.tokens) / self.rate
+                time.sleep(wait)
+        finally:
+            RATE_LIMIT_QUEUE.dec()
+        waited = time.perf_counter() - start
+        RATE_LIMIT_WAIT.observe(waited)
+        return waited
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
@@ -0,0 +1,126 @@
+# result_cache.py
+"""Content-addressed on-disk cache of backtest results.
+
+Results are stored under a key hashed from everything that determines them:
+the input data, the strategy parameters and the source of the code that
+computes them. Changing any of these gives a new key, so stale entries are
+never read back; they simply age out. The cache is bounded by total size,
+evicting the least recently used entries first.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+from config import RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES
+
+MISS = object()  # Returned by ResultCache.get for absent keys (None is a valid cached result)
+
+
+def _feed(digest, part):
+    if isinstance(part, np.ndarray):
+        digest.update(f"ndarray{part.dtype.str}{part.shape}".encode())
+        digest.update(np.ascontiguousarray(part).tobytes() if part.dtype != object else repr(part.tolist()).encode())
+    elif isinstance(part, (bytes, bytearray, memoryview)):
+        digest.update(b"bytes")
+        digest.update(part)
+    elif isinstance(part, dict):
+        digest.update(b"dict")
+        for name in sorted(part, key=repr):
+            _feed(digest, name)
+            _feed(digest, part[name])
+    elif isinstance(part, (list, tuple)):
+        digest.update(f"{type(part).__name__}{len(part)}".encode())
+        for item in part:
+            _feed(digest, item)
+    else:
+        digest.update(repr(part).encode())
+    digest.update(b"\0")
+
+
+def fingerprint(*parts):
+    """Hex SHA-256 of arrays, bytes, containers and reprs, in order."""
+    digest = hashlib.sha256()
+    for part in parts:
+        _feed(digest, part)
+    return digest.hexdigest()
+
+
+def code_version(*modules):
+    """Fingerprint of the source files of the given modules (or paths)."""
+    sources = []
+    for module in modules:
+        path = module if isinstance(module, (str, os.PathLike)) else module.__file__
+        with open(path, "rb") as f:
+            sources.append(f.read())
+    return fingerprint(*sources)[:16]
+
+
+class ResultCache:
+    """Pickled results keyed by fingerprint, with size-bounded LRU eviction.
+
+    Reading an entry refreshes its modification time, which orders eviction.
+    Writes are atomic, so processes can share one directory.
+    """
+
+    def __init__(self, directory=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES):
+        """
+        Args:
+            directory (str): Cache directory; None disables the cache.
+            max_bytes (int): Total size kept before the oldest entries are evicted.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key, default=MISS):
+        """The cached result for ``key``, or ``default``."""
+        if self.directory is None:
+            self.misses += 1
+            return default
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """Store a result, then evict least recently used entries beyond max_bytes."""
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(".pkl"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Evicted by another process
+            total -= size
@@ -0,0 +1,254 @@
+# risk_rules.py
+"""Declarative exit rules compiled into a vectorized per-tick evaluator.
+
+Each strategy's rules (``RISK_RULES`` in config) are compiled once into
+per-position parameter columns. Leg ticks update the positions' marked
+value incrementally, and ``evaluate`` then checks every rule for every open
+position in a handful of NumPy operations, so the per-tick cost barely
+grows with the number of positions.
+
+Rule types:
+    take_profit   {"pnl": 1500}              exit when P&L >= pnl
+    max_loss      {"pnl": -2000}             exit when P&L <= pnl
+    credit_stop   {"multiple": 3}            exit when the loss reaches multiple x the entry credit
+    trailing_stop {"trigger": 800, "trail": 200}
+                                             once P&L reaches trigger, exit when it falls below
+                                             max(trigger, peak P&L - trail)
+    exit_time     {"time": "15:20"}          exit at or after this time of day
+"""
+
+import datetime
+
+import numpy as np
+
+RULE_TYPES = ("take_profit", "max_loss", "credit_stop", "trailing_stop", "exit_time")
+_PARAMETERS = {"take_profit": ("pnl",), "max_loss": ("pnl",), "credit_stop": ("multiple",),
+               "trailing_stop": ("trigger", "trail"), "exit_time": ("time",)}
+_DEFAULTS = {"take_profit": np.inf, "max_loss": -np.inf, "credit_multiple": np.inf,
+             "trail_trigger": np.inf, "trail": 0.0, "exit_minute": np.inf}
+
+
+def _minute_of_day(moment):
+    """Minutes since midnight for a datetime, time or "HH:MM" string."""
+    if isinstance(moment, str):
+        moment = datetime.datetime.strptime(moment, "%H:%M").time()
+    return moment.hour * 60 + moment.minute + moment.second / 60
+
+
+def compile_rules(rules):
+    """Turn a list of rule dicts into the parameter values of one position.
+
+    Raises:
+        ValueError: For an unknown rule type or a missing parameter.
+    """
+    compiled = dict(_DEFAULTS)
+    for rule in rules:
+        kind = rule.get("type")
+        if kind not in _PARAMETERS:
+            raise ValueError(f"Unknown risk rule type: {kind}")
+        missing = [name for name in _PARAMETERS[kind] if name not in rule]
+        if missing:
+            raise ValueError(f"Risk rule {kind} is missing {', '.join(missing)}")
+        # Several rules of one type keep the tightest
+        if kind == "take_profit":
+            compiled["take_profit"] = min(compiled["take_profit"], rule["pnl"])
+        elif kind == "max_loss":
+            compiled["max_loss"] = max(compiled["max_loss"], rule["pnl"])
+        elif kind == "credit_stop":
+            compiled["credit_multiple"] = min(compiled["credit_multiple"], rule["multiple"])
+        elif kind == "trailing_stop":
+            compiled["trail_trigger"], compiled["trail"] = rule["trigger"], rule["trail"]
+        else:
+            compiled["exit_minute"] = min(compiled["exit_minute"], _minute_of_day(rule["time"]))
+    return compiled
+
+
+class RiskEngine:
+    """Evaluate compiled exit rules for every open position at once.
+
+    A position is either marked from its legs (``open`` with ``legs``, then
+    ``on_tick`` per leg price) or given its P&L directly (``set_pnl``, e.g.
+    from the broker's positions). A leg-marked position isn't evaluated until
+    every leg has a price.
+    """
+
+    def __init__(self, rules_by_strategy, capacity=64):
+        """
+        Args:
+            rules_by_strategy (dict): Strategy name -> list of rule dicts.
+            capacity (int): Initial number of position slots (grows as needed).
+        """
+        self.rules = {strategy: compile_rules(rules) for strategy, rules in rules_by_strategy.items()}
+        self._index = {}
+        self._ids = []
+        self._free = []
+        self._marks = {}  # Symbol -> last price
+        self._holders = {}  # Symbol -> {slot: signed quantity}
+        self._holder_arrays = {}  # Symbol -> (slots, quantities) cached for on_tick
+        self._legs = []  # Slot -> {symbol: signed quantity}
+        self._size = 0  # Slots in use are all below this
+        self._columns = {name: np.zeros(0) for name in
+                         ("cash", "value", "pnl", "external_pnl", "peak", "stop", "credit_floor", *_DEFAULTS)}
+        self._views = None  # Column slices up to _size, rebuilt when it or the allocation changes
+        self._live = np.zeros(0, dtype=bool)
+        self._external = np.zeros(0, dtype=bool)
+        self._armed = np.zeros(0, dtype=bool)
+        self._unpriced = np.zeros(0, dtype=int)
+        self._hits = np.zeros((len(RULE_TYPES), 0), dtype=bool)
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        size = len(self._live)
+        extra = capacity - size
+        for name, column in self._columns.items():
+            self._columns[name] = np.concatenate([column, np.zeros(extra)])
+        self._live = np.concatenate([self._live, np.zeros(extra, dtype=bool)])
+        self._external = np.concatenate([self._external, np.zeros(extra, dtype=bool)])
+        self._armed = np.concatenate([self._armed, np.zeros(extra, dtype=bool)])
+        self._unpriced = np.concatenate([self._unpriced, np.zeros(extra, dtype=int)])
+        self._hits = np.zeros((len(RULE_TYPES), capacity), dtype=bool)
+        self._ids.extend([None] * extra)
+        self._legs.extend([None] * extra)
+        self._free.extend(range(capacity - 1, size - 1, -1))
+        self._views = None
+
+    def _columns_in_use(self):
+        n = self._size
+        if self._views is None or self._views[0] != n:
+            views = {name: column[:n] for name, column in self._columns.items()}
+            views.update(live=self._live[:n], external=self._external[:n], armed=self._armed[:n],
+                         unpriced=self._unpriced[:n], hits=self._hits[:, :n])
+            self._views = (n, views)
+        return self._views[1]
+
+    def open(self, position_id, strategy, legs=None, credit=0.0):
+        """Start evaluating a position.
+
+        Args:
+            position_id: Any hashable id.
+            strategy (str): Key into the rule set.
+            legs (dict): Symbol -> signed quantity (negative for sold legs); omit to use ``set_pnl``.
+            credit (float): Net premium received at entry, in INR (negative for a debit).
+        """
+        if position_id in self._index:
+            self.close(position_id)
+        if not self._free:
+            self._allocate(2 * len(self._live))
+        slot = self._free.pop()
+        self._index[position_id] = slot
+        self._ids[slot] = position_id
+        self._size = max(self._size, slot + 1)
+        columns = self._columns
+        for name, value in self.rules[strategy].items():
+            columns[name][slot] = value
+        columns["cash"][slot] = credit
+        columns["credit_floor"][slot] = -columns["credit_multiple"][slot] * credit if credit > 0 else -np.inf
+        columns["peak"][slot] = -np.inf
+        columns["value"][slot] = 0.0
+        columns["external_pnl"][slot] = np.nan  # Not evaluated until set_pnl is called
+        self._armed[slot] = False
+        self._external[slot] = legs is None
+        self._unpriced[slot] = 0
+        self._legs[slot] = dict(legs or {})
+        for symbol, quantity in self._legs[slot].items():
+            self._holders.setdefault(symbol, {})[slot] = quantity
+            self._holder_arrays.pop(symbol, None)
+            if symbol in self._marks:
+                columns["value"][slot] += quantity * self._marks[symbol]
+            else:
+                self._unpriced[slot] += 1
+        self._live[slot] = True
+        return slot
+
+    def close(self, position_id):
+        """Stop evaluating a closed position."""
+        slot = self._index.pop(position_id, None)
+        if slot is None:
+            return
+        for symbol in self._legs[slot]:
+            self._holders[symbol].pop(slot, None)
+            self._holder_arrays.pop(symbol, None)
+        self._legs[slot] = None
+        self._ids[slot] = None
+        self._live[slot] = False
+        self._free.append(slot)
+
+    def on_tick(self, symbol, price):
+        """Mark a leg price; every position holding the leg is revalued."""
+        holders = self._holder_arrays.get(symbol)
+        if holders is None:
+            held = self._holders.get(symbol, {})
+            holders = self._holder_arrays[symbol] = (np.fromiter(held.keys(), dtype=int, count=len(held)),
+                                                     np.fromiter(held.values(), dtype=float, count=len(held)))
+        slots, quantities = holders
+        previous = self._marks.get(symbol)
+        self._marks[symbol] = price
+        if not len(slots):
+            return
+        if previous is None:
+            self._columns["value"][slots] += quantities * price
+            self._unpriced[slots] -= 1
+        else:
+            self._columns["value"][slots] += quantities * (price - previous)
+
+    def set_pnl(self, position_id, pnl):
+        """Give a position's P&L directly (for positions opened without legs)."""
+        self._columns["external_pnl"][self._index[position_id]] = pnl
+
+    def pnl(self, position_id):
+        """Latest evaluated P&L of a position."""
+        return float(self._columns["pnl"][self._index[position_id]])
+
+    def trailing_stop(self, position_id):
+        """The P&L level the trailing stop currently exits below, or None while it isn't armed."""
+        slot = self._index[position_id]
+        if not self._armed[slot]:
+            return None
+        return float(self._columns["stop"][slot])
+
+    def trail_state(self, position_id):
+        """(peak P&L, armed) of a position's trailing stop, for checkpointing."""
+        slot = self._index[position_id]
+        peak = float(self._columns["peak"][slot])
+        return (peak if np.isfinite(peak) else None), bool(self._armed[slot])
+
+    def restore_trail(self, position_id, peak, armed):
+        """Resume a trailing stop from a checkpointed ``trail_state``."""
+        slot = self._index[position_id]
+        self._columns["peak"][slot] = -np.inf if peak is None else peak
+        self._armed[slot] = armed
+
+    def evaluate(self, now=None):
+        """Check every rule for every open position.
+
+        Args:
+            now: Time of day for exit_time rules (a datetime or time); defaults to now.
+
+        Returns:
+            list: (position_id, rule type) for each position that must exit, by the first rule
+            in ``RULE_TYPES`` order that fired.
+        """
+        if not self._size:
+            return []
+        columns = self._columns_in_use()
+        pnl, peak, stop, hits = columns["pnl"], columns["peak"], columns["stop"], columns["hits"]
+        np.add(columns["cash"], columns["value"], out=pnl)
+        np.copyto(pnl, columns["external_pnl"], where=columns["external"])
+        live = columns["live"] & (columns["unpriced"] == 0)
+        np.fmax(peak, pnl, out=peak, where=live)
+        armed = columns["armed"]
+        armed |= live & (pnl >= columns["trail_trigger"])
+        np.subtract(peak, columns["trail"], out=stop)
+        np.maximum(stop, columns["trail_trigger"], out=stop)
+
+        np.greater_equal(pnl, columns["take_profit"], out=hits[0])
+        np.less_equal(pnl, columns["max_loss"], out=hits[1])
+        np.less_equal(pnl, columns["credit_floor"], out=hits[2])
+        np.less(pnl, stop, out=hits[3])
+        hits[3] &= armed
+        np.greater_equal(_minute_of_day(now or datetime.datetime.now()), columns["exit_minute"], out=hits[4])
+        fired = np.flatnonzero(hits.any(axis=0) & live)
+        if not len(fired):
+            return []
+        reasons = hits[:, fired].argmax(axis=0)
+        return [(self._ids[slot], RULE_TYPES[reason]) for slot, reason in zip(fired, reasons)]
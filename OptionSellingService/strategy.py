@@ -1,27 +1,161 @@
 # strategy.py
 """Core logic for the Iron Condor trading strategy."""
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+
+import numpy as np
 import requests
 
-from config import IV_MIN, IV_MAX, MIN_CREDIT, CAPITAL, INITIAL_ALLOCATION, STRIKE_DISTANCE, PROTECTION_DISTANCE, \
-    ALPHA_VANTAGE_API_KEY
-from api_helper import get_current_nifty_price, get_margin_required
+from config import IV_MIN, IV_MAX, MIN_CREDIT, STRIKE_DISTANCE, PROTECTION_DISTANCE, SOLD_STRIKE_DELTA, \
+    ALPHA_VANTAGE_API_KEY, LOT_SIZE, RISK_FREE_RATE, SNAPSHOT_STRIKE_WINDOW
+from api_helper import get_current_nifty_price, get_options_chain, get_option_premiums
+from allocator import CapitalAllocator
+from fees import charges
+from option_chain import OptionChain
+from pricing import implied_vol
+from vol_surface import VolSurface, year_fraction
+
+_calendar = {}  # (day, expiry) -> whether a major economic event falls before the expiry
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Spot, option chain and IVs captured once per decision cycle.
+
+    Every strategy check reads the same snapshot, so a decision never mixes
+    spot prices fetched at different moments and nothing is fetched twice.
+    Derived values (strikes, premiums by strike, average IV, net credit) are
+    computed on first use and then reused.
+
+    Attributes:
+        spot (float): NIFTY spot price.
+        chain (tuple): Option rows with at least strike, option_type, premium and iv (percent).
+        timestamp (datetime): When the snapshot was taken.
+        expiry (date): Expiry of the chain, if known.
+    """
+
+    spot: float
+    chain: tuple
+    timestamp: datetime
+    expiry: object = None
+
+    @classmethod
+    def capture(cls, options_chain=None, now=None):
+        """Fetch the spot and the premiums of strikes near it, and solve their IVs.
+
+        Args:
+            options_chain (list): NFO instruments of one expiry; fetched if not given.
+            now (datetime): Snapshot time; defaults to now.
+        """
+        now = now or datetime.now()
+        options_chain = options_chain if options_chain is not None else get_options_chain()
+        spot = get_current_nifty_price()
+        nearby = [opt for opt in options_chain if abs(opt["strike"] - spot) <= SNAPSHOT_STRIKE_WINDOW]
+        premiums = get_option_premiums([opt["tradingsymbol"] for opt in nearby]) if nearby else {}
+        quoted = [opt for opt in nearby if opt["tradingsymbol"] in premiums]
+        expiry = options_chain[0]["expiry"] if options_chain else None
+        chain = ()
+        if quoted:
+            prices = np.array([premiums[opt["tradingsymbol"]] for opt in quoted], dtype=float)
+            strikes = np.array([opt["strike"] for opt in quoted], dtype=float)
+            option_types = np.array([opt["instrument_type"] for opt in quoted])
+            t = max(year_fraction(expiry, now), 1e-6)
+            ivs = implied_vol(prices, spot, strikes, t, option_types, RISK_FREE_RATE) * 100
+            chain = tuple({"strike": opt["strike"], "option_type": opt["instrument_type"],
+                           "tradingsymbol": opt["tradingsymbol"], "expiry": opt["expiry"],
+                           "premium": float(price), "iv": float(iv)}
+                          for opt, price, iv in zip(quoted, prices, ivs) if np.isfinite(iv))
+        return cls(spot=float(spot), chain=chain, timestamp=now, expiry=expiry)
+
+    @classmethod
+    def from_chain(cls, option_chain):
+        """Freeze the current quotes of a live OptionChain, e.g. to trade the entry it just passed."""
+        return cls(spot=float(option_chain.spot), chain=option_chain.quotes(),
+                   timestamp=option_chain.timestamp or datetime.now(), expiry=option_chain.expiry)
+
+    @classmethod
+    def from_frame(cls, day_data):
+        """Build a snapshot from one timestamp of backtest options data (nearest expiry only)."""
+        expiry = day_data["expiry"].min()
+        rows = day_data[day_data["expiry"] == expiry]
+        return cls(spot=float(rows["spot_price"].iloc[0]), chain=tuple(rows.to_dict("records")),
+                   timestamp=rows["date"].iloc[0], expiry=expiry)
+
+    @cached_property
+    def surface(self):
+        """VolSurface fitted to the chain's IVs, or None without an expiry or any IV."""
+        if self.expiry is None:
+            return None
+        surface = VolSurface(self.spot, as_of=self.timestamp)
+        for opt in self.chain:
+            if opt.get("iv"):
+                surface.update_iv(self.expiry, opt["strike"], opt["iv"] / 100)
+        return surface if surface.smiles else None
+
+    @cached_property
+    def strikes(self):
+        if not SOLD_STRIKE_DELTA:
+            return select_strikes(self.spot)
+        return select_strikes(self.spot, self.surface, self.expiry, self.timestamp,
+                              [opt["strike"] for opt in self.chain])
+
+    @cached_property
+    def premiums(self):
+        """(strike, option_type) -> premium, for O(1) leg lookups."""
+        return {(opt["strike"], opt["option_type"]): opt["premium"] for opt in self.chain}
+
+    @cached_property
+    def average_iv(self):
+        return calculate_average_iv(self)
+
+    @cached_property
+    def net_credit(self):
+        return calculate_net_credit(self)
 
 
-def check_entry_conditions(options_chain, current_price, expiry_date):
+def check_entry_conditions(snapshot):
     """Verify if entry conditions are met."""
-    strikes = select_strikes(current_price)
-    avg_iv = calculate_average_iv(options_chain, strikes)
-    net_credit = calculate_net_credit(options_chain, strikes)
-    has_major_events = check_economic_calendar(expiry_date)
-    return (IV_MIN <= avg_iv <= IV_MAX and net_credit >= MIN_CREDIT and not has_major_events)
+    if not IV_MIN <= snapshot.average_iv <= IV_MAX or snapshot.net_credit < MIN_CREDIT:
+        return False  # Skip the calendar request when the market already rules the trade out
+    return not check_economic_calendar(str(snapshot.expiry))
 
 
-def calculate_lots():
-    """Calculate number of lots based on capital and margin."""
-    margin_per_lot = get_margin_required({"type": "Iron Condor"}, 1)
-    available_capital = CAPITAL * INITIAL_ALLOCATION
-    lots = int(available_capital // margin_per_lot)
-    return max(lots, 1)  # Ensure at least 1 lot
+def condor_legs(strikes, lots=1):
+    """Iron Condor legs as (strike, option_type, signed quantity)."""
+    quantity = lots * LOT_SIZE
+    return [(strikes["sold_call"], "CE", -quantity), (strikes["bought_call"], "CE", quantity),
+            (strikes["sold_put"], "PE", -quantity), (strikes["bought_put"], "PE", quantity)]
+
+
+def held_lots(legs):
+    """Signed lots held of each contract, e.g. after reconciling with the broker or adjusting.
+
+    Args:
+        legs (list): (strike, option_type, signed quantity) tuples; legs on the same contract are summed.
+
+    Returns:
+        dict: (strike, option_type) -> signed lots (negative when short), without flat contracts.
+    """
+    quantities = {}
+    for strike, option_type, quantity in legs:
+        quantities[(strike, option_type)] = quantities.get((strike, option_type), 0) + quantity
+    lots = {contract: int(quantity / LOT_SIZE) for contract, quantity in quantities.items()}
+    return {contract: held for contract, held in lots.items() if held}
+
+
+def calculate_lots(strikes, spot, expiry=None, allocator=None, purpose="entry"):
+    """Calculate number of lots of an Iron Condor that fit in the free margin.
+
+    Args:
+        strikes (dict): Strikes from select_strikes.
+        spot (float): NIFTY spot price the margin is scanned around.
+        expiry: Expiry of the legs; positions on the same expiry offset each other's margin.
+        allocator (CapitalAllocator): Margin already in use; an empty book if not given.
+        purpose (str): "entry" or "adjustment" (which may also use RESERVE_ALLOCATION).
+    """
+    allocator = allocator or CapitalAllocator()
+    return allocator.max_lots(condor_legs(strikes), "NIFTY", expiry, spot, purpose)
 
 
 def round_to_nearest_strike(price):
@@ -29,11 +163,23 @@ def round_to_nearest_strike(price):
     return round(price / 50) * 50  # Adjust based on your instrument's strike intervals
 
 
-def select_strikes(current_price):
-    """Select OTM strikes for the Iron Condor."""
+def select_strikes(current_price, surface=None, expiry=None, now=None, candidates=()):
+    """Select OTM strikes for the Iron Condor.
+
+    The sold strikes are STRIKE_DISTANCE from the price. With a fitted
+    VolSurface and SOLD_STRIKE_DELTA set, they move out to the candidate
+    strikes whose surface delta is nearest that target, if those are further.
+    """
     sold_call = round_to_nearest_strike(current_price + STRIKE_DISTANCE)
-    bought_call = round_to_nearest_strike(sold_call + PROTECTION_DISTANCE)
     sold_put = round_to_nearest_strike(current_price - STRIKE_DISTANCE)
+    if surface is not None and SOLD_STRIKE_DELTA:
+        calls = sorted({strike for strike in candidates if strike >= sold_call})
+        puts = sorted({strike for strike in candidates if strike <= sold_put})
+        if calls:
+            sold_call = surface.strike_for_delta(expiry, SOLD_STRIKE_DELTA, "CE", calls, current_price, now)
+        if puts:
+            sold_put = surface.strike_for_delta(expiry, -SOLD_STRIKE_DELTA, "PE", puts, current_price, now)
+    bought_call = round_to_nearest_strike(sold_call + PROTECTION_DISTANCE)
     bought_put = round_to_nearest_strike(sold_put - PROTECTION_DISTANCE)
     return {
         "sold_call": sold_call,
@@ -43,11 +189,13 @@ def select_strikes(current_price):
     }
 
 
-def calculate_average_iv(options_chain, current_price, strike_range=200):
-    """Calculate average IV for options within a strike range of the current price."""
+def calculate_average_iv(snapshot, strike_range=200):
+    """Calculate average IV for options within a strike range of the snapshot's spot price."""
+    if isinstance(snapshot, OptionChain) and strike_range == snapshot.iv_window:
+        return snapshot.average_iv  # Maintained incrementally
     relevant_options = [
-        opt for opt in options_chain
-        if abs(opt["strike"] - current_price) <= strike_range
+        opt for opt in snapshot.chain
+        if abs(opt["strike"] - snapshot.spot) <= strike_range
     ]
     if not relevant_options:
         return 0
@@ -55,28 +203,40 @@ def calculate_average_iv(options_chain, current_price, strike_range=200):
     return total_iv / len(relevant_options)
 
 
-def get_premium(options_chain, strike, option_type):
+def get_premium(snapshot, strike, option_type):
     """Get the premium for a specific strike and option type."""
-    for opt in options_chain:
-        if opt["strike"] == strike and opt["option_type"] == option_type:
-            return opt["premium"]
-    return None  # Return None if no matching option is found
+    return snapshot.premiums.get((strike, option_type))  # None if no matching option is found
+
+
+def calculate_fees(premiums, quantities, traded_on=None, exercised=False):
+    """Brokerage, taxes and exchange charges (INR) on a set of fills (see fees.charges).
 
+    Args:
+        premiums: Fill price per unit of each leg.
+        quantities: Signed units of each leg, negative for sells.
+        traded_on: Trade date(s); defaults to today.
+        exercised: True for long legs exercised at expiry (premium is then the intrinsic value).
+    """
+    return float(np.sum(charges(premiums, quantities, traded_on, exercised)))
 
-def calculate_fees(gross_credit):
-    """Estimate taxes and brokerage fees (placeholder)."""
-    return 10  # Replace with actual fee logic
 
+def entry_fees(snapshot, lots):
+    """Charges (INR) on entering the snapshot's Iron Condor at its quoted premiums."""
+    legs = condor_legs(snapshot.strikes, lots)
+    premiums = [get_premium(snapshot, strike, option_type) or 0.0 for strike, option_type, _ in legs]
+    return calculate_fees(premiums, [quantity for _, _, quantity in legs], snapshot.timestamp)
 
-def calculate_net_credit(options_chain):
-    """Calculate the net credit for the Iron Condor."""
-    current_price = get_current_nifty_price()  # Assume this function exists
-    strikes = select_strikes(current_price)
 
-    sold_call_premium = get_premium(options_chain, strikes["sold_call"], "CE")
-    bought_call_premium = get_premium(options_chain, strikes["bought_call"], "CE")
-    sold_put_premium = get_premium(options_chain, strikes["sold_put"], "PE")
-    bought_put_premium = get_premium(options_chain, strikes["bought_put"], "PE")
+def calculate_net_credit(snapshot):
+    """Calculate the net credit for the Iron Condor at the snapshot's strikes."""
+    if isinstance(snapshot, OptionChain):
+        return snapshot.net_credit  # Maintained incrementally
+    strikes = snapshot.strikes
+
+    sold_call_premium = get_premium(snapshot, strikes["sold_call"], "CE")
+    bought_call_premium = get_premium(snapshot, strikes["bought_call"], "CE")
+    sold_put_premium = get_premium(snapshot, strikes["sold_put"], "PE")
+    bought_put_premium = get_premium(snapshot, strikes["bought_put"], "PE")
 
     # Check for missing premiums
     if None in [sold_call_premium, bought_call_premium, sold_put_premium, bought_put_premium]:
@@ -86,27 +246,27 @@ def calculate_net_credit(options_chain):
     put_spread_credit = sold_put_premium - bought_put_premium
     total_credit = call_spread_credit + put_spread_credit
 
-    # Adjust for lot size (assume lot_size is a defined constant, e.g., 50 for Nifty)
-    return total_credit * 75
+    # Adjust for lot size
+    return total_credit * LOT_SIZE
 
 
 def check_economic_calendar(expiry_date):
-    """Check for major economic events before expiry."""
+    """Check for major economic events before expiry.
+
+    Answers are cached for the rest of the day, so entry checks made on every
+    tick don't block on the request; failed requests are retried on the next check.
+    """
+    key = (datetime.now().date(), expiry_date)
+    if key in _calendar:
+        return _calendar[key]
     url = f"https://www.alphavantage.co/query?function=ECONOMIC_CALENDAR&symbol=INDIA&apikey={ALPHA_VANTAGE_API_KEY}"
     try:
         response = requests.get(url)
         events = response.json().get("economic_calendar", [])
         major_events = [event for event in events if event["impact"] == "High" and event["date"] <= expiry_date]
-        return len(major_events) > 0
     except Exception as e:
         print(f"Error fetching economic calendar: {e}")
         return False
+    _calendar[key] = len(major_events) > 0
+    return _calendar[key]
 
-
-def check_entry_conditions(options_chain, current_price, expiry_date):
-    """Verify if entry conditions are met."""
-    strikes = select_strikes(current_price)
-    avg_iv = calculate_average_iv(options_chain, strikes)
-    net_credit = calculate_net_credit(options_chain, strikes)
-    has_major_events = check_economic_calendar(expiry_date)
-    return (IV_MIN <= avg_iv <= IV_MAX and net_credit >= MIN_CREDIT and not has_major_events)
\ No newline at end of file
@@ -0,0 +1,218 @@
+# synthetic_chain.py
+"""Generate synthetic NIFTY option chains from spot candles for backtesting."""
+
+import datetime
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from config import (RISK_FREE_RATE, SYNTHETIC_CACHE_DIR, SYNTHETIC_STRIKE_RANGE, SYNTHETIC_VOL_WINDOW,
+                    EXPIRY_WEEKDAY)
+from pricing import bs_price
+from candle_series import CandleSeries
+
+STRIKE_STEP = 50
+EXPIRY_CLOSE = datetime.time(15, 30)
+TRADING_MINUTES_PER_YEAR = 252 * 375
+CHAIN_COLUMNS = ["date", "spot_price", "expiry", "strike", "option_type", "premium", "iv"]
+
+
+def _to_float(value):
+    """Unwrap single-element Series/arrays left behind by multi-ticker yfinance downloads."""
+    return float(np.asarray(value, dtype=float).ravel()[0])
+
+
+def load_spot_candles(source):
+    """Load spot candles as a DataFrame indexed by date with a 'close' column.
+
+    Args:
+        source: Path to a CandleSeries .npy file or a candle pickle (data_store.py /
+            data_store_yahoo.py), a CandleSeries, a list of candle dicts, or a DataFrame with
+            'date' and 'close' columns.
+
+    Returns:
+        pandas.DataFrame: Candles sorted by date.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        source = CandleSeries.load(source)
+    if isinstance(source, CandleSeries):
+        frame = pd.DataFrame({"date": source["date"], "close": source["close"]})
+    elif isinstance(source, pd.DataFrame):
+        frame = source.reset_index() if "date" not in source.columns else source
+        frame = frame[["date", "close"]].copy()
+    else:
+        frame = pd.DataFrame({
+            "date": [candle["date"] for candle in source],
+            "close": [_to_float(candle["close"]) for candle in source],
+        })
+    frame["date"] = pd.to_datetime(frame["date"])
+    return frame.sort_values("date").set_index("date")
+
+
+def weekly_expiries(start, end, weekday=EXPIRY_WEEKDAY):
+    """List weekly expiry dates on the given weekday covering [start, end]."""
+    day = pd.Timestamp(start).date()
+    day += datetime.timedelta(days=(weekday - day.weekday()) % 7)
+    last = pd.Timestamp(end).date() + datetime.timedelta(days=7)
+    expiries = []
+    while day <= last:
+        expiries.append(day)
+        day += datetime.timedelta(days=7)
+    return expiries
+
+
+def realized_vol(close, window=SYNTHETIC_VOL_WINDOW):
+    """Annualized rolling realized volatility of close-to-close log returns.
+
+    Candle spacing is inferred from the median gap between timestamps so the
+    same model works for minute, 30-minute and daily candles.
+    """
+    log_returns = np.log(close).diff()
+    gaps = close.index.to_series().diff().dropna()
+    minutes = gaps.median().total_seconds() / 60 if not gaps.empty else 375
+    bars_per_year = 252 if minutes >= 375 else TRADING_MINUTES_PER_YEAR / minutes
+    vol = log_returns.rolling(window, min_periods=2).std() * np.sqrt(bars_per_year)
+    return vol.bfill().fillna(0.15)
+
+
+class SyntheticChain:
+    """Lazily generated per-expiry CE/PE price series priced off spot candles.
+
+    Each expiry's chain covers the candles of its weekly cycle (after the
+    previous expiry, up to its own close) and every strike within
+    ``strike_range`` points of the spot seen in that cycle. Chains are priced
+    as a strikes x timestamps grid in one vectorized call and cached on disk
+    so repeated backtests only pay for generation once.
+    """
+
+    def __init__(self, candles, iv_model=None, strike_range=SYNTHETIC_STRIKE_RANGE, strike_step=STRIKE_STEP,
+                 vol_window=SYNTHETIC_VOL_WINDOW, rate=RISK_FREE_RATE, cache_dir=SYNTHETIC_CACHE_DIR,
+                 cycle_days=7):
+        """
+        Args:
+            candles: Anything accepted by load_spot_candles.
+            iv_model: None for the realized-vol model, a float for a flat volatility, or a
+                callable ``(spot, strike, t, timestamps) -> vol`` returning decimal vols for
+                the broadcast grid (e.g. an implied-volatility surface).
+            strike_range: Points either side of the cycle's spot range to generate strikes for.
+            strike_step: Strike interval.
+            vol_window: Window (in candles) for the realized-vol model.
+            rate: Risk-free rate used for pricing.
+            cache_dir: Directory for cached chains; None disables the disk cache.
+            cycle_days: Calendar days before expiry covered by each expiry's series.
+        """
+        self.candles = load_spot_candles(candles)
+        self.iv_model = iv_model
+        self.strike_range = strike_range
+        self.strike_step = strike_step
+        self.vol_window = vol_window
+        self.rate = rate
+        self.cache_dir = cache_dir
+        self.cycle_days = cycle_days
+        self._chains = {}
+        self._realized_vol = None
+
+    def expiries(self):
+        """Expiries whose cycles overlap the loaded candles."""
+        if self.candles.empty:
+            return []
+        return weekly_expiries(self.candles.index[0], self.candles.index[-1])
+
+    def _cache_key(self):
+        if callable(self.iv_model):
+            model = getattr(self.iv_model, "cache_key", None)
+            if model is None:
+                return None  # Arbitrary callables can't be fingerprinted reliably
+        else:
+            model = self.iv_model
+        close = self.candles["close"].to_numpy()
+        digest = hashlib.sha1()
+        digest.update(self.candles.index.asi8.tobytes())
+        digest.update(close.tobytes())
+        digest.update(repr((model, self.strike_range, self.strike_step, self.vol_window, self.rate,
+                            self.cycle_days)).encode())
+        return digest.hexdigest()[:16]
+
+    def _cache_path(self, expiry):
+        key = self._cache_key()
+        if self.cache_dir is None or key is None:
+            return None
+        return os.path.join(self.cache_dir, f"synthetic_chain_{key}_{expiry:%Y%m%d}.pkl")
+
+    def _vols(self, spot, strikes, t, timestamps):
+        shape = (len(timestamps), strikes.shape[-1])
+        if self.iv_model is None:
+            if self._realized_vol is None:
+                self._realized_vol = realized_vol(self.candles["close"], self.vol_window)
+            vol = self._realized_vol.loc[timestamps].to_numpy()[:, None]
+            return np.broadcast_to(vol, shape)
+        if callable(self.iv_model):
+            return np.broadcast_to(self.iv_model(spot, strikes, t, timestamps), shape)
+        return np.full(shape, float(self.iv_model))
+
+    def _generate(self, expiry):
+        expiry_at = pd.Timestamp(datetime.datetime.combine(expiry, EXPIRY_CLOSE))
+        cycle = self.candles[(self.candles.index > expiry_at - pd.Timedelta(days=self.cycle_days)) &
+                             (self.candles.index <= expiry_at)]
+        if cycle.empty:
+            return pd.DataFrame(columns=CHAIN_COLUMNS)
+
+        timestamps = cycle.index
+        spot = cycle["close"].to_numpy()[:, None]
+        low = np.floor((spot.min() - self.strike_range) / self.strike_step) * self.strike_step
+        high = np.ceil((spot.max() + self.strike_range) / self.strike_step) * self.strike_step
+        strikes = np.arange(low, high + self.strike_step, self.strike_step)[None, :]
+        t = ((expiry_at - timestamps).total_seconds().to_numpy() / (365 * 24 * 3600))[:, None]
+
+        vols = self._vols(spot, strikes, t, timestamps)
+        calls = bs_price(spot, strikes, t, vols, "CE", self.rate)
+        puts = bs_price(spot, strikes, t, vols, "PE", self.rate)
+
+        n_times, n_strikes = calls.shape
+        size = n_times * n_strikes
+        return pd.DataFrame({
+            "date": np.tile(np.repeat(timestamps.to_numpy(), n_strikes), 2),
+            "spot_price": np.tile(np.repeat(spot[:, 0], n_strikes), 2),
+            "expiry": np.full(2 * size, expiry),
+            "strike": np.tile(np.tile(strikes[0], n_times), 2).astype(int),
+            "option_type": np.repeat(["CE", "PE"], size),
+            "premium": np.round(np.concatenate([calls.ravel(), puts.ravel()]), 2),
+            "iv": np.tile((vols * 100).ravel(), 2),
+        }, columns=CHAIN_COLUMNS)
+
+    def for_expiry(self, expiry):
+        """Return the chain for one expiry, generating and caching it on first use.
+
+        Returns:
+            pandas.DataFrame: Rows of date, spot_price, expiry, strike, option_type, premium, iv.
+        """
+        if expiry in self._chains:
+            return self._chains[expiry]
+        path = self._cache_path(expiry)
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                chain = pickle.load(f)
+        else:
+            chain = self._generate(expiry)
+            if path:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    pickle.dump(chain, f)
+        self._chains[expiry] = chain
+        return chain
+
+    def to_frame(self, start=None, end=None):
+        """Concatenate the chains of every expiry, optionally limited to [start, end]."""
+        frames = [self.for_expiry(expiry) for expiry in self.expiries()]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=CHAIN_COLUMNS)
+        data = pd.concat(frames, ignore_index=True)
+        if start is not None:
+            data = data[data["date"] >= pd.Timestamp(start)]
+        if end is not None:
+            data = data[data["date"] <= pd.Timestamp(end)]
+        return data
@@ -0,0 +1,47 @@
+# tests/test_allocator.py
+"""Unit tests for the margin-aware capital allocator."""
+
+import unittest
+
+from allocator import CapitalAllocator
+from strategy import condor_legs
+
+STRIKES = {"sold_call": 23650, "bought_call": 23850, "sold_put": 23350, "bought_put": 23150}
+
+
+class TestCapitalAllocator(unittest.TestCase):
+    def setUp(self):
+        self.allocator = CapitalAllocator(capital=1000000, initial_allocation=0.7, reserve_allocation=0.3,
+                                          scan_range=0.1, exposure=0.02)
+
+    def test_margin_is_netted_per_expiry_and_updated_incrementally(self):
+        allocator = self.allocator
+        allocator.open("condor", condor_legs(STRIKES), "NIFTY", "2024-06-27", 23500)
+        # Worst loss is one 200-point wing, plus exposure on one short side
+        self.assertAlmostEqual(allocator.used, 200 * 75 + 0.02 * 23500 * 75)
+        allocator.open("weekly", condor_legs(STRIKES), "NIFTY", "2024-07-04", 23500)
+        self.assertAlmostEqual(allocator.used, 2 * (200 * 75 + 0.02 * 23500 * 75))
+        # Buying back the call spread leaves a put spread with the same worst case
+        allocator.apply("condor", [(23650, "CE", 75), (23850, "CE", -75)])
+        self.assertAlmostEqual(allocator.margin("condor"), 200 * 75 + 0.02 * 23500 * 75)
+        # A long put at the sold strike hedges the spread on the same expiry
+        self.assertLess(allocator.marginal_margin([(23350, "PE", 75)], "NIFTY", "2024-06-27"), 0)
+        allocator.close("condor")
+        allocator.close("weekly")
+        self.assertAlmostEqual(allocator.used, 0.0)
+
+    def test_max_lots_is_the_largest_count_that_fits(self):
+        allocator = self.allocator
+        lot = condor_legs(STRIKES)
+        lots = allocator.max_lots(lot, "NIFTY", "2024-06-27", 23500)
+        self.assertEqual(lots, int(700000 // (200 * 75 + 0.02 * 23500 * 75)))
+        allocator.open("condor", condor_legs(STRIKES, lots - 2), "NIFTY", "2024-06-27", 23500)
+        self.assertEqual(allocator.max_lots(lot, "NIFTY", "2024-06-27"), 2)
+        self.assertGreater(allocator.max_lots(lot, "NIFTY", "2024-06-27", purpose="adjustment"), 2)
+        for n in range(1, 4):
+            fits = allocator.used + allocator.marginal_margin(condor_legs(STRIKES, n), "NIFTY", "2024-06-27") <= 700000
+            self.assertEqual(fits, n <= 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# tests/test_backtest.py
+"""Unit tests for the expiry-cycle partitioned backtest."""
+
+import datetime
+import types
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import backtest
+from fees import charges
+from result_cache import ResultCache
+from synthetic_chain import SyntheticChain
+
+
+def make_history(days=30):
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=days * 24, freq="h")
+    dates = dates[(dates.hour >= 10) & (dates.hour <= 15)]
+    rng = np.random.default_rng(7)
+    candles = pd.DataFrame({"date": dates, "close": 23500 * np.exp(np.cumsum(rng.normal(0, 0.002, len(dates))))})
+    return SyntheticChain(candles, iv_model=0.25, strike_range=500, cache_dir=None).to_frame()
+
+
+class TestBacktest(unittest.TestCase):
+    def test_cycles_hold_only_their_nearest_expiry(self):
+        rows, cycles = backtest.partition_cycles(make_history())
+        self.assertEqual([expiry for expiry, _, _ in cycles], sorted(set(rows["expiry"])))
+        for expiry, start, stop in cycles:
+            cycle = rows.iloc[start:stop]
+            self.assertTrue((cycle["expiry"] == expiry).all())
+            self.assertTrue((cycle["date"].dt.date <= expiry).all())
+
+    @mock.patch("strategy.check_economic_calendar", return_value=False)
+    def test_parallel_run_matches_in_process_run(self, calendar):
+        data = make_history()
+        trades = {}
+        for workers in (1, 2):
+            logged = []
+            with mock.patch("backtest.load_historical_data", return_value=data.copy()), \
+                    mock.patch("backtest.log_trade", logged.append), mock.patch("builtins.print"):
+                total = backtest.run_backtest(workers=workers, cache=ResultCache(None))
+            trades[workers] = (total, logged)
+        self.assertTrue(trades[1][1])
+        self.assertEqual(trades[1], trades[2])
+
+    def test_held_to_expiry_pays_only_exercise_stt_on_long_legs_in_the_money(self):
+        strikes = {"sold_call": 23650, "bought_call": 23850, "sold_put": 23350, "bought_put": 23150}
+        entry, expiry_close = np.datetime64("2025-01-06T10:45"), np.datetime64("2025-01-09T15:00")
+        legs = [(23650, "CE", 100.0, 250.0), (23850, "CE", 40.0, 50.0),
+                (23350, "PE", 90.0, 0.05), (23150, "PE", 35.0, 0.05)]
+        columns = {
+            "date": np.repeat([entry, expiry_close], 4),
+            "strike": np.tile([strike for strike, *_ in legs], 2).astype(float),
+            "option_type": np.tile([option_type for _, option_type, *_ in legs], 2),
+            "premium": np.array([premium for *_, premium, _ in legs] + [mark for *_, mark in legs]),
+            "spot_price": np.repeat([23500.0, 23900.0], 4),
+        }
+        snapshot = types.SimpleNamespace(strikes=strikes, net_credit=8000.0, expiry=datetime.date(2025, 1, 9),
+                                         timestamp=datetime.datetime(2025, 1, 6, 10, 45))
+        trade = backtest._hold_to_expiry(columns, entry, snapshot, lots=1)
+        self.assertFalse(trade["stopped"])
+        entry_fees = charges([100.0, 40.0, 90.0, 35.0], [-75, 75, -75, 75], datetime.date(2025, 1, 6)).sum()
+        # Only the bought 23850 call finishes in the money (50 points at a 23900 spot); the short legs cost nothing
+        self.assertAlmostEqual(trade["fees"], round(entry_fees + 50 * 75 * 0.00125, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
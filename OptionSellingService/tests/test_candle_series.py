@@ -0,0 +1,47 @@
+# tests/test_candle_series.py
+"""Unit tests for the array-backed candle series."""
+
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from candle_series import CandleSeries
+
+
+class TestCandleSeries(unittest.TestCase):
+    def test_conversions_agree_and_round_trip(self):
+        dates = pd.date_range("2025-01-01 09:15", periods=5, freq="1min", tz="Asia/Kolkata")
+        prices = np.arange(5.0) + 100
+        frame = pd.DataFrame({("Open", "^NSEI"): prices, ("High", "^NSEI"): prices + 1,
+                              ("Low", "^NSEI"): prices - 1, ("Close", "^NSEI"): prices + 0.5,
+                              ("Volume", "^NSEI"): np.zeros(5)}, index=dates)
+        frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+        from_frame = CandleSeries.from_frame(frame)
+        records = [{"date": date.to_pydatetime(), "open": pd.Series([o]), "high": o + 1, "low": o - 1,
+                    "close": o + 0.5, "volume": 0} for date, o in zip(dates, prices)][::-1]  # Unsorted
+        from_records = CandleSeries.from_records(records)
+        np.testing.assert_array_equal(from_frame.data, from_records.data)
+        self.assertEqual(from_frame[0]["date"].item(), datetime.datetime(2025, 1, 1, 9, 15))  # Exchange time
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "candles.npy")
+            from_frame.save(path)
+            loaded = CandleSeries.load(path)
+            self.assertIsInstance(loaded.data, np.memmap)
+            np.testing.assert_array_equal(loaded.data, from_frame.data)
+
+    def test_between_is_a_binary_searched_view(self):
+        series = CandleSeries.from_records([{"date": datetime.datetime(2025, 1, 1, 9, 15) + datetime.timedelta(minutes=i),
+                                             "open": i, "high": i, "low": i, "close": i, "volume": 1}
+                                            for i in range(100)])
+        window = series.between(datetime.datetime(2025, 1, 1, 9, 20), datetime.datetime(2025, 1, 1, 9, 30))
+        self.assertEqual([candle["close"] for candle in window], list(range(5, 16)))
+        self.assertTrue(np.shares_memory(window.data, series.data))
+        self.assertEqual(len(series.between(end=datetime.datetime(2025, 1, 1, 9, 0))), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
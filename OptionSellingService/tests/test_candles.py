@@ -0,0 +1,45 @@
+# tests/test_candles.py
+"""Unit tests for the tick-to-candle aggregator."""
+
+import datetime
+import unittest
+
+from candles import CandleAggregator
+
+OPEN = datetime.datetime(2025, 1, 6, 9, 15)
+
+
+def tick(seconds, price, volume):
+    return {"instrument_token": 256265, "last_price": price, "volume_traded": volume,
+            "exchange_timestamp": OPEN + datetime.timedelta(seconds=seconds)}
+
+
+class TestCandleAggregator(unittest.TestCase):
+    def setUp(self):
+        self.aggregator = CandleAggregator(timeframes=("1m", "5m"), history=3, capacity=1)
+        self.closed = []
+        self.aggregator.on_bar(self.closed.append, timeframe="1m")
+
+    def test_bars_close_on_the_next_period(self):
+        self.aggregator.on_ticks(None, [tick(0, 100, 1000), tick(20, 104, 1010), tick(40, 98, 1030)])
+        self.assertEqual(self.closed, [])
+        self.aggregator.on_ticks(None, [tick(61, 101, 1035)])
+        bar, = self.closed
+        self.assertEqual((bar["date"], bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"]),
+                         (OPEN, 100, 104, 98, 98, 30))
+        self.assertEqual(self.aggregator.forming(256265, "5m")["volume"], 35)
+
+    def test_ring_keeps_the_latest_bars(self):
+        for minute in range(6):
+            self.aggregator.add_tick(256265, 100 + minute, 1736154900 + 60 * minute)
+        self.aggregator.advance(OPEN + datetime.timedelta(minutes=10))
+        self.assertEqual(len(self.closed), 6)
+        candles = self.aggregator.candles(256265, "1m")
+        self.assertEqual([candle["close"] for candle in candles], [103, 104, 105])
+        self.assertEqual(candles[0]["date"], OPEN + datetime.timedelta(minutes=3))
+        self.assertEqual(len(self.aggregator.bars(256265, "5m")["close"]), 2)
+        self.assertEqual(len(self.aggregator.bars(1, "1m")["close"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+# tests/test_checkpoint.py
+"""Unit tests for the write-ahead checkpoint store."""
+
+import datetime
+import os
+import tempfile
+import unittest
+
+from checkpoint import CheckpointStore, reconcile
+
+
+class TestCheckpointStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "state.json")
+
+    def test_state_survives_a_crash_and_compaction(self):
+        store = CheckpointStore(self.path, fsync=False, compact_every=3)
+        entered = datetime.datetime(2025, 1, 7, 10, 45)
+        store.save("iron_condor", {"phase": "entering", "entry_time": entered, "expiry": entered.date()})
+        store.save("iron_condor", {"phase": "open", "entry_time": entered, "trail_peak": None})
+        store.save("other", {"phase": "open"})
+        store.delete("other")  # Compacts first: the snapshot holds three records' worth of state
+        store.save("iron_condor", {"phase": "exiting", "entry_time": entered})
+        with open(self.path + ".log", "a") as f:
+            f.write('{"key": "iron_condor", "val')  # Torn by a crash mid-write
+        store.close()
+
+        restored = CheckpointStore(self.path)
+        self.assertEqual(restored.state, {"iron_condor": {"phase": "exiting", "entry_time": entered}})
+
+    def test_reconcile_against_broker_positions(self):
+        legs = {"NFO:NIFTY25JAN23200PE": -75, "NIFTY25JAN23100PE": 75, "NIFTY25JAN23800CE": -75}
+        positions = {"net": [{"tradingsymbol": "NIFTY25JAN23200PE", "quantity": -75},
+                             {"tradingsymbol": "NIFTY25JAN23100PE", "quantity": 75},
+                             {"tradingsymbol": "BANKNIFTY25JAN50000CE", "quantity": -30}]}
+        held, differing = reconcile(legs, positions)
+        self.assertEqual(held, {"NFO:NIFTY25JAN23200PE": -75, "NIFTY25JAN23100PE": 75, "NIFTY25JAN23800CE": 0})
+        self.assertEqual(differing, ["NIFTY25JAN23800CE"])
+
+
+if __name__ == "__main__":
+    unittest.main()
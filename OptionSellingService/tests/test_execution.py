@@ -0,0 +1,72 @@
+# tests/test_execution.py
+"""Unit tests for the limit-chase execution engine on the paper exchange."""
+
+import datetime
+import unittest
+
+from execution import LimitChaser
+from order_tracker import OrderTracker
+from paper_exchange import PaperExchange, PaperKite, PaperTicker, index_instruments, option_instruments
+
+
+class TestLimitChaser(unittest.TestCase):
+    def setUp(self):
+        expiry = datetime.date(2025, 1, 9)
+        self.exchange = PaperExchange(index_instruments() + option_instruments(23500, [expiry], strike_range=500))
+        self.exchange.now = datetime.datetime(2025, 1, 6, 10, 0)
+        self.symbol = "NIFTY2510923900CE"
+        self.token = self.exchange.resolve("NFO", self.symbol)["instrument_token"]
+        self.quote(10, 12)
+        self.tracker = OrderTracker()
+        ticker = PaperTicker(self.exchange)
+        self.tracker.attach(ticker)
+        ticker.connect(threaded=True)
+        self.kite = PaperKite(self.exchange)
+
+    def quote(self, bid, ask):
+        depth = {"buy": [{"price": bid, "quantity": 750, "orders": 1}],
+                 "sell": [{"price": ask, "quantity": 750, "orders": 1}]}
+        self.exchange.publish_price(self.token, (bid + ask) / 2, depth=depth)
+
+    def sell(self, max_slippage, fallback):
+        chaser = LimitChaser(self.kite, self.tracker, steps=4, step_seconds=0.01, max_slippage=max_slippage)
+        result, = chaser.execute([{"exchange": "NFO", "tradingsymbol": self.symbol, "transaction_type": "SELL",
+                                   "quantity": 75}], fallback=fallback)
+        return result
+
+    def test_starts_at_mid_and_steps_to_the_touch(self):
+        result = self.sell(max_slippage=2, fallback="cancel")
+        self.assertEqual(result["arrival_mid"], 11)
+        self.assertEqual(result["status"], "COMPLETE")
+        self.assertEqual(result["average_price"], 10)
+        history = [order for order in self.kite.orders() if order["order_id"] == result["order_id"]]
+        self.assertEqual(len(history), 1)  # Repriced by modification, never cancel-and-replace
+
+    def test_stops_at_the_slippage_budget(self):
+        result = self.sell(max_slippage=0.5, fallback="cancel")
+        self.assertEqual(result["limit_price"], 10.5)
+        self.assertEqual(result["status"], "CANCELLED")
+        self.assertEqual(result["filled_quantity"], 0)
+
+    def test_never_chases_past_the_fair_value(self):
+        chaser = LimitChaser(self.kite, self.tracker, steps=4, step_seconds=0.01, max_slippage=2)
+        result, = chaser.execute([{"exchange": "NFO", "tradingsymbol": self.symbol, "transaction_type": "SELL",
+                                   "quantity": 75, "fair_price": 10.6}], fallback="cancel")
+        self.assertEqual(result["limit_price"], 10.6)  # The budget alone would have sold at the 10 bid
+        self.assertEqual(result["status"], "CANCELLED")
+        # A fair value below the bid isn't chased at all: the order rests at it
+        self.assertEqual(chaser._plan({"transaction_type": "BUY", "fair_price": 9.5},
+                                      {"depth": {"buy": [{"price": 10}], "sell": [{"price": 12}]}})["start"], 9.5)
+
+    def test_fill_inside_the_spread_is_counted_as_saved_slippage(self):
+        chaser = LimitChaser(self.kite, self.tracker, steps=4, step_seconds=0.01, max_slippage=0.5)
+        self.exchange.add_order_listener(
+            lambda order: order["status"] == "OPEN" and self.quote(11, 12))  # A buyer lifts to 11 once we rest
+        result, = chaser.execute([{"exchange": "NFO", "tradingsymbol": self.symbol, "transaction_type": "SELL",
+                                   "quantity": 75}], fallback="cancel")
+        self.assertEqual(result["average_price"], 11)
+        self.assertEqual(result["slippage_saved"], 75.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
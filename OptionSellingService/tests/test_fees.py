@@ -0,0 +1,42 @@
+# tests/test_fees.py
+"""Unit tests for the vectorized option charges."""
+
+import datetime
+import unittest
+
+import numpy as np
+
+from fees import charges
+
+DAY = datetime.date(2025, 1, 6)
+
+
+class TestCharges(unittest.TestCase):
+    def test_sell_and_buy_charges_at_the_days_rates(self):
+        sold = charges(100.0, -75, DAY, breakdown=True)
+        turnover = 7500.0
+        self.assertAlmostEqual(sold["brokerage"], 20.0)
+        self.assertAlmostEqual(sold["stt"], turnover * 0.001)
+        self.assertAlmostEqual(sold["stamp_duty"], 0.0)
+        self.assertAlmostEqual(sold["gst"], 0.18 * (20.0 + turnover * 0.0003503 + turnover * 1e-6))
+        bought = charges(100.0, 75, DAY, breakdown=True)
+        self.assertAlmostEqual(bought["stt"], 0.0)
+        self.assertAlmostEqual(bought["stamp_duty"], turnover * 0.00003)
+        # Older fills keep the STT rate of their day
+        self.assertAlmostEqual(charges(100.0, -75, datetime.date(2022, 6, 1), breakdown=True)["stt"], turnover * 0.0005)
+        # Exercise pays STT on the intrinsic value and nothing else
+        self.assertAlmostEqual(charges(40.0, 75, DAY, exercised=True), 3000.0 * 0.00125)
+
+    def test_arrays_match_fill_by_fill(self):
+        rng = np.random.default_rng(3)
+        prices = rng.uniform(1, 300, 50)
+        quantities = rng.choice([-150, -75, 75, 150], 50)
+        dates = np.datetime64("2022-01-01") + rng.integers(0, 1200, 50).astype("timedelta64[D]")
+        exercised = rng.random(50) < 0.2
+        totals = charges(prices, quantities, dates, exercised)
+        for i in range(50):
+            self.assertAlmostEqual(totals[i], charges(prices[i], quantities[i], dates[i], exercised[i]))
+
+
+if __name__ == "__main__":
+    unittest.main()
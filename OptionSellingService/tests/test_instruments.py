@@ -0,0 +1,34 @@
+# tests/test_instruments.py
+"""Unit tests for the indexed instrument lookup."""
+
+import datetime
+import unittest
+
+from instruments import InstrumentIndex
+from paper_exchange import index_instruments, option_instruments
+
+EXPIRIES = [datetime.date(2025, 1, 9), datetime.date(2025, 1, 16)]
+
+
+class TestInstrumentIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = InstrumentIndex(index_instruments() + option_instruments(23500, EXPIRIES, strike_range=500))
+
+    def test_lookups(self):
+        self.assertEqual(self.index.instrument("NSE", "NIFTY 50")["instrument_token"], 256265)
+        self.assertEqual(self.index.expiries("NIFTY"), EXPIRIES)
+        self.assertEqual(self.index.nearest_expiry("NIFTY", datetime.date(2025, 1, 10)), EXPIRIES[1])
+        option = self.index.option("NIFTY", "2025-01-09", 23600, "PE")
+        self.assertEqual(option["tradingsymbol"], "NIFTY2510923600PE")
+        self.assertIs(self.index.by_token[option["instrument_token"]], option)
+        self.assertIsNone(self.index.option("NIFTY", EXPIRIES[0], 23625, "PE"))
+
+    def test_strikes_near_a_price(self):
+        self.assertEqual(self.index.nearest_strike("NIFTY", EXPIRIES[0], 23574), 23550)
+        self.assertEqual(self.index.nearest_strike("NIFTY", EXPIRIES[0], 30000), 24000)
+        self.assertEqual(self.index.strikes_around("NIFTY", EXPIRIES[0], 23580, 3), [23550, 23600, 23650])
+        self.assertEqual(self.index.strikes_around("NIFTY", EXPIRIES[0], 22000, 2), [23000, 23050])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# tests/test_metrics.py
+"""Unit tests for the metrics layer and the order rate limiter."""
+
+import threading
+import unittest
+import urllib.request
+
+from metrics import Histogram, InstrumentedKite, KITE_ERRORS, KITE_LATENCY, RATE_LIMIT_QUEUE, Registry, \
+    start_metrics_server
+from rate_limiter import RateLimiter
+
+
+class FakeKite:
+    VARIETY_REGULAR = "regular"
+
+    def quote(self, symbols):
+        return {symbol: {"last_price": 100} for symbol in symbols}
+
+    def positions(self):
+        raise RuntimeError("down")
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_sums_shards_from_all_threads(self):
+        histogram = Histogram("latency", "test", buckets=(0.001, 0.01))
+        threads = [threading.Thread(target=lambda: [histogram.observe(0.005) for _ in range(1000)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        histogram.observe(0.0001)
+        counts, total, count = histogram.snapshot()
+        self.assertEqual(counts, [1, 4000, 0])
+        self.assertEqual(count, 4001)
+        self.assertAlmostEqual(total, 20.0001)
+        self.assertEqual(histogram.quantile(0.5), 0.01)
+
+    def test_instrumented_kite_records_latency_and_errors(self):
+        kite = InstrumentedKite(FakeKite())
+        before = KITE_LATENCY.labels("quote").snapshot()[2]
+        self.assertEqual(kite.quote(["NSE:NIFTY 50"])["NSE:NIFTY 50"]["last_price"], 100)
+        self.assertEqual(kite.VARIETY_REGULAR, "regular")
+        self.assertEqual(KITE_LATENCY.labels("quote").snapshot()[2], before + 1)
+        errors = KITE_ERRORS.labels("positions").value
+        with self.assertRaises(RuntimeError):
+            kite.positions()
+        self.assertEqual(KITE_ERRORS.labels("positions").value, errors + 1)
+
+    def test_endpoint_serves_prometheus_text(self):
+        registry = Registry()
+        registry.counter("orders", "Orders placed").inc(3)
+        registry.histogram("kite_request_seconds", "Latency", label="endpoint").labels("ltp").observe(0.002)
+        server = start_metrics_server(0, registry=registry)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            body = urllib.request.urlopen(url, timeout=5).read().decode()
+        finally:
+            server.shutdown()
+        self.assertIn("# TYPE orders counter", body)
+        self.assertIn("orders_total 3", body)
+        self.assertIn('kite_request_seconds_bucket{endpoint="ltp",le="0.0025"} 1', body)
+        self.assertIn('kite_request_seconds_count{endpoint="ltp"} 1', body)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_waits_for_tokens_and_tracks_queue_depth(self):
+        clock = [0.0]
+        limiter = RateLimiter(rate=10, burst=2, clock=lambda: clock[0])
+        self.assertTrue(limiter.try_acquire())
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+        clock[0] += 0.1
+        self.assertTrue(limiter.try_acquire())
+
+        limiter = RateLimiter(rate=50, burst=1)
+        limiter.acquire()
+        self.assertGreater(limiter.acquire(), 0.005)
+        self.assertEqual(RATE_LIMIT_QUEUE.value, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# tests/test_option_chain.py
+"""Unit tests for the incrementally aggregated option chain."""
+
+import datetime
+import unittest
+
+import numpy as np
+
+from option_chain import OptionChain
+from strategy import MarketSnapshot, calculate_average_iv, calculate_net_credit, select_strikes
+
+NOW = datetime.datetime(2025, 1, 7, 10, 45)
+EXPIRY = datetime.date(2025, 1, 9)
+
+
+class TestOptionChain(unittest.TestCase):
+    def test_aggregates_match_a_full_recompute(self):
+        rng = np.random.default_rng(7)
+        quotes = {(float(strike), option_type): (float(rng.uniform(5, 200)), float(rng.uniform(10, 40)))
+                  for strike in range(18000, 20050, 50) for option_type in ("CE", "PE")}
+        spot = 19000.0
+        chain = OptionChain(EXPIRY, strike_selector=select_strikes)
+        chain.set_spot(spot, NOW)
+        for (strike, option_type), (premium, iv) in quotes.items():
+            chain.update(strike, option_type, premium, iv)
+        for step in range(200):
+            if step % 10 == 0:
+                spot += float(rng.choice([-120, -35, 40, 95]))
+                chain.set_spot(spot, NOW)
+            if step == 100:  # A strike listed intraday
+                quotes[(20100.0, "CE")] = (3.0, 45.0)
+                chain.update(20100, "CE", 3.0, 45.0)
+            for key in rng.choice(len(quotes), 3):
+                strike, option_type = list(quotes)[key]
+                quotes[(strike, option_type)] = (float(rng.uniform(5, 200)), float(rng.uniform(10, 40)))
+                chain.update(strike, option_type, *quotes[(strike, option_type)])
+            full = MarketSnapshot(spot, tuple({"strike": strike, "option_type": option_type, "premium": premium,
+                                               "iv": iv} for (strike, option_type), (premium, iv) in quotes.items()),
+                                  NOW, EXPIRY)
+            self.assertAlmostEqual(calculate_average_iv(chain), calculate_average_iv(full))
+            self.assertAlmostEqual(calculate_net_credit(chain), calculate_net_credit(full))
+        self.assertFalse(chain.dirty)
+
+    def test_ticks_solve_iv_for_changed_strikes_only(self):
+        chain = OptionChain(EXPIRY, strike_selector=select_strikes)
+        chain.add_instrument({"instrument_token": 1, "strike": 19000, "instrument_type": "CE"})
+        chain.add_instrument({"instrument_token": 2, "strike": 19000, "instrument_type": "PE"})
+        chain.on_ticks([{"instrument_token": 256265, "last_price": 19000.0, "exchange_timestamp": NOW},
+                        {"instrument_token": 1, "last_price": 120.0}])
+        self.assertEqual(chain.dirty, {0})
+        first = chain.average_iv
+        self.assertTrue(10 < first < 40)
+        chain.on_ticks([{"instrument_token": 2, "last_price": 115.0}])
+        self.assertEqual(chain.dirty, {1})
+        self.assertNotEqual(chain.average_iv, first)
+        self.assertEqual(chain.net_credit, 0)  # Condor legs not quoted
+
+    def test_frozen_snapshot_matches_the_ticked_chain(self):
+        chain = OptionChain(EXPIRY, strike_selector=select_strikes)
+        chain.set_spot(19000.0, NOW)
+        for token, (strike, option_type, premium) in enumerate(
+                [(19150, "CE", 60.0), (19350, "CE", 30.0), (18850, "PE", 55.0), (18650, "PE", 25.0)]):
+            chain.add_instrument({"instrument_token": token, "strike": strike, "instrument_type": option_type})
+            chain.update(strike, option_type, premium)
+        chain.on_ticks([{"instrument_token": 0, "last_price": 70.0}])
+        snapshot = MarketSnapshot.from_chain(chain)
+        self.assertEqual((snapshot.spot, snapshot.timestamp, snapshot.expiry), (19000.0, NOW, EXPIRY))
+        self.assertEqual(snapshot.strikes, chain.strikes)
+        self.assertEqual(snapshot.net_credit, chain.net_credit)
+        self.assertEqual(snapshot.net_credit, (70 - 30 + 55 - 25) * 75)
+        self.assertAlmostEqual(snapshot.average_iv, chain.average_iv)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# tests/test_order_gateway.py
+"""Unit tests for freeze-quantity slicing in the order gateway."""
+
+import datetime
+import unittest
+
+from execution import LimitChaser
+from order_gateway import OrderGateway, split_quantity
+from order_tracker import OrderTracker
+from paper_exchange import PaperExchange, PaperKite, PaperTicker, index_instruments, option_instruments
+
+
+class TestSplitQuantity(unittest.TestCase):
+    def test_near_equal_lot_aligned_slices(self):
+        self.assertEqual(split_quantity(1800), [1800])
+        self.assertEqual(split_quantity(4500), [1500, 1500, 1500])
+        self.assertEqual(split_quantity(1875), [975, 900])
+
+
+class TestOrderGateway(unittest.TestCase):
+    def setUp(self):
+        expiry = datetime.date(2025, 1, 9)
+        # A deep touch, so every slice of one order can fill against it
+        self.exchange = PaperExchange(index_instruments() + option_instruments(23500, [expiry], strike_range=200),
+                                      touch_quantity=100000)
+        self.exchange.now = datetime.datetime(2025, 1, 6, 10, 0)
+        self.exchange.publish_price(256265, 23500)
+        self.kite = PaperKite(self.exchange)
+        ticker = PaperTicker(self.exchange)
+        self.tracker = OrderTracker().attach(ticker)
+        ticker.connect(threaded=True)
+        self.symbol = "NIFTY2510923600CE"
+
+    def place(self, gateway, quantity, order_type="MARKET", price=None):
+        return gateway.place_order(exchange="NFO", tradingsymbol=self.symbol, transaction_type="SELL",
+                                   quantity=quantity, product="NRML", order_type=order_type, price=price,
+                                   tag="IC1")
+
+    def test_child_slices_fill_as_one_order(self):
+        gateway = OrderGateway(self.kite, self.tracker, iceberg=False)
+        order_id = self.place(gateway, 4500)
+        self.assertEqual(len(gateway.children(order_id)), 3)
+        state, = self.tracker.wait_all_filled_sync([order_id], timeout=2)
+        self.assertEqual((state.quantity, state.filled_quantity), (4500, 4500))
+        self.assertGreater(state.average_price, 0)
+
+    def test_parent_is_not_filled_when_a_slice_is_rejected(self):
+        gateway = OrderGateway(self.kite, self.tracker, iceberg=False, lot_size=50)  # Slices of 50-multiples; the 950 one is rejected
+        order_id = self.place(gateway, 1850)
+        state = self.tracker.wait_terminal_sync(order_id, timeout=2)
+        self.assertEqual(state.status, "CANCELLED")
+        self.assertLess(state.filled_quantity, 1850)
+
+    def test_oversized_limit_order_goes_out_as_an_iceberg(self):
+        gateway = OrderGateway(self.kite, self.tracker)
+        order_id = self.place(gateway, 3600, order_type="LIMIT", price=5000)  # Rests
+        self.assertEqual(gateway.children(order_id), [order_id])
+        self.assertEqual(self.exchange.orders[order_id].variety, "iceberg")
+        self.assertTrue(gateway.cancel_order(order_id))
+        self.assertEqual(self.tracker.wait_terminal_sync(order_id, timeout=2).status, "CANCELLED")
+
+    def test_basket_keeps_order_and_reports_refusals(self):
+        gateway = OrderGateway(self.kite, self.tracker, iceberg=False)
+        order = dict(exchange="NFO", transaction_type="SELL", product="NRML", order_type="MARKET")
+        results = gateway.place_basket([dict(order, tradingsymbol=self.symbol, quantity=75),
+                                        dict(order, tradingsymbol="NIFTY25109UNKNOWNCE", quantity=75),
+                                        dict(order, tradingsymbol="NIFTY2510923400PE", quantity=3600)])
+        self.assertIsInstance(results[1], Exception)
+        states = self.tracker.wait_all_filled_sync([results[0], results[2]], timeout=2)
+        self.assertEqual([state.filled_quantity for state in states], [75, 3600])
+        self.assertEqual(len(gateway.children(results[2])), 2)
+
+    def test_chaser_works_sliced_orders(self):
+        gateway = OrderGateway(self.kite, self.tracker, iceberg=False)
+        chaser = LimitChaser(self.kite, self.tracker, steps=2, step_seconds=0.01, gateway=gateway)
+        result, = chaser.execute([{"exchange": "NFO", "tradingsymbol": self.symbol, "transaction_type": "SELL",
+                                   "quantity": 3600}], fallback="market")
+        self.assertEqual(result["status"], "COMPLETE")
+        self.assertEqual(result["filled_quantity"], 3600)
+
+
+if __name__ == "__main__":
+    unittest.main()
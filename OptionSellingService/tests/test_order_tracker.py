@@ -0,0 +1,59 @@
+# tests/test_order_tracker.py
+"""Unit tests for the push-based order tracker, fed by the paper exchange."""
+
+import asyncio
+import datetime
+import threading
+import unittest
+
+from order_tracker import OrderNotFilled, OrderTracker
+from paper_exchange import PaperExchange, PaperKite, PaperTicker, index_instruments, option_instruments
+
+
+class TestOrderTracker(unittest.TestCase):
+    def setUp(self):
+        expiry = datetime.date(2025, 1, 9)
+        self.exchange = PaperExchange(index_instruments() + option_instruments(23500, [expiry], strike_range=200))
+        self.exchange.now = datetime.datetime(2025, 1, 6, 10, 0)
+        self.exchange.publish_price(256265, 23500)
+        self.kite = PaperKite(self.exchange)
+        self.ticker = PaperTicker(self.exchange)
+        self.tracker = OrderTracker().attach(self.ticker)
+        self.ticker.connect(threaded=True)
+        self.symbol = "NIFTY2510923600CE"
+
+    def order(self, side="SELL", quantity=75, price=None, tag="IC1"):
+        order_id = self.kite.place_order("regular", "NFO", self.symbol, side, quantity, "NRML",
+                                         "LIMIT" if price else "MARKET", price=price, tag=tag)
+        self.tracker.track(order_id, tag)
+        return order_id
+
+    def test_wait_filled_and_bulk_queries(self):
+        filled = self.order()
+        rejected = self.order(quantity=50)
+        resting = self.order("BUY", price=1)
+        state = asyncio.run(self.tracker.wait_filled(filled, timeout=1))
+        self.assertEqual(state.filled_quantity, 75)
+        with self.assertRaises(OrderNotFilled) as caught:
+            asyncio.run(self.tracker.wait_filled(rejected, timeout=1))
+        self.assertEqual(caught.exception.state.status, "REJECTED")
+        self.assertEqual(self.tracker.statuses([filled, rejected, resting]),
+                         {filled: "COMPLETE", rejected: "REJECTED", resting: "OPEN"})
+        self.assertEqual({state.order_id for state in self.tracker.by_tag("IC1")}, {filled, rejected, resting})
+        self.assertEqual([state.order_id for state in self.tracker.open_orders()], [resting])
+
+    def test_waiter_woken_by_a_later_fill_on_another_thread(self):
+        order_id = self.order("BUY", price=10)
+        token = self.exchange.resolve("NFO", self.symbol)["instrument_token"]
+        threading.Timer(0.05, self.exchange.publish_price, (token, 9.5)).start()
+        states = self.tracker.wait_all_filled_sync([order_id], timeout=2)
+        self.assertEqual(states[0].average_price, 10)
+
+    def test_stale_updates_are_ignored(self):
+        self.tracker.update({"order_id": "1", "status": "COMPLETE", "filled_quantity": 75, "quantity": 75})
+        self.tracker.update({"order_id": "1", "status": "OPEN", "filled_quantity": 0, "quantity": 75})
+        self.assertEqual(self.tracker.get("1").status, "COMPLETE")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# tests/test_paper_exchange.py
+"""Unit tests for the paper-trading exchange."""
+
+import datetime
+import unittest
+
+from paper_exchange import PaperExchange, PaperKite, PaperTicker, index_instruments, option_instruments
+
+
+class TestPaperExchange(unittest.TestCase):
+    def setUp(self):
+        expiry = datetime.date(2025, 1, 9)
+        instruments = index_instruments() + option_instruments(23500, [expiry], strike_range=200)
+        self.exchange = PaperExchange(instruments, seed=1)
+        self.kite = PaperKite(self.exchange)
+        self.symbol = "NIFTY2510923600CE"
+        self.exchange.now = datetime.datetime(2025, 1, 6, 10, 0)
+        self.exchange.publish_price(256265, 23500)
+
+    def order(self, side, price=None, quantity=75):
+        return self.kite.place_order("regular", "NFO", self.symbol, side, quantity, "NRML",
+                                     "LIMIT" if price else "MARKET", price=price)
+
+    def status(self, order_id):
+        return self.kite.order_history(order_id)[-1]
+
+    def test_price_time_priority(self):
+        first = self.order("SELL", 500)
+        second = self.order("SELL", 500)
+        better = self.order("SELL", 499)
+        buy = self.order("BUY", 500, quantity=150)
+        self.assertEqual(self.status(better)["status"], "COMPLETE")
+        self.assertEqual(self.status(first)["status"], "COMPLETE")
+        self.assertEqual(self.status(second)["status"], "OPEN")
+        self.assertAlmostEqual(self.status(buy)["average_price"], 499.5)
+
+    def test_repriced_order_loses_priority_and_leaves_no_stale_level(self):
+        moved = self.order("BUY", 5)
+        self.kite.modify_order("regular", moved, price=4)
+        resting = self.order("BUY", 4.5)
+        self.kite.modify_order("regular", moved, price=4.2)
+        instrument = self.exchange.resolve("NFO", self.symbol)
+        book = self.exchange._books[instrument["instrument_token"]]
+        self.assertEqual(book.best_bid().order_id, resting)
+        self.assertEqual(book.levels("BUY"), [{"price": 4.5, "quantity": 75, "orders": 1},
+                                              {"price": 4.2, "quantity": 75, "orders": 1}])
+        sell = self.order("SELL", 4.2)
+        self.assertEqual(self.status(resting)["status"], "COMPLETE")
+        self.assertEqual(self.status(moved)["status"], "OPEN")
+        self.assertAlmostEqual(self.status(sell)["average_price"], 4.5)
+
+    def test_resting_order_fills_when_ticks_cross_it(self):
+        order_id = self.order("BUY", 10)
+        self.assertEqual(self.status(order_id)["status"], "OPEN")
+        token = self.exchange.resolve("NFO", self.symbol)["instrument_token"]
+        self.exchange.publish_price(token, 9.5)
+        self.assertEqual(self.status(order_id)["status"], "COMPLETE")
+        self.assertEqual(self.kite.positions()["net"][0]["quantity"], 75)
+
+    def test_fills_against_the_touch_are_capped_at_its_quantity(self):
+        token = self.exchange.resolve("NFO", self.symbol)["instrument_token"]
+        depth = {"buy": [{"price": 99.0, "quantity": 75, "orders": 1}],
+                 "sell": [{"price": 101.0, "quantity": 75, "orders": 1}]}
+        self.exchange.publish_price(token, 100.0, depth=depth)
+        market = self.order("BUY", quantity=150)
+        self.assertEqual((self.status(market)["status"], self.status(market)["filled_quantity"]), ("CANCELLED", 75))
+        limit = self.order("BUY", 101.0, quantity=150)  # The offer is used up until the next tick
+        self.assertEqual((self.status(limit)["status"], self.status(limit)["filled_quantity"]), ("OPEN", 0))
+        self.exchange.publish_price(token, 100.0, depth=depth)
+        self.assertEqual((self.status(limit)["status"], self.status(limit)["filled_quantity"]), ("OPEN", 75))
+        self.exchange.publish_price(token, 100.0, depth=depth)
+        self.assertEqual(self.status(limit)["status"], "COMPLETE")
+
+    def test_positions_have_the_kite_day_fields(self):
+        self.order("BUY", quantity=150)
+        self.order("SELL", quantity=75)
+        position, = self.kite.positions()["day"]
+        self.assertEqual(position["quantity"], 75)
+        self.assertAlmostEqual(position["day_buy_price"], position["day_buy_value"] / 150)
+        self.assertAlmostEqual(position["day_sell_price"], position["sell_price"])
+        self.assertAlmostEqual(position["value"], position["sell_value"] - position["buy_value"])
+
+    def test_freeze_quantity_and_lot_size_rejections(self):
+        self.assertEqual(self.status(self.order("SELL", quantity=1875))["status"], "REJECTED")
+        self.assertEqual(self.status(self.order("SELL", quantity=50))["status"], "REJECTED")
+
+    def test_ticker_receives_subscribed_ticks_and_order_updates(self):
+        ticks, updates = [], []
+        ticker = PaperTicker(self.exchange)
+        ticker.on_ticks = lambda ws, batch: ticks.extend(batch)
+        ticker.on_order_update = lambda ws, order: updates.append(order["status"])
+        ticker.connect(threaded=True)
+        ticker.subscribe([256265])
+        self.exchange.publish_price(256265, 23510)
+        self.exchange.publish_price(260105, 50000)
+        self.order("SELL")
+        self.assertEqual([tick["last_price"] for tick in ticks], [23510])
+        self.assertEqual(updates, ["OPEN", "COMPLETE"])
+
+
+if __name__ == "__main__":
+    unittest.main()
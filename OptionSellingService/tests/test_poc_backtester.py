@@ -0,0 +1,48 @@
+# tests/test_poc_backtester.py
+"""Regression test replaying the POC strategy (trade_zero) through its candle backtester."""
+
+import datetime
+import importlib
+import os
+import sys
+import unittest
+from unittest import mock
+
+from result_cache import ResultCache
+
+POC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "OptionSellingPOC")
+CANDLES = os.path.join(POC_DIR, "historical_data_^NSEI_20250101_20250131_30m.pkl")
+
+
+class TestPocBacktester(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if POC_DIR not in sys.path:
+            sys.path.append(POC_DIR)
+        # trade_zero connects at import: point it at the paper exchange
+        with mock.patch.dict(os.environ, {"KITE_PAPER": "1", "METRICS_PORT": "0"}):
+            cls.backtester = importlib.import_module("backtester")
+
+    def test_replay_holds_the_condor_to_the_last_candle(self):
+        backtester = self.backtester.Backtester(CANDLES, datetime.datetime(2025, 1, 6), datetime.datetime(2025, 1, 20),
+                                                cache=ResultCache(None))
+        with mock.patch("builtins.print"):
+            backtester.run_backtest(profile=False)
+        self.assertEqual(len(backtester.trade_log), 4)  # The four condor legs, none closed
+        self.assertEqual(backtester.final_pnl, 0)
+        # No rule fires during the replay (a spurious max_loss would stop it at the entry candle)
+        self.assertEqual(backtester.current_candle["date"], backtester.historical_data[-1]["date"])
+
+    def test_cache_key_covers_the_service_modules_the_replay_runs(self):
+        backtester = self.backtester.Backtester(CANDLES, datetime.datetime(2025, 1, 6), datetime.datetime(2025, 1, 20),
+                                                cache=ResultCache(None))
+        with mock.patch("builtins.print"):
+            backtester.load_historical_data()
+        with mock.patch.object(self.backtester, "code_version", return_value="0" * 16) as version:
+            backtester.cache_key()
+        covered = {os.path.basename(getattr(module, "__file__", module)) for module in version.call_args.args}
+        self.assertLessEqual({"trade_zero.py", "backtester.py", "risk_rules.py", "checkpoint.py", "fees.py"}, covered)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# tests/test_pricing.py
+"""Unit tests for the vectorized Black-Scholes pricing."""
+
+import math
+import unittest
+
+import numpy as np
+
+from pricing import bs_greeks, bs_price, bs_price_scalar, implied_vol
+
+RATE = 0.065
+
+
+class TestPricing(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.spot = 23500.0
+        self.strikes = np.arange(22000, 25050, 250, dtype=float)
+        self.t = rng.uniform(1 / 365, 0.25, len(self.strikes))
+        self.vols = rng.uniform(0.08, 0.6, len(self.strikes))
+
+    def test_implied_vol_recovers_the_pricing_vol(self):
+        for option_type in ("CE", "PE"):
+            prices = bs_price(self.spot, self.strikes, self.t, self.vols, option_type, RATE)
+            solved = implied_vol(prices, self.spot, self.strikes, self.t, option_type, RATE)
+            np.testing.assert_allclose(solved, self.vols, atol=1e-5)
+        # Below intrinsic value there is no vol to find
+        self.assertTrue(np.isnan(implied_vol(1.0, self.spot, 22000.0, 0.05, "CE", RATE)))
+
+    def test_put_call_parity(self):
+        calls = bs_price(self.spot, self.strikes, self.t, self.vols, "CE", RATE)
+        puts = bs_price(self.spot, self.strikes, self.t, self.vols, "PE", RATE)
+        np.testing.assert_allclose(calls - puts, self.spot - self.strikes * np.exp(-RATE * self.t), atol=1e-6)
+        deltas = [bs_greeks(self.spot, self.strikes, self.t, self.vols, option_type, RATE)["delta"]
+                  for option_type in ("CE", "PE")]
+        np.testing.assert_allclose(deltas[0] - deltas[1], 1.0, atol=1e-12)
+
+    def test_vectorized_grid_matches_scalar_pricing(self):
+        spots = np.array([23000.0, 23500.0, 24000.0])[:, None]
+        for option_type in ("CE", "PE"):
+            grid = bs_price(spots, self.strikes, self.t, self.vols, option_type, RATE)
+            self.assertEqual(grid.shape, (3, len(self.strikes)))
+            # The vectorized CDF is an approximation good to 1.5e-7, i.e. under a paisa at these spots
+            for i, spot in enumerate(spots[:, 0]):
+                for j, strike in enumerate(self.strikes):
+                    self.assertTrue(math.isclose(grid[i, j], bs_price_scalar(spot, strike, self.t[j], self.vols[j],
+                                                                              option_type, RATE), abs_tol=1e-2))
+        # Expired options price at intrinsic on both paths
+        self.assertEqual(bs_price(23500.0, 23400.0, 0.0, 0.2, "CE", RATE), 100.0)
+        self.assertEqual(bs_price_scalar(23500.0, 23400.0, 0.0, 0.2, "PE", RATE), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
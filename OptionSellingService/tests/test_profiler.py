@@ -0,0 +1,50 @@
+# tests/test_profiler.py
+"""Unit tests for the sampling profiler."""
+
+import json
+import tempfile
+import time
+import unittest
+
+from profiler import SamplingProfiler
+
+
+def busy_leaf(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def busy_caller(seconds):
+    return busy_leaf(seconds)
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_samples_a_busy_function_into_folded_stacks_and_its_cycle(self):
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = SamplingProfiler("test", interval=0.002, output_dir=directory).start()
+            with profiler.cycle("monitor"):
+                busy_caller(0.3)
+            profiler.stop()
+            with open(profiler.path_prefix + ".folded") as f:
+                folded = [line.rsplit(" ", 1) for line in f.read().splitlines()]
+            with open(profiler.path_prefix + ".cycles.json") as f:
+                cycles = json.load(f)["cycles"]
+        busy = [(stack.split(";"), int(count)) for stack, count in folded if "busy_leaf (test_profiler.py" in stack]
+        self.assertTrue(busy)
+        # Callers come first and the sampled function last, as flamegraph.pl expects
+        stack, _ = max(busy, key=lambda entry: entry[1])
+        self.assertTrue(stack[-2].startswith("busy_caller (test_profiler.py"))
+        self.assertTrue(stack[-1].startswith("busy_leaf (test_profiler.py"))
+        self.assertGreater(sum(count for _, count in busy), 10)
+        self.assertEqual(cycles["monitor"]["cycles"], 1)
+        # Every frame under the cycle ties on cumulative samples, so look past the report's top 20
+        leaf = [function for function in profiler.cycle_report(top=None)["monitor"]["functions"]
+                if function["function"].startswith("busy_leaf")]
+        self.assertGreater(leaf[0]["self_s"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+# tests/test_result_cache.py
+"""Unit tests for the content-addressed result cache."""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import backtest
+from result_cache import MISS, ResultCache, fingerprint
+from tests.test_backtest import make_history
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_fingerprint_follows_content(self):
+        self.assertEqual(fingerprint(np.arange(3), {"a": 1, "b": [2]}), fingerprint(np.arange(3), {"b": [2], "a": 1}))
+        self.assertNotEqual(fingerprint(np.arange(3)), fingerprint(np.arange(3.0)))
+        self.assertNotEqual(fingerprint("ab", "c"), fingerprint("a", "bc"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResultCache(self.directory.name, max_bytes=2500)
+        for key in ("a", "b"):
+            cache.put(key, b"x" * 1000)
+            time.sleep(0.01)
+        self.assertIsNotNone(cache.get("a"))  # Now more recent than b
+        cache.put("c", b"x" * 1000)
+        self.assertIs(cache.get("b"), MISS)
+        self.assertEqual([cache.get(key) for key in ("a", "c")], [b"x" * 1000] * 2)
+        cache.put("d", None)
+        self.assertIsNone(cache.get("d"))
+
+    @mock.patch("strategy.check_economic_calendar", return_value=False)
+    def test_rerun_simulates_only_changed_cycles(self, calendar):
+        cache = ResultCache(self.directory.name)
+        data = make_history()
+        last_cycle = data["expiry"] == data["expiry"].max()
+        changed = data.assign(premium=np.where(last_cycle, data["premium"] * 1.1, data["premium"]))
+        totals, simulated = [], []
+        with mock.patch("backtest.log_trade"), mock.patch("builtins.print"), \
+                mock.patch("backtest.simulate_cycle", side_effect=backtest.simulate_cycle) as simulate:
+            for history in (data, data, changed):
+                with mock.patch("backtest.load_historical_data", return_value=history.copy()):
+                    totals.append(backtest.run_backtest(workers=1, cache=cache))
+                simulated.append(simulate.call_count)
+                simulate.reset_mock()
+        self.assertEqual(simulated, [len(backtest.partition_cycles(data)[1]), 0, 1])
+        self.assertEqual(totals[0], totals[1])
+
+    def test_cycle_key_covers_pricing_code_and_rate(self):
+        rows, cycles = backtest.partition_cycles(make_history())
+        columns = {name: rows[name].to_numpy() for name in backtest._COLUMNS}
+        expiry, start, stop = cycles[0]
+        key = backtest.cycle_key(columns, expiry, start, stop, 1)
+        with mock.patch("config.RISK_FREE_RATE", 0.07):
+            self.assertNotEqual(backtest.cycle_key(columns, expiry, start, stop, 1), key)
+        with mock.patch("backtest.code_version", return_value="0" * 16) as version:
+            backtest.cycle_key(columns, expiry, start, stop, 1)
+        covered = {os.path.basename(path) for path in version.call_args.args}
+        self.assertLessEqual({"pricing.py", "vol_surface.py", "fees.py", "strategy.py"}, covered)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+# tests/test_risk_rules.py
+"""Unit tests for the compiled risk-rule engine."""
+
+import datetime
+import unittest
+
+from risk_rules import RiskEngine, compile_rules
+
+RULES = {
+    "condor": [
+        {"type": "take_profit", "pnl": 1500},
+        {"type": "max_loss", "pnl": -2000},
+        {"type": "credit_stop", "multiple": 3},
+        {"type": "trailing_stop", "trigger": 800, "trail": 200},
+        {"type": "exit_time", "time": "15:20"},
+    ],
+}
+MORNING = datetime.time(10, 0)
+
+
+class TestRiskEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = RiskEngine(RULES, capacity=1)  # Forces the slot arrays to grow
+
+    def test_leg_marked_positions(self):
+        self.engine.open("a", "condor", legs={"CE": -75, "PE": -75}, credit=600)
+        self.engine.on_tick("CE", 4)
+        self.assertEqual(self.engine.evaluate(MORNING), [])  # Not evaluated until every leg is priced
+        self.engine.on_tick("PE", 4)
+        self.assertEqual(self.engine.evaluate(MORNING), [])
+        self.assertEqual(self.engine.pnl("a"), 0)
+        self.engine.on_tick("CE", 28)
+        self.assertEqual(self.engine.evaluate(MORNING), [("a", "credit_stop")])  # Loss of 1800 = 3x credit
+
+    def test_trailing_stop_follows_the_peak(self):
+        self.engine.open("a", "condor")
+        self.engine.open("b", "condor")
+        self.engine.set_pnl("b", 0)
+        for pnl in (500, 900, 1300):
+            self.engine.set_pnl("a", pnl)
+            self.assertEqual(self.engine.evaluate(MORNING), [])
+        self.assertEqual(self.engine.trailing_stop("a"), 1100)
+        self.assertIsNone(self.engine.trailing_stop("b"))
+        self.engine.set_pnl("a", 1050)
+        self.assertEqual(self.engine.evaluate(MORNING), [("a", "trailing_stop")])
+
+    def test_exit_time_and_closed_positions(self):
+        self.engine.open("a", "condor")
+        self.engine.set_pnl("a", 0)
+        self.engine.close("a")
+        self.engine.open("b", "condor")
+        self.engine.set_pnl("b", 0)
+        self.assertEqual(self.engine.evaluate(datetime.time(15, 20)), [("b", "exit_time")])
+
+    def test_unknown_rule_type(self):
+        with self.assertRaises(ValueError):
+            compile_rules([{"type": "delta_stop"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# tests/test_session_manager.py
+"""Unit tests for the shared Kite session store (Zerodha/Connection/session_manager.py)."""
+
+import datetime
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from kiteconnect.exceptions import TokenException
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+if REPO_DIR not in sys.path:
+    sys.path.append(REPO_DIR)
+
+from Zerodha.Connection.session_manager import SessionManager  # noqa: E402
+
+
+class StubKite:
+    """Accepts the tokens in ``valid`` and counts profile() calls."""
+
+    def __init__(self, valid):
+        self.valid = valid
+        self.access_token = None
+        self.profile_calls = 0
+
+    def set_access_token(self, access_token):
+        self.access_token = access_token
+
+    def profile(self):
+        self.profile_calls += 1
+        if self.access_token not in self.valid:
+            raise TokenException("Incorrect `api_key` or `access_token`.")
+        return {"user_id": "AB1234"}
+
+
+class TestSessionManager(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store_path = os.path.join(directory.name, "kite_session.json")
+        self.now = datetime.datetime(2025, 1, 6, 8, 45)
+        self.tokens = set()
+        self.logins = 0
+
+    def login(self, kite):
+        self.logins += 1
+        token = f"token{self.logins}"
+        self.tokens.add(token)
+        return {"access_token": token, "user_id": "AB1234"}
+
+    def manager(self, login=None):
+        return SessionManager("key", login=login or self.login, store_path=self.store_path, clock=lambda: self.now)
+
+    def test_valid_stored_token_is_reused(self):
+        first = self.manager().session(StubKite(self.tokens))
+        self.assertEqual((first["access_token"], first["session_day"]), ("token1", "2025-01-06"))
+        kite = StubKite(self.tokens)
+        self.assertEqual(self.manager().session(kite)["access_token"], "token1")
+        self.assertEqual(kite.profile_calls, 0)  # Validated at login, within VALIDATION_TTL
+        self.now += datetime.timedelta(hours=3)
+        self.assertEqual(self.manager().session(kite)["access_token"], "token1")
+        self.assertEqual((kite.profile_calls, self.logins), (1, 1))
+        # A token the API rejects is replaced
+        self.tokens.clear()
+        self.now += datetime.timedelta(hours=1)
+        self.assertEqual(self.manager().session(kite)["access_token"], "token2")
+
+    def test_logs_in_again_after_the_session_day_rolls_over(self):
+        self.manager().session(StubKite(self.tokens))
+        self.now = datetime.datetime(2025, 1, 7, 5, 59)  # Before the 6 AM reset: still the 6th's session
+        self.assertEqual(self.manager().session(StubKite(self.tokens))["access_token"], "token1")
+        self.now = datetime.datetime(2025, 1, 7, 6, 1)
+        self.assertIsNone(self.manager().read())
+        session = self.manager().session(StubKite(self.tokens))
+        self.assertEqual((session["access_token"], session["session_day"]), ("token2", "2025-01-07"))
+
+    def test_contending_managers_log_in_once(self):
+        start = threading.Barrier(2)
+
+        def slow_login(kite):
+            time.sleep(0.2)  # Long enough for the other manager to queue on the lock
+            return self.login(kite)
+
+        sessions = []
+
+        def run():
+            start.wait()
+            sessions.append(self.manager(slow_login).session(StubKite(self.tokens)))
+
+        threads = [threading.Thread(target=run) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.logins, 1)
+        self.assertEqual([session["access_token"] for session in sessions], ["token1", "token1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,19 +1,70 @@
 # tests/test_strategy.py
 """Unit tests for the strategy module."""
 
+import datetime
 import unittest
-from ..strategy import check_entry_conditions, select_strikes
+from unittest import mock
+
+from strategy import MarketSnapshot, check_economic_calendar, check_entry_conditions, held_lots, select_strikes
+
+
+def make_snapshot(iv=30, spot=19000):
+    premiums = {(19150, "CE"): 60, (19350, "CE"): 30, (18850, "PE"): 55, (18650, "PE"): 25,
+                (19000, "CE"): 120, (19000, "PE"): 115}
+    chain = tuple({"strike": strike, "option_type": option_type, "premium": premium, "iv": iv}
+                  for (strike, option_type), premium in premiums.items())
+    return MarketSnapshot(spot, chain, datetime.datetime(2025, 1, 7, 10, 45), datetime.date(2025, 1, 9))
 
 
 class TestStrategy(unittest.TestCase):
-    def test_check_entry_conditions(self):
-        options_chain = {"iv": 30, "net_credit": 150, "events": False}
-        self.assertTrue(check_entry_conditions(options_chain))
+    @mock.patch("strategy.check_economic_calendar", return_value=False)
+    def test_check_entry_conditions(self, calendar):
+        snapshot = make_snapshot()
+        self.assertTrue(check_entry_conditions(snapshot))
+        self.assertEqual(snapshot.net_credit, 60 * 75)
+        self.assertEqual(snapshot.average_iv, 30)
+        calendar.assert_called_once_with("2025-01-09")
+        self.assertFalse(check_entry_conditions(make_snapshot(iv=10)))
+
+    @mock.patch("strategy._calendar", {})
+    @mock.patch("strategy.requests.get")
+    def test_economic_calendar_is_fetched_once_a_day(self, get):
+        get.return_value.json.return_value = {"economic_calendar": [{"impact": "High", "date": "2025-01-08"}]}
+        self.assertTrue(check_economic_calendar("2025-01-09"))
+        self.assertTrue(check_economic_calendar("2025-01-09"))
+        self.assertEqual(get.call_count, 1)
+        get.side_effect = OSError("unreachable")  # Failures are not cached
+        self.assertFalse(check_economic_calendar("2025-01-16"))
+        get.side_effect = None
+        self.assertTrue(check_economic_calendar("2025-01-16"))
+        self.assertEqual(get.call_count, 3)
 
     def test_select_strikes(self):
         strikes = select_strikes(19000)
         self.assertEqual(strikes["sold_call"], 19150)
 
+    def test_sold_strikes_follow_the_surface_delta(self):
+        chain = tuple({"strike": strike, "option_type": option_type, "premium": 10,
+                       "iv": 30 + abs(strike - 19000) / 100}
+                      for strike in range(18000, 20050, 50) for option_type in ("CE", "PE"))
+        snapshot = MarketSnapshot(19000, chain, datetime.datetime(2025, 1, 7, 10, 45), datetime.date(2025, 1, 16))
+        with mock.patch("strategy.SOLD_STRIKE_DELTA", 0.16):
+            strikes = snapshot.strikes
+        self.assertEqual(strikes["sold_call"], snapshot.surface.strike_for_delta(
+            snapshot.expiry, 0.16, "CE", range(19150, 20050, 50), 19000, snapshot.timestamp))
+        self.assertGreater(strikes["sold_call"], 19150)
+        self.assertLess(strikes["sold_put"], 18850)
+        self.assertEqual(strikes["bought_call"], strikes["sold_call"] + 200)
+        # A delta target closer than STRIKE_DISTANCE keeps the distance rule
+        with mock.patch("strategy.SOLD_STRIKE_DELTA", 0.6):
+            self.assertEqual(select_strikes(19000, snapshot.surface, snapshot.expiry, snapshot.timestamp,
+                                            [opt["strike"] for opt in chain]), select_strikes(19000))
+
+    def test_held_lots_merge_legs_on_the_same_contract(self):
+        # An adjustment's condor sharing the old bought call, and a put spread closed at the broker
+        legs = [(19150, "CE", -150), (19350, "CE", 75), (19350, "CE", -75), (19550, "CE", 75), (18850, "PE", 0)]
+        self.assertEqual(held_lots(legs), {(19150, "CE"): -2, (19550, "CE"): 1})
+
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
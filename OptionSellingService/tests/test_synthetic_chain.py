@@ -0,0 +1,70 @@
+# tests/test_synthetic_chain.py
+"""Unit tests for the synthetic option chain generator."""
+
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from pricing import bs_price
+from synthetic_chain import SyntheticChain
+
+EXPIRIES = [datetime.date(2025, 1, 9), datetime.date(2025, 1, 16)]
+
+
+def make_candles():
+    dates = pd.date_range("2025-01-06 09:15", "2025-01-16 15:15", freq="30min")
+    dates = dates[(dates.dayofweek < 5) & (dates.time >= datetime.time(9, 15)) & (dates.time <= datetime.time(15, 15))]
+    close = 23500 + 100 * np.sin(np.arange(len(dates)) / 5)
+    return pd.DataFrame({"date": dates, "close": close})
+
+
+class TestSyntheticChain(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.chain = SyntheticChain(make_candles(), iv_model=0.15, strike_range=200, cache_dir=self.directory.name)
+
+    def test_each_expiry_covers_its_own_cycle(self):
+        self.assertEqual(self.chain.expiries()[:2], EXPIRIES)
+        first, second = (self.chain.for_expiry(expiry) for expiry in EXPIRIES)
+        self.assertLessEqual(first["date"].max(), pd.Timestamp("2025-01-09 15:30"))
+        self.assertGreater(second["date"].min(), pd.Timestamp("2025-01-09 15:30"))
+        self.assertTrue((first["expiry"] == EXPIRIES[0]).all())
+        self.assertEqual(set(first["option_type"]), {"CE", "PE"})
+        self.assertTrue((first["strike"] % 50 == 0).all())
+        self.assertLessEqual(first["strike"].min(), first["spot_price"].min() - 200)
+        self.assertGreaterEqual(first["strike"].max(), first["spot_price"].max() + 200)
+        row = first.iloc[len(first) // 3]
+        t = (pd.Timestamp("2025-01-09 15:30") - row["date"]).total_seconds() / (365 * 24 * 3600)
+        self.assertAlmostEqual(row["premium"], round(float(bs_price(row["spot_price"], row["strike"], t, 0.15,
+                                                                    row["option_type"], self.chain.rate)), 2))
+        self.assertTrue(np.allclose(first["iv"], 15.0))
+
+    def test_chains_are_generated_once_and_cached_on_disk(self):
+        generated = mock.patch.object(SyntheticChain, "_generate", autospec=True, side_effect=SyntheticChain._generate)
+        with generated as generate:
+            chain = self.chain.for_expiry(EXPIRIES[0])
+            self.assertIs(self.chain.for_expiry(EXPIRIES[0]), chain)
+            self.assertEqual(generate.call_count, 1)
+            self.assertEqual(len(os.listdir(self.directory.name)), 1)
+            reloaded = SyntheticChain(make_candles(), iv_model=0.15, strike_range=200, cache_dir=self.directory.name)
+            pd.testing.assert_frame_equal(reloaded.for_expiry(EXPIRIES[0]), chain)
+            self.assertEqual(generate.call_count, 1)
+            # A different vol model is a different chain
+            SyntheticChain(make_candles(), iv_model=0.2, strike_range=200,
+                           cache_dir=self.directory.name).for_expiry(EXPIRIES[0])
+            self.assertEqual(generate.call_count, 2)
+        # Callables without a cache_key are never cached on disk
+        uncached = SyntheticChain(make_candles(), iv_model=lambda spot, strikes, t, timestamps: 0.15,
+                                  strike_range=200, cache_dir=self.directory.name)
+        pd.testing.assert_frame_equal(uncached.for_expiry(EXPIRIES[0]), chain)
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# tests/test_tick_store.py
+"""Unit tests for the tick ring buffer and daily tick files."""
+
+import datetime
+import os
+import tempfile
+import unittest
+
+from tick_store import SnapshotWriter, TickRecorder, TickRing, iter_ticks, read_ticks, snapshot_at
+
+START = datetime.datetime(2025, 1, 6, 9, 15)
+
+
+def ticks(count, token=256265, start=0):
+    return [{"instrument_token": token, "last_price": 23500.0 + i, "volume_traded": i,
+             "exchange_timestamp": START + datetime.timedelta(seconds=i)} for i in range(start, start + count)]
+
+
+class TestTickRing(unittest.TestCase):
+    def test_wraps_around_and_drops_when_full(self):
+        ring = TickRing(capacity=8)
+        self.assertEqual(ring.push(ticks(6)), 6)
+        self.assertEqual(list(ring.drain()["volume_traded"]), list(range(6)))
+        self.assertEqual(ring.push(ticks(10, start=6)), 8)  # Wraps past the end; two don't fit
+        self.assertEqual(ring.dropped, 2)
+        self.assertEqual(list(ring.drain()["volume_traded"]), list(range(6, 14)))
+
+
+class TestTickRecorder(unittest.TestCase):
+    def test_round_trip_across_days_and_a_torn_chunk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = TickRecorder(directory, capacity=64)
+            recorder.on_ticks(None, ticks(3))
+            recorder.flush()
+            next_day = ticks(1)
+            next_day[0]["exchange_timestamp"] += datetime.timedelta(days=1)
+            recorder.on_ticks(None, ticks(2, start=3) + next_day)
+            recorder.flush()
+            path = os.path.join(directory, "2025-01-06.ticks")
+            with open(path, "ab") as f:
+                f.write(b"TKS1\x05\x00\x00\x00\x10")  # A crash mid-append
+            rows = read_ticks(path)
+            self.assertEqual(list(rows["volume_traded"]), [0, 1, 2, 3, 4])
+            self.assertEqual(len(read_ticks(directory)["last_price"]), 6)
+            replayed = list(iter_ticks(path))
+            self.assertEqual(replayed[4]["exchange_timestamp"], START + datetime.timedelta(seconds=4))
+            self.assertEqual(replayed[4]["last_price"], 23504.0)
+
+
+class TestSnapshotWriter(unittest.TestCase):
+    def test_skips_unchanged_quotes_and_fills_forward(self):
+        instruments = [{"instrument_token": token, "tradingsymbol": f"NIFTY{token}CE", "name": "NIFTY",
+                        "instrument_type": "CE", "expiry": "2025-01-09", "strike": float(token)}
+                       for token in (23400, 23500, 23600)]
+        quotes = [{"instrument_token": token, "last_price": 100.0, "oi": 10} for token in (23400, 23500, 23600)]
+        with tempfile.TemporaryDirectory() as directory:
+            writer = SnapshotWriter(directory)
+            self.assertEqual(writer.write(quotes, instruments, START), 3)
+            self.assertEqual(writer.write(quotes, instruments, START + datetime.timedelta(minutes=1)), 0)
+            quotes[1] = dict(quotes[1], last_price=120.0)
+            self.assertEqual(writer.write(quotes, instruments, START + datetime.timedelta(minutes=2)), 1)
+
+            book = snapshot_at(directory).set_index("instrument_token")
+            self.assertEqual(list(book["last_price"]), [100.0, 120.0, 100.0])
+            self.assertEqual(book.loc[23500, "exchange_timestamp"], START + datetime.timedelta(minutes=2))
+            self.assertEqual(book.loc[23600, "tradingsymbol"], "NIFTY23600CE")
+            earlier = snapshot_at(directory, START + datetime.timedelta(minutes=1)).set_index("instrument_token")
+            self.assertEqual(earlier.loc[23500, "last_price"], 100.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
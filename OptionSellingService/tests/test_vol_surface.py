@@ -0,0 +1,45 @@
+# tests/test_vol_surface.py
+"""Unit tests for the implied-volatility surface."""
+
+import datetime
+import math
+import unittest
+
+from vol_surface import VolSurface
+
+
+class TestVolSurface(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime.datetime(2025, 1, 6, 10, 0)
+        self.near = datetime.date(2025, 1, 9)
+        self.far = datetime.date(2025, 1, 16)
+        self.surface = VolSurface(23500, as_of=self.now)
+        for strike in range(22500, 24600, 100):
+            k = math.log(strike / 23500)
+            self.surface.update_iv(self.near, strike, 0.13 - 0.1 * k + 0.5 * k * k)
+            self.surface.update_iv(self.far, strike, 0.15)
+
+    def test_recovers_quadratic_smile(self):
+        k = math.log(23725 / 23500)
+        self.assertAlmostEqual(self.surface.iv(23725, self.near), 0.13 - 0.1 * k + 0.5 * k * k, places=6)
+
+    def test_incremental_update_matches_refit(self):
+        self.surface.update_iv(self.near, 23500, 0.2)
+        refit = VolSurface(23500)
+        for strike, (_, vol, weight) in self.surface.smiles[self.near].points.items():
+            refit.update_iv(self.near, strike, vol, weight)
+        self.assertAlmostEqual(self.surface.iv(23600, self.near), refit.iv(23600, self.near), places=9)
+
+    def test_interpolates_total_variance_between_expiries(self):
+        mid = datetime.date(2025, 1, 13)
+        vol = self.surface.iv(23500, mid, self.now)
+        self.assertTrue(self.surface.iv(23500, self.near) < vol < self.surface.iv(23500, self.far))
+
+    def test_price_round_trips_through_implied_vol(self):
+        premium = self.surface.price(23700, self.near, "CE", now=self.now)
+        vol = self.surface.update_price(self.near, 23700, "CE", premium, self.now)
+        self.assertAlmostEqual(vol, self.surface.iv(23700, self.near), places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,482 @@
+# tick_store.py
+"""Record live ticks into compressed, columnar, append-only daily files.
+
+TickRecorder sits on a KiteTicker's ``on_ticks`` callback. Each batch of
+ticks is copied field by field into preallocated NumPy ring-buffer columns
+and the callback returns; it never waits on disk or a lock. A background
+thread drains the ring every TICK_FLUSH_SECONDS and appends one chunk per
+trading day to ``<directory>/<YYYY-MM-DD>.ticks``: a small header, then each
+column zlib-compressed (timestamps delta-encoded first). A chunk cut short
+by a crash is ignored when reading, so files are only ever appended to.
+
+The files are a data source for the paper exchange (``iter_ticks``), the
+service backtester (``chain_frame``) and the POC backtester (``spot_candles``).
+Polled quotes (e.g. option chains fetched over HTTP) go into the same files
+through SnapshotWriter, and ``snapshot_at`` reads the book back as of any time.
+"""
+
+import datetime
+import glob
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from config import TICK_DIR, TICK_BUFFER_CAPACITY, TICK_FLUSH_SECONDS, RISK_FREE_RATE
+from instruments import INDICES
+from pricing import implied_vol
+from candle_series import CandleSeries
+
+TICK_FILE_SUFFIX = ".ticks"
+MAGIC = b"TKS1"
+EXPIRY_CLOSE = datetime.time(15, 30)
+# Column name, dtype; a file's columns are always written in this order
+COLUMNS = (
+    ("exchange_timestamp", "int64"),  # ns since epoch, exchange-local time
+    ("received", "int64"),  # ns since epoch (UTC) when the batch reached the recorder
+    ("instrument_token", "int64"),
+    ("last_price", "float64"),
+    ("last_traded_quantity", "int64"),
+    ("volume_traded", "int64"),
+    ("oi", "int64"),
+    ("bid", "float64"),
+    ("bid_quantity", "int64"),
+    ("ask", "float64"),
+    ("ask_quantity", "int64"),
+)
+DELTA_COLUMNS = {"exchange_timestamp", "received"}
+_HEADER = struct.Struct("<4sI")
+_LENGTH = struct.Struct("<I")
+
+
+def _touch(tick, side):
+    levels = (tick.get("depth") or {}).get(side) or ()
+    return (levels[0]["price"], levels[0]["quantity"]) if levels else (np.nan, 0)
+
+
+class TickRing:
+    """Single-producer, single-consumer ring of tick columns.
+
+    ``push`` (the ticker thread) and ``drain`` (the flush thread) each only
+    advance their own counter, so neither takes a lock. When the ring is full
+    new ticks are dropped and counted rather than blocking the producer.
+    """
+
+    def __init__(self, capacity=TICK_BUFFER_CAPACITY):
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS}
+        self.head = 0  # Rows ever written
+        self.tail = 0  # Rows ever drained
+        self.dropped = 0
+
+    def push(self, ticks, received=None):
+        """Append a batch of Kite tick dicts; returns the number kept."""
+        count = min(len(ticks), self.capacity - (self.head - self.tail))
+        if count < len(ticks):
+            self.dropped += len(ticks) - count
+            ticks = ticks[:count]
+        if not count:
+            return 0
+        received = received or time.time_ns()
+        stamps = [tick.get("exchange_timestamp") or tick.get("last_trade_time") for tick in ticks]
+        bids = [_touch(tick, "buy") for tick in ticks]
+        asks = [_touch(tick, "sell") for tick in ticks]
+        values = {
+            "exchange_timestamp": np.array([stamp or datetime.datetime.now() for stamp in stamps],
+                                           dtype="datetime64[ns]").view("int64"),
+            "received": received,
+            "instrument_token": [tick["instrument_token"] for tick in ticks],
+            "last_price": [tick.get("last_price", np.nan) for tick in ticks],
+            "last_traded_quantity": [tick.get("last_traded_quantity", 0) for tick in ticks],
+            "volume_traded": [tick.get("volume_traded", 0) for tick in ticks],
+            "oi": [tick.get("oi", 0) for tick in ticks],
+            "bid": [price for price, _ in bids],
+            "bid_quantity": [quantity for _, quantity in bids],
+            "ask": [price for price, _ in asks],
+            "ask_quantity": [quantity for _, quantity in asks],
+        }
+        start = self.head % self.capacity
+        first = min(count, self.capacity - start)
+        for name, column in self.columns.items():
+            value = values[name]
+            if np.isscalar(value):
+                column[start:start + first] = value
+                column[:count - first] = value
+            else:
+                column[start:start + first] = value[:first]
+                column[:count - first] = value[first:]
+        self.head += count  # Publish only after the rows are written
+        return count
+
+    def drain(self):
+        """Copy out and release every row pushed so far; returns a dict of column arrays."""
+        head, tail = self.head, self.tail
+        count = head - tail
+        start = tail % self.capacity
+        first = min(count, self.capacity - start)
+        rows = {name: np.concatenate([column[start:start + first], column[:count - first]])
+                for name, column in self.columns.items()}
+        self.tail = head
+        return rows
+
+
+def encode_chunk(rows):
+    """Serialize a dict of equal-length columns into one compressed chunk."""
+    count = len(rows["instrument_token"])
+    parts = [_HEADER.pack(MAGIC, count)]
+    for name, dtype in COLUMNS:
+        values = np.ascontiguousarray(rows[name], dtype=dtype)
+        if name in DELTA_COLUMNS:
+            values = np.diff(values, prepend=np.int64(0))
+        blob = zlib.compress(values.tobytes(), 1)
+        parts.append(_LENGTH.pack(len(blob)))
+        parts.append(blob)
+    return b"".join(parts)
+
+
+def read_chunks(path):
+    """Yield each complete chunk of a tick file as a dict of column arrays."""
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        magic, count = _HEADER.unpack_from(data, offset)
+        if magic != MAGIC:
+            return
+        position = offset + _HEADER.size
+        rows = {}
+        for name, dtype in COLUMNS:
+            if position + _LENGTH.size > len(data):
+                return  # Truncated by a crash mid-write
+            length, = _LENGTH.unpack_from(data, position)
+            position += _LENGTH.size
+            if position + length > len(data):
+                return
+            values = np.frombuffer(zlib.decompress(data[position:position + length]), dtype=dtype)
+            rows[name] = np.cumsum(values) if name in DELTA_COLUMNS else values
+            position += length
+        offset = position
+        yield rows
+
+
+def read_ticks(path):
+    """Every tick in one file (or a directory of files), as a dict of column arrays in time order."""
+    paths = sorted(glob.glob(os.path.join(path, f"*{TICK_FILE_SUFFIX}"))) if os.path.isdir(path) else [path]
+    chunks = [chunk for file_path in paths for chunk in read_chunks(file_path)]
+    if not chunks:
+        return {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS}
+    rows = {name: np.concatenate([chunk[name] for chunk in chunks]) for name, _ in COLUMNS}
+    order = np.argsort(rows["exchange_timestamp"], kind="stable")
+    return {name: values[order] for name, values in rows.items()}
+
+
+def read_instruments(path):
+    """Instrument records saved next to tick files, keyed by instrument token."""
+    paths = (sorted(glob.glob(os.path.join(path, "*.instruments.json"))) if os.path.isdir(path)
+             else [path[:-len(TICK_FILE_SUFFIX)] + ".instruments.json"])
+    instruments = {}
+    for file_path in paths:
+        if os.path.exists(file_path):
+            with open(file_path) as f:
+                for record in json.load(f):
+                    if record.get("expiry"):
+                        record["expiry"] = datetime.date.fromisoformat(record["expiry"])
+                    instruments[record["instrument_token"]] = record
+    return instruments
+
+
+def iter_ticks(path):
+    """Yield recorded ticks as Kite tick dicts, e.g. for ``PaperExchange.replay``."""
+    rows = read_ticks(path)
+    stamps = rows["exchange_timestamp"].view("datetime64[ns]").astype("datetime64[us]").tolist()
+    columns = [(name, rows[name].tolist()) for name in ("instrument_token", "last_price", "volume_traded", "oi")]
+    bids, bid_quantities = rows["bid"].tolist(), rows["bid_quantity"].tolist()
+    asks, ask_quantities = rows["ask"].tolist(), rows["ask_quantity"].tolist()
+    for i, stamp in enumerate(stamps):
+        tick = {name: values[i] for name, values in columns}
+        tick["exchange_timestamp"] = stamp
+        if bids[i] == bids[i] and asks[i] == asks[i]:  # Not NaN
+            tick["depth"] = {"buy": [{"price": bids[i], "quantity": bid_quantities[i], "orders": 1}],
+                             "sell": [{"price": asks[i], "quantity": ask_quantities[i], "orders": 1}]}
+        yield tick
+
+
+def spot_candles(path, instrument_token=256265, interval="1min"):
+    """OHLCV candles of one instrument from recorded ticks, as a CandleSeries."""
+    rows = read_ticks(path)
+    mine = rows["instrument_token"] == instrument_token
+    if not mine.any():
+        return CandleSeries()
+    prices = pd.Series(rows["last_price"][mine], index=pd.to_datetime(rows["exchange_timestamp"][mine]))
+    candles = prices.resample(interval).ohlc().dropna()
+    volume = pd.Series(rows["volume_traded"][mine], index=prices.index).resample(interval).last()
+    candles["volume"] = volume.diff().fillna(0).clip(lower=0).reindex(candles.index).astype(int)
+    return CandleSeries.from_frame(candles)
+
+
+def chain_frame(path, spot_token=256265, interval="1min", rate=RISK_FREE_RATE):
+    """Option chain snapshots from recorded ticks, one per ``interval``, in the backtester's chain format.
+
+    Returns:
+        pandas.DataFrame: Rows of date, spot_price, expiry, strike, option_type, premium, iv (percent).
+    """
+    rows = read_ticks(path)
+    instruments = read_instruments(path)
+    frame = pd.DataFrame({"token": rows["instrument_token"], "price": rows["last_price"]},
+                         index=pd.to_datetime(rows["exchange_timestamp"]))
+    frame["date"] = frame.index.floor(interval)
+    last = frame.groupby(["date", "token"])["price"].last().reset_index()
+    spot = last[last["token"] == spot_token].set_index("date")["price"]
+    options = last[last["token"].map(lambda token: token in instruments and
+                                     instruments[token].get("instrument_type") in ("CE", "PE"))].copy()
+    options["spot_price"] = options["date"].map(spot)
+    options = options.dropna(subset=["spot_price"])
+    records = [instruments[token] for token in options["token"]]
+    options["expiry"] = [record["expiry"] for record in records]
+    options["strike"] = [int(record["strike"]) for record in records]
+    options["option_type"] = [record["instrument_type"] for record in records]
+    options["premium"] = options["price"]
+    expiry_at = pd.to_datetime([datetime.datetime.combine(expiry, EXPIRY_CLOSE) for expiry in options["expiry"]])
+    t = (expiry_at - pd.DatetimeIndex(options["date"])).total_seconds().to_numpy() / (365 * 24 * 3600)
+    options["iv"] = implied_vol(options["premium"].to_numpy(), options["spot_price"].to_numpy(),
+                                options["strike"].to_numpy(), t, options["option_type"].to_numpy(), rate) * 100
+    return options[["date", "spot_price", "expiry", "strike", "option_type", "premium", "iv"]].reset_index(drop=True)
+
+
+class TickRecorder:
+    """Buffer ticks from a ticker and append them to daily tick files on a background thread.
+
+    Args:
+        directory (str): Where the daily ``.ticks`` files go.
+        instruments (list): Kite instrument records of the subscribed tokens, saved next to
+            each day's file so the recording can be replayed and turned into chains.
+        capacity (int): Ring size in ticks; enough for the ticks arriving between flushes.
+        flush_seconds (float): Time between flushes.
+    """
+
+    def __init__(self, directory=TICK_DIR, instruments=(), capacity=TICK_BUFFER_CAPACITY,
+                 flush_seconds=TICK_FLUSH_SECONDS):
+        self.directory = directory
+        self.instruments = list(instruments)
+        self.flush_seconds = flush_seconds
+        self.ring = TickRing(capacity)
+        self.rows_written = 0
+        self._days = set()  # Days whose instrument file has been written
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def attach(self, ticker):
+        """Record a KiteTicker's ticks, keeping any existing on_ticks handler."""
+        previous = ticker.on_ticks
+
+        def on_ticks(ws, ticks):
+            self.ring.push(ticks)
+            if previous:
+                previous(ws, ticks)
+
+        ticker.on_ticks = on_ticks
+        return self
+
+    def on_ticks(self, ws, ticks):
+        """KiteTicker.on_ticks-compatible callback."""
+        self.ring.push(ticks)
+
+    def path(self, day):
+        return os.path.join(self.directory, f"{day}{TICK_FILE_SUFFIX}")
+
+    def flush(self):
+        """Append everything buffered so far; returns the number of ticks written."""
+        rows = self.ring.drain()
+        count = len(rows["instrument_token"])
+        if not count:
+            return 0
+        days = rows["exchange_timestamp"].view("datetime64[ns]").astype("datetime64[D]")
+        for day in np.unique(days):
+            mask = days == day
+            rows_of_day = rows if mask.all() else {name: values[mask] for name, values in rows.items()}
+            with open(self.path(day), "ab") as f:
+                f.write(encode_chunk(rows_of_day))
+            if day not in self._days:
+                self._write_instruments(day)
+        self.rows_written += count
+        return count
+
+    def _write_instruments(self, day):
+        self._days.add(day)
+        path = os.path.join(self.directory, f"{day}.instruments.json")
+        if self.instruments and not os.path.exists(path):
+            with open(path, "w") as f:
+                json.dump(self.instruments, f, default=str)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+        self.flush()
+
+    def start(self):
+        """Start the flush thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tick-recorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Flush what is left and stop the flush thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# Quote fields compared between snapshots; a contract is rewritten only when one of them changed
+SNAPSHOT_FIELDS = ("last_price", "volume_traded", "oi", "bid", "bid_quantity", "ask", "ask_quantity")
+
+
+class SnapshotWriter:
+    """Append polled quote snapshots to the daily tick files, skipping unchanged contracts.
+
+    Each snapshot is one chunk stamped with the time it was taken. A contract
+    is written only if its quote differs from the one last written, so
+    polling a chain every minute stores little more than what traded, and
+    ``snapshot_at`` fills the rest forward. New instrument records are merged
+    into the day's instruments file.
+
+    Args:
+        directory (str): Where the daily ``.ticks`` files go.
+    """
+
+    def __init__(self, directory=TICK_DIR):
+        self.directory = directory
+        self.rows_written = 0
+        self._tokens = np.zeros(0, dtype="int64")  # Sorted tokens of the last written quotes
+        self._quotes = np.zeros((0, len(SNAPSHOT_FIELDS)))
+        self._instruments = {}  # Day -> tokens in the day's instruments file
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, quotes, instruments=(), taken_at=None):
+        """Append one snapshot.
+
+        Args:
+            quotes (list): Kite-style quote dicts (instrument_token, last_price, volume_traded, oi, depth).
+            instruments (list): Instrument records of the quoted tokens.
+            taken_at (datetime): Snapshot time, written as every row's exchange_timestamp; defaults to now.
+
+        Returns:
+            int: Rows written (the contracts whose quote changed).
+        """
+        if not quotes:
+            return 0
+        taken_at = taken_at or datetime.datetime.now()
+        ring = TickRing(len(quotes))
+        ring.push([dict(quote, exchange_timestamp=taken_at) for quote in quotes])
+        rows = ring.drain()
+        tokens = rows["instrument_token"]
+        values = np.column_stack([rows[name].astype(float) for name in SNAPSHOT_FIELDS])
+        position = np.minimum(np.searchsorted(self._tokens, tokens), max(len(self._tokens) - 1, 0))
+        known = (self._tokens[position] == tokens) if len(self._tokens) else np.zeros(len(tokens), dtype=bool)
+        previous = self._quotes[position] if len(self._tokens) else values
+        same = (values == previous) | (np.isnan(values) & np.isnan(previous))
+        changed = ~known | ~same.all(axis=1)
+        day = np.datetime64(taken_at, "D")
+        self._write_instruments(day, instruments)
+        if changed.any():
+            with open(os.path.join(self.directory, f"{day}{TICK_FILE_SUFFIX}"), "ab") as f:
+                f.write(encode_chunk({name: column[changed] for name, column in rows.items()}))
+            merged_tokens = np.concatenate([self._tokens, tokens[changed]])
+            merged_quotes = np.concatenate([self._quotes, values[changed]])
+            # np.unique keeps the first occurrence, so look from the newest rows back
+            self._tokens, last = np.unique(merged_tokens[::-1], return_index=True)
+            self._quotes = merged_quotes[::-1][last]
+        written = int(changed.sum())
+        self.rows_written += written
+        return written
+
+    def _write_instruments(self, day, instruments):
+        path = os.path.join(self.directory, f"{day}.instruments.json")
+        if day not in self._instruments:
+            existing = []
+            if os.path.exists(path):
+                with open(path) as f:
+                    existing = json.load(f)
+            self._instruments[day] = {record["instrument_token"]: record for record in existing}
+        known = self._instruments[day]
+        new = [record for record in instruments if record["instrument_token"] not in known]
+        if new:
+            known.update((record["instrument_token"], record) for record in new)
+            with open(path, "w") as f:
+                json.dump(list(known.values()), f, default=str)
+
+
+def snapshot_at(path, moment=None):
+    """The latest quote of every instrument as of ``moment`` (default: the end of the data).
+
+    Returns:
+        pandas.DataFrame: One row per instrument token (in token order) with its quote columns, the
+        exchange_timestamp of that quote and the instrument's saved record fields.
+    """
+    rows = read_ticks(path)
+    stamps = rows["exchange_timestamp"].view("datetime64[ns]")
+    upto = len(stamps) if moment is None else int(np.searchsorted(stamps, np.datetime64(moment, "ns"), "right"))
+    tokens = rows["instrument_token"][:upto]
+    _, last = np.unique(tokens[::-1], return_index=True)
+    latest = upto - 1 - last  # In token order
+    frame = pd.DataFrame({name: values[latest] for name, values in rows.items() if name != "received"})
+    frame["exchange_timestamp"] = stamps[latest]
+    instruments = read_instruments(path)
+    for field in ("tradingsymbol", "name", "expiry", "strike", "instrument_type"):
+        frame[field] = [instruments.get(token, {}).get(field) for token in frame["instrument_token"].tolist()]
+    return frame
+
+
+def chain_tokens(instruments, underlyings=("NIFTY", "BANKNIFTY"), expiries=2, max_tokens=3000):
+    """Instrument records of the index and the nearest ``expiries`` option chains of each underlying."""
+    selected = [{"instrument_token": INDICES[name][1], "tradingsymbol": INDICES[name][0], "name": name,
+                 "instrument_type": "INDEX", "exchange": "NSE", "expiry": "", "strike": 0.0}
+                for name in underlyings]
+    today = datetime.date.today()
+    for name in underlyings:
+        options = [inst for inst in instruments if inst["name"] == name and inst["instrument_type"] in ("CE", "PE")
+                   and inst["expiry"] and inst["expiry"] >= today]
+        nearest = sorted({inst["expiry"] for inst in options})[:expiries]
+        selected.extend(inst for inst in options if inst["expiry"] in nearest)
+    if len(selected) > max_tokens:
+        print(f"Recording the first {max_tokens} of {len(selected)} instruments (KiteTicker connection limit)")
+        selected = selected[:max_tokens]
+    return selected
+
+
+def record_chains(kite, ticker, underlyings=("NIFTY", "BANKNIFTY"), expiries=2, directory=TICK_DIR):
+    """Subscribe ``ticker`` to full chains in MODE_FULL and record them until interrupted."""
+    instruments = chain_tokens(kite.instruments("NFO"), underlyings, expiries)
+    recorder = TickRecorder(directory, instruments).attach(ticker)
+    tokens = [inst["instrument_token"] for inst in instruments]
+
+    def on_connect(ws, response):
+        ws.subscribe(tokens)
+        ws.set_mode(ws.MODE_FULL, tokens)
+
+    ticker.on_connect = on_connect  # Re-subscribes after reconnects
+    recorder.start()
+    ticker.connect(threaded=True)
+    print(f"Recording {len(tokens)} instruments to {directory}")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"{recorder.rows_written} ticks written, {recorder.ring.dropped} dropped")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.stop()
+        ticker.close()
+    return recorder
+
+
+if __name__ == "__main__":
+    from api_helper import kite, ticker
+    record_chains(kite, ticker)
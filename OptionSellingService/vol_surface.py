@@ -0,0 +1,243 @@
+# vol_surface.py
+"""Incrementally updated implied-volatility surface across strikes and expiries."""
+
+import bisect
+import datetime
+import math
+
+import numpy as np
+
+from config import RISK_FREE_RATE
+from pricing import bs_price_scalar, bs_greeks, implied_vol
+
+EXPIRY_CLOSE = datetime.time(15, 30)
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+
+def year_fraction(expiry, now):
+    """Time from now to the expiry's 15:30 close, in years (never negative)."""
+    expiry_at = datetime.datetime.combine(expiry, EXPIRY_CLOSE)
+    if now.tzinfo is not None:
+        now = now.replace(tzinfo=None)
+    return max((expiry_at - now).total_seconds(), 0.0) / SECONDS_PER_YEAR
+
+
+class Smile:
+    """Quadratic smile ``vol(k) = a + b*k + c*k**2`` in log-moneyness for one expiry.
+
+    The least-squares fit is kept as running sums of its normal equations, so
+    a tick on one strike swaps that strike's contribution out and back in
+    (O(1)) instead of refitting every point. Log-moneyness is measured against
+    the anchor spot the smile was started with; call ``rebase`` after large
+    spot moves to re-centre it.
+    """
+
+    def __init__(self, anchor):
+        self.anchor = float(anchor)
+        self.points = {}  # strike -> (k, vol, weight)
+        self._moments = [0.0] * 5  # sum(w * k**n) for n = 0..4
+        self._targets = [0.0] * 3  # sum(w * vol * k**n) for n = 0..2
+        self._coefficients = None
+
+    def _accumulate(self, k, vol, weight, sign):
+        power = weight * sign
+        for n in range(5):
+            self._moments[n] += power
+            if n < 3:
+                self._targets[n] += power * vol
+            power *= k
+        self._coefficients = None
+
+    def update(self, strike, vol, weight=1.0):
+        """Add or replace the implied vol (decimal) observed at a strike."""
+        old = self.points.get(strike)
+        if old is not None:
+            self._accumulate(old[0], old[1], old[2], -1.0)
+        k = math.log(strike / self.anchor)
+        self.points[strike] = (k, vol, weight)
+        self._accumulate(k, vol, weight, 1.0)
+
+    def remove(self, strike):
+        """Drop a strike from the fit (e.g. when its quote goes stale)."""
+        old = self.points.pop(strike, None)
+        if old is not None:
+            self._accumulate(old[0], old[1], old[2], -1.0)
+
+    def rebase(self, anchor):
+        """Re-centre log-moneyness on a new anchor spot and rebuild the sums."""
+        points = [(strike, vol, weight) for strike, (_, vol, weight) in self.points.items()]
+        self.__init__(anchor)
+        for strike, vol, weight in points:
+            self.update(strike, vol, weight)
+
+    def coefficients(self):
+        """Return (a, b, c), solving the 3x3 normal equations only when the fit changed."""
+        if self._coefficients is None:
+            m, y = self._moments, self._targets
+            if len(self.points) >= 3:
+                normal = np.array([[m[0], m[1], m[2]], [m[1], m[2], m[3]], [m[2], m[3], m[4]]])
+                try:
+                    self._coefficients = tuple(float(c) for c in np.linalg.solve(normal, y))
+                except np.linalg.LinAlgError:
+                    self._coefficients = (y[0] / m[0], 0.0, 0.0)
+            elif self.points:
+                self._coefficients = (y[0] / m[0], 0.0, 0.0)
+            else:
+                self._coefficients = (float("nan"), 0.0, 0.0)
+        return self._coefficients
+
+    def vol(self, strike):
+        """Fitted implied vol (decimal) at an arbitrary strike."""
+        a, b, c = self.coefficients()
+        k = math.log(strike / self.anchor)
+        return max(a + k * (b + k * c), 1e-4)
+
+    def vols(self, log_moneyness):
+        """Vectorized fitted vols for an array of log-moneyness values (relative to the anchor)."""
+        a, b, c = self.coefficients()
+        k = np.asarray(log_moneyness, dtype=float)
+        return np.maximum(a + k * (b + k * c), 1e-4)
+
+
+class VolSurface:
+    """Per-expiry smiles with total-variance interpolation across expiries.
+
+    Feed it ticks with ``update_iv`` (already-implied vols) or ``update_price``
+    (premiums, implied on the spot); query ``iv``/``price`` for any strike and
+    expiry. Expiries between fitted ones interpolate total variance linearly
+    in time, expiries outside the fitted range use the nearest smile's vol.
+
+    Vols are decimals internally; ``iv_percent`` matches the chain's "iv" field.
+    """
+
+    def __init__(self, spot=None, rate=RISK_FREE_RATE, as_of=None):
+        self.spot = spot
+        self.rate = rate
+        self.as_of = as_of
+        self.smiles = {}
+        self._expiries = []
+        self.version = 0
+
+    def set_spot(self, spot):
+        """Record the latest underlying price used for pricing and implying vols."""
+        self.spot = spot
+
+    def _smile(self, expiry):
+        smile = self.smiles.get(expiry)
+        if smile is None:
+            if self.spot is None:
+                raise ValueError("Set the spot price before adding points to the surface")
+            smile = self.smiles[expiry] = Smile(self.spot)
+            bisect.insort(self._expiries, expiry)
+        return smile
+
+    def update_iv(self, expiry, strike, vol, weight=1.0):
+        """Update one strike's implied vol (decimal) for an expiry."""
+        if vol is None or not vol > 0:
+            return
+        self._smile(expiry).update(strike, vol, weight)
+        self.version += 1
+
+    def update_price(self, expiry, strike, option_type, premium, now=None, weight=1.0):
+        """Imply a vol from a traded premium and update the surface with it."""
+        now = now or datetime.datetime.now()
+        t = year_fraction(expiry, now)
+        vol = float(implied_vol(premium, self.spot, strike, t, option_type, self.rate))
+        if not math.isnan(vol):
+            self.update_iv(expiry, strike, vol, weight)
+        return vol
+
+    def rebase(self, spot=None):
+        """Re-centre every smile on the current (or given) spot."""
+        if spot is not None:
+            self.spot = spot
+        for smile in self.smiles.values():
+            smile.rebase(self.spot)
+        self.version += 1
+
+    def iv(self, strike, expiry, now=None):
+        """Implied vol (decimal) for any strike and expiry."""
+        if not self._expiries:
+            raise ValueError("Volatility surface has no data")
+        smile = self.smiles.get(expiry)
+        if smile is not None:
+            return smile.vol(strike)
+        index = bisect.bisect_left(self._expiries, expiry)
+        if index == 0:
+            return self.smiles[self._expiries[0]].vol(strike)
+        if index == len(self._expiries):
+            return self.smiles[self._expiries[-1]].vol(strike)
+        now = now or datetime.datetime.now()
+        near, far = self._expiries[index - 1], self._expiries[index]
+        t_near, t_far, t = year_fraction(near, now), year_fraction(far, now), year_fraction(expiry, now)
+        var_near = self.smiles[near].vol(strike) ** 2 * t_near
+        var_far = self.smiles[far].vol(strike) ** 2 * t_far
+        if t <= 0 or t_far <= t_near:
+            return self.smiles[far].vol(strike)
+        weight = (t - t_near) / (t_far - t_near)
+        return math.sqrt(max(var_near + weight * (var_far - var_near), 1e-12) / t)
+
+    def iv_percent(self, strike, expiry, now=None):
+        """Implied vol in percent, matching the 'iv' field of option chains."""
+        return self.iv(strike, expiry, now) * 100
+
+    def price(self, strike, expiry, option_type, spot=None, now=None):
+        """Fair-value premium from the surface."""
+        now = now or datetime.datetime.now()
+        spot = self.spot if spot is None else spot
+        t = year_fraction(expiry, now)
+        return bs_price_scalar(spot, strike, t, self.iv(strike, expiry, now), option_type, self.rate)
+
+    def strike_for_delta(self, expiry, target_delta, option_type, strikes, spot=None, now=None):
+        """Pick the strike whose surface delta is closest to target_delta (negative for puts)."""
+        now = now or datetime.datetime.now()
+        spot = self.spot if spot is None else spot
+        strikes = np.asarray(sorted(strikes), dtype=float)
+        vols = np.array([self.iv(strike, expiry, now) for strike in strikes])
+        deltas = bs_greeks(spot, strikes, year_fraction(expiry, now), vols, option_type, self.rate)["delta"]
+        return int(strikes[np.argmin(np.abs(deltas - target_delta))])
+
+    @property
+    def cache_key(self):
+        """Fingerprint of the fitted surface, so SyntheticChain can cache chains priced off it."""
+        return (self.as_of, tuple((expiry, smile.anchor, smile.coefficients())
+                                  for expiry, smile in sorted(self.smiles.items())))
+
+    def __call__(self, spot, strikes, t, timestamps=None):
+        """Vol model hook for SyntheticChain: vols for a broadcast spot/strike/tenor grid.
+
+        Smiles are sticky in moneyness (strike relative to each row's spot) and
+        the term structure is interpolated in total variance by time to expiry,
+        using each smile's tenor as of the surface's ``as_of`` time.
+        """
+        if not self._expiries:
+            raise ValueError("Volatility surface has no data")
+        k = np.log(np.asarray(strikes, dtype=float) / np.asarray(spot, dtype=float))
+        t = np.broadcast_to(np.asarray(t, dtype=float), k.shape)
+        as_of = self.as_of or datetime.datetime.now()
+        tenors = np.array([year_fraction(expiry, as_of) for expiry in self._expiries])
+        vols = np.stack([self.smiles[expiry].vols(k) for expiry in self._expiries])
+        if len(tenors) == 1:
+            return vols[0]
+        upper = np.clip(np.searchsorted(tenors, t), 1, len(tenors) - 1)
+        lower = upper - 1
+        v_low = np.take_along_axis(vols, lower[None, ...], axis=0)[0]
+        v_high = np.take_along_axis(vols, upper[None, ...], axis=0)[0]
+        t_low, t_high = tenors[lower], tenors[upper]
+        weight = np.clip((t - t_low) / np.maximum(t_high - t_low, 1e-12), 0.0, 1.0)
+        variance = v_low ** 2 * t_low + weight * (v_high ** 2 * t_high - v_low ** 2 * t_low)
+        interpolated = np.sqrt(np.maximum(variance, 1e-12) / np.maximum(t, 1e-12))
+        return np.where(t <= t_low, v_low, np.where(t >= t_high, v_high, interpolated))
+
+    @classmethod
+    def from_chain(cls, options_chain, spot, now=None, rate=RISK_FREE_RATE):
+        """Build a surface from chain rows carrying 'expiry', 'strike' and 'iv' (percent) or 'premium'."""
+        now = now or datetime.datetime.now()
+        surface = cls(spot, rate, as_of=now)
+        for opt in options_chain:
+            if opt.get("iv"):
+                surface.update_iv(opt["expiry"], opt["strike"], opt["iv"] / 100.0)
+            elif opt.get("premium"):
+                surface.update_price(opt["expiry"], opt["strike"], opt.get("option_type", opt.get("instrument_type")),
+                                     opt["premium"], now)
+        return surface
@@ -1,7 +1,6 @@
 from kiteconnect import KiteConnect
-from Zerodha.Connection.zerodha_automation.return_request_token import get_request_token
+from Zerodha.Connection.session_manager import SessionManager, totp_login
 
 def connect(credentials: dict, kite: KiteConnect):
-    request_token = get_request_token(credentials, kite)
-    data = kite.generate_session(request_token, api_secret=credentials['api_secret'])
-    kite.set_access_token(data["access_token"])
+    """Give kite today's access token, logging in with TOTP only if no process has yet today."""
+    SessionManager(credentials['api_key'], login=totp_login(credentials)).kite(kite)
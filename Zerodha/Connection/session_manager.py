@@ -0,0 +1,226 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, time as dt_time
+from typing import Callable, Optional
+
+from kiteconnect import KiteConnect
+from kiteconnect.exceptions import TokenException
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# Kite access tokens are invalidated every morning at 6 AM; a login after that is good for the whole day.
+SESSION_RESET = dt_time(6, 0)
+# A token validated this recently (by any process) is trusted without another profile() call.
+VALIDATION_TTL = timedelta(minutes=5)
+STORE_DIR = os.path.join(os.path.expanduser("~"), ".adkite")
+
+
+class SessionError(Exception):
+    """Raised when no valid access token is stored and no login method was given."""
+
+
+def session_day(moment: datetime) -> str:
+    """Return the Kite session day a moment belongs to (sessions roll over at 6 AM)."""
+    return (moment - timedelta(hours=SESSION_RESET.hour, minutes=SESSION_RESET.minute)).date().isoformat()
+
+
+def default_store_path(api_key: str) -> str:
+    """Return the session store for an API key (override with KITE_SESSION_FILE)."""
+    return os.environ.get("KITE_SESSION_FILE") or os.path.join(STORE_DIR, f"kite_session_{api_key}.json")
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on ``path`` (created if missing) across processes."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+b") as handle:
+        if os.name == "nt":
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ~10 seconds; keep waiting
+                    continue
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class SessionManager:
+    """Cache the day's Kite access token in a locked local store shared by every process.
+
+    The first process to need a session after the 6 AM reset logs in while
+    holding the store's lock; processes starting at the same time wait on the
+    lock and then reuse the token it wrote, so there is one login per day. A
+    stored token is checked with a single ``profile()`` call, skipped when any
+    process validated it within ``VALIDATION_TTL``.
+
+    Args:
+        api_key: Kite Connect API key.
+        login: Callable taking a KiteConnect and returning ``generate_session`` data
+            (at least ``access_token``). Without it, only a stored token can be used.
+        store_path: Session store location; defaults to ``default_store_path(api_key)``.
+        clock: Returns the current time; replaceable in tests.
+    """
+
+    def __init__(self, api_key: str, login: Optional[Callable[[KiteConnect], dict]] = None,
+                 store_path: Optional[str] = None, clock: Callable[[], datetime] = datetime.now):
+        self.api_key = api_key
+        self.login = login
+        self.store_path = store_path or default_store_path(api_key)
+        self.lock_path = self.store_path + ".lock"
+        self.clock = clock
+
+    def read(self) -> Optional[dict]:
+        """Return the stored session for the current session day, or None."""
+        try:
+            with open(self.store_path) as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if session.get("api_key") != self.api_key or session.get("session_day") != session_day(self.clock()):
+            return None
+        return session
+
+    def write(self, session: dict):
+        """Atomically replace the store (readers never see a partial file)."""
+        os.makedirs(os.path.dirname(self.store_path) or ".", exist_ok=True)
+        temp_path = f"{self.store_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(session, f)
+        os.chmod(temp_path, 0o600)
+        os.replace(temp_path, self.store_path)
+
+    def _recently_validated(self, session: dict) -> bool:
+        validated_at = session.get("validated_at")
+        return bool(validated_at) and self.clock() - datetime.fromisoformat(validated_at) < VALIDATION_TTL
+
+    def _check(self, kite: KiteConnect, session: dict) -> bool:
+        """Validate the token with one cheap profile() call."""
+        kite.set_access_token(session["access_token"])
+        try:
+            kite.profile()
+        except TokenException:
+            return False
+        return True
+
+    def _mark_validated(self, session: dict):
+        """Record the validation, unless another process replaced the token meanwhile (lock held)."""
+        stored = self.read()
+        if stored and stored["access_token"] == session["access_token"]:
+            stored["validated_at"] = self.clock().isoformat(timespec="seconds")
+            self.write(stored)
+
+    def _login(self, kite: KiteConnect) -> dict:
+        if self.login is None:
+            raise SessionError(f"No valid Kite session in {self.store_path} and no login method given")
+        data = self.login(kite)
+        now = self.clock()
+        session = {
+            "api_key": self.api_key,
+            "access_token": data["access_token"],
+            "user_id": data.get("user_id"),
+            "login_time": now.isoformat(timespec="seconds"),
+            "validated_at": now.isoformat(timespec="seconds"),
+            "session_day": session_day(now),
+        }
+        self.write(session)
+        return session
+
+    def session(self, kite: Optional[KiteConnect] = None, force_refresh: bool = False) -> dict:
+        """Return a valid session for today, logging in at most once across processes.
+
+        Args:
+            kite: Client used for validation and login; a new one is created if not given.
+            force_refresh: Log in again even if the stored token is still valid.
+
+        Returns:
+            The stored session (``access_token``, ``user_id``, ``login_time``, ...).
+        """
+        kite = kite or KiteConnect(api_key=self.api_key)
+        session = None if force_refresh else self.read()
+        if session and self._recently_validated(session):
+            return session
+        if session and self._check(kite, session):
+            with file_lock(self.lock_path):
+                self._mark_validated(session)
+            return session
+        rejected = session["access_token"] if session else None
+        with file_lock(self.lock_path):
+            # Another process may have logged in while we waited for the lock
+            stored = None if force_refresh else self.read()
+            if stored and stored["access_token"] != rejected:
+                if self._recently_validated(stored):
+                    return stored
+                if self._check(kite, stored):
+                    self._mark_validated(stored)
+                    return stored
+            return self._login(kite)
+
+    def kite(self, kite: Optional[KiteConnect] = None) -> KiteConnect:
+        """Return a KiteConnect client carrying today's access token."""
+        kite = kite or KiteConnect(api_key=self.api_key)
+        kite.set_access_token(self.session(kite)["access_token"])
+        return kite
+
+    def invalidate(self):
+        """Drop the stored session, e.g. after the API reports the token as expired."""
+        with file_lock(self.lock_path):
+            if os.path.exists(self.store_path):
+                os.remove(self.store_path)
+
+
+def load_access_token(api_key: str, store_path: Optional[str] = None) -> Optional[str]:
+    """Return today's stored access token without any network calls, or None."""
+    session = SessionManager(api_key, store_path=store_path).read()
+    return session["access_token"] if session else None
+
+
+def credentials_from_env() -> dict:
+    """Read login credentials from KITE_USERNAME, KITE_PASSWORD, KITE_TOTP_KEY, KITE_API_KEY, KITE_API_SECRET."""
+    return {key: os.environ[f"KITE_{key.upper()}"]
+            for key in ("username", "password", "totp_key", "api_key", "api_secret")}
+
+
+def totp_login(credentials: dict) -> Callable[[KiteConnect], dict]:
+    """Return a login method running the scripted TOTP login flow for ``credentials``."""
+    def login(kite: KiteConnect) -> dict:
+        from Zerodha.Connection.zerodha_automation.return_request_token import get_request_token
+        request_token = get_request_token(credentials, kite)
+        return kite.generate_session(request_token, api_secret=credentials["api_secret"])
+    return login
+
+
+def refresh_before_open(credentials: dict, at: dt_time = dt_time(8, 45)):
+    """Sleep until ``at`` and make sure today's session exists before the market opens.
+
+    Meant to run once a day (e.g. from cron) so strategy processes started
+    later only ever read the store.
+    """
+    now = datetime.now()
+    target = datetime.combine(now.date(), at)
+    if now < target:
+        time.sleep((target - now).total_seconds())
+    manager = SessionManager(credentials["api_key"], login=totp_login(credentials))
+    session = manager.session()
+    print(f"Kite session for {session['session_day']} ready (logged in at {session['login_time']})")
+    return session
+
+
+if __name__ == "__main__":
+    refresh_before_open(credentials_from_env(), at=dt_time(0, 0) if "--now" in sys.argv else dt_time(8, 45))
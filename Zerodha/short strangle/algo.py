@@ -1,54 +1,237 @@
-from kiteconnect import KiteConnect
+# algo.py
+"""Tick-driven short strangle.
+
+Sells an OTM call and an OTM put around the index and manages them on every
+tick: each leg is bought back when its premium reaches its stop-loss, and the
+strangle is re-centered on the index when the index drifts too far from the
+level it was opened at. Legs are resolved through an InstrumentIndex over the
+NFO instrument dump, orders go through the service's OrderGateway and fills
+are awaited from the OrderTracker, all on one asyncio event loop.
+"""
+
+import asyncio
 import datetime
+import os
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "OptionSellingService"))
+from instruments import INDICES, InstrumentIndex  # noqa: E402
+from order_gateway import OrderGateway  # noqa: E402
+from order_tracker import OrderTracker  # noqa: E402
+
+UNDERLYING = "NIFTY"
+LOTS = 1
+STRIKE_DISTANCE = 300  # Points from the index to each sold strike
+STOP_LOSS_PERCENT = 0.3  # Buy a leg back when its premium rises 30% above the entry price
+RECENTER_POINTS = 150  # Re-open the strangle around the index when it moves this far from the center
+EXIT_TIME = datetime.time(15, 15)  # Close everything at this time
+PRODUCT = "MIS"
+FILL_TIMEOUT = 30  # Seconds to wait for order updates confirming a fill
+CLOSE_ATTEMPTS = 3  # Rounds of buy-backs close_all tries before leaving a leg for manual closing
+IDLE_SECONDS = 1.0  # Re-check the clock this often when no ticks arrive
+TAG = "STRANGLE"
+
+
+class TickQueue:
+    """Hands tick batches from the KiteTicker thread to an asyncio loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def attach(self, ticker) -> "TickQueue":
+        """Forward the ticker's ticks, keeping any existing on_ticks handler."""
+        previous = ticker.on_ticks
+
+        def on_ticks(ws, ticks):
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, ticks)
+            if previous:
+                previous(ws, ticks)
+
+        ticker.on_ticks = on_ticks
+        return self
+
+    async def get(self, timeout: float) -> list:
+        """The next batch of ticks, or an empty list after ``timeout`` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+
+@dataclass
+class Leg:
+    """One sold option of the strangle."""
+
+    instrument: dict
+    quantity: int
+    entry_price: float
+    stop_price: float
+    last_price: float
+
+    @property
+    def token(self) -> int:
+        return self.instrument["instrument_token"]
+
+    @property
+    def tradingsymbol(self) -> str:
+        return self.instrument["tradingsymbol"]
+
+
+class ShortStrangle:
+    """Run one day's short strangle from ticks.
+
+    Args:
+        index: InstrumentIndex holding the NFO options of ``underlying``.
+        gateway: OrderGateway used for every order.
+        tracker: OrderTracker receiving the ticker's order updates.
+        ticker: KiteTicker (or PaperTicker) the legs are subscribed on.
+    """
+
+    def __init__(self, index: InstrumentIndex, gateway: OrderGateway, tracker: OrderTracker, ticker,
+                 underlying: str = UNDERLYING, lots: int = LOTS, strike_distance: float = STRIKE_DISTANCE,
+                 stop_loss_percent: float = STOP_LOSS_PERCENT, recenter_points: float = RECENTER_POINTS,
+                 exit_time: datetime.time = EXIT_TIME):
+        self.index = index
+        self.gateway = gateway
+        self.tracker = tracker
+        self.ticker = ticker
+        self.underlying = underlying
+        self.lots = lots
+        self.strike_distance = strike_distance
+        self.stop_loss_percent = stop_loss_percent
+        self.recenter_points = recenter_points
+        self.exit_time = exit_time
+        self.index_token = INDICES[underlying][1]
+        self.legs: dict = {}  # Token -> open Leg
+        self.center: Optional[float] = None
+        self.spot: Optional[float] = None
+        self.now: Optional[datetime.datetime] = None
+        self.realized_pnl = 0.0
+
+    # -------------- Orders -------------- #
+    async def _trade(self, instrument: dict, transaction_type: str, quantity: int) -> float:
+        """Place a MARKET order through the gateway and return its average fill price."""
+        loop = asyncio.get_running_loop()
+        order_id = await loop.run_in_executor(None, lambda: self.gateway.place_order(
+            exchange="NFO", tradingsymbol=instrument["tradingsymbol"], transaction_type=transaction_type,
+            quantity=quantity, product=PRODUCT, order_type="MARKET", tag=TAG))
+        state = await self.tracker.wait_filled(order_id, FILL_TIMEOUT)
+        return state.average_price
+
+    async def open(self, spot: float) -> None:
+        """Sell the strikes nearest spot +/- strike_distance of the nearest expiry."""
+        expiry = self.index.nearest_expiry(self.underlying, (self.now or datetime.datetime.now()).date())
+        if expiry is None:
+            raise ValueError(f"No {self.underlying} option expiries listed")
+        legs = []
+        for option_type, target in (("CE", spot + self.strike_distance), ("PE", spot - self.strike_distance)):
+            strike = self.index.nearest_strike(self.underlying, expiry, target)
+            legs.append(self.index.option(self.underlying, expiry, strike, option_type))
+        quantity = self.lots * int(legs[0].get("lot_size") or 1)
+        prices = await asyncio.gather(*(self._trade(instrument, "SELL", quantity) for instrument in legs),
+                                      return_exceptions=True)
+        for instrument, price in zip(legs, prices):
+            if isinstance(price, Exception):
+                continue
+            leg = Leg(instrument, quantity, price, price * (1 + self.stop_loss_percent), price)
+            self.legs[leg.token] = leg
+            print(f"Sold {leg.tradingsymbol} x{quantity} at {price} (stop {leg.stop_price:.2f})")
+        tokens = list(self.legs)
+        self.ticker.subscribe(tokens)
+        self.ticker.set_mode(self.ticker.MODE_LTP, tokens)
+        self.center = spot
+        failed = [price for price in prices if isinstance(price, Exception)]
+        if failed:
+            raise failed[0]  # run() closes the legs that did fill, whatever the failure
+
+    async def close(self, leg: Leg, reason: str) -> None:
+        """Buy a leg back and book its P&L."""
+        price = await self._trade(leg.instrument, "BUY", leg.quantity)
+        del self.legs[leg.token]  # Kept on a failed order so it is retried
+        self.realized_pnl += (leg.entry_price - price) * leg.quantity
+        self.ticker.unsubscribe([leg.token])
+        print(f"Bought back {leg.tradingsymbol} at {price} ({reason}); realized P&L {self.realized_pnl:.2f}")
+
+    async def close_all(self, reason: str) -> None:
+        """Buy back every open leg, retrying failed orders up to CLOSE_ATTEMPTS rounds.
+
+        Failures are reported rather than raised, so one refused order doesn't
+        leave the other legs open; legs still open afterwards are printed.
+        """
+        for attempt in range(1, CLOSE_ATTEMPTS + 1):
+            if not self.legs:
+                return
+            results = await asyncio.gather(*(self.close(leg, reason) for leg in list(self.legs.values())),
+                                           return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Buy-back failed (attempt {attempt} of {CLOSE_ATTEMPTS}): {result!r}")
+        if self.legs:
+            print(f"Still short {[leg.tradingsymbol for leg in self.legs.values()]}; close them manually.")
+
+    # -------------- Tick handling -------------- #
+    def subscribe(self, ws, response) -> None:
+        """KiteTicker.on_connect callback: subscribe the index and the open legs."""
+        ws.subscribe([self.index_token])
+        ws.set_mode(ws.MODE_FULL, [self.index_token])  # Full mode carries the exchange timestamp
+        tokens = list(self.legs)
+        if tokens:
+            ws.subscribe(tokens)
+            ws.set_mode(ws.MODE_LTP, tokens)
+
+    def on_ticks(self, ticks: list) -> None:
+        """Fold a batch of ticks into the index and leg prices."""
+        for tick in ticks:
+            token = tick["instrument_token"]
+            if token == self.index_token:
+                self.spot = tick["last_price"]
+            elif token in self.legs:
+                self.legs[token].last_price = tick["last_price"]
+            stamp = tick.get("exchange_timestamp")
+            if stamp is not None:
+                self.now = stamp
+
+    async def evaluate(self) -> bool:
+        """Apply the exit, stop-loss and re-centering rules; False once the strangle is done."""
+        now = self.now or datetime.datetime.now()
+        if now.time() >= self.exit_time:
+            await self.close_all("exit time")
+            return False
+        stopped = [leg for leg in self.legs.values() if leg.last_price >= leg.stop_price]
+        if stopped:
+            await asyncio.gather(*(self.close(leg, "stop-loss") for leg in stopped))
+            if not self.legs:
+                return False
+        if self.spot is not None and abs(self.spot - self.center) >= self.recenter_points:
+            print(f"Index at {self.spot} moved {self.spot - self.center:+.2f} from {self.center}; re-centering")
+            await self.close_all("re-center")
+            await self.open(self.spot)
+        return True
 
-# Initialize KiteConnect with your API key
-api_key = "your_api_key"
-api_secret = "your_api_secret"
-kite = KiteConnect(api_key=api_key)
-
-# Assume you've already obtained the access token through the login flow
-access_token = "your_access_token"
-kite.set_access_token(access_token)
-
-# Define the underlying asset, expiry, and strike prices for the options
-underlying_symbol = "NIFTY"
-expiry_date = datetime.date(2024, 5, 25)  # Example expiry date
-call_strike_price = 17000
-put_strike_price = 16000
-
-# Fetch option instrument tokens for the defined options
-instrument_dict = kite.instruments("NSE")
-call_token = None
-put_token = None
-for instrument in instrument_dict:
-    if (instrument['tradingsymbol'] == f"{underlying_symbol}{expiry_date:%y%b}%CE{call_strike_price}" or
-        instrument['tradingsymbol'] == f"{underlying_symbol}{expiry_date:%y%b}%PE{put_strike_price}"):
-        if 'CE' in instrument['tradingsymbol']:
-            call_token = instrument['instrument_token']
-        else:
-            put_token = instrument['instrument_token']
-
-# Sell the options (ensure you have the necessary margins)
-if call_token and put_token:
-    kite.place_order(tradingsymbol=f"{underlying_symbol}{expiry_date:%y%b}%CE{call_strike_price}",
-                     exchange=kite.EXCHANGE_NFO,
-                     transaction_type=kite.TRANSACTION_TYPE_SELL,
-                     quantity=1,
-                     order_type=kite.ORDER_TYPE_MARKET,
-                     product=kite.PRODUCT_MIS,
-                     variety=kite.VARIETY_REGULAR)
-
-    kite.place_order(tradingsymbol=f"{underlying_symbol}{expiry_date:%y%b}%PE{put_strike_price}",
-                     exchange=kite.EXCHANGE_NFO,
-                     transaction_type=kite.TRANSACTION_TYPE_SELL,
-                     quantity=1,
-                     order_type=kite.ORDER_TYPE_MARKET,
-                     product=kite.PRODUCT_MIS,
-                     variety=kite.VARIETY_REGULAR)
-else:
-    print("Could not find option tokens. Check your symbols and expiry date.")
-
-# Risk Management
-# Implement your risk management here. This could include setting stop-loss orders,
-# monitoring positions for potential adjustments, etc.
+    async def run(self, ticks: TickQueue) -> float:
+        """Open on the first index tick and manage the legs until they are closed.
 
+        Returns:
+            float: Realized P&L in INR.
+        """
+        self.ticker.on_connect = self.subscribe  # Re-subscribes after reconnects
+        if self.ticker.is_connected():
+            self.subscribe(self.ticker, None)
+        try:
+            while self.spot is None:
+                self.on_ticks(await ticks.get(IDLE_SECONDS))
+            if (self.now or datetime.datetime.now()).time() >= self.exit_time:
+                print("Past the exit time; not opening a strangle.")
+                return self.realized_pnl
+            await self.open(self.spot)
+            while True:
+                self.on_ticks(await ticks.get(IDLE_SECONDS))
+                if not await self.evaluate():
+                    break
+        except Exception as e:  # Refused orders, fill timeouts, ...: never leave filled legs naked
+            print(f"Strangle failed: {e!r}; closing the remaining legs.")
+            await self.close_all("failure")
+        return self.realized_pnl
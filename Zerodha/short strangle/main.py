@@ -1,47 +1,58 @@
-import schedule
-import time
-from kiteconnect import KiteConnect
-from datetime import datetime, time as dt_time
+# main.py
+"""Run the tick-driven short strangle for the day.
 
-# Your Zerodha Kite API credentials
-api_key = "your_api_key"
-api_secret = "your_api_secret"
-access_token = "your_access_token"  # Obtain through login flow
-
-# Initialize KiteConnect
-kite = KiteConnect(api_key=api_key)
-kite.set_access_token(access_token)
-
-
-def check_market_and_trade():
-    """
-    Checks market stats and decides whether to place or exit positions
-    based on your strategy criteria.
-    """
-    print(f"Checking market stats at {datetime.now()}")
-    # Implement your logic here
-    # 1. Fetch market data
-    # 2. Decide whether to buy/sell based on your criteria
-    # 3. Place or exit positions as needed
+Connects to Kite (or the in-process paper exchange with KITE_PAPER=1),
+indexes the NSE and NFO instrument dumps once, and runs ShortStrangle on an
+asyncio loop fed by the ticker's ticks and order updates.
+"""
 
+import asyncio
+import os
+import sys
 
-def run_during_market_hours():
-    """
-    Function to run the check_market_and_trade function during market hours.
-    """
-    now = datetime.now().time()
-    market_start = dt_time(9, 15)
-    market_end = dt_time(15, 30)
+from algo import ShortStrangle, TickQueue  # Also puts OptionSellingService on sys.path
+from instruments import InstrumentIndex
+from order_gateway import OrderGateway
+from order_tracker import OrderTracker
 
-    if market_start <= now <= market_end:
-        check_market_and_trade()
-    else:
-        print(f"Market closed at {now}. Service sleeping...")
-
-
-# Schedule the task to run every 10 minutes during market hours
-schedule.every(10).minutes.do(run_during_market_hours)
-
-while True:
-    schedule.run_pending()
-    time.sleep(1)
+# Your Zerodha Kite API credentials
+api_key = "your_api_key"
+api_secret = "your_api_secret"
+request_token = "your_request_token"  # Only needed for the first login of the day
+
+
+def connect():
+    """Return (kite, ticker, paper exchange or None) for a live session or a paper one."""
+    if os.environ.get("KITE_PAPER") == "1":
+        from paper_exchange import paper_session
+        return paper_session(ticks_file=os.environ.get("KITE_PAPER_TICKS"))
+    from kiteconnect import KiteConnect, KiteTicker
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from Zerodha.Connection.session_manager import SessionManager
+    kite = KiteConnect(api_key=api_key)
+    session = SessionManager(
+        api_key, login=lambda kite: kite.generate_session(request_token, api_secret=api_secret)
+    ).session(kite)
+    kite.set_access_token(session["access_token"])
+    return kite, KiteTicker(api_key, session["access_token"]), None
+
+
+async def main():
+    kite, ticker, paper_exchange = connect()
+    index = InstrumentIndex.load(kite)
+    tracker = OrderTracker().attach(ticker)
+    gateway = OrderGateway(kite, tracker)
+    ticks = TickQueue(asyncio.get_running_loop()).attach(ticker)
+    strangle = ShortStrangle(index, gateway, tracker, ticker)
+    ticker.connect(threaded=True)
+    if paper_exchange is not None:
+        paper_exchange.publish_ticks([paper_exchange.last_tick(strangle.index_token)])  # Opening tick, now subscribed
+    try:
+        pnl = await strangle.run(ticks)
+    finally:
+        ticker.close()
+    print(f"Short strangle done. Realized P&L: {pnl:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
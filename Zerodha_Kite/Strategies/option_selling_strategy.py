@@ -1,42 +1,128 @@
+import datetime
+import os
+import sys
 from kiteconnect import KiteConnect
-import pandas as pd
 import numpy as np
 
-# Load access token
-with open("access_token.txt", "r") as file:
-    access_token = file.read().strip()
+# Shared modules (instrument index, order gateway, pricing) live in OptionSellingService
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "OptionSellingService"))
+from instruments import InstrumentIndex
+from order_gateway import OrderGateway
+from order_tracker import OrderTracker
+from pricing import bs_greeks, implied_vol
+from rate_limiter import RateLimiter
+from vol_surface import year_fraction
 
-# Initialize KiteConnect
-api_key = "your_api_key"
-kite = KiteConnect(api_key=api_key)
-kite.set_access_token(access_token)
+if os.environ.get("KITE_PAPER") == "1":
+    # Trade against the in-process paper exchange from OptionSellingService
+    from paper_exchange import paper_session
+    kite, ticker, paper_exchange = paper_session(ticks_file=os.environ.get("KITE_PAPER_TICKS"))
+else:
+    # Load today's access token from the shared session store (written by kite_login.py)
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+    from Zerodha.Connection.session_manager import load_access_token
+    api_key = "your_api_key"
+    access_token = load_access_token(api_key)
+    if access_token is None:
+        with open("access_token.txt", "r") as file:
+            access_token = file.read().strip()
+
+    # Initialize KiteConnect
+    kite = KiteConnect(api_key=api_key)
+    kite.set_access_token(access_token)
+
+# Selection and sizing
+UNDERLYING = "NIFTY"
+INDEX_SYMBOL = "NSE:NIFTY 50"
+OPTION_TYPE = "CE"  # Sell OTM calls ("PE" for puts)
+MIN_DISTANCE = 200  # Only strikes at least this far OTM
+STRIKE_WINDOW = 1000  # ... and at most this far, which bounds the quote request
+STRIKE_COUNT = 3  # Number of contracts in the basket
+TARGET_DELTA = 0.15  # Pick the strikes whose |delta| is closest to this ...
+TARGET_PREMIUM = None  # ... or, when set, whose premium is closest to this
+LOTS_PER_STRIKE = 1
+PRODUCT = "MIS"  # Intraday
+ORDER_RATE_LIMIT = 10  # Orders per second allowed by the Kite API
+
+# Options by underlying, expiry and strike, indexed once from the NFO instrument dump
+index = InstrumentIndex.load(kite, exchanges=("NFO",))
+gateway = OrderGateway(kite, OrderTracker(), limiter=RateLimiter(ORDER_RATE_LIMIT))
+
+
+def select_otm_options(spot, option_type=OPTION_TYPE, count=STRIKE_COUNT, target_delta=TARGET_DELTA,
+                       target_premium=TARGET_PREMIUM, now=None):
+    """Pick the nearest-expiry OTM options closest to a target delta or premium.
+
+    Only strikes between MIN_DISTANCE and STRIKE_WINDOW points OTM are
+    considered, and they are quoted in a single request.
+
+    Returns:
+        list: (instrument, premium) pairs, nearest the money first.
+    """
+    now = now or datetime.datetime.now()
+    expiry = index.nearest_expiry(UNDERLYING, now.date())
+    sign = 1 if option_type == "CE" else -1
+    options = [index.option(UNDERLYING, expiry, strike, option_type)
+               for strike in index.strikes(UNDERLYING, expiry)
+               if MIN_DISTANCE <= sign * (strike - spot) <= STRIKE_WINDOW]
+    candidates = [option for option in options if option is not None]  # A strike may list only the other type
+    if not candidates:
+        return []
+    quotes = kite.quote([f"NFO:{option['tradingsymbol']}" for option in candidates])
+    quoted = [(option, quotes[f"NFO:{option['tradingsymbol']}"]["last_price"]) for option in candidates
+              if f"NFO:{option['tradingsymbol']}" in quotes]
+    if not quoted:
+        return []
+    premiums = np.array([premium for _, premium in quoted])
+    if target_premium is not None:
+        distance = np.abs(premiums - target_premium)
+    else:
+        strikes = np.array([option["strike"] for option, _ in quoted])
+        t = max(year_fraction(expiry, now), 1e-6)
+        vols = implied_vol(premiums, spot, strikes, t, option_type)
+        delta = bs_greeks(spot, strikes, t, vols, option_type)["delta"]
+        distance = np.where(np.isfinite(vols), np.abs(np.abs(delta) - target_delta), np.inf)
+    chosen = sorted(np.argsort(distance, kind="stable")[:count], key=lambda i: sign * quoted[i][0]["strike"])
+    return [quoted[i] for i in chosen if np.isfinite(distance[i])]
+
+
+def margin_check(orders):
+    """Basket margin after the orders vs. the available equity margin; returns (required, available)."""
+    params = [{"exchange": order["exchange"], "tradingsymbol": order["tradingsymbol"],
+               "transaction_type": order["transaction_type"], "variety": "regular", "product": order["product"],
+               "order_type": order["order_type"], "quantity": order["quantity"]} for order in orders]
+    required = kite.basket_order_margins(params, consider_positions=True)["final"]["total"]
+    available = kite.margins("equity")["net"]
+    return required, available
 
-# Fetch NIFTY and Bank NIFTY options
-instruments = kite.instruments(exchange="NSE")
-nifty_options = [instr for instr in instruments if instr['tradingsymbol'].startswith('NIFTY') and instr['segment'] == 'NFO-OPT']
-bank_nifty_options = [instr for instr in instruments if instr['tradingsymbol'].startswith('BANKNIFTY') and instr['segment'] == 'NFO-OPT']
 
 # Define your option selling strategy here
 # Example: Selling NIFTY OTM options
 def sell_otm_options():
+    """Sell a bounded basket of nearest-expiry OTM options in one margin check and one batch of orders."""
     # Fetch current price of NIFTY
-    nifty_ltp = kite.ltp("NSE:NIFTY 50")['NSE:NIFTY 50']['last_price']
-
-    # Sell NIFTY OTM options (e.g., 200 points away)
-    for option in nifty_options:
-        strike_price = int(option['strike'])
-        if strike_price > nifty_ltp + 200:
-            # Place sell order
-            order = kite.place_order(
-                variety=kite.VARIETY_REGULAR,
-                exchange=kite.EXCHANGE_NFO,
-                tradingsymbol=option['tradingsymbol'],
-                transaction_type=kite.TRANSACTION_TYPE_SELL,
-                quantity=75,  # Lot size of NIFTY options
-                order_type=kite.ORDER_TYPE_MARKET,
-                product=kite.PRODUCT_MIS  # Intraday
-            )
-            print(f"Order placed: {order}")
+    nifty_ltp = kite.ltp(INDEX_SYMBOL)[INDEX_SYMBOL]['last_price']
+
+    selection = select_otm_options(nifty_ltp)
+    if not selection:
+        print("No OTM options matched the selection.")
+        return []
+    orders = [{"exchange": kite.EXCHANGE_NFO, "tradingsymbol": option["tradingsymbol"],
+               "transaction_type": kite.TRANSACTION_TYPE_SELL, "quantity": LOTS_PER_STRIKE * option["lot_size"],
+               "order_type": kite.ORDER_TYPE_MARKET, "product": PRODUCT} for option, _ in selection]
+
+    required, available = margin_check(orders)
+    if required > available:
+        print(f"Skipping the basket: margin required {required:.0f} exceeds available {available:.0f}")
+        return []
+
+    results = gateway.place_basket(orders)
+    for order, (option, premium), result in zip(orders, selection, results):
+        if isinstance(result, Exception):
+            print(f"Order for {order['tradingsymbol']} failed: {result}")
+        else:
+            print(f"Order placed: {result} ({order['tradingsymbol']} x{order['quantity']} near {premium})")
+    return [result for result in results if not isinstance(result, Exception)]
 
 if __name__ == "__main__":
     sell_otm_options()
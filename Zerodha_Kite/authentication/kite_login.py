@@ -1,6 +1,11 @@
+import os
+import sys
 from kiteconnect import KiteConnect
 import logging
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from Zerodha.Connection.session_manager import SessionManager
+
 # Initialize KiteConnect
 api_key = "your_api_key"
 kite = KiteConnect(api_key=api_key)
@@ -8,12 +13,14 @@ kite = KiteConnect(api_key=api_key)
 # Request token (you need to generate this using your account)
 request_token = "your_request_token"
 
-# Generate session
-data = kite.generate_session(request_token, api_secret="your_api_secret")
-kite.set_access_token(data["access_token"])
+# Generate session, or reuse today's from the shared session store
+session = SessionManager(
+    api_key, login=lambda kite: kite.generate_session(request_token, api_secret="your_api_secret")
+).session(kite)
+kite.set_access_token(session["access_token"])
 
-# Save access token for future use
+# Save access token for scripts that still read the file
 with open("access_token.txt", "w") as file:
-    file.write(data["access_token"])
+    file.write(session["access_token"])
 
 logging.info("Login successful!")